@@ -1,23 +1,74 @@
 import { render } from "@react-email/render";
 import { Command } from "commander";
+import { createInterface } from "node:readline";
 
 import emails from "./emails";
 
+const renderTemplate = async (
+  template: string,
+  props: Record<string, unknown>,
+): Promise<string> => {
+  const TemplateComponent = emails[template];
+  if (!TemplateComponent) {
+    throw new Error(`Template ${template} not found`);
+  }
+  return render(<TemplateComponent {...props} />);
+};
+
+const respond = (response: Record<string, unknown>) => {
+  process.stdout.write(`${JSON.stringify(response)}\n`);
+};
+
+/**
+ * Render requests read from stdin, one JSON object per line:
+ * `{"id": 1, "template": "magic_link", "props": {...}}`.
+ *
+ * Each response is written on stdout as soon as it's rendered,
+ * so they may come out of order: `{"id": 1, "html": "..."}`
+ * or `{"id": 1, "error": "..."}`.
+ *
+ * The process exits once stdin is closed and the pending renders are done.
+ */
+const serve = () => {
+  const lines = createInterface({ input: process.stdin, crlfDelay: Infinity });
+  lines.on("line", (line: string) => {
+    let request: { id: number; template: string; props: Record<string, unknown> };
+    try {
+      request = JSON.parse(line);
+    } catch (error) {
+      respond({ id: null, error: `Error parsing request: ${error}` });
+      return;
+    }
+    renderTemplate(request.template, request.props ?? {}).then(
+      (html) => respond({ id: request.id, html }),
+      (error) => respond({ id: request.id, error: String(error) }),
+    );
+  });
+};
+
 const program = new Command();
 
 program
-  .argument("<template>", "name of the email template")
-  .argument("<props>", "props to pass to the email template, as a JSON string")
-  .action((template: string, props: string) => {
+  .argument("[template]", "name of the email template")
+  .argument("[props]", "props to pass to the email template, as a JSON string")
+  .option("--serve", "render the requests read from stdin, line by line")
+  .action((template?: string, props?: string, options?: { serve?: boolean }) => {
+    if (options?.serve) {
+      serve();
+      return;
+    }
+    if (!template || !props) {
+      console.error("Missing template or props");
+      process.exit(1);
+    }
     try {
       const parsedProps = JSON.parse(props);
-      const TemplateComponent = emails[template];
-      if (!TemplateComponent) {
-        console.error(`Template ${template} not found`);
-        process.exit(1);
-      }
-      render(<TemplateComponent {...parsedProps} />).then((html) =>
-        console.log(html),
+      renderTemplate(template, parsedProps).then(
+        (html) => console.log(html),
+        (error) => {
+          console.error(String(error));
+          process.exit(1);
+        },
       );
     } catch (error) {
       console.error("Error parsing JSON string:", error);
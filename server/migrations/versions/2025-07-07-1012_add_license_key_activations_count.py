@@ -0,0 +1,45 @@
+"""Add LicenseKey.activations_count
+
+Revision ID: 9a1f3c6e2b47
+Revises: 4b8976c08210
+Create Date: 2025-07-07 10:12:41.523918
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "9a1f3c6e2b47"
+down_revision = "4b8976c08210"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "license_keys",
+        sa.Column(
+            "activations_count", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+    op.execute(
+        """
+        UPDATE license_keys
+        SET activations_count = activations.count
+        FROM (
+            SELECT license_key_id, COUNT(*) AS count
+            FROM license_key_activations
+            WHERE deleted_at IS NULL
+            GROUP BY license_key_id
+        ) AS activations
+        WHERE license_keys.id = activations.license_key_id
+        """
+    )
+    op.alter_column("license_keys", "activations_count", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("license_keys", "activations_count")
@@ -0,0 +1,86 @@
+"""Add TransactionBalanceSnapshot
+
+Revision ID: 3e5d7a91c4f8
+Revises: 9a1f3c6e2b47
+Create Date: 2025-07-08 10:30:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "3e5d7a91c4f8"
+down_revision = "9a1f3c6e2b47"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "transaction_balance_snapshots",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("modified_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("account_id", sa.Uuid(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("snapshot_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("amount", sa.BigInteger(), nullable=False),
+        sa.Column("account_amount", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["account_id"],
+            ["accounts.id"],
+            name=op.f("transaction_balance_snapshots_account_id_fkey"),
+            ondelete="cascade",
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("transaction_balance_snapshots_pkey")),
+        sa.UniqueConstraint(
+            "account_id",
+            "type",
+            name=op.f("transaction_balance_snapshots_account_id_type_key"),
+        ),
+    )
+    op.create_index(
+        op.f("ix_transaction_balance_snapshots_created_at"),
+        "transaction_balance_snapshots",
+        ["created_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_transaction_balance_snapshots_deleted_at"),
+        "transaction_balance_snapshots",
+        ["deleted_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_transaction_balance_snapshots_modified_at"),
+        "transaction_balance_snapshots",
+        ["modified_at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_transactions_account_id_created_at",
+        "transactions",
+        ["account_id", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_account_id_created_at", table_name="transactions")
+    op.drop_index(
+        op.f("ix_transaction_balance_snapshots_modified_at"),
+        table_name="transaction_balance_snapshots",
+    )
+    op.drop_index(
+        op.f("ix_transaction_balance_snapshots_deleted_at"),
+        table_name="transaction_balance_snapshots",
+    )
+    op.drop_index(
+        op.f("ix_transaction_balance_snapshots_created_at"),
+        table_name="transaction_balance_snapshots",
+    )
+    op.drop_table("transaction_balance_snapshots")
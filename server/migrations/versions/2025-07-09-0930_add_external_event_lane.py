@@ -0,0 +1,38 @@
+"""Add ExternalEvent.lane
+
+Revision ID: 5b8e2d4f7a13
+Revises: 3e5d7a91c4f8
+Create Date: 2025-07-09 09:30:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "5b8e2d4f7a13"
+down_revision = "3e5d7a91c4f8"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("external_events", sa.Column("lane", sa.Integer(), nullable=True))
+    op.create_index(
+        "ix_external_events_source_lane_pending",
+        "external_events",
+        ["source", "lane"],
+        unique=False,
+        postgresql_where=sa.text("handled_at IS NULL AND lane IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_external_events_source_lane_pending",
+        table_name="external_events",
+        postgresql_where=sa.text("handled_at IS NULL AND lane IS NOT NULL"),
+    )
+    op.drop_column("external_events", "lane")
@@ -0,0 +1,53 @@
+"""Add EventName
+
+Revision ID: 8c4f1e6a2d59
+Revises: 5b8e2d4f7a13
+Create Date: 2025-07-10 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "8c4f1e6a2d59"
+down_revision = "5b8e2d4f7a13"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_names",
+        sa.Column("organization_id", sa.Uuid(), nullable=False),
+        sa.Column("name", sa.String(length=128), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("occurrences", sa.BigInteger(), nullable=False),
+        sa.Column("first_seen", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("last_seen", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+            name=op.f("event_names_organization_id_fkey"),
+            ondelete="cascade",
+        ),
+        sa.PrimaryKeyConstraint(
+            "organization_id", "name", "source", name=op.f("event_names_pkey")
+        ),
+    )
+    op.create_index(
+        "ix_event_names_organization_id_last_seen",
+        "event_names",
+        ["organization_id", "last_seen"],
+        unique=False,
+    )
+
+    # Backfilled from the existing events by the event.enqueue_names_reconciliation
+    # job, one organization at a time, instead of aggregating all the events here.
+
+
+def downgrade() -> None:
+    op.drop_index("ix_event_names_organization_id_last_seen", table_name="event_names")
+    op.drop_table("event_names")
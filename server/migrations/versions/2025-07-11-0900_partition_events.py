@@ -0,0 +1,204 @@
+"""Partition events by month of ingestion
+
+Revision ID: d2a7c9e4b1f6
+Revises: 8c4f1e6a2d59
+Create Date: 2025-07-11 09:00:00.000000
+
+"""
+
+from datetime import UTC, datetime
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "d2a7c9e4b1f6"
+down_revision = "8c4f1e6a2d59"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+INDEXED_COLUMNS = (
+    "customer_id",
+    "external_customer_id",
+    "ingested_at",
+    "name",
+    "organization_id",
+    "source",
+    "timestamp",
+)
+FOREIGN_KEYS = ("customer_id", "organization_id")
+EVENT_FOREIGN_KEYS = (
+    ("billing_entry", "event_id", "cascade"),
+    ("meters", "last_billed_event_id", None),
+    ("customer_meters", "last_balanced_event_id", None),
+)
+PARTITIONS_AHEAD = 3
+
+DELETE_BILLING_ENTRIES_FUNCTION = """
+CREATE FUNCTION events_delete_billing_entries() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM billing_entry WHERE event_id = OLD.id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+"""
+DELETE_BILLING_ENTRIES_TRIGGER = """
+CREATE TRIGGER events_delete_billing_entries
+AFTER DELETE ON events
+FOR EACH ROW EXECUTE FUNCTION events_delete_billing_entries()
+"""
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + year, month=month_index + 1)
+
+
+def upgrade() -> None:
+    cutover = _add_months(
+        datetime.now(UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+        1,
+    )
+
+    # Prepare the expensive parts without blocking writes on the tables,
+    # so the locking part below only swaps catalog entries.
+    # Postgres can't build indexes concurrently inside a transaction.
+    with op.get_context().autocommit_block():
+        # Future primary key of the legacy partition
+        op.create_index(
+            "events_legacy_pkey",
+            "events",
+            ["id", "ingested_at"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        # Used to delete the billing entries of deleted events, see below
+        op.create_index(
+            op.f("ix_billing_entry_event_id"),
+            "billing_entry",
+            ["event_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        # A valid check constraint lets Postgres attach the partition without
+        # scanning it. Validating it scans the table, but doesn't block writes.
+        op.execute(
+            "ALTER TABLE events ADD CONSTRAINT events_legacy_ingested_at_check "
+            f"CHECK (ingested_at < '{cutover.isoformat()}') NOT VALID"
+        )
+        op.execute(
+            "ALTER TABLE events VALIDATE CONSTRAINT events_legacy_ingested_at_check"
+        )
+
+    # A partitioned table can only be referenced by a key including the partition
+    # key, which `id` alone isn't: the references to events become plain columns.
+    for table, column, _ in EVENT_FOREIGN_KEYS:
+        op.drop_constraint(f"{table}_{column}_fkey", table, type_="foreignkey")
+
+    # The existing table becomes the partition of all the events before the
+    # cutover, so we don't have to copy them.
+    op.rename_table("events", "events_legacy")
+    op.execute(
+        "ALTER TABLE events_legacy DROP CONSTRAINT events_pkey, "
+        "ADD CONSTRAINT events_legacy_pkey PRIMARY KEY USING INDEX events_legacy_pkey"
+    )
+    for column in INDEXED_COLUMNS:
+        op.execute(
+            f"ALTER INDEX ix_events_{column} RENAME TO ix_events_legacy_{column}"
+        )
+    for column in FOREIGN_KEYS:
+        op.execute(
+            f"ALTER TABLE events_legacy RENAME CONSTRAINT events_{column}_fkey "
+            f"TO events_legacy_{column}_fkey"
+        )
+
+    op.create_table(
+        "events",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("ingested_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("timestamp", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("name", sa.String(length=128), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("customer_id", sa.Uuid(), nullable=True),
+        sa.Column("external_customer_id", sa.String(), nullable=True),
+        sa.Column("organization_id", sa.Uuid(), nullable=False),
+        sa.Column(
+            "user_metadata", postgresql.JSONB(astext_type=sa.Text()), nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ["customer_id"], ["customers.id"], name=op.f("events_customer_id_fkey")
+        ),
+        sa.ForeignKeyConstraint(
+            ["organization_id"],
+            ["organizations.id"],
+            name=op.f("events_organization_id_fkey"),
+            ondelete="cascade",
+        ),
+        sa.PrimaryKeyConstraint("id", "ingested_at", name=op.f("events_pkey")),
+        postgresql_partition_by="RANGE (ingested_at)",
+    )
+    for column in INDEXED_COLUMNS:
+        op.create_index(op.f(f"ix_events_{column}"), "events", [column], unique=False)
+
+    # Its indexes and foreign keys match the parent ones, so they're attached as-is.
+    op.execute(
+        "ALTER TABLE events ATTACH PARTITION events_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{cutover.isoformat()}')"
+    )
+
+    for months in range(PARTITIONS_AHEAD):
+        start = _add_months(cutover, months)
+        end = _add_months(cutover, months + 1)
+        op.execute(
+            f"CREATE TABLE events_y{start.year}m{start.month:02d} PARTITION OF events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    # Catch events out of the created partitions, e.g. if maintenance lagged
+    op.execute("CREATE TABLE events_default PARTITION OF events DEFAULT")
+
+    # Replace the `ON DELETE CASCADE` of the billing entries foreign key
+    op.execute(DELETE_BILLING_ENTRIES_FUNCTION)
+    op.execute(DELETE_BILLING_ENTRIES_TRIGGER)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER events_delete_billing_entries ON events")
+    op.execute("DROP FUNCTION events_delete_billing_entries()")
+    op.drop_index(op.f("ix_billing_entry_event_id"), table_name="billing_entry")
+
+    op.execute("ALTER TABLE events DETACH PARTITION events_legacy")
+    columns = (
+        "id, ingested_at, timestamp, name, source, customer_id, "
+        "external_customer_id, organization_id, user_metadata"
+    )
+    op.execute(f"INSERT INTO events_legacy ({columns}) SELECT {columns} FROM events")
+    op.drop_table("events")
+
+    op.drop_constraint(
+        op.f("events_legacy_ingested_at_check"), "events_legacy", type_="check"
+    )
+    for column in FOREIGN_KEYS:
+        op.execute(
+            f"ALTER TABLE events_legacy RENAME CONSTRAINT events_legacy_{column}_fkey "
+            f"TO events_{column}_fkey"
+        )
+    for column in INDEXED_COLUMNS:
+        op.execute(
+            f"ALTER INDEX ix_events_legacy_{column} RENAME TO ix_events_{column}"
+        )
+    op.drop_constraint("events_legacy_pkey", "events_legacy", type_="primary")
+    op.create_primary_key("events_pkey", "events_legacy", ["id"])
+    op.rename_table("events_legacy", "events")
+
+    for table, column, ondelete in EVENT_FOREIGN_KEYS:
+        op.create_foreign_key(
+            f"{table}_{column}_fkey",
+            table,
+            "events",
+            [column],
+            ["id"],
+            ondelete=ondelete,
+        )
@@ -0,0 +1,86 @@
+"""Add user_metadata GIN indexes
+
+Revision ID: 4b9e1d7c3a82
+Revises: d2a7c9e4b1f6
+Create Date: 2025-07-12 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "4b9e1d7c3a82"
+down_revision = "d2a7c9e4b1f6"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+TABLES = ("customers", "orders", "subscriptions")
+PARTITIONED_TABLE = "events"
+
+
+def upgrade() -> None:
+    # Build the indexes without blocking writes on the tables.
+    # Postgres can't build indexes concurrently inside a transaction.
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(
+                f"ix_{table}_user_metadata",
+                table,
+                ["user_metadata"],
+                unique=False,
+                postgresql_using="gin",
+                postgresql_ops={"user_metadata": "jsonb_path_ops"},
+                postgresql_concurrently=True,
+            )
+
+        # Indexes can't be built concurrently on a partitioned table:
+        # create an invalid one on the parent only, build the index of each
+        # partition concurrently and attach it. Once they're all attached,
+        # the parent index becomes valid.
+        op.execute(
+            f"CREATE INDEX ix_{PARTITIONED_TABLE}_user_metadata "
+            f"ON ONLY {PARTITIONED_TABLE} USING gin (user_metadata jsonb_path_ops)"
+        )
+        partitions = (
+            op.get_bind()
+            .execute(
+                sa.text(
+                    "SELECT child.relname FROM pg_inherits "
+                    "JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent "
+                    "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+                    "WHERE parent.relname = :table ORDER BY child.relname"
+                ),
+                {"table": PARTITIONED_TABLE},
+            )
+            .scalars()
+            .all()
+        )
+        for partition in partitions:
+            op.create_index(
+                f"ix_{partition}_user_metadata",
+                partition,
+                ["user_metadata"],
+                unique=False,
+                postgresql_using="gin",
+                postgresql_ops={"user_metadata": "jsonb_path_ops"},
+                postgresql_concurrently=True,
+            )
+            op.execute(
+                f"ALTER INDEX ix_{PARTITIONED_TABLE}_user_metadata "
+                f"ATTACH PARTITION ix_{partition}_user_metadata"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.drop_index(
+                f"ix_{table}_user_metadata",
+                table_name=table,
+                postgresql_concurrently=True,
+            )
+    # Drops the indexes of the partitions as well
+    op.drop_index(f"ix_{PARTITIONED_TABLE}_user_metadata", table_name=PARTITIONED_TABLE)
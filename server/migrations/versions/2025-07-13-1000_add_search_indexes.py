@@ -0,0 +1,81 @@
+"""Add search indexes
+
+Revision ID: 7e3c5a9b2f14
+Revises: 4b9e1d7c3a82
+Create Date: 2025-07-13 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "7e3c5a9b2f14"
+down_revision = "4b9e1d7c3a82"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+TRIGRAM_INDEXES = (
+    ("customers", "email"),
+    ("customers", "name"),
+    ("meters", "name"),
+    ("event_names", "name"),
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Build the indexes without blocking writes on the tables.
+    # Postgres can't build indexes concurrently inside a transaction.
+    with op.get_context().autocommit_block():
+        for table, column in TRIGRAM_INDEXES:
+            op.create_index(
+                f"ix_{table}_{column}_trigram",
+                table,
+                [column],
+                unique=False,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+            )
+        op.create_index(
+            "ix_products_name_trigram",
+            "products",
+            [sa.text("(name::text) gin_trgm_ops")],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_customers_email_domain",
+            "customers",
+            [
+                "organization_id",
+                sa.text("lower(split_part(email, '@', 2)) text_pattern_ops"),
+            ],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_customers_email_domain",
+            table_name="customers",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_products_name_trigram",
+            table_name="products",
+            postgresql_concurrently=True,
+        )
+        for table, column in TRIGRAM_INDEXES:
+            op.drop_index(
+                f"ix_{table}_{column}_trigram",
+                table_name=table,
+                postgresql_concurrently=True,
+            )
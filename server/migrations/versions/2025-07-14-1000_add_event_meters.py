@@ -0,0 +1,49 @@
+"""Add event_meters and Meter.match_materialization
+
+Revision ID: a5f2c8e1d934
+Revises: 7e3c5a9b2f14
+Create Date: 2025-07-14 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "a5f2c8e1d934"
+down_revision = "7e3c5a9b2f14"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_meters",
+        sa.Column("meter_id", sa.Uuid(), nullable=False),
+        sa.Column("ingested_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("event_id", sa.Uuid(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["meter_id"],
+            ["meters.id"],
+            name=op.f("event_meters_meter_id_fkey"),
+            ondelete="cascade",
+        ),
+        sa.PrimaryKeyConstraint(
+            "meter_id", "ingested_at", "event_id", name=op.f("event_meters_pkey")
+        ),
+    )
+    op.add_column(
+        "meters", sa.Column("match_materialization", sa.String(), nullable=True)
+    )
+    op.add_column(
+        "meters",
+        sa.Column("match_materialized_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("meters", "match_materialized_at")
+    op.drop_column("meters", "match_materialization")
+    op.drop_table("event_meters")
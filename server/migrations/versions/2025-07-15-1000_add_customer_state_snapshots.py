@@ -0,0 +1,42 @@
+"""Add customer_state_snapshots
+
+Revision ID: c81e4d2a6f37
+Revises: a5f2c8e1d934
+Create Date: 2025-07-15 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# Polar Custom Imports
+
+# revision identifiers, used by Alembic.
+revision = "c81e4d2a6f37"
+down_revision = "a5f2c8e1d934"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "customer_state_snapshots",
+        sa.Column("customer_id", sa.Uuid(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("state", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["customer_id"],
+            ["customers.id"],
+            name=op.f("customer_state_snapshots_customer_id_fkey"),
+            ondelete="cascade",
+        ),
+        sa.PrimaryKeyConstraint(
+            "customer_id", name=op.f("customer_state_snapshots_pkey")
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("customer_state_snapshots")
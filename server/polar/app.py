@@ -10,8 +10,13 @@ from polar import worker  # noqa
 from polar.api import router
 from polar.checkout import ip_geolocation
 from polar.config import settings
+from polar.email.react import email_renderer_pool
 from polar.exception_handlers import add_exception_handlers
 from polar.health.endpoints import router as health_router
+from polar.integrations.stripe.service import (
+    stripe_http_client,
+    stripe_object_cache,
+)
 from polar.kit.cors import CORSConfig, CORSMatcherMiddleware, Scope
 from polar.kit.db.postgres import (
     AsyncEngine,
@@ -107,6 +112,8 @@ async def lifespan(app: FastAPI) -> AsyncIterator[State]:
     instrument_sqlalchemy(sync_engine)
 
     redis = create_redis("app")
+    stripe_http_client.set_redis(redis)
+    stripe_object_cache.set_redis(redis)
 
     try:
         ip_geolocation_client = ip_geolocation.get_client()
@@ -128,6 +135,9 @@ async def lifespan(app: FastAPI) -> AsyncIterator[State]:
         "ip_geolocation_client": ip_geolocation_client,
     }
 
+    stripe_http_client.set_redis(None)
+    stripe_object_cache.set_redis(None)
+    await email_renderer_pool.close()
     await redis.close(True)
     await async_engine.dispose()
     sync_engine.dispose()
@@ -0,0 +1,88 @@
+import asyncio
+import time
+import uuid
+from collections.abc import Sequence
+from datetime import timedelta
+from typing import Literal, TypeAlias
+
+from polar.redis import Redis
+
+BenefitGrantBatchTask: TypeAlias = Literal["update", "delete"]
+
+BATCH_PROGRESS_TTL = timedelta(days=7)
+
+
+class BenefitGrantBatchProgress:
+    """
+    Track the progress of a batched benefit grant job in Redis.
+
+    Processed items, grants or benefits granted to a customer, are checkpointed
+    after the database transaction handling them is committed, so a retried job
+    can skip them and resume where the previous attempt stopped.
+    """
+
+    def __init__(self, redis: Redis, batch_id: uuid.UUID) -> None:
+        self.redis = redis
+        self.batch_id = batch_id
+
+    async def get_remaining(self, ids: Sequence[uuid.UUID]) -> list[uuid.UUID]:
+        processed = await self.redis.smembers(self._get_processed_key())
+        return [id for id in ids if str(id) not in processed]
+
+    async def checkpoint(
+        self, processed_ids: Sequence[uuid.UUID], *, total: int
+    ) -> int:
+        """
+        Mark items as processed and return the overall number of processed items.
+        """
+        processed_key = self._get_processed_key()
+        progress_key = self._get_progress_key()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if processed_ids:
+                pipe.sadd(processed_key, *(str(id) for id in processed_ids))
+            pipe.scard(processed_key)
+            pipe.expire(processed_key, BATCH_PROGRESS_TTL)
+            results = await pipe.execute()
+            processed = int(results[-2])
+            pipe.hset(progress_key, mapping={"total": total, "processed": processed})
+            pipe.expire(progress_key, BATCH_PROGRESS_TTL)
+            await pipe.execute()
+        return processed
+
+    async def get(self) -> tuple[int, int] | None:
+        """
+        Return the `(processed, total)` counters of the batch, if known.
+        """
+        progress = await self.redis.hgetall(self._get_progress_key())
+        if not progress:
+            return None
+        return int(progress["processed"]), int(progress["total"])
+
+    def _get_processed_key(self) -> str:
+        return f"polar:benefit_grant_batch:{self.batch_id}:processed"
+
+    def _get_progress_key(self) -> str:
+        return f"polar:benefit_grant_batch:{self.batch_id}:progress"
+
+
+class BenefitGrantBatchRateLimiter:
+    """
+    Space out calls to an external provider during a batch.
+
+    Args:
+        rate: Maximum number of grants processed per second.
+        If `None`, grants are processed as fast as possible.
+    """
+
+    def __init__(self, rate: float | None) -> None:
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_at = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next_at > now:
+            await asyncio.sleep(self._next_at - now)
+            now = self._next_at
+        self._next_at = now + self.interval
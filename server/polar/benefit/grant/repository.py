@@ -33,6 +33,17 @@ class BenefitGrantRepository(
         )
         return await self.get_one_or_none(statement)
 
+    async def list_by_ids(
+        self, ids: Sequence[UUID], *, options: Options = ()
+    ) -> Sequence[BenefitGrant]:
+        statement = (
+            self.get_base_statement()
+            .where(BenefitGrant.id.in_(ids))
+            .order_by(BenefitGrant.created_at.asc())
+            .options(*options)
+        )
+        return await self.get_all(statement)
+
     async def list_granted_by_scope(
         self, **scope: Unpack[BenefitGrantScope]
     ) -> Sequence[BenefitGrant]:
@@ -1,3 +1,4 @@
+import itertools
 from collections.abc import Sequence
 from typing import Any, Literal, TypeVar, Unpack, overload
 from uuid import UUID
@@ -6,6 +7,7 @@ import structlog
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 
+from polar.config import settings
 from polar.customer.repository import CustomerRepository
 from polar.event.service import event as event_service
 from polar.event.system import SystemEvent, build_system_event
@@ -13,9 +15,11 @@ from polar.eventstream.service import publish as eventstream_publish
 from polar.exceptions import PolarError
 from polar.kit.pagination import PaginationParams, paginate
 from polar.kit.services import ResourceServiceReader
+from polar.kit.utils import generate_uuid
 from polar.logging import Logger
 from polar.models import Benefit, BenefitGrant, Customer, Product
 from polar.models.benefit_grant import BenefitGrantScope
+from polar.models.customer_state_snapshot import CustomerStateSection
 from polar.models.webhook_endpoint import WebhookEventType
 from polar.postgres import AsyncSession, sql
 from polar.redis import Redis
@@ -28,6 +32,7 @@ from ..strategies import (
     BenefitGrantProperties,
     BenefitProperties,
 )
+from .batch import BenefitGrantBatchTask
 from .repository import BenefitGrantRepository
 from .scope import scope_to_args
 
@@ -308,21 +313,15 @@ class BenefitGrantService(ResourceServiceReader[BenefitGrant]):
         repository = BenefitGrantRepository.from_session(session)
         outdated_grants = await repository.list_outdated_grants(product, **scope)
 
-        for benefit in product.benefits:
-            enqueue_job(
-                f"benefit.{task}",
-                customer_id=customer.id,
-                benefit_id=benefit.id,
-                **scope_to_args(scope),
-            )
-
-        for outdated_grant in outdated_grants:
-            enqueue_job(
-                "benefit.revoke",
-                customer_id=customer.id,
-                benefit_id=outdated_grant.benefit_id,
-                **scope_to_args(scope),
-            )
+        self._enqueue_customer_benefit_batches(
+            task, customer, [benefit.id for benefit in product.benefits], scope
+        )
+        self._enqueue_customer_benefit_batches(
+            "revoke",
+            customer,
+            [outdated_grant.benefit_id for outdated_grant in outdated_grants],
+            scope,
+        )
 
     async def enqueue_benefit_grant_updates(
         self,
@@ -337,8 +336,7 @@ class BenefitGrantService(ResourceServiceReader[BenefitGrant]):
 
         repository = BenefitGrantRepository.from_session(session)
         grants = await repository.list_granted_by_benefit(benefit)
-        for grant in grants:
-            enqueue_job("benefit.update", benefit_grant_id=grant.id)
+        self._enqueue_benefit_grant_batches("update", benefit.id, grants)
 
     async def update_benefit_grant(
         self,
@@ -352,14 +350,26 @@ class BenefitGrantService(ResourceServiceReader[BenefitGrant]):
         if grant.is_revoked:
             return grant
 
-        benefit = grant.benefit
-
         customer_repository = CustomerRepository.from_session(session)
         customer = await customer_repository.get_by_id(grant.customer_id)
         # Deleted customer, don't update the grant
         if customer is None:
             return grant
 
+        return await self._update_benefit_grant(
+            session, redis, grant, grant.benefit, customer, attempt=attempt
+        )
+
+    async def _update_benefit_grant(
+        self,
+        session: AsyncSession,
+        redis: Redis,
+        grant: BenefitGrant,
+        benefit: Benefit,
+        customer: Customer,
+        *,
+        attempt: int = 1,
+    ) -> BenefitGrant:
         previous_properties = grant.properties
         benefit_strategy = get_benefit_strategy(benefit.type, session, redis)
         try:
@@ -475,16 +485,18 @@ class BenefitGrantService(ResourceServiceReader[BenefitGrant]):
     ) -> None:
         repository = BenefitGrantRepository.from_session(session)
         grants = await repository.list_granted_by_benefit(benefit)
-        for grant in grants:
-            enqueue_job("benefit.delete_grant", benefit_grant_id=grant.id)
+        self._enqueue_benefit_grant_batches("delete", benefit.id, grants)
 
     async def enqueue_customer_grant_deletions(
         self, session: AsyncSession, customer: Customer
     ) -> None:
         repository = BenefitGrantRepository.from_session(session)
         grants = await repository.list_granted_by_customer(customer.id)
+        grants_by_benefit: dict[UUID, list[BenefitGrant]] = {}
         for grant in grants:
-            enqueue_job("benefit.delete_grant", benefit_grant_id=grant.id)
+            grants_by_benefit.setdefault(grant.benefit_id, []).append(grant)
+        for benefit_id, benefit_grants in grants_by_benefit.items():
+            self._enqueue_benefit_grant_batches("delete", benefit_id, benefit_grants)
 
     async def delete_benefit_grant(
         self,
@@ -499,7 +511,6 @@ class BenefitGrantService(ResourceServiceReader[BenefitGrant]):
             return grant
 
         await session.refresh(grant, {"benefit"})
-        benefit = grant.benefit
 
         customer_repository = CustomerRepository.from_session(session)
         customer = await customer_repository.get_by_id(
@@ -507,6 +518,20 @@ class BenefitGrantService(ResourceServiceReader[BenefitGrant]):
         )
         assert customer is not None
 
+        return await self._delete_benefit_grant(
+            session, redis, grant, grant.benefit, customer, attempt=attempt
+        )
+
+    async def _delete_benefit_grant(
+        self,
+        session: AsyncSession,
+        redis: Redis,
+        grant: BenefitGrant,
+        benefit: Benefit,
+        customer: Customer,
+        *,
+        attempt: int = 1,
+    ) -> BenefitGrant:
         previous_properties = grant.properties
         benefit_strategy = get_benefit_strategy(benefit.type, session, redis)
         properties = await benefit_strategy.revoke(
@@ -529,6 +554,70 @@ class BenefitGrantService(ResourceServiceReader[BenefitGrant]):
         )
         return grant
 
+    async def process_benefit_grant_batch_item(
+        self,
+        session: AsyncSession,
+        redis: Redis,
+        task: BenefitGrantBatchTask,
+        benefit: Benefit,
+        grant: BenefitGrant,
+        *,
+        attempt: int = 1,
+    ) -> BenefitGrant:
+        """
+        Process a grant from a batch, reusing the benefit and customer
+        preloaded once for the whole batch.
+        """
+        if grant.is_revoked:
+            return grant
+
+        customer = grant.customer
+        if task == "update":
+            # Deleted customer, don't update the grant
+            if customer.deleted_at is not None:
+                return grant
+            return await self._update_benefit_grant(
+                session, redis, grant, benefit, customer, attempt=attempt
+            )
+
+        return await self._delete_benefit_grant(
+            session, redis, grant, benefit, customer, attempt=attempt
+        )
+
+    def _enqueue_benefit_grant_batches(
+        self,
+        task: BenefitGrantBatchTask,
+        benefit_id: UUID,
+        grants: Sequence[BenefitGrant],
+    ) -> None:
+        for batch in itertools.batched(
+            (grant.id for grant in grants), settings.BENEFIT_GRANT_BATCH_SIZE
+        ):
+            enqueue_job(
+                "benefit.grant_batch",
+                task=task,
+                batch_id=generate_uuid(),
+                benefit_id=benefit_id,
+                benefit_grant_ids=list(batch),
+            )
+
+    def _enqueue_customer_benefit_batches(
+        self,
+        task: Literal["grant", "revoke"],
+        customer: Customer,
+        benefit_ids: Sequence[UUID],
+        scope: BenefitGrantScope,
+    ) -> None:
+        for batch in itertools.batched(benefit_ids, settings.BENEFIT_GRANT_BATCH_SIZE):
+            enqueue_job(
+                "benefit.customer_batch",
+                task=task,
+                batch_id=generate_uuid(),
+                customer_id=customer.id,
+                benefit_ids=list(batch),
+                **scope_to_args(scope),
+            )
+
     async def _send_webhook(
         self,
         session: AsyncSession,
@@ -550,6 +639,7 @@ class BenefitGrantService(ResourceServiceReader[BenefitGrant]):
             "customer.webhook",
             WebhookEventType.customer_state_changed,
             grant.customer_id,
+            sections=[CustomerStateSection.granted_benefits],
         )
 
 
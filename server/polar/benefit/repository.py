@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from uuid import UUID
 
 from sqlalchemy import Select, select
@@ -23,6 +24,17 @@ class BenefitRepository(
     def get_eager_options(self) -> Options:
         return (joinedload(Benefit.organization),)
 
+    async def list_by_ids(
+        self, ids: Sequence[UUID], *, options: Options = ()
+    ) -> Sequence[Benefit]:
+        statement = (
+            self.get_base_statement()
+            .where(Benefit.id.in_(ids))
+            .order_by(Benefit.created_at.asc())
+            .options(*options)
+        )
+        return await self.get_all(statement)
+
     def get_readable_statement(
         self, auth_subject: AuthSubject[User | Organization]
     ) -> Select[tuple[Benefit]]:
@@ -1,3 +1,5 @@
+import contextlib
+from collections.abc import AsyncIterator
 from typing import Any, Protocol, TypeVar, cast
 
 from polar.auth.models import AuthSubject
@@ -75,10 +77,28 @@ class BenefitServiceProtocol(Protocol[BP, BGP]):
 
     should_revoke_individually: bool = False
 
+    batch_rate_limit: float | None = None
+    """
+    Maximum number of grants processed per second by batched benefit grant jobs.
+
+    Set it for benefits calling an external provider,
+    so large batches stay within its rate limits.
+    """
+
     def __init__(self, session: AsyncSession, redis: Redis) -> None:
         self.session = session
         self.redis = redis
 
+    @contextlib.asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        """
+        Context wrapping the processing of a batch of grants.
+
+        Strategies can override it to share state across the grants of a batch,
+        like lookups to an external provider.
+        """
+        yield
+
     async def grant(
         self,
         benefit: Benefit,
@@ -1,4 +1,5 @@
-from typing import Any, cast
+import math
+from typing import Any, NoReturn, cast
 
 import httpx
 import structlog
@@ -8,7 +9,9 @@ from httpx_oauth.oauth2 import RefreshTokenError
 from polar.auth.models import AuthSubject
 from polar.config import settings
 from polar.customer.repository import CustomerRepository
+from polar.integrations.discord.client import DiscordRateLimitError
 from polar.integrations.discord.service import discord_bot as discord_bot_service
+from polar.kit.rate_limit import RateLimiter
 from polar.logging import Logger
 from polar.models import Benefit, Customer, Organization, User
 from polar.models.customer import CustomerOAuthAccount, CustomerOAuthPlatform
@@ -23,10 +26,17 @@ from .properties import BenefitDiscordProperties, BenefitGrantDiscordProperties
 
 log: Logger = structlog.get_logger()
 
+# Discord allows 50 requests per second per bot, across all our processes
+DISCORD_RATE_LIMIT_RATE = 40.0
+DISCORD_RATE_LIMIT_CAPACITY = 50
+
 
 class BenefitDiscordService(
     BenefitServiceProtocol[BenefitDiscordProperties, BenefitGrantDiscordProperties]
 ):
+    # Discord rate limits role updates per guild
+    batch_rate_limit = 5.0
+
     async def grant(
         self,
         benefit: Benefit,
@@ -64,10 +74,14 @@ class BenefitDiscordService(
 
         oauth_account = await self._get_customer_oauth_account(customer, account_id)
 
+        rate_limiter = self._get_rate_limiter()
+        await rate_limiter.acquire()
         try:
             await discord_bot_service.add_member(
                 guild_id, role_id, oauth_account.account_id, oauth_account.access_token
             )
+        except DiscordRateLimitError as e:
+            await self._handle_rate_limit_error(e, rate_limiter)
         except httpx.HTTPError as e:
             error_bound_logger = bound_logger.bind(error=str(e))
             if isinstance(e, httpx.HTTPStatusError):
@@ -116,8 +130,12 @@ class BenefitDiscordService(
         if not (guild_id and role_id and account_id):
             return {}
 
+        rate_limiter = self._get_rate_limiter()
+        await rate_limiter.acquire()
         try:
             await discord_bot_service.remove_member_role(guild_id, role_id, account_id)
+        except DiscordRateLimitError as e:
+            await self._handle_rate_limit_error(e, rate_limiter)
         except httpx.HTTPError as e:
             error_bound_logger = bound_logger.bind(error=str(e))
             if isinstance(e, httpx.HTTPStatusError):
@@ -175,6 +193,22 @@ class BenefitDiscordService(
 
         return cast(BenefitDiscordProperties, properties)
 
+    def _get_rate_limiter(self) -> RateLimiter:
+        return RateLimiter(
+            self.redis,
+            "discord",
+            rate=DISCORD_RATE_LIMIT_RATE,
+            capacity=DISCORD_RATE_LIMIT_CAPACITY,
+        )
+
+    async def _handle_rate_limit_error(
+        self, error: DiscordRateLimitError, rate_limiter: RateLimiter
+    ) -> NoReturn:
+        # Global rate limit: make sure other processes back off as well
+        if error.is_global:
+            await rate_limiter.block(error.retry_after)
+        raise BenefitRetriableError(math.ceil(error.retry_after)) from error
+
     async def _get_customer_oauth_account(
         self, customer: Customer, account_id: str
     ) -> CustomerOAuthAccount:
@@ -1,6 +1,7 @@
 import contextlib
 from collections.abc import AsyncIterator
-from typing import TYPE_CHECKING, Any, cast
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, TypeAlias, cast
 
 import structlog
 from githubkit.exception import (
@@ -15,6 +16,7 @@ from polar.integrations.github import client as github
 from polar.integrations.github_repository_benefit.service import (
     github_repository_benefit_user_service,
 )
+from polar.kit.rate_limit import RateLimiter
 from polar.logging import Logger
 from polar.models import Benefit, Customer, Organization, User
 from polar.models.customer import CustomerOAuthPlatform
@@ -38,12 +40,26 @@ if TYPE_CHECKING:
 
 log: Logger = structlog.get_logger()
 
+# GitHub allows 5,000 requests per hour per app installation
+GITHUB_RATE_LIMIT_RATE = 5_000 / 3_600
+GITHUB_RATE_LIMIT_CAPACITY = 50
+
+InvitationIndex: TypeAlias = dict[tuple[str, str], dict[int, "RepositoryInvitation"]]
+"""Pending invitations by invitee ID, for each `(owner, name)` repository."""
+
+_invitation_index: ContextVar[InvitationIndex | None] = ContextVar(
+    "polar.benefit.github_repository.invitation_index", default=None
+)
+
 
 class BenefitGitHubRepositoryService(
     BenefitServiceProtocol[
         BenefitGitHubRepositoryProperties, BenefitGrantGitHubRepositoryProperties
     ]
 ):
+    # GitHub secondary rate limits content-creating requests to ~80 per minute
+    batch_rate_limit = 1.0
+
     async def grant(
         self,
         benefit: Benefit,
@@ -102,14 +118,17 @@ class BenefitGitHubRepositoryService(
                     # The permission change will be handled by the add_collaborator call
                     pass
 
+            rate_limiter = self._get_rate_limiter(repository_owner)
+            await rate_limiter.acquire()
             try:
-                await client.rest.repos.async_add_collaborator(
+                response = await client.rest.repos.async_add_collaborator(
                     owner=repository_owner,
                     repo=repository_name,
                     username=oauth_account.account_username,
                     data={"permission": permission},
                 )
             except RateLimitExceeded as e:
+                await rate_limiter.block(e.retry_after.total_seconds())
                 raise BenefitRetriableError(int(e.retry_after.total_seconds())) from e
             except RequestFailed as e:
                 if e.response.is_client_error:
@@ -118,6 +137,12 @@ class BenefitGitHubRepositoryService(
             except (RequestTimeout, RequestError) as e:
                 raise BenefitRetriableError() from e
 
+            # A new invitation was created
+            if response.status_code == 201 and response.parsed_data is not None:
+                self._index_invitation(
+                    repository_owner, repository_name, response.parsed_data
+                )
+
             bound_logger.debug("Benefit granted")
 
             # Store repository and permission to compare on update
@@ -170,11 +195,12 @@ class BenefitGitHubRepositoryService(
                     "The customer needs to connect their GitHub account"
                 )
 
+            user_id = int(oauth_account.account_id)
             invitation = await self._get_invitation(
                 client,
                 repository_owner=repository_owner,
                 repository_name=repository_name,
-                user_id=int(oauth_account.account_id),
+                user_id=user_id,
             )
             if invitation is not None:
                 bound_logger.debug("Invitation not yet accepted, removing it")
@@ -187,9 +213,12 @@ class BenefitGitHubRepositoryService(
                     repository_owner, repository_name, oauth_account.account_username
                 )
 
+            rate_limiter = self._get_rate_limiter(repository_owner)
+            await rate_limiter.acquire()
             try:
                 await revoke_request
             except RateLimitExceeded as e:
+                await rate_limiter.block(e.retry_after.total_seconds())
                 raise BenefitRetriableError(int(e.retry_after.total_seconds())) from e
             except RequestFailed as e:
                 if e.response.is_client_error:
@@ -198,6 +227,9 @@ class BenefitGitHubRepositoryService(
             except (RequestTimeout, RequestError) as e:
                 raise BenefitRetriableError() from e
 
+            if invitation is not None:
+                self._unindex_invitation(repository_owner, repository_name, user_id)
+
             bound_logger.debug("Benefit revoked")
 
             return {}
@@ -316,6 +348,16 @@ class BenefitGitHubRepositoryService(
             },
         )
 
+    @contextlib.asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        # Index repository invitations once for the whole batch,
+        # instead of listing them for each grant
+        token = _invitation_index.set({})
+        try:
+            yield
+        finally:
+            _invitation_index.reset(token)
+
     async def _get_invitation(
         self,
         client: "GitHub[Any]",
@@ -324,15 +366,61 @@ class BenefitGitHubRepositoryService(
         repository_name: str,
         user_id: int,
     ) -> "RepositoryInvitation | None":
+        index = _invitation_index.get()
+        if index is not None:
+            invitations = index.get((repository_owner, repository_name))
+            if invitations is not None:
+                return invitations.get(user_id)
+
+        repository_invitations: dict[int, RepositoryInvitation] = {}
+        await self._get_rate_limiter(repository_owner).acquire()
         async for invitation in client.paginate(
             client.rest.repos.async_list_invitations,
             owner=repository_owner,
             repo=repository_name,
         ):
-            if invitation.invitee and invitation.invitee.id == user_id:
+            if invitation.invitee is None:
+                continue
+            # Not indexing, we can stop as soon as we find the user
+            if index is None and invitation.invitee.id == user_id:
                 return invitation
+            repository_invitations[invitation.invitee.id] = invitation
+
+        if index is not None:
+            index[(repository_owner, repository_name)] = repository_invitations
+
+        return repository_invitations.get(user_id)
 
-        return None
+    def _index_invitation(
+        self,
+        repository_owner: str,
+        repository_name: str,
+        invitation: "RepositoryInvitation",
+    ) -> None:
+        index = _invitation_index.get()
+        if index is None or invitation.invitee is None:
+            return
+        invitations = index.get((repository_owner, repository_name))
+        if invitations is not None:
+            invitations[invitation.invitee.id] = invitation
+
+    def _unindex_invitation(
+        self, repository_owner: str, repository_name: str, user_id: int
+    ) -> None:
+        index = _invitation_index.get()
+        if index is None:
+            return
+        invitations = index.get((repository_owner, repository_name))
+        if invitations is not None:
+            invitations.pop(user_id, None)
+
+    def _get_rate_limiter(self, repository_owner: str) -> RateLimiter:
+        return RateLimiter(
+            self.redis,
+            f"github:{repository_owner}",
+            rate=GITHUB_RATE_LIMIT_RATE,
+            capacity=GITHUB_RATE_LIMIT_CAPACITY,
+        )
 
     @contextlib.asynccontextmanager
     async def _get_github_app_client(
@@ -341,11 +429,11 @@ class BenefitGitHubRepositoryService(
         properties = self._get_properties(benefit)
         repository_owner = properties["repository_owner"]
         repository_name = properties["repository_name"]
-        installation = (
-            await github_repository_benefit_user_service.get_repository_installation(
-                owner=repository_owner, name=repository_name
+        installation_id = (
+            await github_repository_benefit_user_service.get_repository_installation_id(
+                self.redis, owner=repository_owner, name=repository_name
             )
         )
-        assert installation is not None
-        async with github.get_app_installation_client(installation.id) as client:
+        assert installation_id is not None
+        async with github.get_app_installation_client(installation_id) as client:
             yield client
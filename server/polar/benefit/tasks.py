@@ -1,25 +1,36 @@
 import uuid
 from typing import Literal, Unpack
 
+import dramatiq
 import structlog
 from dramatiq import Retry
+from sqlalchemy.orm import joinedload
 
 from polar.benefit.repository import BenefitRepository
 from polar.customer.repository import CustomerRepository
 from polar.exceptions import PolarTaskError
 from polar.logging import Logger
+from polar.models import BenefitGrant
 from polar.models.benefit_grant import BenefitGrantScopeArgs
 from polar.product.repository import ProductRepository
 from polar.worker import (
     AsyncSessionMaker,
+    JobQueueManager,
     RedisMiddleware,
     TaskPriority,
     actor,
     get_retries,
 )
 
+from .grant.batch import (
+    BenefitGrantBatchProgress,
+    BenefitGrantBatchRateLimiter,
+    BenefitGrantBatchTask,
+)
+from .grant.repository import BenefitGrantRepository
 from .grant.scope import resolve_scope
 from .grant.service import benefit_grant as benefit_grant_service
+from .registry import get_benefit_strategy
 from .strategies import BenefitRetriableError
 
 log: Logger = structlog.get_logger()
@@ -282,3 +293,162 @@ async def benefit_delete_grant(benefit_grant_id: uuid.UUID) -> None:
                 benefit_grant_id=str(benefit_grant_id),
             )
             raise Retry(delay=e.defer_milliseconds) from e
+
+
+@actor(actor_name="benefit.grant_batch", priority=TaskPriority.MEDIUM)
+async def benefit_grant_batch(
+    task: BenefitGrantBatchTask,
+    batch_id: uuid.UUID,
+    benefit_id: uuid.UUID,
+    benefit_grant_ids: list[uuid.UUID],
+) -> None:
+    redis = RedisMiddleware.get()
+    progress = BenefitGrantBatchProgress(redis, batch_id)
+    total = len(benefit_grant_ids)
+    processed_ids: list[uuid.UUID] = []
+
+    async with AsyncSessionMaker() as session:
+        benefit_repository = BenefitRepository.from_session(session)
+        benefit = await benefit_repository.get_by_id(
+            benefit_id,
+            options=benefit_repository.get_eager_options(),
+            # Deleted benefits are processed for deletion tasks
+            include_deleted=task == "delete",
+        )
+        if benefit is None:
+            raise BenefitDoesNotExist(benefit_id)
+
+        remaining_ids = await progress.get_remaining(benefit_grant_ids)
+        benefit_grant_repository = BenefitGrantRepository.from_session(session)
+        grants = await benefit_grant_repository.list_by_ids(
+            remaining_ids, options=(joinedload(BenefitGrant.customer),)
+        )
+
+        benefit_strategy = get_benefit_strategy(benefit.type, session, redis)
+        rate_limiter = BenefitGrantBatchRateLimiter(benefit_strategy.batch_rate_limit)
+
+        async with benefit_strategy.batch():
+            for grant in grants:
+                await rate_limiter.wait()
+                try:
+                    await benefit_grant_service.process_benefit_grant_batch_item(
+                        session, redis, task, benefit, grant, attempt=get_retries()
+                    )
+                except BenefitRetriableError as e:
+                    # Persist progress, so the retry resumes from this grant
+                    await session.commit()
+                    await JobQueueManager.get().flush(dramatiq.get_broker(), redis)
+                    processed = await progress.checkpoint(processed_ids, total=total)
+                    log.warning(
+                        "Retriable error encountered while processing benefit grant batch",
+                        error=str(e),
+                        defer_seconds=e.defer_seconds,
+                        task=task,
+                        batch_id=str(batch_id),
+                        benefit_id=str(benefit_id),
+                        benefit_grant_id=str(grant.id),
+                        processed=processed,
+                        total=total,
+                    )
+                    raise Retry(delay=e.defer_milliseconds) from e
+                processed_ids.append(grant.id)
+
+        await session.commit()
+        processed = await progress.checkpoint(processed_ids, total=total)
+        log.info(
+            "Benefit grant batch processed",
+            task=task,
+            batch_id=str(batch_id),
+            benefit_id=str(benefit_id),
+            processed=processed,
+            total=total,
+        )
+
+
+@actor(actor_name="benefit.customer_batch", priority=TaskPriority.MEDIUM)
+async def benefit_customer_batch(
+    task: Literal["grant", "revoke"],
+    batch_id: uuid.UUID,
+    customer_id: uuid.UUID,
+    benefit_ids: list[uuid.UUID],
+    **scope: Unpack[BenefitGrantScopeArgs],
+) -> None:
+    redis = RedisMiddleware.get()
+    progress = BenefitGrantBatchProgress(redis, batch_id)
+    total = len(benefit_ids)
+    processed_ids: list[uuid.UUID] = []
+
+    async with AsyncSessionMaker() as session:
+        customer_repository = CustomerRepository.from_session(session)
+        customer = await customer_repository.get_by_id(
+            customer_id,
+            # Allow deleted customers to be processed for revocation tasks
+            include_deleted=task == "revoke",
+        )
+        if customer is None:
+            raise CustomerDoesNotExist(customer_id)
+
+        resolved_scope = await resolve_scope(session, scope)
+
+        remaining_ids = await progress.get_remaining(benefit_ids)
+        benefit_repository = BenefitRepository.from_session(session)
+        benefits = await benefit_repository.list_by_ids(
+            remaining_ids, options=benefit_repository.get_eager_options()
+        )
+
+        rate_limiters: dict[str, BenefitGrantBatchRateLimiter] = {}
+        for benefit in benefits:
+            benefit_strategy = get_benefit_strategy(benefit.type, session, redis)
+            rate_limiter = rate_limiters.setdefault(
+                benefit.type,
+                BenefitGrantBatchRateLimiter(benefit_strategy.batch_rate_limit),
+            )
+            await rate_limiter.wait()
+            try:
+                if task == "grant":
+                    await benefit_grant_service.grant_benefit(
+                        session,
+                        redis,
+                        customer,
+                        benefit,
+                        attempt=get_retries(),
+                        **resolved_scope,
+                    )
+                else:
+                    await benefit_grant_service.revoke_benefit(
+                        session,
+                        redis,
+                        customer,
+                        benefit,
+                        attempt=get_retries(),
+                        **resolved_scope,
+                    )
+            except BenefitRetriableError as e:
+                # Persist progress, so the retry resumes from this benefit
+                await session.commit()
+                await JobQueueManager.get().flush(dramatiq.get_broker(), redis)
+                processed = await progress.checkpoint(processed_ids, total=total)
+                log.warning(
+                    "Retriable error encountered while processing customer benefit batch",
+                    error=str(e),
+                    defer_seconds=e.defer_seconds,
+                    task=task,
+                    batch_id=str(batch_id),
+                    customer_id=str(customer_id),
+                    benefit_id=str(benefit.id),
+                    processed=processed,
+                    total=total,
+                )
+                raise Retry(delay=e.defer_milliseconds) from e
+            processed_ids.append(benefit.id)
+
+        await session.commit()
+        processed = await progress.checkpoint(processed_ids, total=total)
+        log.info(
+            "Customer benefit batch processed",
+            task=task,
+            batch_id=str(batch_id),
+            customer_id=str(customer_id),
+            processed=processed,
+            total=total,
+        )
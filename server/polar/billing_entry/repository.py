@@ -1,6 +1,9 @@
+import itertools
 from collections.abc import Sequence
 from uuid import UUID
 
+from sqlalchemy import Uuid, column, update, values
+
 from polar.kit.repository import (
     Options,
     RepositoryBase,
@@ -9,6 +12,11 @@ from polar.kit.repository import (
 )
 from polar.models import BillingEntry
 
+BULK_UPDATE_BATCH_SIZE = 5000
+"""
+Rows updated per statement, to stay under the maximum number of query parameters.
+"""
+
 
 class BillingEntryRepository(
     RepositorySoftDeletionIDMixin[BillingEntry, UUID],
@@ -30,3 +38,24 @@ class BillingEntryRepository(
             .options(*options)
         )
         return await self.get_all(statement)
+
+    async def set_order_items(self, assignments: Sequence[tuple[UUID, UUID]]) -> None:
+        """
+        Set the order item of many billing entries.
+
+        Args:
+            assignments: Couples of billing entry ID and order item ID.
+        """
+        for batch in itertools.batched(assignments, BULK_UPDATE_BATCH_SIZE):
+            assignments_values = values(
+                column("id", Uuid),
+                column("order_item_id", Uuid),
+                name="assignments",
+            ).data(list(batch))
+            statement = (
+                update(BillingEntry)
+                .where(BillingEntry.id == assignments_values.c.id)
+                .values(order_item_id=assignments_values.c.order_item_id)
+                .execution_options(synchronize_session=False)
+            )
+            await self.session.execute(statement)
@@ -1,10 +1,13 @@
+import asyncio
 import dataclasses
+import hashlib
 import itertools
 import uuid
 from collections.abc import Sequence
 from datetime import datetime
 
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from polar.event.repository import EventRepository
 from polar.integrations.stripe.service import stripe as stripe_service
@@ -17,6 +20,9 @@ from polar.product.guard import MeteredPrice, is_metered_price
 
 from .repository import BillingEntryRepository
 
+INVOICE_ITEMS_CONCURRENCY = 10
+"""Maximum number of Stripe invoice items created in parallel for an invoice."""
+
 
 @dataclasses.dataclass
 class MeteredLineItem:
@@ -38,31 +44,47 @@ class BillingEntryService:
         *,
         stripe_invoice_id: str,
         stripe_customer_id: str,
-    ) -> Sequence[OrderItem]:
-        repository = BillingEntryRepository.from_session(session)
-
-        items: list[tuple[OrderItem, Sequence[BillingEntry]]] = []
-        for line_item, entries in await self.compute_pending_subscription_line_items(
+    ) -> Sequence[tuple[OrderItem, Sequence[BillingEntry]]]:
+        """
+        Create the order items, and their Stripe invoice items,
+        for the pending billing entries of the subscription.
+
+        The entries are not linked to the order items yet: it's done by
+        `set_order_items`, once the order items are saved with their order.
+        """
+        line_items = await self.compute_pending_subscription_line_items(
             session, subscription
-        ):
-            order_item_id = uuid.uuid4()
-            price = line_item.price
-            await stripe_service.create_invoice_item(
-                customer=stripe_customer_id,
-                invoice=stripe_invoice_id,
-                amount=line_item.amount,
-                currency=line_item.currency,
-                description=line_item.label,
-                metadata={
-                    "order_item_id": str(order_item_id),
-                    "product_price_id": str(price.id),
-                    "meter_id": str(price.meter_id),
-                    "units": str(line_item.consumed_units),
-                    "credited_units": str(line_item.credited_units),
-                    "unit_amount": str(price.unit_amount),
-                    "cap_amount": str(price.cap_amount),
-                },
+        )
+
+        semaphore = asyncio.Semaphore(INVOICE_ITEMS_CONCURRENCY)
+
+        async def _create_order_item(
+            line_item: MeteredLineItem, entries: Sequence[BillingEntry]
+        ) -> tuple[OrderItem, Sequence[BillingEntry]]:
+            idempotency_key = self._get_invoice_item_idempotency_key(
+                stripe_invoice_id, entries
             )
+            # Derived from the key, so a retried request has the same parameters
+            order_item_id = uuid.uuid5(uuid.NAMESPACE_OID, idempotency_key)
+            price = line_item.price
+            async with semaphore:
+                await stripe_service.create_invoice_item(
+                    customer=stripe_customer_id,
+                    invoice=stripe_invoice_id,
+                    amount=line_item.amount,
+                    currency=line_item.currency,
+                    description=line_item.label,
+                    metadata={
+                        "order_item_id": str(order_item_id),
+                        "product_price_id": str(price.id),
+                        "meter_id": str(price.meter_id),
+                        "units": str(line_item.consumed_units),
+                        "credited_units": str(line_item.credited_units),
+                        "unit_amount": str(price.unit_amount),
+                        "cap_amount": str(price.cap_amount),
+                    },
+                    idempotency_key=idempotency_key,
+                )
 
             order_item = OrderItem(
                 id=order_item_id,
@@ -72,16 +94,52 @@ class BillingEntryService:
                 proration=False,
                 product_price=price,
             )
-            items.append((order_item, entries))
+            return order_item, entries
+
+        async with asyncio.TaskGroup() as task_group:
+            tasks = [
+                task_group.create_task(_create_order_item(line_item, entries))
+                for line_item, entries in line_items
+            ]
+
+        return [task.result() for task in tasks]
+
+    def _get_invoice_item_idempotency_key(
+        self, stripe_invoice_id: str, entries: Sequence[BillingEntry]
+    ) -> str:
+        """
+        Idempotency key of the invoice item of a group of billing entries,
+        so retrying the billing cycle doesn't add the same item twice.
+        """
+        entries_hash = hashlib.sha256(
+            ",".join(sorted(str(entry.id) for entry in entries)).encode()
+        ).hexdigest()
+        return f"billing_entry_invoice_item_{stripe_invoice_id}_{entries_hash}"
+
+    async def set_order_items(
+        self,
+        session: AsyncSession,
+        items: Sequence[tuple[OrderItem, Sequence[BillingEntry]]],
+    ) -> None:
+        """
+        Link the billing entries to their order item, in bulk.
 
-        # Update entries with order item
-        # We don't do it in the main loop to avoid issues with DB flush, since we're
-        # generating OrderItem without attached to an Order yet.
-        for order_item, order_item_entries in items:
-            for entry in order_item_entries:
-                await repository.update(entry, update_dict={"order_item": order_item})
+        The order items must already be saved.
+        """
+        repository = BillingEntryRepository.from_session(session)
+        await repository.set_order_items(
+            [
+                (entry.id, order_item.id)
+                for order_item, entries in items
+                for entry in entries
+            ]
+        )
 
-        return [item for item, _ in items]
+        # Reflect the update on the loaded entries, without marking them as dirty
+        for order_item, entries in items:
+            for entry in entries:
+                set_committed_value(entry, "order_item_id", order_item.id)
+                set_committed_value(entry, "order_item", order_item)
 
     async def compute_pending_subscription_line_items(
         self, session: AsyncSession, subscription: Subscription
@@ -115,9 +173,12 @@ class BillingEntryService:
         subscription: Subscription,
         entries: Sequence[BillingEntry],
     ) -> MeteredLineItem:
+        start_timestamp = min(entry.start_timestamp for entry in entries)
+        end_timestamp = max(entry.end_timestamp for entry in entries)
+
         event_repository = EventRepository.from_session(session)
         events_statement = event_repository.get_by_pending_entries_statement(
-            subscription.id, price.id
+            subscription.id, price.id, since=start_timestamp
         )
         meter = price.meter
         units = await meter_service.get_quantity(
@@ -137,9 +198,6 @@ class BillingEntryService:
         amount, amount_label = price.get_amount_and_label(units - credited_units)
         label = f"{meter.name} — {amount_label}"
 
-        start_timestamp = min(entry.start_timestamp for entry in entries)
-        end_timestamp = max(entry.end_timestamp for entry in entries)
-
         return MeteredLineItem(
             price=price,
             start_timestamp=start_timestamp,
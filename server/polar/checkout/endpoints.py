@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from fastapi import Depends, Path, Query, Request
+from fastapi import Depends, Path, Query, Request, Response
 from pydantic import UUID4
 from sse_starlette.sse import EventSourceResponse
 
@@ -24,6 +24,7 @@ from polar.redis import Redis, get_redis
 from polar.routing import APIRouter
 
 from . import auth, ip_geolocation, sorting
+from .read_model import CheckoutPublicReadModel
 from .schemas import Checkout as CheckoutSchema
 from .schemas import (
     CheckoutConfirm,
@@ -191,8 +192,13 @@ async def update(
 async def client_get(
     client_secret: CheckoutClientSecret,
     session: AsyncSession = Depends(get_db_session),
-) -> Checkout:
+    redis: Redis = Depends(get_redis),
+) -> Checkout | Response:
     """Get a checkout session by client secret."""
+    # Serve the read model when available, not touching the database
+    checkout_public = await CheckoutPublicReadModel(redis).get(client_secret)
+    if checkout_public is not None:
+        return Response(content=checkout_public, media_type="application/json")
     return await checkout_service.get_by_client_secret(session, client_secret)
 
 
@@ -1,5 +1,5 @@
 from enum import StrEnum
-from typing import Literal, TypedDict, overload
+from typing import Any, Literal, NotRequired, TypedDict, overload
 
 from polar.eventstream.service import publish
 from polar.models.checkout import CheckoutStatus
@@ -14,6 +14,8 @@ class CheckoutEvent(StrEnum):
 
 class CheckoutEventUpdatedPayload(TypedDict):
     status: CheckoutStatus
+    delta: NotRequired[dict[str, Any]]
+    """Fields of the public checkout that changed since the previous update."""
 
 
 class CheckoutEventWebhookEventDeliveredPayload(TypedDict):
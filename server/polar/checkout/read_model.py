@@ -0,0 +1,150 @@
+import json
+import uuid
+from datetime import datetime
+from typing import Any
+
+from polar.kit.utils import utc_now
+from polar.postgres import AsyncSession, after_commit
+from polar.redis import Redis
+
+# Return the snapshot only if it was built after the last invalidation
+# of the organization's checkouts.
+_GET_SCRIPT = """
+local fields = redis.call("HMGET", KEYS[1], "data", "organization_id", "generation")
+if not fields[1] then
+    return nil
+end
+local current = redis.call("GET", ARGV[1] .. fields[2]) or "0"
+if fields[3] ~= current then
+    return nil
+end
+return fields[1]
+"""
+
+# Store the snapshot only if it's newer than the current one, so updates
+# processed out of order don't overwrite a fresh state with a stale one.
+# Returns the previous snapshot, "" if there was none, or nil if discarded.
+_SET_SCRIPT = """
+local key = KEYS[1]
+local version = tonumber(ARGV[1])
+local current = tonumber(redis.call("HGET", key, "version"))
+if current ~= nil and current >= version then
+    return nil
+end
+local generation = redis.call("GET", KEYS[2]) or "0"
+local previous = redis.call("HGET", key, "data")
+redis.call(
+    "HSET", key,
+    "version", ARGV[1],
+    "data", ARGV[2],
+    "organization_id", ARGV[3],
+    "generation", generation
+)
+redis.call("EXPIRE", key, ARGV[4])
+return previous or ""
+"""
+
+
+_MISSING = object()
+
+
+class CheckoutPublicReadModel:
+    """
+    Denormalized `CheckoutPublic` snapshots stored in Redis.
+
+    They're rebuilt each time a checkout is updated, so the checkout page
+    can read them without loading the checkout and its relationships
+    from the database. Snapshots expire with the checkout.
+
+    Snapshots also embed the organization and its products, so they're tagged
+    with a generation of the organization, bumped when those change:
+    a snapshot from a previous generation isn't served anymore.
+    """
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+
+    async def get(self, client_secret: str) -> str | None:
+        """
+        Return the JSON-encoded snapshot of the checkout, if available.
+        """
+        return await self.redis.eval(
+            _GET_SCRIPT,
+            1,
+            self._get_key(client_secret),
+            self._get_generation_key_prefix(),
+        )
+
+    async def set(
+        self,
+        client_secret: str,
+        data: dict[str, Any],
+        *,
+        version: float,
+        organization_id: uuid.UUID,
+    ) -> dict[str, Any] | None:
+        """
+        Store the snapshot of the checkout.
+
+        Returns:
+            The fields that changed since the previous snapshot,
+            or `None` if a newer snapshot is already stored.
+        """
+        expires_at = datetime.fromisoformat(data["expires_at"])
+        ttl = int((expires_at - utc_now()).total_seconds())
+        if ttl <= 0:
+            await self.delete(client_secret)
+            return None
+
+        previous = await self.redis.eval(
+            _SET_SCRIPT,
+            2,
+            self._get_key(client_secret),
+            self._get_generation_key(organization_id),
+            version,
+            json.dumps(data),
+            str(organization_id),
+            ttl,
+        )
+        if previous is None:
+            return None
+
+        previous_data: dict[str, Any] = json.loads(previous) if previous else {}
+        return {
+            key: value
+            for key, value in data.items()
+            if previous_data.get(key, _MISSING) != value
+        }
+
+    async def delete(self, client_secret: str) -> None:
+        await self.redis.delete(self._get_key(client_secret))
+
+    async def invalidate_organization(self, organization_id: uuid.UUID) -> None:
+        """
+        Stop serving the snapshots of the organization's checkouts,
+        until they're rebuilt.
+        """
+        await self.redis.incr(self._get_generation_key(organization_id))
+
+    def _get_key(self, client_secret: str) -> str:
+        return f"polar:checkout_public:{client_secret}"
+
+    def _get_generation_key_prefix(self) -> str:
+        return "polar:checkout_public_generation:"
+
+    def _get_generation_key(self, organization_id: uuid.UUID) -> str:
+        return f"{self._get_generation_key_prefix()}{organization_id}"
+
+
+def invalidate_organization_checkouts(
+    session: AsyncSession, organization_id: uuid.UUID
+) -> None:
+    """
+    Invalidate the public snapshots of the organization's checkouts
+    once the transaction is committed, e.g. after a product update.
+    """
+
+    async def _invalidate(redis: Redis) -> None:
+        await CheckoutPublicReadModel(redis).invalidate_organization(organization_id)
+
+    after_commit(session, _invalidate)
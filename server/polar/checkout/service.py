@@ -16,6 +16,7 @@ from polar.checkout.schemas import (
     CheckoutCreatePublic,
     CheckoutPriceCreate,
     CheckoutProductCreate,
+    CheckoutPublic,
     CheckoutUpdate,
     CheckoutUpdatePublic,
 )
@@ -64,7 +65,7 @@ from polar.models.webhook_endpoint import WebhookEventType
 from polar.order.service import order as order_service
 from polar.organization.repository import OrganizationRepository
 from polar.payment.repository import PaymentRepository
-from polar.postgres import AsyncSession
+from polar.postgres import AsyncSession, after_commit
 from polar.product.guard import (
     is_currency_price,
     is_custom_price,
@@ -73,14 +74,25 @@ from polar.product.guard import (
 )
 from polar.product.repository import ProductPriceRepository, ProductRepository
 from polar.product.service import product as product_service
+from polar.redis import Redis
 from polar.subscription.repository import SubscriptionRepository
 from polar.subscription.service import subscription as subscription_service
 from polar.webhook.service import webhook as webhook_service
 from polar.worker import enqueue_job
 
-from ..kit.tax import InvalidTaxID, TaxCalculationError, calculate_tax
+from ..kit.tax import (
+    InvalidTaxID,
+    TaxCalculationError,
+    calculate_tax,
+    calculate_tax_quote,
+)
 from . import ip_geolocation
-from .eventstream import CheckoutEvent, publish_checkout_event
+from .eventstream import (
+    CheckoutEvent,
+    CheckoutEventUpdatedPayload,
+    publish_checkout_event,
+)
+from .read_model import CheckoutPublicReadModel
 from .repository import CheckoutRepository
 from .sorting import CheckoutSortProperty
 
@@ -701,14 +713,22 @@ class CheckoutService:
         ip_geolocation_client: ip_geolocation.IPGeolocationClient | None = None,
     ) -> Checkout:
         async with self._lock_checkout_update(session, locker, checkout) as checkout:
+            tax_inputs = self._get_tax_inputs(checkout)
             checkout = await self._update_checkout(
                 session, checkout, checkout_update, ip_geolocation_client
             )
-            try:
-                checkout = await self._update_checkout_tax(session, checkout)
-            # Swallow incomplete tax calculation error: require it only on confirm
-            except TaxCalculationError:
-                pass
+            # Only estimate tax again if something affecting it changed
+            if (
+                checkout.tax_amount is None
+                or self._get_tax_inputs(checkout) != tax_inputs
+            ):
+                try:
+                    checkout = await self._update_checkout_tax(
+                        session, checkout, locker=locker
+                    )
+                # Swallow incomplete tax calculation error: require it only on confirm
+                except TaxCalculationError:
+                    pass
 
             await self._after_checkout_updated(session, checkout)
             return checkout
@@ -1606,9 +1626,32 @@ class CheckoutService:
 
         return checkout
 
+    def _get_tax_inputs(self, checkout: Checkout) -> tuple[typing.Any, ...]:
+        return (
+            checkout.is_payment_required,
+            checkout.product.is_tax_applicable,
+            checkout.currency,
+            checkout.net_amount,
+            checkout.product.stripe_product_id,
+            checkout.customer_billing_address,
+            checkout.customer_tax_id,
+        )
+
     async def _update_checkout_tax(
-        self, session: AsyncSession, checkout: Checkout
+        self,
+        session: AsyncSession,
+        checkout: Checkout,
+        *,
+        locker: Locker | None = None,
     ) -> Checkout:
+        """
+        Compute the tax amount of the checkout.
+
+        If a `locker` is given, we only get a tax quote shared across checkouts,
+        which is enough while the customer is still filling the form.
+        Otherwise, we create a tax calculation specific to this checkout,
+        which is required to record the tax transaction of the order.
+        """
         if not (checkout.is_payment_required and checkout.product.is_tax_applicable):
             checkout.tax_amount = 0
             checkout.tax_processor_id = None
@@ -1618,19 +1661,31 @@ class CheckoutService:
             checkout.customer_billing_address is not None
             and checkout.product.stripe_product_id is not None
         ):
+            tax_ids = (
+                [checkout.customer_tax_id]
+                if checkout.customer_tax_id is not None
+                else []
+            )
+            tax_processor_id: str | None = None
             try:
-                tax_processor_id, tax_amount = await calculate_tax(
-                    checkout.id,
-                    checkout.currency,
-                    checkout.net_amount,
-                    checkout.product.stripe_product_id,
-                    checkout.customer_billing_address,
-                    (
-                        [checkout.customer_tax_id]
-                        if checkout.customer_tax_id is not None
-                        else []
-                    ),
-                )
+                if locker is not None:
+                    tax_amount = await calculate_tax_quote(
+                        locker,
+                        checkout.currency,
+                        checkout.net_amount,
+                        checkout.product.stripe_product_id,
+                        checkout.customer_billing_address,
+                        tax_ids,
+                    )
+                else:
+                    tax_processor_id, tax_amount = await calculate_tax(
+                        checkout.id,
+                        checkout.currency,
+                        checkout.net_amount,
+                        checkout.product.stripe_product_id,
+                        checkout.customer_billing_address,
+                        tax_ids,
+                    )
                 checkout.tax_amount = tax_amount
                 checkout.tax_processor_id = tax_processor_id
             except TaxCalculationError:
@@ -1857,9 +1912,32 @@ class CheckoutService:
     async def _after_checkout_updated(
         self, session: AsyncSession, checkout: Checkout
     ) -> None:
-        await publish_checkout_event(
-            checkout.client_secret, CheckoutEvent.updated, {"status": checkout.status}
+        # Flush to set the modification time, which versions the snapshot
+        await session.flush()
+        client_secret = checkout.client_secret
+        status = checkout.status
+        organization_id = checkout.product.organization_id
+        version = (checkout.modified_at or checkout.created_at).timestamp()
+        checkout_public = CheckoutPublic.model_validate(checkout).model_dump(
+            mode="json", by_alias=True
         )
+
+        async def _update_public_read_model(redis: Redis) -> None:
+            # Store the snapshot once committed, so it never exposes uncommitted
+            # state and is up-to-date as soon as the response is sent
+            delta = await CheckoutPublicReadModel(redis).set(
+                client_secret,
+                checkout_public,
+                version=version,
+                organization_id=organization_id,
+            )
+            payload: CheckoutEventUpdatedPayload = {"status": status}
+            if delta is not None:
+                payload["delta"] = delta
+            await publish_checkout_event(client_secret, CheckoutEvent.updated, payload)
+
+        after_commit(session, _update_public_read_model)
+
         organization_repository = OrganizationRepository.from_session(session)
         organization = await organization_repository.get_by_id(
             checkout.product.organization_id
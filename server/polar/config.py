@@ -89,6 +89,9 @@ class Settings(BaseSettings):
     CUSTOMER_SESSION_CODE_TTL: timedelta = timedelta(minutes=30)
     CUSTOMER_SESSION_CODE_LENGTH: int = 6
 
+    # Customer state
+    CUSTOMER_STATE_SNAPSHOT_TTL: timedelta = timedelta(hours=1)
+
     # Magic link
     MAGIC_LINK_TTL_SECONDS: int = 60 * 30  # 30 minutes
 
@@ -126,8 +129,18 @@ class Settings(BaseSettings):
         / "bin"
         / f"react-email-pkg{file_extension}"
     )
+    EMAIL_RENDERER_POOL_SIZE: int = 2
+    EMAIL_RENDERER_TIMEOUT_SECONDS: float = 10.0
+    EMAIL_RENDERER_MAX_RENDERS: int = 1000  # Recycle the processes after that
     EMAIL_SENDER: EmailSender = EmailSender.logger
     RESEND_API_KEY: str = ""
+    # Resend API requests per second, shared by all our processes
+    RESEND_RATE_LIMIT: float = 2.0
+    RESEND_RATE_LIMIT_CAPACITY: int = 2
+    RESEND_RATE_LIMIT_TIMEOUT: float = 30.0
+    RESEND_MAX_RATE_LIMITED_RETRIES: int = 3
+    # Rendered emails are stored until their jobs are done
+    EMAIL_CONTENT_TTL: timedelta = timedelta(days=3)
     EMAIL_FROM_NAME: str = "Polar"
     EMAIL_FROM_EMAIL_ADDRESS: str = "noreply@notifications.polar.sh"
 
@@ -161,6 +174,18 @@ class Settings(BaseSettings):
     STRIPE_WEBHOOK_SECRET: str = ""
     STRIPE_CONNECT_WEBHOOK_SECRET: str = ""
     STRIPE_STATEMENT_DESCRIPTOR: str = "POLAR"
+    # Stripe API requests per second, shared by all our processes
+    STRIPE_RATE_LIMIT: float = 80.0
+    STRIPE_RATE_LIMIT_CAPACITY: int = 100
+    STRIPE_RATE_LIMIT_TIMEOUT: float = 10.0
+    STRIPE_MAX_RATE_LIMITED_RETRIES: int = 3
+    # Cache of the Stripe objects that won't change anymore
+    STRIPE_OBJECT_CACHE_LOCAL_SIZE: int = 1024
+    STRIPE_OBJECT_CACHE_TTL: timedelta = timedelta(days=1)
+
+    # Number of lanes external events are handled in, in order per object.
+    # 0 handles each event in an independent job.
+    EXTERNAL_EVENT_LANES: int = 0
 
     # Open Collective
     OPEN_COLLECTIVE_PERSONAL_TOKEN: str | None = None
@@ -230,10 +255,16 @@ class Settings(BaseSettings):
 
     ACCOUNT_PAYOUT_DELAY: timedelta = timedelta(seconds=1)
     ACCOUNT_PAYOUT_MINIMUM_BALANCE: int = 1000
+    # Stripe transfers made in parallel, and per second, when creating a payout
+    ACCOUNT_PAYOUT_TRANSFERS_CONCURRENCY: int = 5
+    ACCOUNT_PAYOUT_TRANSFERS_RATE_LIMIT: float = 20.0
 
     PLATFORM_FEE_BASIS_POINTS: int = 400
     PLATFORM_FEE_FIXED: int = 40
 
+    # Number of grants processed by a single batched benefit grant job
+    BENEFIT_GRANT_BATCH_SIZE: int = 100
+
     ORGANIZATION_SLUG_RESERVED_KEYWORDS: list[str] = [
         # Landing pages
         "benefits",
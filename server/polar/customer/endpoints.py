@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 from fastapi import Depends, Query
 
 from polar.exceptions import ResourceNotFound
@@ -8,7 +10,6 @@ from polar.models import Customer
 from polar.openapi import APITag
 from polar.organization.schemas import OrganizationID
 from polar.postgres import AsyncSession, get_db_session
-from polar.redis import Redis, get_redis
 from polar.routing import APIRouter
 
 from . import auth, sorting
@@ -72,6 +73,38 @@ async def list(
     )
 
 
+@router.get(
+    "/search",
+    summary="Search Customers",
+    response_model=Sequence[CustomerSchema],
+)
+async def search(
+    auth_subject: auth.CustomerRead,
+    query: str = Query(
+        ...,
+        min_length=1,
+        description=(
+            "Search by name or email. "
+            "Start with `@` to search by email domain, e.g. `@example.com`."
+        ),
+    ),
+    organization_id: MultipleQueryFilter[OrganizationID] | None = Query(
+        None, title="OrganizationID Filter", description="Filter by organization ID."
+    ),
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of results."),
+    session: AsyncSession = Depends(get_db_session),
+) -> Sequence[CustomerSchema]:
+    """Search customers, best matches first."""
+    results = await customer_service.search(
+        session,
+        auth_subject,
+        query,
+        organization_id=organization_id,
+        limit=limit,
+    )
+    return [CustomerSchema.model_validate(result) for result in results]
+
+
 @router.get(
     "/{id}",
     summary="Get Customer",
@@ -122,7 +155,6 @@ async def get_state(
     id: CustomerID,
     auth_subject: auth.CustomerRead,
     session: AsyncSession = Depends(get_db_session),
-    redis: Redis = Depends(get_redis),
 ) -> CustomerState:
     """
     Get a customer state by ID.
@@ -138,7 +170,7 @@ async def get_state(
     if customer is None:
         raise ResourceNotFound()
 
-    return await customer_service.get_state(session, redis, customer)
+    return await customer_service.get_state(session, customer)
 
 
 @router.get(
@@ -151,7 +183,6 @@ async def get_state_external(
     external_id: CustomerExternalID,
     auth_subject: auth.CustomerRead,
     session: AsyncSession = Depends(get_db_session),
-    redis: Redis = Depends(get_redis),
 ) -> CustomerState:
     """
     Get a customer state by external ID.
@@ -167,7 +198,7 @@ async def get_state_external(
     if customer is None:
         raise ResourceNotFound()
 
-    return await customer_service.get_state(session, redis, customer)
+    return await customer_service.get_state(session, customer)
 
 
 @router.post(
@@ -1,7 +1,9 @@
+from collections.abc import Sequence
 from typing import Any
 from uuid import UUID
 
-from sqlalchemy import Select, func, select
+from sqlalchemy import ColumnElement, Select, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from polar.auth.models import AuthSubject, Organization, User, is_organization, is_user
 from polar.kit.repository import (
@@ -9,7 +11,14 @@ from polar.kit.repository import (
     RepositorySoftDeletionIDMixin,
     RepositorySoftDeletionMixin,
 )
-from polar.models import Customer, UserOrganization
+from polar.kit.search import (
+    SEARCH_CANDIDATES,
+    escape_like,
+    get_search_clause,
+    get_search_rank,
+)
+from polar.kit.utils import utc_now
+from polar.models import Customer, CustomerStateSnapshot, UserOrganization
 from polar.models.webhook_endpoint import WebhookEventType
 from polar.worker import enqueue_job
 
@@ -114,3 +123,84 @@ class CustomerRepository(
             )
 
         return statement
+
+    def get_search_clause(self, query: str) -> ColumnElement[bool]:
+        """
+        Match customers by name or email.
+
+        A query starting with `@` matches the beginning of the email domain,
+        e.g. `@acme` matches `jane@acme.com`.
+        """
+        if query.startswith("@") and len(query) > 1:
+            pattern = f"{escape_like(query[1:].lower())}%"
+            # Same expression as `ix_customers_email_domain`
+            email_domain = func.lower(
+                func.split_part(
+                    Customer.email, literal_column("'@'"), literal_column("2")
+                )
+            )
+            return email_domain.like(pattern, escape="\\")
+        return get_search_clause(query, Customer.email, Customer.name)
+
+    async def search(
+        self, statement: Select[tuple[Customer]], query: str, *, limit: int
+    ) -> Sequence[Customer]:
+        return await self.get_all(
+            self.get_search_statement(statement, query, limit=limit)
+        )
+
+    def get_search_statement(
+        self, statement: Select[tuple[Customer]], query: str, *, limit: int
+    ) -> Select[tuple[Customer]]:
+        """
+        Select the customers best matching the query, among the ones selected by
+        the statement.
+
+        Only the first `SEARCH_CANDIDATES` matches are ranked, so broad queries
+        don't have to go through all the customers.
+        """
+        candidates = (
+            statement.with_only_columns(Customer.id)
+            .where(self.get_search_clause(query))
+            .limit(SEARCH_CANDIDATES)
+        )
+        rank = get_search_rank(query, Customer.email, Customer.name)
+        return (
+            self.get_base_statement()
+            .where(Customer.id.in_(candidates))
+            .order_by(rank.desc(), Customer.created_at.desc())
+            .limit(limit)
+        )
+
+
+class CustomerStateSnapshotRepository(RepositoryBase[CustomerStateSnapshot]):
+    model = CustomerStateSnapshot
+
+    async def get_by_customer(self, customer_id: UUID) -> CustomerStateSnapshot | None:
+        statement = self.get_base_statement().where(
+            CustomerStateSnapshot.customer_id == customer_id
+        )
+        return await self.get_one_or_none(statement)
+
+    async def get_locked_by_customer(self, customer_id: UUID) -> CustomerStateSnapshot:
+        """
+        Get the snapshot of the customer, locked `FOR UPDATE`.
+
+        An empty snapshot is created if the customer doesn't have one yet,
+        so concurrent updates of a new snapshot wait for each other as well.
+        """
+        insert_statement = (
+            pg_insert(CustomerStateSnapshot)
+            .values(customer_id=customer_id, version=0, state={}, updated_at=utc_now())
+            .on_conflict_do_nothing(index_elements=["customer_id"])
+        )
+        await self.session.execute(insert_statement)
+
+        statement = (
+            self.get_base_statement()
+            .where(CustomerStateSnapshot.customer_id == customer_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        result = await self.session.execute(statement)
+        return result.scalar_one()
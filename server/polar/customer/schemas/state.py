@@ -178,3 +178,12 @@ class CustomerState(CustomerBase):
     active_meters: list[CustomerStateMeter] = Field(
         description="The customer's active meters.",
     )
+    version: int = Field(
+        default=0,
+        description=(
+            "Version of the customer state, increased each time it changes. "
+            "Deliveries of `customer.state_changed` with a version you already "
+            "processed can be safely ignored."
+        ),
+        examples=[3],
+    )
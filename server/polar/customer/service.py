@@ -1,36 +1,49 @@
+import builtins
 import uuid
 from collections.abc import Sequence
 from typing import Any
 
-from sqlalchemy import UnaryExpression, asc, desc, func, or_
+from pydantic import TypeAdapter
+from sqlalchemy import UnaryExpression, asc, desc, func
 from sqlalchemy.orm import joinedload
-from sqlalchemy_utils.types.range import timedelta
 from stripe import Customer as StripeCustomer
 
 from polar.auth.models import AuthSubject
 from polar.benefit.grant.repository import BenefitGrantRepository
+from polar.config import settings
 from polar.customer_meter.repository import CustomerMeterRepository
 from polar.exceptions import PolarRequestValidationError, ValidationError
 from polar.kit.metadata import MetadataQuery, apply_metadata_clause
 from polar.kit.pagination import PaginationParams
 from polar.kit.sorting import Sorting
+from polar.kit.utils import utc_now
 from polar.models import (
     BenefitGrant,
     Customer,
     Organization,
     User,
 )
+from polar.models.customer_state_snapshot import CustomerStateSection
 from polar.models.webhook_endpoint import CustomerWebhookEventType, WebhookEventType
 from polar.organization.resolver import get_payload_organization
 from polar.postgres import AsyncSession
-from polar.redis import Redis
 from polar.subscription.repository import SubscriptionRepository
 from polar.webhook.service import webhook as webhook_service
 from polar.worker import enqueue_job
 
-from .repository import CustomerRepository
-from .schemas.customer import CustomerCreate, CustomerUpdate, CustomerUpdateExternalID
-from .schemas.state import CustomerState
+from .repository import CustomerRepository, CustomerStateSnapshotRepository
+from .schemas.customer import (
+    CustomerBase,
+    CustomerCreate,
+    CustomerUpdate,
+    CustomerUpdateExternalID,
+)
+from .schemas.state import (
+    CustomerState,
+    CustomerStateBenefitGrant,
+    CustomerStateMeter,
+    CustomerStateSubscription,
+)
 from .sorting import CustomerSortProperty
 
 
@@ -62,12 +75,7 @@ class CustomerService:
             statement = apply_metadata_clause(Customer, statement, metadata)
 
         if query is not None:
-            statement = statement.where(
-                or_(
-                    Customer.email.ilike(f"%{query}%"),
-                    Customer.name.ilike(f"%{query}%"),
-                )
-            )
+            statement = statement.where(repository.get_search_clause(query))
 
         order_by_clauses: list[UnaryExpression[Any]] = []
         for criterion, is_desc in sorting:
@@ -84,6 +92,23 @@ class CustomerService:
             statement, limit=pagination.limit, page=pagination.page
         )
 
+    async def search(
+        self,
+        session: AsyncSession,
+        auth_subject: AuthSubject[User | Organization],
+        query: str,
+        *,
+        organization_id: Sequence[uuid.UUID] | None = None,
+        limit: int = 10,
+    ) -> Sequence[Customer]:
+        repository = CustomerRepository.from_session(session)
+        statement = repository.get_readable_statement(auth_subject)
+
+        if organization_id is not None:
+            statement = statement.where(Customer.organization_id.in_(organization_id))
+
+        return await repository.search(statement, query, limit=limit)
+
     async def get(
         self,
         session: AsyncSession,
@@ -232,49 +257,124 @@ class CustomerService:
         return await repository.soft_delete(customer)
 
     async def get_state(
+        self, session: AsyncSession, customer: Customer
+    ) -> CustomerState:
+        """
+        Get the customer state from its snapshot.
+
+        If the customer doesn't have a snapshot yet, or if it wasn't fully
+        refreshed for `CUSTOMER_STATE_SNAPSHOT_TTL`, the state is built without
+        locking or writing the snapshot, and a job is enqueued to persist it.
+        The age check catches the changes not covered by the section hooks.
+        """
+        repository = CustomerStateSnapshotRepository.from_session(session)
+        snapshot = await repository.get_by_customer(customer.id)
+        if (
+            snapshot is not None
+            and snapshot.state
+            and snapshot.updated_at > utc_now() - settings.CUSTOMER_STATE_SNAPSHOT_TTL
+        ):
+            return CustomerState.model_validate(
+                {**snapshot.state, "version": snapshot.version}
+            )
+
+        previous_state = snapshot.state if snapshot is not None else {}
+        version = snapshot.version if snapshot is not None else 0
+        state = await self._build_state(session, customer, previous_state)
+        enqueue_job("customer.refresh_state", customer_id=customer.id)
+
+        # The version the job will store, unless the state changes again meanwhile
+        if state != previous_state:
+            version += 1
+        return CustomerState.model_validate({**state, "version": version})
+
+    async def refresh_state(
         self,
         session: AsyncSession,
-        redis: Redis,
         customer: Customer,
-        cache: bool = True,
+        sections: Sequence[CustomerStateSection] | None = None,
     ) -> CustomerState:
-        # 👋 Whenever you change the state schema,
-        # please also update the cache key with a version number.
-        cache_key = f"polar:customer_state:v2:{customer.id}"
-
-        if cache:
-            raw_state = await redis.get(cache_key)
-            if raw_state is not None:
-                return CustomerState.model_validate_json(raw_state)
-
-        # If not cached, fetch from the database
-        subscription_repository = SubscriptionRepository.from_session(session)
-        customer.active_subscriptions = (
-            await subscription_repository.list_active_by_customer(customer.id)
-        )
+        """
+        Update the customer state snapshot and return the state.
 
-        benefit_grant_repository = BenefitGrantRepository.from_session(session)
-        customer.granted_benefits = (
-            await benefit_grant_repository.list_granted_by_customer(
-                customer.id, options=(joinedload(BenefitGrant.benefit),)
-            )
-        )
+        Only the given sections are fetched again from the database; the other ones
+        are kept from the snapshot. The customer fields are always updated.
+        If `sections` is `None`, or the snapshot is empty, all of them are fetched
+        and the snapshot is marked as fresh, even if the state didn't change.
 
-        customer_meter_repository = CustomerMeterRepository.from_session(session)
-        customer.active_meters = await customer_meter_repository.get_all_by_customer(
-            customer.id
+        The snapshot version is bumped only if the state actually changed,
+        so consumers can tell duplicate deliveries apart from new states.
+        """
+        repository = CustomerStateSnapshotRepository.from_session(session)
+        # Lock before reading the sections, so we can't overwrite a fresher state
+        snapshot = await repository.get_locked_by_customer(customer.id)
+        full_refresh = sections is None or not snapshot.state
+        state = await self._build_state(
+            session, customer, snapshot.state, None if full_refresh else sections
         )
 
-        state = CustomerState.model_validate(customer)
+        update_dict: dict[str, Any] = {}
+        if state != snapshot.state:
+            update_dict.update(state=state, version=snapshot.version + 1)
+        if full_refresh:
+            update_dict["updated_at"] = utc_now()
+        if update_dict:
+            await repository.update(snapshot, update_dict=update_dict)
 
-        await redis.set(
-            cache_key,
-            state.model_dump_json(),
-            ex=int(timedelta(hours=1).total_seconds()),
-        )
+        return CustomerState.model_validate({**state, "version": snapshot.version})
 
+    async def _build_state(
+        self,
+        session: AsyncSession,
+        customer: Customer,
+        previous_state: dict[str, Any],
+        sections: Sequence[CustomerStateSection] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Build the customer state, fetching the given sections, or all of them
+        if `sections` is `None`, and keeping the other ones from `previous_state`.
+        """
+        state: dict[str, Any] = CustomerBase.model_validate(customer).model_dump(
+            mode="json"
+        )
+        for section in CustomerStateSection:
+            if sections is None or section in sections:
+                state[section] = await self._get_state_section(
+                    session, customer, section
+                )
+            else:
+                state[section] = previous_state[section]
         return state
 
+    async def _get_state_section(
+        self,
+        session: AsyncSession,
+        customer: Customer,
+        section: CustomerStateSection,
+    ) -> builtins.list[dict[str, Any]]:
+        objects: Sequence[Any]
+        match section:
+            case CustomerStateSection.active_subscriptions:
+                subscription_repository = SubscriptionRepository.from_session(session)
+                objects = await subscription_repository.list_active_by_customer(
+                    customer.id
+                )
+            case CustomerStateSection.granted_benefits:
+                benefit_grant_repository = BenefitGrantRepository.from_session(session)
+                objects = await benefit_grant_repository.list_granted_by_customer(
+                    customer.id, options=(joinedload(BenefitGrant.benefit),)
+                )
+            case CustomerStateSection.active_meters:
+                customer_meter_repository = CustomerMeterRepository.from_session(
+                    session
+                )
+                objects = await customer_meter_repository.get_all_by_customer(
+                    customer.id
+                )
+
+        adapter = _state_section_adapters[section]
+        return adapter.dump_python(adapter.validate_python(objects), mode="json")
+
     async def get_or_create_from_stripe_customer(
         self,
         session: AsyncSession,
@@ -325,13 +425,13 @@ class CustomerService:
     async def webhook(
         self,
         session: AsyncSession,
-        redis: Redis,
         event_type: CustomerWebhookEventType,
         customer: Customer,
+        sections: Sequence[CustomerStateSection] | None = None,
     ) -> None:
         data: CustomerState | Customer
         if event_type == WebhookEventType.customer_state_changed:
-            data = await self.get_state(session, redis, customer, cache=False)
+            data = await self.refresh_state(session, customer, sections)
             await webhook_service.send(
                 session,
                 customer.organization,
@@ -344,15 +444,25 @@ class CustomerService:
                 session, customer.organization, event_type, customer
             )
 
-        # For created, updated and deleted events, also trigger a state changed event
+        # For created, updated and deleted events, also trigger a state changed event.
+        # Only the customer fields of the state need to be refreshed.
         if event_type in (
             WebhookEventType.customer_created,
             WebhookEventType.customer_updated,
             WebhookEventType.customer_deleted,
         ):
             await self.webhook(
-                session, redis, WebhookEventType.customer_state_changed, customer
+                session, WebhookEventType.customer_state_changed, customer, sections=()
             )
 
 
+_state_section_adapters: dict[CustomerStateSection, TypeAdapter[Any]] = {
+    CustomerStateSection.active_subscriptions: TypeAdapter(
+        list[CustomerStateSubscription]
+    ),
+    CustomerStateSection.granted_benefits: TypeAdapter(list[CustomerStateBenefitGrant]),
+    CustomerStateSection.active_meters: TypeAdapter(list[CustomerStateMeter]),
+}
+
+
 customer = CustomerService()
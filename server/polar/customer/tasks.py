@@ -4,8 +4,9 @@ from sqlalchemy.orm import joinedload
 
 from polar.exceptions import PolarTaskError
 from polar.models import Customer
+from polar.models.customer_state_snapshot import CustomerStateSection
 from polar.models.webhook_endpoint import CustomerWebhookEventType
-from polar.worker import AsyncSessionMaker, RedisMiddleware, TaskPriority, actor
+from polar.worker import AsyncSessionMaker, TaskPriority, actor
 
 from .repository import CustomerRepository
 from .service import customer as customer_service
@@ -23,7 +24,9 @@ class CustomerDoesNotExist(CustomerTaskError):
 
 @actor(actor_name="customer.webhook", priority=TaskPriority.MEDIUM)
 async def customer_webhook(
-    event_type: CustomerWebhookEventType, customer_id: uuid.UUID
+    event_type: CustomerWebhookEventType,
+    customer_id: uuid.UUID,
+    sections: list[CustomerStateSection] | None = None,
 ) -> None:
     async with AsyncSessionMaker() as session:
         repository = CustomerRepository.from_session(session)
@@ -36,6 +39,15 @@ async def customer_webhook(
         if customer is None:
             raise CustomerDoesNotExist(customer_id)
 
-        await customer_service.webhook(
-            session, RedisMiddleware.get(), event_type, customer
-        )
+        await customer_service.webhook(session, event_type, customer, sections)
+
+
+@actor(actor_name="customer.refresh_state", priority=TaskPriority.LOW)
+async def customer_refresh_state(customer_id: uuid.UUID) -> None:
+    async with AsyncSessionMaker() as session:
+        repository = CustomerRepository.from_session(session)
+        customer = await repository.get_by_id(customer_id)
+        if customer is None:
+            raise CustomerDoesNotExist(customer_id)
+
+        await customer_service.refresh_state(session, customer)
@@ -15,6 +15,7 @@ from polar.locker import Locker
 from polar.meter.repository import MeterRepository
 from polar.meter.service import meter as meter_service
 from polar.models import Customer, CustomerMeter, Event, Meter
+from polar.models.customer_state_snapshot import CustomerStateSection
 from polar.models.event import EventSource
 from polar.models.webhook_endpoint import WebhookEventType
 from polar.postgres import AsyncSession
@@ -97,7 +98,10 @@ class CustomerMeterService:
 
         if updated:
             enqueue_job(
-                "customer.webhook", WebhookEventType.customer_state_changed, customer.id
+                "customer.webhook",
+                WebhookEventType.customer_state_changed,
+                customer.id,
+                sections=[CustomerStateSection.active_meters],
             )
 
     async def update_customer_meter(
@@ -0,0 +1,133 @@
+import contextlib
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from datetime import timedelta
+
+import structlog
+
+from polar.logging import Logger
+from polar.redis import Redis
+
+log: Logger = structlog.get_logger()
+
+RESERVATION_TTL = timedelta(minutes=5)
+"""
+Lifetime of a redemption reservation.
+
+It must outlive the transaction creating the redemption: until it's committed,
+the reservation is what makes other checkouts count the redemption.
+"""
+
+# Sweep the expired reservations, then add the new one,
+# ordered by a sequence so every reservation sees the same order.
+# Returns the rank of the reservation and all the current reservations.
+_RESERVE_SCRIPT = """
+local order_key = KEYS[1]
+local expiry_key = KEYS[2]
+local sequence_key = KEYS[3]
+local member = ARGV[1]
+local now = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+
+local expired = redis.call("ZRANGEBYSCORE", expiry_key, "-inf", now)
+for _, expired_member in ipairs(expired) do
+    redis.call("ZREM", order_key, expired_member)
+end
+redis.call("ZREMRANGEBYSCORE", expiry_key, "-inf", now)
+
+local sequence = redis.call("INCR", sequence_key)
+redis.call("ZADD", order_key, sequence, member)
+redis.call("ZADD", expiry_key, now + ttl, member)
+for _, key in ipairs(KEYS) do
+    redis.call("EXPIRE", key, math.ceil(ttl) + 60)
+end
+
+local rank = redis.call("ZRANK", order_key, member)
+return {rank, redis.call("ZRANGE", order_key, 0, -1)}
+"""
+
+
+class DiscountRedemptionReservations:
+    """
+    Reservations of discount redemptions, so concurrent checkouts can redeem
+    a discount with limited redemptions without waiting on each other.
+
+    Reservations are ordered: one is granted if the redemptions committed
+    in database plus the reservations before it are under the limit.
+    Redemptions still reserved are not counted from the database,
+    so the ones committed but not expired yet aren't counted twice.
+    """
+
+    def __init__(self, redis: Redis, *, ttl: timedelta = RESERVATION_TTL) -> None:
+        self.redis = redis
+        self.ttl = ttl
+
+    @contextlib.asynccontextmanager
+    async def reserve(
+        self,
+        discount_id: uuid.UUID,
+        redemption_id: uuid.UUID,
+        *,
+        max_redemptions: int,
+        count_redemptions: Callable[[Sequence[uuid.UUID]], Awaitable[int]],
+    ) -> AsyncIterator[bool]:
+        """
+        Reserve a redemption of the discount.
+
+        The reservation is released if the block raises,
+        else it's kept until it expires, covering the redemption until
+        it's committed.
+
+        Args:
+            discount_id: ID of the discount.
+            redemption_id: ID of the redemption to create.
+            max_redemptions: Maximum number of redemptions of the discount.
+            count_redemptions: Function counting the redemptions in database,
+            excluding the given redemption IDs.
+
+        Yields:
+            Whether the reservation was granted.
+        """
+        rank, reserved_ids = await self.redis.eval(
+            _RESERVE_SCRIPT,
+            3,
+            *self._get_keys(discount_id),
+            str(redemption_id),
+            time.time(),
+            self.ttl.total_seconds(),
+        )
+        try:
+            # Don't bother counting in database if the reservations
+            # before us already exhaust the limit
+            granted = rank < max_redemptions
+            if granted:
+                committed = await count_redemptions(
+                    [uuid.UUID(reserved_id) for reserved_id in reserved_ids]
+                )
+                granted = committed + rank < max_redemptions
+            if not granted:
+                log.info(
+                    "discount.reservation.refused",
+                    discount_id=discount_id,
+                    rank=rank,
+                )
+                await self.release(discount_id, redemption_id)
+            yield granted
+        except BaseException:
+            await self.release(discount_id, redemption_id)
+            raise
+
+    async def release(self, discount_id: uuid.UUID, redemption_id: uuid.UUID) -> None:
+        order_key, expiry_key, _ = self._get_keys(discount_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(order_key, str(redemption_id))
+            pipe.zrem(expiry_key, str(redemption_id))
+            await pipe.execute()
+
+    def _get_keys(self, discount_id: uuid.UUID) -> tuple[str, str, str]:
+        prefix = f"polar:discount_reservations:{discount_id}"
+        return f"{prefix}:order", f"{prefix}:expiry", f"{prefix}:sequence"
+
+
+__all__ = ["DiscountRedemptionReservations", "RESERVATION_TTL"]
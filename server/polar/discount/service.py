@@ -7,12 +7,13 @@ from sqlalchemy import Select, UnaryExpression, asc, delete, desc, func, or_, se
 from sqlalchemy.orm import joinedload
 
 from polar.auth.models import AuthSubject, is_organization, is_user
+from polar.checkout.read_model import invalidate_organization_checkouts
 from polar.exceptions import PolarError, PolarRequestValidationError
 from polar.integrations.stripe.service import stripe as stripe_service
 from polar.kit.pagination import PaginationParams, paginate
 from polar.kit.services import ResourceServiceReader
 from polar.kit.sorting import Sorting
-from polar.kit.utils import utc_now
+from polar.kit.utils import generate_uuid, utc_now
 from polar.locker import Locker
 from polar.models import (
     Discount,
@@ -28,6 +29,7 @@ from polar.organization.resolver import get_payload_organization
 from polar.postgres import AsyncSession
 from polar.product.repository import ProductRepository
 
+from .reservation import DiscountRedemptionReservations
 from .schemas import DiscountCreate, DiscountUpdate
 from .sorting import DiscountSortProperty
 
@@ -284,6 +286,8 @@ class DiscountService(ResourceServiceReader[Discount]):
         await session.flush()
         await session.refresh(discount)
 
+        invalidate_organization_checkouts(session, discount.organization_id)
+
         return discount
 
     async def delete(self, session: AsyncSession, discount: Discount) -> Discount:
@@ -292,6 +296,7 @@ class DiscountService(ResourceServiceReader[Discount]):
         await stripe_service.delete_coupon(discount.stripe_coupon_id)
 
         session.add(discount)
+        invalidate_organization_checkouts(session, discount.organization_id)
         return discount
 
     async def get_by_id_and_organization(
@@ -380,18 +385,11 @@ class DiscountService(ResourceServiceReader[Discount]):
     async def is_redeemable_discount(
         self, session: AsyncSession, discount: Discount
     ) -> bool:
-        if discount.starts_at is not None and discount.starts_at > utc_now():
-            return False
-
-        if discount.ends_at is not None and discount.ends_at < utc_now():
+        if not self._is_in_redemption_period(discount):
             return False
 
         if discount.max_redemptions is not None:
-            statement = select(func.count(DiscountRedemption.id)).where(
-                DiscountRedemption.discount_id == discount.id
-            )
-            result = await session.execute(statement)
-            redemptions_count = result.scalar_one()
+            redemptions_count = await self._count_redemptions(session, discount)
             return redemptions_count < discount.max_redemptions
 
         return True
@@ -400,22 +398,34 @@ class DiscountService(ResourceServiceReader[Discount]):
     async def redeem_discount(
         self, session: AsyncSession, locker: Locker, discount: Discount
     ) -> AsyncIterator[DiscountRedemption]:
-        # The timeout is purposely set to 10 seconds, a high value.
-        # We've seen in the past Stripe payment requests taking more than 5 seconds,
-        # causing the lock to expire while waiting for the payment to complete.
-        async with locker.lock(
-            f"discount:{discount.id}", timeout=10, blocking_timeout=10
-        ):
-            if not await self.is_redeemable_discount(session, discount):
-                raise DiscountNotRedeemableError(discount)
+        discount_redemption = DiscountRedemption(id=generate_uuid(), discount=discount)
 
-            discount_redemption = DiscountRedemption(discount=discount)
+        if not self._is_in_redemption_period(discount):
+            raise DiscountNotRedeemableError(discount)
 
+        if discount.max_redemptions is None:
             yield discount_redemption
+            await self._save_redemption(session, discount, discount_redemption)
+            return
+
+        # Reserve the redemption instead of locking the discount,
+        # so checkouts redeeming it don't wait on each other's payments.
+        reservations = DiscountRedemptionReservations(locker.redis)
+
+        async def _count_redemptions(exclude: Sequence[uuid.UUID]) -> int:
+            return await self._count_redemptions(session, discount, exclude=exclude)
+
+        async with reservations.reserve(
+            discount.id,
+            discount_redemption.id,
+            max_redemptions=discount.max_redemptions,
+            count_redemptions=_count_redemptions,
+        ) as granted:
+            if not granted:
+                raise DiscountNotRedeemableError(discount)
 
-            session.add(discount_redemption)
-            await session.flush()
-            await session.refresh(discount, {"redemptions_count"})
+            yield discount_redemption
+            await self._save_redemption(session, discount, discount_redemption)
 
     async def remove_checkout_redemption(
         self, session: AsyncSession, checkout: Checkout
@@ -425,6 +435,39 @@ class DiscountService(ResourceServiceReader[Discount]):
         )
         await session.execute(statement)
 
+    def _is_in_redemption_period(self, discount: Discount) -> bool:
+        now = utc_now()
+        if discount.starts_at is not None and discount.starts_at > now:
+            return False
+        if discount.ends_at is not None and discount.ends_at < now:
+            return False
+        return True
+
+    async def _count_redemptions(
+        self,
+        session: AsyncSession,
+        discount: Discount,
+        *,
+        exclude: Sequence[uuid.UUID] = (),
+    ) -> int:
+        statement = select(func.count(DiscountRedemption.id)).where(
+            DiscountRedemption.discount_id == discount.id
+        )
+        if exclude:
+            statement = statement.where(DiscountRedemption.id.not_in(exclude))
+        result = await session.execute(statement)
+        return result.scalar_one()
+
+    async def _save_redemption(
+        self,
+        session: AsyncSession,
+        discount: Discount,
+        discount_redemption: DiscountRedemption,
+    ) -> None:
+        session.add(discount_redemption)
+        await session.flush()
+        await session.refresh(discount, {"redemptions_count"})
+
     def _get_readable_discount_statement(
         self, auth_subject: AuthSubject[User | Organization]
     ) -> Select[tuple[Discount]]:
@@ -1,11 +1,33 @@
+import asyncio
+import contextlib
+import itertools
 import json
 import subprocess
-from typing import Any
+from pathlib import Path
+from typing import Any, Self
+
+import structlog
 
 from polar.config import settings
+from polar.exceptions import PolarError
+from polar.logging import Logger
+
+log: Logger = structlog.get_logger()
+
+# Rendered emails are sent back on a single line
+_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class ReactEmailError(PolarError): ...
 
 
 def render_email_template(template: str, props: dict[str, Any]) -> str:
+    """
+    Render the template in a new renderer process.
+
+    It blocks until the process exits: from async code, prefer
+    `email_renderer_pool.render`, which reuses long-lived processes.
+    """
     process = subprocess.Popen(
         [settings.EMAIL_RENDERER_BINARY_PATH, template, json.dumps(props)],
         stdout=subprocess.PIPE,
@@ -13,8 +35,190 @@ def render_email_template(template: str, props: dict[str, Any]) -> str:
     )
     stdout, stderr = process.communicate()
     if process.returncode != 0:
-        raise Exception(f"Error in react-email process: {stderr.decode('utf-8')}")
+        raise ReactEmailError(f"Error in react-email process: {stderr.decode('utf-8')}")
     return stdout.decode("utf-8")
 
 
-__all__ = ["render_email_template"]
+class RendererProcess:
+    """
+    A renderer process in serve mode, rendering concurrent requests.
+
+    Requests and responses are JSON lines on its stdin and stdout,
+    matched by their `id`.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process) -> None:
+        self.process = process
+        self.renders = 0
+        self._ids = itertools.count()
+        self._pending: dict[int, asyncio.Future[str]] = {}
+        self._reader = asyncio.create_task(self._read())
+
+    @classmethod
+    async def start(cls, binary_path: Path) -> Self:
+        process = await asyncio.create_subprocess_exec(
+            binary_path,
+            "--serve",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=_STREAM_LIMIT,
+        )
+        log.debug("Started email renderer process", pid=process.pid)
+        return cls(process)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def is_alive(self) -> bool:
+        return self.process.returncode is None and not self._reader.done()
+
+    async def render(self, template: str, props: dict[str, Any], timeout: float) -> str:
+        assert self.process.stdin is not None
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.renders += 1
+        try:
+            request = {"id": request_id, "template": template, "props": props}
+            self.process.stdin.write(json.dumps(request).encode("utf-8") + b"\n")
+            await self.process.stdin.drain()
+            return await asyncio.wait_for(future, timeout)
+        except (BrokenPipeError, ConnectionResetError) as e:
+            self.kill()
+            raise ReactEmailError("Email renderer process exited") from e
+        except TimeoutError as e:
+            # The process may be stuck: don't give it more requests
+            self.kill()
+            raise ReactEmailError(f"Timed out rendering {template}") from e
+        finally:
+            self._pending.pop(request_id, None)
+
+    def kill(self) -> None:
+        with contextlib.suppress(ProcessLookupError):
+            self.process.kill()
+
+    async def close(self) -> None:
+        """
+        Let the pending renders finish, then stop the process.
+        """
+        await asyncio.gather(*self._pending.values(), return_exceptions=True)
+        if self.process.stdin is not None:
+            self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), 5)
+        except TimeoutError:
+            self.kill()
+        await self._reader
+
+    async def _read(self) -> None:
+        assert self.process.stdout is not None
+        try:
+            while line := await self.process.stdout.readline():
+                try:
+                    response = json.loads(line)
+                    future = self._pending.get(response["id"])
+                except (ValueError, KeyError, TypeError):
+                    log.warning("Unexpected email renderer output", line=line[:200])
+                    continue
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(ReactEmailError(response["error"]))
+                else:
+                    future.set_result(response["html"])
+        except Exception as e:
+            log.error("Error reading from email renderer process", error=str(e))
+            self.kill()
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(
+                        ReactEmailError("Email renderer process exited")
+                    )
+            log.debug("Email renderer process exited", pid=self.process.pid)
+
+
+class RendererPool:
+    """
+    Long-lived renderer processes, sharing the renders of the event loop.
+
+    Processes are started on the first render, and restarted when they exit,
+    time out or reach `max_renders`.
+    """
+
+    def __init__(
+        self,
+        binary_path: Path,
+        *,
+        size: int,
+        timeout: float,
+        max_renders: int,
+    ) -> None:
+        self.binary_path = binary_path
+        self.size = size
+        self.timeout = timeout
+        self.max_renders = max_renders
+        self._processes: list[RendererProcess] = []
+        self._closing: set[asyncio.Task[None]] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock | None = None
+
+    async def render(self, template: str, props: dict[str, Any]) -> str:
+        process = await self._get_process()
+        return await process.render(template, props, self.timeout)
+
+    async def close(self) -> None:
+        processes, self._processes = self._processes, []
+        await asyncio.gather(
+            *(process.close() for process in processes), *self._closing
+        )
+
+    async def _get_process(self) -> RendererProcess:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Processes are bound to the event loop which started them
+            for process in self._processes:
+                with contextlib.suppress(RuntimeError):
+                    process.kill()
+            self._processes = []
+            self._loop = loop
+            self._lock = asyncio.Lock()
+
+        assert self._lock is not None
+        async with self._lock:
+            processes: list[RendererProcess] = []
+            for process in self._processes:
+                if not process.is_alive():
+                    log.warning(
+                        "Restarting email renderer process",
+                        pid=process.process.pid,
+                        returncode=process.process.returncode,
+                    )
+                elif process.renders >= self.max_renders:
+                    task = loop.create_task(process.close())
+                    self._closing.add(task)
+                    task.add_done_callback(self._closing.discard)
+                else:
+                    processes.append(process)
+            while len(processes) < self.size:
+                processes.append(await RendererProcess.start(self.binary_path))
+            self._processes = processes
+
+        return min(self._processes, key=lambda process: process.pending)
+
+
+email_renderer_pool = RendererPool(
+    settings.EMAIL_RENDERER_BINARY_PATH,
+    size=settings.EMAIL_RENDERER_POOL_SIZE,
+    timeout=settings.EMAIL_RENDERER_TIMEOUT_SECONDS,
+    max_renders=settings.EMAIL_RENDERER_MAX_RENDERS,
+)
+
+
+__all__ = [
+    "ReactEmailError",
+    "RendererPool",
+    "email_renderer_pool",
+    "render_email_template",
+]
@@ -1,10 +1,14 @@
 import datetime
-from collections.abc import Mapping
+import functools
+import threading
+from collections.abc import Iterable, Mapping
 from typing import Any
 
 from jinja2 import (
+    BytecodeCache,
     ChoiceLoader,
     Environment,
+    FileSystemBytecodeCache,
     PackageLoader,
     PrefixLoader,
     StrictUndefined,
@@ -12,10 +16,16 @@ from jinja2 import (
 )
 
 EMAIL_TEMPLATES_FOLDER_NAME = "email_templates"
+STRING_TEMPLATES_CACHE_SIZE = 256
 
 
 class EmailRenderer:
-    def __init__(self, extras_templates_packages: Mapping[str, str] = {}) -> None:
+    def __init__(
+        self,
+        extras_templates_packages: Mapping[str, str] = {},
+        *,
+        bytecode_cache: BytecodeCache | None = None,
+    ) -> None:
         """
         Args:
             extras_templates_package: Optional mapping to load additional templates.
@@ -23,6 +33,8 @@ class EmailRenderer:
                 e.g. `magic_link/template.html`.
                 Value is the namespace of the package containing an `email_templates`
                 directory containing Jinja templates.
+            bytecode_cache: Optional cache of the compiled templates,
+                shared between processes.
 
         Example:
 
@@ -44,12 +56,25 @@ class EmailRenderer:
             ),
             autoescape=select_autoescape(),
             undefined=StrictUndefined,
+            bytecode_cache=bytecode_cache,
         )
+        # Jinja only caches the templates from the loaders
+        self._from_string = functools.lru_cache(maxsize=STRING_TEMPLATES_CACHE_SIZE)(
+            self.env.from_string
+        )
+
+    def precompile(self) -> None:
+        """
+        Compile all the templates from the loaders, so the first renders
+        don't have to.
+        """
+        for name in self.env.list_templates(extensions=["html"]):
+            self.env.get_template(name)
 
     def render_from_string(
         self, subject: str, body: str, context: dict[str, Any]
     ) -> tuple[str, str]:
-        rendered_subject = self.env.from_string(subject).render(context).strip()
+        rendered_subject = self._from_string(subject).render(context).strip()
 
         wrapped_body = f"""
         {{% extends 'base.html' %}}
@@ -61,18 +86,61 @@ class EmailRenderer:
 
         context["current_year"] = datetime.datetime.now().year
 
-        rendered_body = self.env.from_string(wrapped_body).render(context).strip()
+        rendered_body = self._from_string(wrapped_body).render(context).strip()
         return rendered_subject, rendered_body
 
     def render_from_template(
         self, subject: str, body_template: str, context: dict[str, Any]
     ) -> tuple[str, str]:
-        rendered_subject = self.env.from_string(subject).render(context).strip()
-        rendered_body = self.env.get_template(body_template).render(context).strip()
-        return rendered_subject, rendered_body
+        return self.render_many_from_template(subject, body_template, [context])[0]
+
+    def render_many_from_template(
+        self,
+        subject: str,
+        body_template: str,
+        contexts: Iterable[dict[str, Any]],
+    ) -> list[tuple[str, str]]:
+        """
+        Render the same email for many recipients, e.g. all the members
+        of an organization, looking up the templates only once.
+        """
+        subject_template = self._from_string(subject)
+        template = self.env.get_template(body_template)
+        return [
+            (
+                subject_template.render(context).strip(),
+                template.render(context).strip(),
+            )
+            for context in contexts
+        ]
+
+
+_renderers: dict[frozenset[tuple[str, str]], EmailRenderer] = {}
+_renderers_lock = threading.Lock()
+_bytecode_cache: BytecodeCache | None = None
 
 
 def get_email_renderer(
     extras_templates_packages: Mapping[str, str] = {},
 ) -> EmailRenderer:
-    return EmailRenderer(extras_templates_packages)
+    """
+    Get the renderer of the templates packages, shared by the whole process,
+    so its compiled templates are reused from one email to the next.
+    """
+    global _bytecode_cache
+    key = frozenset(extras_templates_packages.items())
+    try:
+        return _renderers[key]
+    except KeyError:
+        pass
+
+    with _renderers_lock:
+        if key not in _renderers:
+            if _bytecode_cache is None:
+                _bytecode_cache = FileSystemBytecodeCache()
+            renderer = EmailRenderer(
+                extras_templates_packages, bytecode_cache=_bytecode_cache
+            )
+            renderer.precompile()
+            _renderers[key] = renderer
+        return _renderers[key]
@@ -1,15 +1,24 @@
+import asyncio
+import hashlib
+import json
+import random
+import uuid
 from abc import ABC, abstractmethod
+from collections.abc import Mapping, Sequence
 from typing import Any
 
 import httpx
 import structlog
 from email_validator import validate_email
+from redis.exceptions import RedisError
 
 from polar.config import EmailSender as EmailSenderType
 from polar.config import settings
 from polar.exceptions import PolarError
+from polar.kit.rate_limit import RateLimiter, RateLimitTimeout
 from polar.logging import Logger
-from polar.worker import enqueue_job
+from polar.redis import Redis
+from polar.worker import JobQueueManager, RedisMiddleware, enqueue_job
 
 log: Logger = structlog.get_logger()
 
@@ -18,6 +27,9 @@ DEFAULT_FROM_EMAIL_ADDRESS = settings.EMAIL_FROM_EMAIL_ADDRESS
 DEFAULT_REPLY_TO_NAME = "Polar Support"
 DEFAULT_REPLY_TO_EMAIL_ADDRESS = "support@polar.sh"
 
+# Maximum number of emails in a request to the batch endpoint of Resend
+EMAIL_BATCH_SIZE = 100
+
 
 def to_ascii_email(email: str) -> str:
     """
@@ -51,6 +63,35 @@ class EmailSender(ABC):
     ) -> None:
         pass
 
+    async def send_batch(
+        self,
+        *,
+        to_email_addrs: Sequence[str],
+        subject: str,
+        html_content: str,
+        batch_id: uuid.UUID,
+        batch_offset: int = 0,
+        from_name: str = DEFAULT_FROM_NAME,
+        from_email_addr: str = DEFAULT_FROM_EMAIL_ADDRESS,
+        email_headers: dict[str, str] = {},
+        reply_to_name: str | None = DEFAULT_REPLY_TO_NAME,
+        reply_to_email_addr: str | None = DEFAULT_REPLY_TO_EMAIL_ADDRESS,
+    ) -> None:
+        """
+        Send the same email to each recipient, separately.
+        """
+        for to_email_addr in to_email_addrs:
+            await self.send(
+                to_email_addr=to_email_addr,
+                subject=subject,
+                html_content=html_content,
+                from_name=from_name,
+                from_email_addr=from_email_addr,
+                email_headers=email_headers,
+                reply_to_name=reply_to_name,
+                reply_to_email_addr=reply_to_email_addr,
+            )
+
 
 class LoggingEmailSender(EmailSender):
     async def send(
@@ -77,11 +118,23 @@ class LoggingEmailSender(EmailSender):
 
 
 class ResendEmailSender(EmailSender):
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        rate_limit: float,
+        rate_limit_capacity: int,
+        rate_limit_timeout: float,
+        max_rate_limited_retries: int,
+    ) -> None:
         self.client = httpx.AsyncClient(
             base_url="https://api.resend.com",
             headers={"Authorization": f"Bearer {settings.RESEND_API_KEY}"},
         )
+        self.rate_limit = rate_limit
+        self.rate_limit_capacity = rate_limit_capacity
+        self.rate_limit_timeout = rate_limit_timeout
+        self.max_rate_limited_retries = max_rate_limited_retries
+        self._rate_limiter: RateLimiter | None = None
 
     async def send(
         self,
@@ -96,22 +149,19 @@ class ResendEmailSender(EmailSender):
         reply_to_email_addr: str | None = DEFAULT_REPLY_TO_EMAIL_ADDRESS,
     ) -> None:
         to_email_addr_ascii = to_ascii_email(to_email_addr)
-        payload: dict[str, Any] = {
-            "from": f"{from_name} <{to_ascii_email(from_email_addr)}>",
-            "to": [to_email_addr_ascii],
-            "subject": subject,
-            "html": html_content,
-            "headers": email_headers,
-        }
-        if reply_to_name and reply_to_email_addr:
-            payload["reply_to"] = (
-                f"{reply_to_name} <{to_ascii_email(reply_to_email_addr)}>"
-            )
+        payload = self._get_payload(
+            to_email_addr=to_email_addr_ascii,
+            subject=subject,
+            html_content=html_content,
+            from_name=from_name,
+            from_email_addr=from_email_addr,
+            email_headers=email_headers,
+            reply_to_name=reply_to_name,
+            reply_to_email_addr=reply_to_email_addr,
+        )
 
         try:
-            response = await self.client.post("/emails", json=payload)
-            response.raise_for_status()
-            email = response.json()
+            email = await self._post("/emails", payload)
         except httpx.HTTPError as e:
             log.warning(
                 "resend.send_error",
@@ -128,6 +178,198 @@ class ResendEmailSender(EmailSender):
             email_id=email["id"],
         )
 
+    async def send_batch(
+        self,
+        *,
+        to_email_addrs: Sequence[str],
+        subject: str,
+        html_content: str,
+        batch_id: uuid.UUID,
+        batch_offset: int = 0,
+        from_name: str = DEFAULT_FROM_NAME,
+        from_email_addr: str = DEFAULT_FROM_EMAIL_ADDRESS,
+        email_headers: dict[str, str] = {},
+        reply_to_name: str | None = DEFAULT_REPLY_TO_NAME,
+        reply_to_email_addr: str | None = DEFAULT_REPLY_TO_EMAIL_ADDRESS,
+    ) -> None:
+        """
+        Send the same email to each recipient, with one request
+        per `EMAIL_BATCH_SIZE` recipients.
+
+        Each request has an idempotency key derived from the batch ID and
+        the position of its recipients in the batch, so a retried job
+        doesn't send the email twice to the recipients of the chunks already
+        sent, while enqueuing the same email again sends it again.
+        """
+        for start in range(0, len(to_email_addrs), EMAIL_BATCH_SIZE):
+            chunk = [
+                to_ascii_email(to_email_addr)
+                for to_email_addr in to_email_addrs[start : start + EMAIL_BATCH_SIZE]
+            ]
+            payload = [
+                self._get_payload(
+                    to_email_addr=to_email_addr,
+                    subject=subject,
+                    html_content=html_content,
+                    from_name=from_name,
+                    from_email_addr=from_email_addr,
+                    email_headers=email_headers,
+                    reply_to_name=reply_to_name,
+                    reply_to_email_addr=reply_to_email_addr,
+                )
+                for to_email_addr in chunk
+            ]
+
+            try:
+                emails = await self._post(
+                    "/emails/batch",
+                    payload,
+                    idempotency_key=_get_batch_idempotency_key(
+                        batch_id, batch_offset + start
+                    ),
+                )
+            except httpx.HTTPError as e:
+                log.warning(
+                    "resend.send_batch_error",
+                    count=len(chunk),
+                    subject=subject,
+                    error=e,
+                )
+                raise SendEmailError(str(e)) from e
+
+            log.info(
+                "resend.send_batch",
+                count=len(chunk),
+                subject=subject,
+                email_ids=[email["id"] for email in emails["data"]],
+            )
+
+    def _get_payload(
+        self,
+        *,
+        to_email_addr: str,
+        subject: str,
+        html_content: str,
+        from_name: str,
+        from_email_addr: str,
+        email_headers: dict[str, str],
+        reply_to_name: str | None,
+        reply_to_email_addr: str | None,
+    ) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "from": f"{from_name} <{to_ascii_email(from_email_addr)}>",
+            "to": [to_email_addr],
+            "subject": subject,
+            "html": html_content,
+            "headers": email_headers,
+        }
+        if reply_to_name and reply_to_email_addr:
+            payload["reply_to"] = (
+                f"{reply_to_name} <{to_ascii_email(reply_to_email_addr)}>"
+            )
+        return payload
+
+    async def _post(
+        self, url: str, payload: Any, *, idempotency_key: str | None = None
+    ) -> Any:
+        headers = (
+            {"Idempotency-Key": idempotency_key} if idempotency_key is not None else {}
+        )
+        attempt = 0
+        while True:
+            await self._acquire()
+            response = await self.client.post(url, json=payload, headers=headers)
+            if response.status_code != 429 or attempt >= self.max_rate_limited_retries:
+                response.raise_for_status()
+                return response.json()
+
+            delay = self._get_backoff(attempt, response.headers)
+            log.warning("resend.rate_limited", attempt=attempt, delay=delay)
+            await self._block(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _get_rate_limiter(self) -> RateLimiter | None:
+        """
+        Get the rate limiter shared by the workers, or None outside of them.
+        """
+        try:
+            redis = RedisMiddleware.get()
+        except RuntimeError:
+            return None
+        if self._rate_limiter is None or self._rate_limiter.redis is not redis:
+            self._rate_limiter = RateLimiter(
+                redis,
+                "resend",
+                rate=self.rate_limit,
+                capacity=self.rate_limit_capacity,
+            )
+        return self._rate_limiter
+
+    async def _acquire(self) -> None:
+        rate_limiter = self._get_rate_limiter()
+        if rate_limiter is None:
+            return
+        # Fail open: Resend enforces its own limit anyway,
+        # and we back off when it tells us to.
+        try:
+            await rate_limiter.acquire(timeout=self.rate_limit_timeout)
+        except RateLimitTimeout as e:
+            log.warning("resend.rate_limit.timeout", wait=e.wait)
+        except RedisError as e:
+            log.warning("resend.rate_limit.error", error=str(e))
+
+    async def _block(self, delay: float) -> None:
+        rate_limiter = self._get_rate_limiter()
+        if rate_limiter is None:
+            return
+        try:
+            await rate_limiter.block(delay)
+        except RedisError as e:
+            log.warning("resend.rate_limit.error", error=str(e))
+
+    def _get_backoff(self, attempt: int, response_headers: Mapping[str, str]) -> float:
+        retry_after = response_headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Exponential backoff with full jitter, starting at 0.5 second
+        return random.uniform(0, 0.5 * 2**attempt)
+
+
+def get_email_content_key(subject: str, html_content: str) -> str:
+    digest = hashlib.sha256(
+        json.dumps([subject, html_content]).encode("utf-8")
+    ).hexdigest()
+    return f"email:content:{digest}"
+
+
+def _get_batch_idempotency_key(batch_id: uuid.UUID, offset: int) -> str:
+    return f"email-batch-{batch_id}-{offset}"
+
+
+def _store_email_content(subject: str, html_content: str) -> str:
+    """
+    Store the rendered email once, for the jobs sending it to reference it.
+    """
+    key = get_email_content_key(subject, html_content)
+    JobQueueManager.get().store(
+        key,
+        json.dumps({"subject": subject, "html_content": html_content}),
+        ttl=int(settings.EMAIL_CONTENT_TTL.total_seconds()),
+    )
+    return key
+
+
+async def get_email_content(redis: Redis, content_key: str) -> tuple[str, str] | None:
+    value = await redis.get(content_key)
+    if value is None:
+        return None
+    content = json.loads(value)
+    return content["subject"], content["html_content"]
+
 
 def enqueue_email(
     to_email_addr: str,
@@ -142,8 +384,7 @@ def enqueue_email(
     enqueue_job(
         "email.send",
         to_email_addr=to_email_addr,
-        subject=subject,
-        html_content=html_content,
+        content_key=_store_email_content(subject, html_content),
         from_name=from_name,
         from_email_addr=from_email_addr,
         email_headers=email_headers,
@@ -152,9 +393,50 @@ def enqueue_email(
     )
 
 
+def enqueue_bulk_email(
+    to_email_addrs: Sequence[str],
+    subject: str,
+    html_content: str,
+    from_name: str = DEFAULT_FROM_NAME,
+    from_email_addr: str = DEFAULT_FROM_EMAIL_ADDRESS,
+    email_headers: dict[str, str] = {},
+    reply_to_name: str | None = DEFAULT_REPLY_TO_NAME,
+    reply_to_email_addr: str | None = DEFAULT_REPLY_TO_EMAIL_ADDRESS,
+) -> None:
+    """
+    Enqueue the same email for many recipients,
+    with one job per `EMAIL_BATCH_SIZE` recipients.
+
+    The jobs share a batch ID, from which the idempotency keys
+    of the requests to the email provider are derived.
+    """
+    if not to_email_addrs:
+        return
+    content_key = _store_email_content(subject, html_content)
+    batch_id = uuid.uuid4()
+    for start in range(0, len(to_email_addrs), EMAIL_BATCH_SIZE):
+        enqueue_job(
+            "email.send_batch",
+            to_email_addrs=list(to_email_addrs[start : start + EMAIL_BATCH_SIZE]),
+            content_key=content_key,
+            batch_id=batch_id,
+            batch_offset=start,
+            from_name=from_name,
+            from_email_addr=from_email_addr,
+            email_headers=email_headers,
+            reply_to_name=reply_to_name,
+            reply_to_email_addr=reply_to_email_addr,
+        )
+
+
 email_sender: EmailSender
 if settings.EMAIL_SENDER == EmailSenderType.resend:
-    email_sender = ResendEmailSender()
+    email_sender = ResendEmailSender(
+        rate_limit=settings.RESEND_RATE_LIMIT,
+        rate_limit_capacity=settings.RESEND_RATE_LIMIT_CAPACITY,
+        rate_limit_timeout=settings.RESEND_RATE_LIMIT_TIMEOUT,
+        max_rate_limited_retries=settings.RESEND_MAX_RATE_LIMITED_RETRIES,
+    )
 else:
     # Logging in development
     email_sender = LoggingEmailSender()
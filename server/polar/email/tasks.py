@@ -1,19 +1,37 @@
-from polar.worker import TaskPriority, actor
+import uuid
 
-from .sender import email_sender
+import structlog
+
+from polar.logging import Logger
+from polar.worker import RedisMiddleware, TaskPriority, actor
+
+from .sender import email_sender, get_email_content
+
+log: Logger = structlog.get_logger()
 
 
 @actor(actor_name="email.send", priority=TaskPriority.HIGH)
 async def email_send(
     to_email_addr: str,
-    subject: str,
-    html_content: str,
     from_name: str,
     from_email_addr: str,
     email_headers: dict[str, str],
     reply_to_name: str | None,
     reply_to_email_addr: str | None,
+    content_key: str | None = None,
+    # Jobs enqueued before the content was stored separately
+    subject: str | None = None,
+    html_content: str | None = None,
 ) -> None:
+    if content_key is not None:
+        content = await get_email_content(RedisMiddleware.get(), content_key)
+        if content is None:
+            log.error("email.content_expired", content_key=content_key)
+            return
+        subject, html_content = content
+    assert subject is not None
+    assert html_content is not None
+
     await email_sender.send(
         to_email_addr=to_email_addr,
         subject=subject,
@@ -24,3 +42,35 @@ async def email_send(
         reply_to_name=reply_to_name,
         reply_to_email_addr=reply_to_email_addr,
     )
+
+
+@actor(actor_name="email.send_batch", priority=TaskPriority.HIGH)
+async def email_send_batch(
+    to_email_addrs: list[str],
+    content_key: str,
+    batch_id: uuid.UUID,
+    batch_offset: int,
+    from_name: str,
+    from_email_addr: str,
+    email_headers: dict[str, str],
+    reply_to_name: str | None,
+    reply_to_email_addr: str | None,
+) -> None:
+    content = await get_email_content(RedisMiddleware.get(), content_key)
+    if content is None:
+        log.error("email.content_expired", content_key=content_key)
+        return
+    subject, html_content = content
+
+    await email_sender.send_batch(
+        to_email_addrs=to_email_addrs,
+        subject=subject,
+        html_content=html_content,
+        batch_id=batch_id,
+        batch_offset=batch_offset,
+        from_name=from_name,
+        from_email_addr=from_email_addr,
+        email_headers=email_headers,
+        reply_to_name=reply_to_name,
+        reply_to_email_addr=reply_to_email_addr,
+    )
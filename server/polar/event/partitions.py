@@ -0,0 +1,137 @@
+"""
+Maintenance of the monthly partitions of the `events` table.
+
+`events` is partitioned by range of `ingested_at`, one partition per month,
+named `events_yYYYYmMM`. Partitions are created ahead of time; events falling
+outside of them end up in the `events_default` partition.
+"""
+
+import dataclasses
+import re
+from collections.abc import Sequence
+from datetime import UTC, datetime
+
+import structlog
+from sqlalchemy import text
+
+from polar.logging import Logger
+from polar.postgres import AsyncSession
+
+log: Logger = structlog.get_logger()
+
+PARTITIONS_AHEAD = 3
+"""Number of months for which partitions are created in advance."""
+
+PARTITION_NAME_REGEX = re.compile(r"^events_y(?P<year>\d{4})m(?P<month>\d{2})$")
+
+
+@dataclasses.dataclass(frozen=True)
+class EventPartition:
+    name: str
+    start: datetime
+    end: datetime
+
+
+def get_month_start(date: datetime, months: int = 0) -> datetime:
+    year, month_index = divmod(date.month - 1 + months, 12)
+    return datetime(date.year + year, month_index + 1, 1, tzinfo=UTC)
+
+
+def get_partition(month: datetime) -> EventPartition:
+    start = get_month_start(month)
+    return EventPartition(
+        name=f"events_y{start.year:04d}m{start.month:02d}",
+        start=start,
+        end=get_month_start(start, 1),
+    )
+
+
+class EventPartitionService:
+    async def list(self, session: AsyncSession) -> Sequence[EventPartition]:
+        """
+        List the monthly partitions attached to `events`, oldest first.
+
+        The legacy and default partitions are not included.
+        """
+        result = await session.execute(
+            text(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = 'events'
+                """
+            )
+        )
+        partitions: list[EventPartition] = []
+        for (name,) in result.tuples().all():
+            match = PARTITION_NAME_REGEX.match(name)
+            if match is None:
+                continue
+            partitions.append(
+                get_partition(
+                    datetime(int(match["year"]), int(match["month"]), 1, tzinfo=UTC)
+                )
+            )
+        return sorted(partitions, key=lambda partition: partition.start)
+
+    async def create_ahead(
+        self,
+        session: AsyncSession,
+        *,
+        months: int = PARTITIONS_AHEAD,
+        now: datetime | None = None,
+    ) -> Sequence[EventPartition]:
+        """
+        Create the partitions of the current month and of the next ones,
+        if they don't exist yet.
+
+        Returns:
+            The created partitions.
+        """
+        now = now or datetime.now(UTC)
+        existing = {partition.name for partition in await self.list(session)}
+        created: list[EventPartition] = []
+        for offset in range(months + 1):
+            partition = get_partition(get_month_start(now, offset))
+            if partition.name in existing:
+                continue
+            # Fails if the default partition already holds events of that month:
+            # they have to be moved manually, which is what we want to know about.
+            await session.execute(
+                text(
+                    f"CREATE TABLE {partition.name} PARTITION OF events "
+                    f"FOR VALUES FROM ('{partition.start.isoformat()}') "
+                    f"TO ('{partition.end.isoformat()}')"
+                )
+            )
+            created.append(partition)
+            log.info("event.partition.created", partition=partition.name)
+        return created
+
+    async def detach_before(
+        self, session: AsyncSession, before: datetime
+    ) -> Sequence[EventPartition]:
+        """
+        Detach the partitions ending before the given date.
+
+        Their events are not deleted: the tables are kept, so they can be
+        archived or dropped afterwards.
+
+        Returns:
+            The detached partitions.
+        """
+        detached: list[EventPartition] = []
+        for partition in await self.list(session):
+            if partition.end > before:
+                continue
+            await session.execute(
+                text(f"ALTER TABLE events DETACH PARTITION {partition.name}")
+            )
+            detached.append(partition)
+            log.info("event.partition.detached", partition=partition.name)
+        return detached
+
+
+event_partition = EventPartitionService()
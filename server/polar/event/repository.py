@@ -1,5 +1,5 @@
 from collections.abc import Sequence
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any
 from uuid import UUID
 
@@ -7,22 +7,44 @@ from sqlalchemy import (
     ColumnElement,
     ColumnExpressionArgument,
     Select,
+    Uuid,
     and_,
+    delete,
     func,
     insert,
+    literal,
     or_,
     select,
+    tuple_,
 )
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import joinedload
 
 from polar.auth.models import AuthSubject, Organization, User, is_organization, is_user
 from polar.kit.repository import RepositoryBase, RepositoryIDMixin
 from polar.kit.repository.base import Options
-from polar.models import BillingEntry, Customer, Event, Meter, UserOrganization
+from polar.models import (
+    BillingEntry,
+    Customer,
+    Event,
+    EventMeter,
+    EventName,
+    Meter,
+    UserOrganization,
+)
 from polar.models.event import EventSource
 
 from .system import SystemEvent
 
+INGESTION_MARGIN = timedelta(hours=1)
+"""
+Maximum time an event can be ingested before its timestamp.
+
+Events can't be ingested before they happen, except by the few microseconds
+between the defaults of `ingested_at` and `timestamp`; the margin covers it,
+and clock skew between our processes.
+"""
+
 
 class EventRepository(RepositoryBase[Event], RepositoryIDMixin[Event, UUID]):
     model = Event
@@ -117,6 +139,22 @@ class EventRepository(RepositoryBase[Event], RepositoryIDMixin[Event, UUID]):
         )
 
     def get_meter_clause(self, meter: Meter) -> ColumnExpressionArgument[bool]:
+        if meter.is_match_materialized:
+            # On the full primary key, so each event is looked up in its partition
+            return tuple_(Event.ingested_at, Event.id).in_(
+                select(EventMeter.ingested_at, EventMeter.event_id).where(
+                    EventMeter.meter_id == meter.id
+                )
+            )
+        return self.get_meter_definition_clause(meter)
+
+    def get_meter_definition_clause(
+        self, meter: Meter
+    ) -> ColumnExpressionArgument[bool]:
+        """
+        Evaluate the meter filter and aggregation on the events,
+        regardless of its materialized match.
+        """
         return and_(
             meter.filter.get_sql_clause(Event),
             # Additional clauses to make sure we work on rows with the right type for aggregation
@@ -137,9 +175,14 @@ class EventRepository(RepositoryBase[Event], RepositoryIDMixin[Event, UUID]):
         )
 
     def get_by_pending_entries_statement(
-        self, subscription: UUID, price: UUID
+        self, subscription: UUID, price: UUID, *, since: datetime | None = None
     ) -> Select[tuple[Event]]:
-        return (
+        """
+        Args:
+            since: Minimum timestamp of the pending entries, if known,
+            to only scan the partitions their events can be in.
+        """
+        statement = (
             self.get_base_statement()
             .join(BillingEntry, Event.id == BillingEntry.event_id)
             .where(
@@ -149,6 +192,327 @@ class EventRepository(RepositoryBase[Event], RepositoryIDMixin[Event, UUID]):
             )
             .order_by(Event.ingested_at.asc())
         )
+        if since is not None:
+            statement = statement.where(self.get_ingested_since_clause(since))
+        return statement
+
+    def get_ingested_since_clause(
+        self, timestamp: datetime | ColumnElement[datetime]
+    ) -> ColumnElement[bool]:
+        """
+        Bound `ingested_at` for events happening after the given timestamp.
+
+        `events` is partitioned by `ingested_at`: the bound lets Postgres
+        skip the partitions ingested before.
+        """
+        return Event.ingested_at >= timestamp - INGESTION_MARGIN
 
     def get_eager_options(self) -> Options:
         return (joinedload(Event.customer),)
+
+
+class EventNameRepository(RepositoryBase[EventName]):
+    model = EventName
+
+    async def get_all_by_organization(
+        self,
+        organization_id: UUID,
+        *,
+        names: Sequence[tuple[str, EventSource]] | None = None,
+        for_update: bool = False,
+    ) -> Sequence[EventName]:
+        statement = self.get_base_statement().where(
+            EventName.organization_id == organization_id
+        )
+        if names is not None:
+            statement = statement.where(
+                tuple_(EventName.name, EventName.source).in_(names)
+            )
+        if for_update:
+            # Lock in the same order as the upserts, so we don't deadlock with them
+            statement = statement.order_by(
+                EventName.name, EventName.source
+            ).with_for_update()
+        return await self.get_all(statement)
+
+    async def upsert_from_events(self, event_ids: Sequence[UUID]) -> None:
+        """
+        Add the given events to the statistics of their names.
+        """
+        aggregate = (
+            select(
+                Event.organization_id,
+                Event.name,
+                Event.source,
+                func.count(Event.id),
+                func.min(Event.timestamp),
+                func.max(Event.timestamp),
+            )
+            .where(Event.id.in_(event_ids))
+            .group_by(Event.organization_id, Event.name, Event.source)
+            # Upsert in a consistent order, so concurrent jobs don't deadlock
+            .order_by(Event.organization_id, Event.name, Event.source)
+        )
+        statement = pg_insert(EventName).from_select(
+            [
+                "organization_id",
+                "name",
+                "source",
+                "occurrences",
+                "first_seen",
+                "last_seen",
+            ],
+            aggregate,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[
+                EventName.organization_id,
+                EventName.name,
+                EventName.source,
+            ],
+            set_={
+                "occurrences": EventName.occurrences + statement.excluded.occurrences,
+                "first_seen": func.least(
+                    EventName.first_seen, statement.excluded.first_seen
+                ),
+                "last_seen": func.greatest(
+                    EventName.last_seen, statement.excluded.last_seen
+                ),
+            },
+        )
+        await self.session.execute(statement)
+
+    async def get_events_statistics(
+        self,
+        organization_id: UUID,
+        *,
+        ingested_before: datetime | None = None,
+        ingested_since: datetime | None = None,
+        names: Sequence[tuple[str, EventSource]] | None = None,
+    ) -> Sequence[tuple[str, EventSource, int, datetime, datetime]]:
+        """
+        Compute the statistics of the event names of the organization
+        from the events themselves.
+        """
+        statement = (
+            select(
+                Event.name,
+                Event.source,
+                func.count(Event.id),
+                func.min(Event.timestamp),
+                func.max(Event.timestamp),
+            )
+            .where(Event.organization_id == organization_id)
+            .group_by(Event.name, Event.source)
+        )
+        if ingested_before is not None:
+            statement = statement.where(Event.ingested_at < ingested_before)
+        if ingested_since is not None:
+            statement = statement.where(Event.ingested_at >= ingested_since)
+        if names is not None:
+            statement = statement.where(tuple_(Event.name, Event.source).in_(names))
+        result = await self.session.execute(statement)
+        return result.tuples().all()
+
+    async def insert_missing_names(
+        self,
+        organization_id: UUID,
+        names: Sequence[tuple[str, EventSource]],
+        timestamp: datetime,
+    ) -> None:
+        """
+        Add the given names to the catalog, without occurrences,
+        unless they're already there.
+        """
+        if not names:
+            return
+        statement = (
+            pg_insert(EventName)
+            .values(
+                [
+                    {
+                        "organization_id": organization_id,
+                        "name": name,
+                        "source": source,
+                        "occurrences": 0,
+                        "first_seen": timestamp,
+                        "last_seen": timestamp,
+                    }
+                    for name, source in sorted(names)
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        await self.session.execute(statement)
+
+    async def set_statistics(
+        self,
+        organization_id: UUID,
+        statistics: Sequence[tuple[str, EventSource, int, datetime, datetime]],
+    ) -> None:
+        """
+        Overwrite the statistics of the given event names.
+        """
+        if not statistics:
+            return
+        statement = pg_insert(EventName).values(
+            [
+                {
+                    "organization_id": organization_id,
+                    "name": name,
+                    "source": source,
+                    "occurrences": occurrences,
+                    "first_seen": first_seen,
+                    "last_seen": last_seen,
+                }
+                for name, source, occurrences, first_seen, last_seen in statistics
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[
+                EventName.organization_id,
+                EventName.name,
+                EventName.source,
+            ],
+            set_={
+                "occurrences": statement.excluded.occurrences,
+                "first_seen": statement.excluded.first_seen,
+                "last_seen": statement.excluded.last_seen,
+            },
+        )
+        await self.session.execute(statement)
+
+    async def delete_names(
+        self, organization_id: UUID, names: Sequence[tuple[str, EventSource]]
+    ) -> None:
+        if not names:
+            return
+        statement = delete(EventName).where(
+            EventName.organization_id == organization_id,
+            tuple_(EventName.name, EventName.source).in_(names),
+        )
+        await self.session.execute(statement)
+
+    def get_event_names_statement(
+        self, auth_subject: AuthSubject[User | Organization]
+    ) -> Select[tuple[str, EventSource, int, datetime, datetime]]:
+        return self.get_readable_statement(auth_subject).with_only_columns(
+            EventName.name,
+            EventName.source,
+            EventName.occurrences,
+            EventName.first_seen,
+            EventName.last_seen,
+        )
+
+    def get_readable_statement(
+        self, auth_subject: AuthSubject[User | Organization]
+    ) -> Select[tuple[EventName]]:
+        statement = self.get_base_statement()
+
+        if is_user(auth_subject):
+            user = auth_subject.subject
+            statement = statement.where(
+                EventName.organization_id.in_(
+                    select(UserOrganization.organization_id).where(
+                        UserOrganization.user_id == user.id,
+                        UserOrganization.deleted_at.is_(None),
+                    )
+                )
+            )
+
+        elif is_organization(auth_subject):
+            statement = statement.where(
+                EventName.organization_id == auth_subject.subject.id
+            )
+
+        return statement
+
+
+class EventMeterRepository(RepositoryBase[EventMeter]):
+    model = EventMeter
+
+    async def insert_batch(self, event_meters: Sequence[dict[str, Any]]) -> None:
+        if not event_meters:
+            return
+        statement = pg_insert(EventMeter).on_conflict_do_nothing()
+        await self.session.execute(statement, event_meters)
+
+    async def tag_events(self, meter: Meter, event_ids: Sequence[UUID]) -> None:
+        """
+        Associate the meter with the given events matching it.
+        """
+        await self._tag(meter, Event.id.in_(event_ids))
+
+    async def tag_ingested_batch(
+        self,
+        meter: Meter,
+        *,
+        until: datetime,
+        after: tuple[datetime, UUID] | None = None,
+        limit: int,
+    ) -> tuple[datetime, UUID] | None:
+        """
+        Associate the meter with the events matching it, among a batch
+        of the events of its organization ingested before `until`.
+
+        Batches are fetched by keyset: `after` is the `(ingested_at, id)`
+        of the last event of the previous batch.
+
+        Returns:
+            The `(ingested_at, id)` of the last event of the batch,
+            or `None` if there are no more events.
+        """
+        statement = (
+            select(Event.ingested_at, Event.id)
+            .where(
+                Event.organization_id == meter.organization_id,
+                Event.ingested_at < until,
+            )
+            .order_by(Event.ingested_at.asc(), Event.id.asc())
+            .limit(limit)
+        )
+        clauses: list[ColumnExpressionArgument[bool]] = []
+        if after is not None:
+            after_ingested_at, after_id = after
+            clauses = [
+                Event.ingested_at >= after_ingested_at,
+                tuple_(Event.ingested_at, Event.id)
+                > tuple_(literal(after_ingested_at), literal(after_id)),
+            ]
+            statement = statement.where(*clauses)
+        result = await self.session.execute(statement)
+        batch = result.tuples().all()
+        if not batch:
+            return None
+
+        last_ingested_at, last_id = batch[-1]
+        await self._tag(
+            meter,
+            *clauses,
+            Event.ingested_at <= last_ingested_at,
+            tuple_(Event.ingested_at, Event.id)
+            <= tuple_(literal(last_ingested_at), literal(last_id)),
+        )
+        if len(batch) < limit:
+            return None
+        return last_ingested_at, last_id
+
+    async def delete_by_meter(self, meter_id: UUID) -> None:
+        statement = delete(EventMeter).where(EventMeter.meter_id == meter_id)
+        await self.session.execute(statement)
+
+    async def _tag(
+        self, meter: Meter, *clauses: ColumnExpressionArgument[bool]
+    ) -> None:
+        event_repository = EventRepository.from_session(self.session)
+        events = select(literal(meter.id, Uuid), Event.ingested_at, Event.id).where(
+            Event.organization_id == meter.organization_id,
+            event_repository.get_meter_definition_clause(meter),
+            *clauses,
+        )
+        statement = (
+            pg_insert(EventMeter)
+            .from_select(["meter_id", "ingested_at", "event_id"], events)
+            .on_conflict_do_nothing()
+        )
+        await self.session.execute(statement)
@@ -1,26 +1,46 @@
 import uuid
 from collections.abc import Callable, Sequence
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any
 
-from sqlalchemy import UnaryExpression, asc, desc, select, text
+import structlog
+from sqlalchemy import Select, UnaryExpression, asc, desc, select, text
 
 from polar.auth.models import AuthSubject, is_organization, is_user
 from polar.exceptions import PolarError, PolarRequestValidationError, ValidationError
 from polar.kit.metadata import MetadataQuery, apply_metadata_clause
 from polar.kit.pagination import PaginationParams, paginate
+from polar.kit.search import get_search_clause
 from polar.kit.sorting import Sorting
+from polar.kit.utils import generate_uuid, utc_now
+from polar.logging import Logger
 from polar.meter.filter import Filter
+from polar.meter.matcher import meter_matcher
 from polar.meter.repository import MeterRepository
 from polar.models import Customer, Event, Organization, User, UserOrganization
+from polar.models import EventName as EventNameModel
 from polar.models.event import EventSource
+from polar.organization.repository import OrganizationRepository
 from polar.postgres import AsyncSession
 from polar.worker import enqueue_events, enqueue_job
 
-from .repository import EventRepository
+from .repository import EventMeterRepository, EventNameRepository, EventRepository
 from .schemas import EventCreateCustomer, EventName, EventsIngest, EventsIngestResponse
 from .sorting import EventNamesSortProperty, EventSortProperty
 
+log: Logger = structlog.get_logger()
+
+NAMES_RECONCILIATION_MARGIN = timedelta(minutes=10)
+"""
+Events ingested more recently than that aren't settled yet:
+their transaction may still be in progress.
+
+The names catalog is reconciled with the events ingested before,
+so the heavy part of the reconciliation doesn't need to lock it.
+"""
+
+_EventNameStatistics = tuple[int, datetime, datetime]
+
 
 class EventError(PolarError): ...
 
@@ -144,33 +164,48 @@ class EventService:
             (EventNamesSortProperty.last_seen, True)
         ],
     ) -> tuple[Sequence[EventName], int]:
-        repository = EventRepository.from_session(session)
-        statement = repository.get_event_names_statement(auth_subject)
-
-        if organization_id is not None:
-            statement = statement.where(Event.organization_id.in_(organization_id))
+        statement: Select[tuple[str, EventSource, int, datetime, datetime]]
+        # The catalog doesn't know which customers sent the events:
+        # aggregate the events if we filter on them.
+        if customer_id is None and external_customer_id is None:
+            event_name_repository = EventNameRepository.from_session(session)
+            statement = event_name_repository.get_event_names_statement(auth_subject)
+            organization_column = EventNameModel.organization_id
+            name_column = EventNameModel.name
+            source_column = EventNameModel.source
+        else:
+            repository = EventRepository.from_session(session)
+            statement = repository.get_event_names_statement(auth_subject)
+            organization_column = Event.organization_id
+            name_column = Event.name
+            source_column = Event.source
+
+            if customer_id is not None:
+                statement = statement.where(
+                    repository.get_customer_id_filter_clause(customer_id)
+                )
 
-        if customer_id is not None:
-            statement = statement.where(
-                repository.get_customer_id_filter_clause(customer_id)
-            )
+            if external_customer_id is not None:
+                statement = statement.where(
+                    repository.get_external_customer_id_filter_clause(
+                        external_customer_id
+                    )
+                )
 
-        if external_customer_id is not None:
-            statement = statement.where(
-                repository.get_external_customer_id_filter_clause(external_customer_id)
-            )
+        if organization_id is not None:
+            statement = statement.where(organization_column.in_(organization_id))
 
         if source is not None:
-            statement = statement.where(Event.source.in_(source))
+            statement = statement.where(source_column.in_(source))
 
         if query is not None:
-            statement = statement.where(Event.name.ilike(f"%{query}%"))
+            statement = statement.where(get_search_clause(query, name_column))
 
         order_by_clauses: list[UnaryExpression[Any]] = []
         for criterion, is_desc in sorting:
             clause_function = desc if is_desc else asc
             if criterion == EventNamesSortProperty.event_name:
-                order_by_clauses.append(clause_function(Event.name))
+                order_by_clauses.append(clause_function(name_column))
             elif criterion == EventNamesSortProperty.first_seen:
                 order_by_clauses.append(clause_function(text("first_seen")))
             elif criterion == EventNamesSortProperty.last_seen:
@@ -224,6 +259,9 @@ class EventService:
             else:
                 events.append(
                     {
+                        # Set here, so we can tag the events without reading them
+                        "id": generate_uuid(),
+                        "ingested_at": utc_now(),
                         "source": EventSource.user,
                         "organization_id": organization_id,
                         **event_create.model_dump(
@@ -237,6 +275,9 @@ class EventService:
 
         repository = EventRepository.from_session(session)
         event_ids = await repository.insert_batch(events)
+        event_name_repository = EventNameRepository.from_session(session)
+        await event_name_repository.upsert_from_events(event_ids)
+        await self._tag_meters(session, events)
         enqueue_events(*event_ids)
 
         return EventsIngestResponse(inserted=len(events))
@@ -244,9 +285,73 @@ class EventService:
     async def create_event(self, session: AsyncSession, event: Event) -> Event:
         repository = EventRepository.from_session(session)
         event = await repository.create(event, flush=True)
+        event_name_repository = EventNameRepository.from_session(session)
+        await event_name_repository.upsert_from_events([event.id])
+        await self._tag_meters(
+            session,
+            [
+                {
+                    "id": event.id,
+                    "ingested_at": event.ingested_at,
+                    "organization_id": event.organization_id,
+                    "name": event.name,
+                    "source": event.source,
+                    "timestamp": event.timestamp,
+                    "user_metadata": event.user_metadata,
+                }
+            ],
+        )
         enqueue_events(event.id)
         return event
 
+    async def _tag_meters(
+        self, session: AsyncSession, events: Sequence[dict[str, Any]]
+    ) -> None:
+        """
+        Associate the events with the meters they match,
+        for the meters with a materialized match.
+
+        Meters are matched in-process; only the events the matcher
+        can't decide on are matched in SQL.
+        """
+        if not events:
+            return
+
+        meter_repository = MeterRepository.from_session(session)
+        # Lock the meters until the events are committed,
+        # so a meter can't start its materialization meanwhile, missing them.
+        # See `MeterService.materialize_match`.
+        meters = await meter_repository.get_all_by_organizations(
+            list({event["organization_id"] for event in events}),
+            key_share_lock=True,
+        )
+
+        event_meters: list[dict[str, Any]] = []
+        event_meter_repository = EventMeterRepository.from_session(session)
+        for meter in meters:
+            if meter.match_materialization is None:
+                continue
+            predicate = meter_matcher.get_predicate(meter)
+            undecided: list[uuid.UUID] = []
+            for event in events:
+                if event["organization_id"] != meter.organization_id:
+                    continue
+                match = predicate(event)
+                if match is None:
+                    undecided.append(event["id"])
+                elif match:
+                    event_meters.append(
+                        {
+                            "meter_id": meter.id,
+                            "ingested_at": event["ingested_at"],
+                            "event_id": event["id"],
+                        }
+                    )
+            if undecided:
+                await event_meter_repository.tag_events(meter, undecided)
+
+        await event_meter_repository.insert_batch(event_meters)
+
     async def ingested(
         self, session: AsyncSession, event_ids: Sequence[uuid.UUID]
     ) -> None:
@@ -265,6 +370,146 @@ class EventService:
         for customer in customers:
             enqueue_job("customer_meter.update_customer", customer_id=customer.id)
 
+    async def enqueue_names_reconciliation(self, session: AsyncSession) -> None:
+        organization_repository = OrganizationRepository.from_session(session)
+        statement = organization_repository.get_base_statement().order_by(
+            Organization.created_at.asc()
+        )
+        async for organization in organization_repository.stream(statement):
+            enqueue_job("event.reconcile_names", organization.id)
+
+    async def reconcile_names(
+        self, session: AsyncSession, organization_id: uuid.UUID
+    ) -> bool:
+        """
+        Verify the event names catalog of the organization matches its events.
+
+        The statistics of the settled events, ingested before a high-water mark,
+        are computed without locking anything. Only the names that seem to drift
+        are then locked, completed with the events ingested since the mark,
+        logged and reset.
+
+        Returns:
+            Whether the catalog was consistent.
+        """
+        repository = EventNameRepository.from_session(session)
+        high_water_mark = utc_now() - NAMES_RECONCILIATION_MARGIN
+        settled = {
+            (name, source): (occurrences, first_seen, last_seen)
+            for (
+                name,
+                source,
+                occurrences,
+                first_seen,
+                last_seen,
+            ) in await repository.get_events_statistics(
+                organization_id, ingested_before=high_water_mark
+            )
+        }
+
+        # Events may be ingested meanwhile: it's only a first guess
+        suspects = list(
+            await self._get_drifted_names(
+                repository, organization_id, settled, high_water_mark
+            )
+        )
+        if not suspects:
+            return True
+
+        # Names missing from the catalog are added first, so they're locked too.
+        # Events ingested meanwhile wait for us to update their names:
+        # they're counted in the same transaction as they're inserted.
+        await repository.insert_missing_names(
+            organization_id, suspects, high_water_mark
+        )
+        drifted = await self._get_drifted_names(
+            repository,
+            organization_id,
+            settled,
+            high_water_mark,
+            names=suspects,
+            for_update=True,
+        )
+
+        statistics: list[tuple[str, EventSource, int, datetime, datetime]] = []
+        stale: list[tuple[str, EventSource]] = []
+        for (name, source), (catalog, expected) in drifted.items():
+            log.warning(
+                "event.names.drift" if expected is not None else "event.names.stale",
+                organization_id=organization_id,
+                name=name,
+                source=source,
+                catalog_occurrences=catalog[0] if catalog is not None else None,
+                occurrences=expected[0] if expected is not None else None,
+            )
+            if expected is None:
+                stale.append((name, source))
+            else:
+                statistics.append((name, source, *expected))
+
+        await repository.set_statistics(organization_id, statistics)
+        await repository.delete_names(organization_id, stale)
+
+        return not drifted
+
+    async def _get_drifted_names(
+        self,
+        repository: EventNameRepository,
+        organization_id: uuid.UUID,
+        settled: dict[tuple[str, EventSource], _EventNameStatistics],
+        high_water_mark: datetime,
+        *,
+        names: Sequence[tuple[str, EventSource]] | None = None,
+        for_update: bool = False,
+    ) -> dict[
+        tuple[str, EventSource],
+        tuple[_EventNameStatistics | None, _EventNameStatistics | None],
+    ]:
+        """
+        Compare the catalog with the settled statistics,
+        completed with the events ingested since the high-water mark.
+
+        Returns:
+            The catalog and expected statistics of the names that differ,
+            `None` where the name is missing or doesn't have events.
+        """
+        catalog: dict[tuple[str, EventSource], _EventNameStatistics] = {
+            (event_name.name, event_name.source): (
+                event_name.occurrences,
+                event_name.first_seen,
+                event_name.last_seen,
+            )
+            for event_name in await repository.get_all_by_organization(
+                organization_id, names=names, for_update=for_update
+            )
+        }
+        expected = (
+            dict(settled)
+            if names is None
+            else {key: settled[key] for key in names if key in settled}
+        )
+        for (
+            name,
+            source,
+            occurrences,
+            first_seen,
+            last_seen,
+        ) in await repository.get_events_statistics(
+            organization_id, ingested_since=high_water_mark, names=names
+        ):
+            previous = expected.get((name, source))
+            if previous is not None:
+                occurrences += previous[0]
+                first_seen = min(first_seen, previous[1])
+                last_seen = max(last_seen, previous[2])
+            expected[(name, source)] = (occurrences, first_seen, last_seen)
+
+        return {
+            key: (catalog.get(key), expected.get(key))
+            for key in catalog.keys() | expected.keys()
+            if catalog.get(key) != expected.get(key)
+        }
+
     async def _get_organization_validation_function(
         self, session: AsyncSession, auth_subject: AuthSubject[User | Organization]
     ) -> Callable[[int, uuid.UUID | None], uuid.UUID]:
@@ -1,8 +1,9 @@
 import uuid
 from collections.abc import Sequence
 
-from polar.worker import AsyncSessionMaker, TaskPriority, actor
+from polar.worker import AsyncSessionMaker, CronTrigger, TaskPriority, actor
 
+from .partitions import event_partition as event_partition_service
 from .service import event as event_service
 
 
@@ -10,3 +11,29 @@ from .service import event as event_service
 async def event_ingested(event_ids: Sequence[uuid.UUID]) -> None:
     async with AsyncSessionMaker() as session:
         await event_service.ingested(session, event_ids)
+
+
+@actor(
+    actor_name="event.enqueue_names_reconciliation",
+    cron_trigger=CronTrigger(hour=2, minute=0),
+    priority=TaskPriority.LOW,
+)
+async def event_enqueue_names_reconciliation() -> None:
+    async with AsyncSessionMaker() as session:
+        await event_service.enqueue_names_reconciliation(session)
+
+
+@actor(actor_name="event.reconcile_names", priority=TaskPriority.LOW)
+async def event_reconcile_names(organization_id: uuid.UUID) -> None:
+    async with AsyncSessionMaker() as session:
+        await event_service.reconcile_names(session, organization_id)
+
+
+@actor(
+    actor_name="event.create_partitions",
+    cron_trigger=CronTrigger(hour=3, minute=0),
+    priority=TaskPriority.LOW,
+)
+async def event_create_partitions() -> None:
+    async with AsyncSessionMaker() as session:
+        await event_partition_service.create_ahead(session)
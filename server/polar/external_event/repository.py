@@ -1,5 +1,9 @@
+from collections.abc import Sequence
+from datetime import datetime
 from uuid import UUID
 
+from sqlalchemy import literal, tuple_
+
 from polar.kit.repository import (
     RepositoryBase,
     RepositoryIDMixin,
@@ -35,6 +39,64 @@ class ExternalEventRepository(
         )
         return await self.get_one_or_none(statement)
 
+    async def get_pending_by_lane(
+        self, source: ExternalEventSource, lane: int, *, limit: int
+    ) -> Sequence[ExternalEvent]:
+        """
+        Get the events of the lane not handled yet,
+        in the order they were emitted by the source.
+        """
+        statement = (
+            self.get_base_statement()
+            .where(
+                ExternalEvent.source == source,
+                ExternalEvent.lane == lane,
+                ExternalEvent.handled_at.is_(None),
+            )
+            .order_by(
+                ExternalEvent.data["created"].as_integer().asc(),
+                ExternalEvent.created_at.asc(),
+            )
+            .limit(limit)
+        )
+        return await self.get_all(statement)
+
+    async def get_unhandled_page(
+        self,
+        source: ExternalEventSource,
+        *,
+        task_name: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        after: tuple[datetime, UUID] | None = None,
+        limit: int,
+    ) -> Sequence[ExternalEvent]:
+        """
+        Get a page of unhandled events, ordered by creation date.
+
+        Pages are fetched by keyset: `after` is the `(created_at, id)`
+        of the last event of the previous page.
+        """
+        statement = self.get_base_statement().where(
+            ExternalEvent.source == source, ExternalEvent.handled_at.is_(None)
+        )
+        if task_name is not None:
+            statement = statement.where(ExternalEvent.task_name == task_name)
+        if start is not None:
+            statement = statement.where(ExternalEvent.created_at >= start)
+        if end is not None:
+            statement = statement.where(ExternalEvent.created_at < end)
+        if after is not None:
+            after_created_at, after_id = after
+            statement = statement.where(
+                tuple_(ExternalEvent.created_at, ExternalEvent.id)
+                > tuple_(literal(after_created_at), literal(after_id))
+            )
+        statement = statement.order_by(
+            ExternalEvent.created_at.asc(), ExternalEvent.id.asc()
+        ).limit(limit)
+        return await self.get_all(statement)
+
     def get_sorting_clause(self, property: ExternalEventSortProperty) -> SortingClause:
         match property:
             case ExternalEventSortProperty.created_at:
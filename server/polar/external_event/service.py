@@ -1,8 +1,11 @@
 import contextlib
 import uuid
-from collections.abc import AsyncIterator
+import zlib
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
 from typing import Any, cast
 
+from polar.config import settings
 from polar.exceptions import PolarError
 from polar.kit.utils import utc_now
 from polar.models import ExternalEvent
@@ -38,26 +41,118 @@ class ExternalEventService:
         task_name: str,
         external_id: str,
         data: dict[str, Any],
+        *,
+        partition_key: str | None = None,
     ) -> ExternalEvent:
+        """
+        Store an external event and enqueue its handling.
+
+        If lanes are enabled and a `partition_key` is given, the event is handled
+        in a lane, in order with the other events of the same key.
+        Otherwise, it's handled by an independent job.
+        """
         repository = ExternalEventRepository.from_session(session)
 
         event = await repository.get_by_source_and_external_id(source, external_id)
         if event is not None:
             return event
 
+        lane: int | None = None
+        if partition_key is not None and settings.EXTERNAL_EVENT_LANES > 0:
+            lane = zlib.crc32(partition_key.encode()) % settings.EXTERNAL_EVENT_LANES
+
         event = await repository.create(
             ExternalEvent(
-                source=source, task_name=task_name, external_id=external_id, data=data
+                source=source,
+                task_name=task_name,
+                external_id=external_id,
+                data=data,
+                lane=lane,
             ),
             flush=True,
         )
-        enqueue_job(task_name, event.id)
+        self._enqueue_handling(event)
         return event
 
     async def resend(self, event: ExternalEvent) -> None:
         if event.is_handled:
             raise ExternalEventAlreadyHandled(event.id)
-        enqueue_job(event.task_name, event.id)
+        self._enqueue_handling(event)
+
+    async def resend_many(self, events: Sequence[ExternalEvent]) -> None:
+        """
+        Enqueue the handling of many events at once.
+
+        Events in lanes enqueue a single job per lane.
+        Events already handled are skipped.
+        """
+        lanes: set[tuple[ExternalEventSource, int]] = set()
+        for event in events:
+            if event.is_handled:
+                continue
+            if event.lane is not None:
+                lanes.add((event.source, event.lane))
+            else:
+                enqueue_job(event.task_name, event.id)
+        for source, lane in sorted(lanes):
+            enqueue_job("external_event.process_lane", source, lane)
+
+    async def stream_unhandled(
+        self,
+        session: AsyncSession,
+        source: ExternalEventSource,
+        *,
+        task_name: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[ExternalEvent]]:
+        """
+        Stream the unhandled events by batches, ordered by creation date.
+        """
+        repository = ExternalEventRepository.from_session(session)
+        after: tuple[datetime, uuid.UUID] | None = None
+        while True:
+            events = await repository.get_unhandled_page(
+                source,
+                task_name=task_name,
+                start=start,
+                end=end,
+                after=after,
+                limit=batch_size,
+            )
+            if len(events) == 0:
+                return
+            yield events
+            if len(events) < batch_size:
+                return
+            last_event = events[-1]
+            after = (last_event.created_at, last_event.id)
+
+    async def get_lane_pending(
+        self,
+        session: AsyncSession,
+        source: ExternalEventSource,
+        lane: int,
+        *,
+        limit: int,
+    ) -> Sequence[ExternalEvent]:
+        repository = ExternalEventRepository.from_session(session)
+        return await repository.get_pending_by_lane(source, lane, limit=limit)
+
+    async def leave_lane(
+        self, session: AsyncSession, source: ExternalEventSource, event_id: uuid.UUID
+    ) -> None:
+        """
+        Take an event out of its lane and enqueue its handling by an independent job,
+        so the next events of the lane don't wait for it anymore.
+        """
+        repository = ExternalEventRepository.from_session(session)
+        event = await repository.get_by_source_and_id(source, event_id)
+        if event is None:
+            raise ExternalEventDoesNotExist(event_id)
+        event = await repository.update(event, update_dict={"lane": None})
+        self._enqueue_handling(event)
 
     @contextlib.asynccontextmanager
     async def handle(
@@ -84,5 +179,11 @@ class ExternalEventService:
         async with self.handle(session, ExternalEventSource.stripe, event_id) as event:
             yield cast(StripeEvent, event)
 
+    def _enqueue_handling(self, event: ExternalEvent) -> None:
+        if event.lane is not None:
+            enqueue_job("external_event.process_lane", event.source, event.lane)
+        else:
+            enqueue_job(event.task_name, event.id)
+
 
 external_event = ExternalEventService()
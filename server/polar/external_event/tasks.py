@@ -0,0 +1,162 @@
+import asyncio
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import dramatiq
+import structlog
+from dramatiq.middleware import CurrentMessage
+
+from polar.locker import Locker
+from polar.logging import Logger
+from polar.models.external_event import ExternalEventSource
+from polar.worker import (
+    AsyncSessionMaker,
+    JobQueueManager,
+    RedisMiddleware,
+    TaskPriority,
+    actor,
+    enqueue_job,
+)
+
+from .service import ExternalEventAlreadyHandled
+from .service import external_event as external_event_service
+
+log: Logger = structlog.get_logger()
+
+LANE_BATCH_SIZE = 20
+"""Maximum number of events handled by a lane job, before enqueuing the next one."""
+
+LANE_LOCK_TIMEOUT = 120
+"""
+Lifetime of the lane lock, in seconds.
+
+It should be enough to handle a batch of events.
+"""
+
+LANE_MAX_ATTEMPTS = 5
+"""
+Number of times an event is tried in its lane before being taken out of it,
+so an event failing again and again doesn't block the lane forever.
+"""
+
+LANE_ATTEMPTS_TTL = 86_400
+"""Lifetime of the attempts counter of an event, in seconds."""
+
+LANE_EVENT_TIME_LIMIT = 30_000
+"""
+Time limit of a handler in a lane, in milliseconds,
+unless its actor sets a `time_limit` option.
+"""
+
+
+def _get_handler(task_name: str) -> Callable[[uuid.UUID], Awaitable[Any]]:
+    # Call the handler function directly, not through the actor wrapper,
+    # which opens its own job queue manager.
+    fn = dramatiq.get_broker().get_actor(task_name).fn
+    return getattr(fn, "__wrapped__", fn)
+
+
+async def _handle_event(task_name: str, event_id: uuid.UUID, attempts: int) -> None:
+    """
+    Call the handler of an event like its actor would.
+
+    The handler sees the lane attempts of the event as its retries,
+    so `can_retry()` and `get_retries()` behave as in a standalone job,
+    and it's interrupted after the time limit of its actor.
+    """
+    handler_actor = dramatiq.get_broker().get_actor(task_name)
+    message = handler_actor.message_with_options(
+        args=(event_id,), retries=attempts, max_retries=LANE_MAX_ATTEMPTS - 1
+    )
+    time_limit = handler_actor.options.get("time_limit", LANE_EVENT_TIME_LIMIT)
+
+    token = CurrentMessage._MESSAGE.set(message)
+    try:
+        async with asyncio.timeout(time_limit / 1000):
+            await _get_handler(task_name)(event_id)
+    finally:
+        CurrentMessage._MESSAGE.reset(token)
+
+
+@actor(actor_name="external_event.process_lane", priority=TaskPriority.HIGH)
+async def process_lane(source: ExternalEventSource, lane: int) -> None:
+    """
+    Handle the pending events of a lane, one after the other.
+
+    Only one job processes a lane at a time. A job finding the lane busy
+    flags it and returns immediately: the running job re-enqueues itself
+    after releasing the lane, so the new events are picked up.
+
+    If an event fails, the job is retried from this event,
+    so the next ones of the lane wait for it.
+    After `LANE_MAX_ATTEMPTS`, the event is taken out of the lane
+    and handled by an independent job, so the lane can move on.
+    """
+    redis = RedisMiddleware.get()
+    locker = Locker(redis)
+    lock_name = f"external_event_lane:{source}:{lane}"
+    pending_key = f"{lock_name}:pending"
+
+    await redis.set(pending_key, 1, ex=LANE_LOCK_TIMEOUT)
+    async with locker.try_lock(lock_name, timeout=LANE_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            log.debug("external_event.lane.busy", source=source, lane=lane)
+            return
+
+        # Events enqueued from now on are either fetched below,
+        # or flag the lane again for the next job.
+        await redis.delete(pending_key)
+        count = await _process_lane_events(source, lane)
+
+    if count == LANE_BATCH_SIZE or await redis.getdel(pending_key) is not None:
+        enqueue_job("external_event.process_lane", source, lane)
+
+
+async def _process_lane_events(source: ExternalEventSource, lane: int) -> int:
+    redis = RedisMiddleware.get()
+    async with AsyncSessionMaker() as session:
+        events = await external_event_service.get_lane_pending(
+            session, source, lane, limit=LANE_BATCH_SIZE
+        )
+        pending = [(event.id, event.task_name) for event in events]
+
+    job_queue_manager = JobQueueManager.get()
+    for event_id, task_name in pending:
+        attempts_key = f"external_event_lane_attempts:{event_id}"
+        previous_attempts = int(await redis.get(attempts_key) or 0)
+        try:
+            await _handle_event(task_name, event_id, previous_attempts)
+        except ExternalEventAlreadyHandled:
+            continue
+        except Exception as e:
+            # Drop the jobs enqueued by the failed handler
+            job_queue_manager.reset()
+
+            attempts = await redis.incr(attempts_key)
+            await redis.expire(attempts_key, LANE_ATTEMPTS_TTL)
+            if attempts < LANE_MAX_ATTEMPTS:
+                raise
+
+            log.warning(
+                "external_event.lane.event_left",
+                source=source,
+                lane=lane,
+                event_id=event_id,
+                attempts=attempts,
+                error=repr(e),
+            )
+            async with AsyncSessionMaker() as session:
+                await external_event_service.leave_lane(session, source, event_id)
+
+        # Flush the jobs enqueued by the handler now it's committed,
+        # so they're not lost if a later event of the lane fails.
+        await job_queue_manager.flush(dramatiq.get_broker(), redis)
+
+    log.debug(
+        "external_event.lane.processed",
+        source=source,
+        lane=lane,
+        count=len(pending),
+    )
+    return len(pending)
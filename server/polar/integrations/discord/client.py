@@ -10,11 +10,50 @@ log = structlog.get_logger()
 BASE_URL = "https://discord.com/api/v10"
 
 
+class DiscordRateLimitError(httpx.HTTPStatusError):
+    """
+    Discord answered with a 429 status code.
+
+    See https://discord.com/developers/docs/topics/rate-limits
+    """
+
+    retry_after: float
+    "Number of seconds to wait before retrying."
+    is_global: bool
+    "Whether the global rate limit was hit, instead of a per-route one."
+
+    def __init__(self, response: httpx.Response) -> None:
+        super().__init__(
+            "Discord rate limit exceeded",
+            request=response.request,
+            response=response,
+        )
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+
+        self.retry_after = float(
+            body.get("retry_after")
+            or response.headers.get("Retry-After")
+            or response.headers.get("X-RateLimit-Reset-After")
+            or 1.0
+        )
+        self.is_global = bool(
+            body.get("global")
+            or response.headers.get("X-RateLimit-Global", "").lower() == "true"
+            or response.headers.get("X-RateLimit-Scope") == "global"
+        )
+
+
 class DiscordClient:
     def __init__(self, scheme: Literal["Bot", "Bearer"], token: str) -> None:
+        # Instantiated once per process, so the connection pool is shared
+        # by every benefit grant handled by the process.
         self.client = httpx.AsyncClient(
             base_url=BASE_URL,
             headers={"Authorization": f"{scheme} {token}"},
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
         )
 
     async def get_me(self) -> dict[str, Any]:
@@ -105,10 +144,20 @@ class DiscordClient:
         return None
 
     def _handle_response(self, response: httpx.Response) -> httpx.Response:
+        if response.status_code == 429:
+            error = DiscordRateLimitError(response)
+            log.warning(
+                "discord.rate_limited",
+                url=str(response.request.url),
+                retry_after=error.retry_after,
+                is_global=error.is_global,
+                bucket=response.headers.get("X-RateLimit-Bucket"),
+            )
+            raise error
         response.raise_for_status()
         return response
 
 
 bot_client = DiscordClient("Bot", settings.DISCORD_BOT_TOKEN)
 
-__all__ = ["DiscordClient", "bot_client"]
+__all__ = ["DiscordClient", "DiscordRateLimitError", "bot_client"]
@@ -1,4 +1,5 @@
 import time
+from collections import OrderedDict
 from enum import StrEnum
 from typing import Any
 
@@ -207,15 +208,43 @@ def get_app_client(
     )
 
 
+APP_INSTALLATION_CLIENTS_MAX_SIZE = 256
+APP_INSTALLATION_CLIENTS_TTL = 50 * 60  # Installation tokens last one hour
+
+_app_installation_clients: OrderedDict[
+    tuple[GitHubApp, int], tuple[float, GitHub[AppInstallationAuthStrategy]]
+] = OrderedDict()
+
+
 def get_app_installation_client(
     installation_id: int,
     *,
     app: GitHubApp = GitHubApp.repository_benefit,
 ) -> GitHub[AppInstallationAuthStrategy]:
+    """
+    Return the process-wide client for an app installation.
+
+    Reusing the same client lets githubkit cache the installation access token
+    until it expires, instead of requesting a new one for each grant.
+
+    Clients are kept in a LRU, bounded in size and age. githubkit only opens
+    HTTP connections for the duration of a request, so evicted clients
+    don't hold any and are simply dropped.
+    """
     if not installation_id:
         raise Exception("unable to create github client: no installation_id provided")
 
-    return GitHub(
+    key = (app, installation_id)
+    now = time.monotonic()
+    cached = _app_installation_clients.get(key)
+    if cached is not None:
+        created_at, client = cached
+        if now - created_at < APP_INSTALLATION_CLIENTS_TTL:
+            _app_installation_clients.move_to_end(key)
+            return client
+        del _app_installation_clients[key]
+
+    client = GitHub(
         AppInstallationAuthStrategy(
             app_id=settings.GITHUB_REPOSITORY_BENEFITS_APP_IDENTIFIER,
             private_key=settings.GITHUB_REPOSITORY_BENEFITS_APP_PRIVATE_KEY,
@@ -225,6 +254,10 @@ def get_app_installation_client(
         ),
         http_cache=False,
     )
+    _app_installation_clients[key] = (now, client)
+    while len(_app_installation_clients) > APP_INSTALLATION_CLIENTS_MAX_SIZE:
+        _app_installation_clients.popitem(last=False)
+    return client
 
 
 __all__ = [
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from typing import TYPE_CHECKING
 
 import structlog
@@ -302,6 +303,29 @@ class GitHubRepositoryBenefitUserService:
                 return repo_install.parsed_data
             return None
 
+    async def get_repository_installation_id(
+        self, redis: Redis, *, owner: str, name: str
+    ) -> int | None:
+        """
+        Get the installation ID of a repository, cached in Redis
+        since it's looked up for each benefit grant and revocation.
+        """
+        cache_key = f"polar:github_repository_installation:{owner}/{name}"
+        cached_installation_id = await redis.get(cache_key)
+        if cached_installation_id is not None:
+            return int(cached_installation_id)
+
+        installation = await self.get_repository_installation(owner=owner, name=name)
+        if installation is None:
+            return None
+
+        await redis.set(
+            cache_key,
+            installation.id,
+            ex=int(timedelta(hours=1).total_seconds()),
+        )
+        return installation.id
+
     async def user_has_access_to_repository(
         self, oauth: OAuthAccount, *, owner: str, name: str
     ) -> bool:
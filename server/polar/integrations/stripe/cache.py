@@ -0,0 +1,128 @@
+import json
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+from datetime import timedelta
+from typing import TypeVar
+
+import logfire
+import stripe as stripe_lib
+import structlog
+from redis.exceptions import RedisError
+
+from polar.logging import Logger
+from polar.redis import Redis
+
+log: Logger = structlog.get_logger()
+
+StripeObjectT = TypeVar("StripeObjectT", bound=stripe_lib.StripeObject)
+
+_lookups = logfire.metric_counter(
+    "stripe.object_cache.lookups",
+    description="Lookups in the Stripe objects cache, by object and tier.",
+)
+
+
+class StripeObjectCache:
+    """
+    Read-through cache of Stripe objects that won't change anymore,
+    like balance transactions or paid invoices.
+
+    Objects are stored in Redis, to be shared across processes,
+    with a local LRU in front of it, so the same object fetched several times
+    while handling a payment only crosses the network once.
+
+    Args:
+        local_size: Maximum number of objects kept in the local LRU.
+        ttl: Time to live of the objects in Redis.
+    """
+
+    def __init__(self, *, local_size: int, ttl: timedelta) -> None:
+        self.local_size = local_size
+        self.ttl = ttl
+        self.redis: Redis | None = None
+        self._local: OrderedDict[str, str] = OrderedDict()
+
+    def set_redis(self, redis: Redis | None) -> None:
+        self.redis = redis
+
+    async def get_or_retrieve(
+        self,
+        object_class: type[StripeObjectT],
+        id: str,
+        retrieve: Callable[[], Awaitable[StripeObjectT]],
+        *,
+        is_final: Callable[[StripeObjectT], bool],
+        stripe_account: str | None = None,
+        expand: Sequence[str] | None = None,
+    ) -> StripeObjectT:
+        """
+        Return the object from the cache, or retrieve it from Stripe.
+
+        The retrieved object is only cached if `is_final` says it won't change.
+        """
+        object_name: str = getattr(object_class, "OBJECT_NAME", object_class.__name__)
+        key = self._get_key(object_name, id, stripe_account, expand)
+
+        data = self._get_local(key)
+        tier = "local"
+        if data is None:
+            data = await self._get_redis(key)
+            tier = "redis"
+            if data is not None:
+                self._set_local(key, data)
+
+        if data is not None:
+            _lookups.add(1, {"object": object_name, "tier": tier})
+            # Build a fresh object on each hit, so callers can't alter the cache
+            return object_class.construct_from(json.loads(data), key=None)
+
+        _lookups.add(1, {"object": object_name, "tier": "miss"})
+        stripe_object = await retrieve()
+        if is_final(stripe_object):
+            data = json.dumps(stripe_object.to_dict())
+            self._set_local(key, data)
+            await self._set_redis(key, data)
+        return stripe_object
+
+    def _get_local(self, key: str) -> str | None:
+        data = self._local.get(key)
+        if data is not None:
+            self._local.move_to_end(key)
+        return data
+
+    def _set_local(self, key: str, data: str) -> None:
+        self._local[key] = data
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def _get_redis(self, key: str) -> str | None:
+        if self.redis is None:
+            return None
+        try:
+            return await self.redis.get(key)
+        except RedisError as e:
+            log.warning("stripe.object_cache.error", key=key, error=str(e))
+            return None
+
+    async def _set_redis(self, key: str, data: str) -> None:
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(key, data, ex=self.ttl)
+        except RedisError as e:
+            log.warning("stripe.object_cache.error", key=key, error=str(e))
+
+    def _get_key(
+        self,
+        object_name: str,
+        id: str,
+        stripe_account: str | None,
+        expand: Sequence[str] | None,
+    ) -> str:
+        expand_key = ",".join(sorted(expand or []))
+        account_key = stripe_account or ""
+        return f"polar:stripe_object:{object_name}:{account_key}:{id}:{expand_key}"
+
+
+__all__ = ["StripeObjectCache"]
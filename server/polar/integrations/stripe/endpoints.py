@@ -41,11 +41,33 @@ DIRECT_IMPLEMENTED_WEBHOOKS = {
 CONNECT_IMPLEMENTED_WEBHOOKS = {"account.updated", "payout.updated", "payout.paid"}
 
 
+def _get_partition_key(event: stripe.Event) -> str | None:
+    """
+    Key of the Stripe object the event relates to, so the events of a customer,
+    or of an object without customer, are handled in order.
+    """
+    object = event["data"]["object"]
+    customer = object.get("customer")
+    if isinstance(customer, str):
+        return customer
+    if object.get("object") == "customer":
+        return object["id"]
+    # Connect events, like account or payout updates
+    if (account := event.get("account")) is not None:
+        return account
+    return object.get("id")
+
+
 async def enqueue(session: AsyncSession, event: stripe.Event) -> None:
     event_type: str = event["type"]
     task_name = f"stripe.webhook.{event_type}"
     await external_event_service.enqueue(
-        session, ExternalEventSource.stripe, task_name, event.id, event
+        session,
+        ExternalEventSource.stripe,
+        task_name,
+        event.id,
+        event,
+        partition_key=_get_partition_key(event),
     )
 
 
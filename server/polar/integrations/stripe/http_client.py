@@ -0,0 +1,202 @@
+import asyncio
+import random
+import re
+import time
+from collections.abc import Mapping
+from typing import Any
+from urllib.parse import urlsplit
+
+import logfire
+import stripe as stripe_lib
+import structlog
+from dramatiq.middleware import CurrentMessage
+from redis.exceptions import RedisError
+
+from polar.kit.rate_limit import RateLimiter, RateLimitTimeout
+from polar.logging import Logger
+from polar.redis import Redis
+
+log: Logger = structlog.get_logger()
+
+StripeResponse = tuple[bytes, int, Mapping[str, str]]
+
+# Stripe IDs are a lowercase prefix followed by a random base62 string,
+# e.g. `ch_3Nabc`, `sub_sched_1Qxyz` or `acct_1Mabc`.
+# The random part is required to have a digit or an uppercase letter,
+# so resources names like `payment_intents` are not mistaken for IDs.
+_ID_REGEX = re.compile(r"^[a-z]+(?:_[a-z]+)*_(?=[a-z]*[A-Z0-9])[A-Za-z0-9]+$")
+
+_request_duration = logfire.metric_histogram(
+    "stripe.request.duration",
+    unit="s",
+    description="Duration of the requests made to the Stripe API.",
+)
+_coalesced_requests = logfire.metric_counter(
+    "stripe.request.coalesced",
+    description="GET requests to the Stripe API served by an identical one in flight.",
+)
+
+
+def get_operation(method: str, url: str) -> str:
+    """
+    Name the Stripe API operation of a request, replacing the IDs in the path,
+    e.g. `GET /v1/charges/{id}`.
+    """
+    path = urlsplit(url).path
+    segments = ["{id}" if _ID_REGEX.match(s) else s for s in path.split("/")]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+def _get_actor_name() -> str | None:
+    message = CurrentMessage.get_current_message()
+    return message.actor_name if message is not None else None
+
+
+class StripeHTTPClient(stripe_lib.HTTPXClient):
+    """
+    HTTP client of the Stripe SDK adding, for asynchronous requests:
+
+    * A latency histogram per API operation, tagged with the calling actor.
+    * A token bucket shared by all our processes through Redis,
+    once a Redis client is set with `set_redis`.
+    * Coalescing of identical concurrent GET requests.
+    * Backoff and retry when Stripe rate limits us.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate_limit: float,
+        rate_limit_capacity: int,
+        rate_limit_timeout: float,
+        max_rate_limited_retries: int,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.rate_limit = rate_limit
+        self.rate_limit_capacity = rate_limit_capacity
+        self.rate_limit_timeout = rate_limit_timeout
+        self.max_rate_limited_retries = max_rate_limited_retries
+        self._rate_limiter: RateLimiter | None = None
+        self._in_flight: dict[
+            tuple[str | None, ...], asyncio.Future[StripeResponse]
+        ] = {}
+
+    def set_redis(self, redis: Redis | None) -> None:
+        if redis is None:
+            self._rate_limiter = None
+            return
+        self._rate_limiter = RateLimiter(
+            redis,
+            "stripe",
+            rate=self.rate_limit,
+            capacity=self.rate_limit_capacity,
+        )
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping[str, str],
+        post_data: Any = None,
+    ) -> StripeResponse:
+        operation = get_operation(method, url)
+
+        if method.lower() != "get":
+            return await self._request(operation, method, url, headers, post_data)
+
+        # Requests are made on behalf of an API key and a connected account,
+        # so we only coalesce requests made with the same ones.
+        key = (
+            url,
+            headers.get("Authorization"),
+            headers.get("Stripe-Account"),
+            headers.get("Stripe-Version"),
+        )
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._request(operation, method, url, headers, post_data)
+            )
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            _coalesced_requests.add(1, {"operation": operation})
+
+        # Shield the request, so a cancelled caller doesn't cancel it
+        # for the other ones waiting on it
+        return await asyncio.shield(task)
+
+    async def _request(
+        self,
+        operation: str,
+        method: str,
+        url: str,
+        headers: Mapping[str, str],
+        post_data: Any,
+    ) -> StripeResponse:
+        attributes: dict[str, str | int] = {"operation": operation}
+        actor_name = _get_actor_name()
+        if actor_name is not None:
+            attributes["actor"] = actor_name
+
+        attempt = 0
+        while True:
+            await self._acquire(operation)
+
+            start = time.perf_counter()
+            content, status_code, response_headers = await super().request_async(
+                method, url, headers, post_data
+            )
+            _request_duration.record(
+                time.perf_counter() - start,
+                {**attributes, "status_code": status_code},
+            )
+
+            if status_code != 429 or attempt >= self.max_rate_limited_retries:
+                return content, status_code, response_headers
+
+            delay = self._get_backoff(attempt, response_headers)
+            log.warning(
+                "stripe.rate_limited",
+                operation=operation,
+                actor=actor_name,
+                attempt=attempt,
+                delay=delay,
+            )
+            await self._block(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _acquire(self, operation: str) -> None:
+        if self._rate_limiter is None:
+            return
+        # Fail open: Stripe enforces its own limit anyway,
+        # and we back off when it tells us to.
+        try:
+            await self._rate_limiter.acquire(timeout=self.rate_limit_timeout)
+        except RateLimitTimeout as e:
+            log.warning("stripe.rate_limit.timeout", operation=operation, wait=e.wait)
+        except RedisError as e:
+            log.warning("stripe.rate_limit.error", operation=operation, error=str(e))
+
+    async def _block(self, delay: float) -> None:
+        if self._rate_limiter is None:
+            return
+        try:
+            await self._rate_limiter.block(delay)
+        except RedisError as e:
+            log.warning("stripe.rate_limit.error", error=str(e))
+
+    def _get_backoff(self, attempt: int, response_headers: Mapping[str, str]) -> float:
+        retry_after = response_headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Exponential backoff with full jitter, starting at 0.5 second
+        return random.uniform(0, 0.5 * 2**attempt)
+
+
+__all__ = ["StripeHTTPClient", "get_operation"]
@@ -7,6 +7,8 @@ import stripe as stripe_lib
 from polar.config import settings
 from polar.enums import SubscriptionRecurringInterval
 from polar.exceptions import PolarError
+from polar.integrations.stripe.cache import StripeObjectCache
+from polar.integrations.stripe.http_client import StripeHTTPClient
 from polar.integrations.stripe.utils import get_expandable_id
 from polar.kit.utils import utc_now
 from polar.logfire import instrument_httpx
@@ -17,10 +19,21 @@ if TYPE_CHECKING:
 
 stripe_lib.api_key = settings.STRIPE_SECRET_KEY
 
-stripe_http_client = stripe_lib.HTTPXClient(allow_sync_methods=True)
+stripe_http_client = StripeHTTPClient(
+    allow_sync_methods=True,
+    rate_limit=settings.STRIPE_RATE_LIMIT,
+    rate_limit_capacity=settings.STRIPE_RATE_LIMIT_CAPACITY,
+    rate_limit_timeout=settings.STRIPE_RATE_LIMIT_TIMEOUT,
+    max_rate_limited_retries=settings.STRIPE_MAX_RATE_LIMITED_RETRIES,
+)
 instrument_httpx(stripe_http_client._client_async)
 stripe_lib.default_http_client = stripe_http_client
 
+stripe_object_cache = StripeObjectCache(
+    local_size=settings.STRIPE_OBJECT_CACHE_LOCAL_SIZE,
+    ttl=settings.STRIPE_OBJECT_CACHE_TTL,
+)
+
 
 StripeCancellationReasons = Literal[
     "customer_service",
@@ -125,6 +138,7 @@ class StripeService:
         source_transaction: str | None = None,
         transfer_group: str | None = None,
         metadata: dict[str, str] | None = None,
+        idempotency_key: str | None = None,
     ) -> stripe_lib.Transfer:
         create_params: stripe_lib.Transfer.CreateParams = {
             "amount": amount,
@@ -136,6 +150,8 @@ class StripeService:
             create_params["source_transaction"] = source_transaction
         if transfer_group is not None:
             create_params["transfer_group"] = transfer_group
+        if idempotency_key is not None:
+            create_params["idempotency_key"] = idempotency_key
         return await stripe_lib.Transfer.create_async(**create_params)
 
     async def get_transfer(self, id: str) -> stripe_lib.Transfer:
@@ -367,11 +383,23 @@ class StripeService:
         return await stripe_lib.Invoice.modify_async(id, **params)
 
     async def get_balance_transaction(self, id: str) -> stripe_lib.BalanceTransaction:
-        return await stripe_lib.BalanceTransaction.retrieve_async(id)
+        # Only the status and availability date of a balance transaction change,
+        # its amounts and fees are fixed once it's created.
+        return await stripe_object_cache.get_or_retrieve(
+            stripe_lib.BalanceTransaction,
+            id,
+            lambda: stripe_lib.BalanceTransaction.retrieve_async(id),
+            is_final=lambda _: True,
+        )
 
     async def get_invoice(self, id: str) -> stripe_lib.Invoice:
-        return await stripe_lib.Invoice.retrieve_async(
-            id, expand=["total_tax_amounts.tax_rate"]
+        expand = ["total_tax_amounts.tax_rate"]
+        return await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Invoice,
+            id,
+            lambda: stripe_lib.Invoice.retrieve_async(id, expand=expand),
+            is_final=lambda invoice: invoice.status in {"paid", "void"},
+            expand=expand,
         )
 
     async def list_balance_transactions(
@@ -420,8 +448,19 @@ class StripeService:
         stripe_account: str | None = None,
         expand: list[str] | None = None,
     ) -> stripe_lib.Charge:
-        return await stripe_lib.Charge.retrieve_async(
-            id, stripe_account=stripe_account, expand=expand or []
+        """
+        Get a charge. Succeeded and failed charges are cached:
+        their refunds and disputes may not be up-to-date.
+        """
+        return await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Charge,
+            id,
+            lambda: stripe_lib.Charge.retrieve_async(
+                id, stripe_account=stripe_account, expand=expand or []
+            ),
+            is_final=lambda charge: charge.status in {"succeeded", "failed"},
+            stripe_account=stripe_account,
+            expand=expand,
         )
 
     async def get_refund(
@@ -431,8 +470,16 @@ class StripeService:
         stripe_account: str | None = None,
         expand: list[str] | None = None,
     ) -> stripe_lib.Refund:
-        return await stripe_lib.Refund.retrieve_async(
-            id, stripe_account=stripe_account, expand=expand or []
+        # Succeeded refunds may still fail afterwards
+        return await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Refund,
+            id,
+            lambda: stripe_lib.Refund.retrieve_async(
+                id, stripe_account=stripe_account, expand=expand or []
+            ),
+            is_final=lambda refund: refund.status in {"failed", "canceled"},
+            stripe_account=stripe_account,
+            expand=expand,
         )
 
     async def get_dispute(
@@ -442,8 +489,15 @@ class StripeService:
         stripe_account: str | None = None,
         expand: list[str] | None = None,
     ) -> stripe_lib.Dispute:
-        return await stripe_lib.Dispute.retrieve_async(
-            id, stripe_account=stripe_account, expand=expand or []
+        return await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Dispute,
+            id,
+            lambda: stripe_lib.Dispute.retrieve_async(
+                id, stripe_account=stripe_account, expand=expand or []
+            ),
+            is_final=lambda dispute: dispute.status in {"won", "lost"},
+            stripe_account=stripe_account,
+            expand=expand,
         )
 
     async def create_payout(
@@ -765,16 +819,20 @@ class StripeService:
         description: str,
         tax_behavior: Literal["exclusive", "inclusive"] = "exclusive",
         metadata: dict[str, str] | None = None,
+        idempotency_key: str | None = None,
     ) -> stripe_lib.InvoiceItem:
-        return await stripe_lib.InvoiceItem.create_async(
-            customer=customer,
-            invoice=invoice,
-            amount=amount,
-            currency=currency,
-            description=description,
-            tax_behavior=tax_behavior,
-            metadata=metadata or {},
-        )
+        params: stripe_lib.InvoiceItem.CreateParams = {
+            "customer": customer,
+            "invoice": invoice,
+            "amount": amount,
+            "currency": currency,
+            "description": description,
+            "tax_behavior": tax_behavior,
+            "metadata": metadata or {},
+        }
+        if idempotency_key is not None:
+            params["idempotency_key"] = idempotency_key
+        return await stripe_lib.InvoiceItem.create_async(**params)
 
     async def create_tax_calculation(
         self,
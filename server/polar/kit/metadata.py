@@ -1,10 +1,12 @@
 import inspect
+import json
+import math
 import re
 from typing import Annotated, Any, TypeAlias, TypeVar
 
 from fastapi import Depends, Request
 from pydantic import AliasChoices, BaseModel, Field, StringConstraints
-from sqlalchemy import ColumnExpressionArgument, Select, and_, or_
+from sqlalchemy import ColumnExpressionArgument, Index, Select, and_, or_
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -17,6 +19,19 @@ class MetadataMixin:
     user_metadata: Mapped[MetadataColumn]
 
 
+def get_metadata_index(tablename: str) -> Index:
+    """
+    GIN index on `user_metadata`, serving the containment queries
+    of `get_metadata_clause`.
+    """
+    return Index(
+        f"ix_{tablename}_user_metadata",
+        "user_metadata",
+        postgresql_using="gin",
+        postgresql_ops={"user_metadata": "jsonb_path_ops"},
+    )
+
+
 MAXIMUM_KEYS = 50
 _MINIMUM_KEY_LENGTH = 1
 _MAXIMUM_KEY_LENGTH = 40
@@ -137,14 +152,43 @@ MetadataQuery = Annotated[dict[str, list[str]], Depends(_get_metadata_query)]
 M = TypeVar("M", bound=MetadataMixin)
 
 
+_json_number_pattern = re.compile(r"^-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$")
+
+
+def _get_metadata_values(value: str) -> list[MetadataValue]:
+    """
+    Get the metadata values a query string value can match.
+
+    Query values are always strings, but they should also match
+    the numbers and booleans they represent.
+
+    JSONB compares numbers by value, so a number matches all its spellings:
+    `1.0` and `1e0` match the stored integer `1`, and `1` a stored `1.0`.
+    Strings are still matched exactly: `1.0` doesn't match the string `"1"`.
+    """
+    values: list[MetadataValue] = [value]
+    if value in {"true", "false"}:
+        values.append(value == "true")
+    elif _json_number_pattern.match(value):
+        number = json.loads(value)
+        if isinstance(number, int) or math.isfinite(number):
+            values.append(number)
+    return values
+
+
 def get_metadata_clause(  # noqa: UP047
     model: type[M], query: MetadataQuery
 ) -> ColumnExpressionArgument[bool]:
+    """
+    Filter on metadata, using JSONB containment (`@>`),
+    so the GIN index on `user_metadata` can be used, if any.
+    """
     clauses: list[ColumnExpressionArgument[bool]] = []
     for key, values in query.items():
         sub_clauses: list[ColumnExpressionArgument[bool]] = []
         for value in values:
-            sub_clauses.append(model.user_metadata[key].as_string() == value)
+            for metadata_value in _get_metadata_values(value):
+                sub_clauses.append(model.user_metadata.contains({key: metadata_value}))
         clauses.append(or_(*sub_clauses))
     return and_(*clauses)
 
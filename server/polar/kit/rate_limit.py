@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import structlog
+
+from polar.logging import Logger
+from polar.redis import Redis
+
+log: Logger = structlog.get_logger()
+
+# Refill the bucket according to the elapsed time, then try to take tokens.
+# Returns the number of seconds to wait before the tokens are available,
+# "0" if they were taken.
+_ACQUIRE_SCRIPT = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+
+local bucket = redis.call("HMGET", key, "tokens", "updated_at", "blocked_until")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+local blocked_until = tonumber(bucket[3]) or 0
+
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+
+redis.call("HSET", key, "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("EXPIRE", key, math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+_BLOCK_SCRIPT = """
+local key = KEYS[1]
+local blocked_until = tonumber(ARGV[1])
+local current = tonumber(redis.call("HGET", key, "blocked_until")) or 0
+if blocked_until > current then
+    redis.call("HSET", key, "blocked_until", tostring(blocked_until))
+    redis.call("EXPIRE", key, math.ceil(tonumber(ARGV[2])) + 60)
+end
+return 1
+"""
+
+
+class RateLimitTimeout(Exception):
+    def __init__(self, name: str, wait: float) -> None:
+        self.name = name
+        self.wait = wait
+        super().__init__(f"Rate limit {name} requires to wait {wait:.2f} seconds.")
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter shared across processes through Redis.
+
+    Args:
+        redis: The Redis client.
+        name: Name of the bucket. Automatically prefixed by `polar:rate_limit:`.
+        rate: Number of tokens refilled per second.
+        capacity: Maximum number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, redis: Redis, name: str, *, rate: float, capacity: int) -> None:
+        self.redis = redis
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+
+    async def acquire(self, tokens: int = 1, *, timeout: float | None = None) -> None:
+        """
+        Wait until the tokens are available and take them.
+
+        Raises:
+            RateLimitTimeout: The tokens wouldn't be available within `timeout`.
+        """
+        waited = 0.0
+        while True:
+            wait = await self.try_acquire(tokens)
+            if wait == 0:
+                return
+            if timeout is not None and waited + wait > timeout:
+                raise RateLimitTimeout(self.name, wait)
+            log.debug("rate_limit.wait", name=self.name, wait=wait)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def try_acquire(self, tokens: int = 1) -> float:
+        """
+        Try to take the tokens.
+
+        Returns:
+            0 if the tokens were taken, else the number of seconds to wait
+            before they'll be available.
+        """
+        wait = await self.redis.eval(
+            _ACQUIRE_SCRIPT,
+            1,
+            self._get_key(),
+            self.rate,
+            self.capacity,
+            time.time(),
+            tokens,
+        )
+        return float(wait)
+
+    async def block(self, seconds: float) -> None:
+        """
+        Prevent every process from taking tokens for the given duration.
+
+        Typically called when the provider told us to back off, e.g. through
+        a `Retry-After` header.
+        """
+        log.info("rate_limit.block", name=self.name, seconds=seconds)
+        await self.redis.eval(
+            _BLOCK_SCRIPT, 1, self._get_key(), time.time() + seconds, seconds
+        )
+
+    def _get_key(self) -> str:
+        return f"polar:rate_limit:{self.name}"
@@ -0,0 +1,51 @@
+"""
+Text search helpers, backed by `pg_trgm` GIN indexes.
+
+Trigram indexes serve `ILIKE '%query%'` filters, whatever the position of the
+query in the value, and `word_similarity` ranks the matches.
+"""
+
+from sqlalchemy import ColumnElement, Index, SQLColumnExpression, func, or_
+
+SEARCH_CANDIDATES = 1000
+"""
+Maximum number of matches ranked by a search.
+
+Bounding the candidates lets Postgres stop scanning early for broad queries,
+e.g. a single letter, at the cost of maybe missing the best match.
+"""
+
+
+def get_trigram_index(tablename: str, column: str) -> Index:
+    return Index(
+        f"ix_{tablename}_{column}_trigram",
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"},
+    )
+
+
+def escape_like(value: str) -> str:
+    """
+    Escape the wildcards of a LIKE pattern, using `\\` as escape character.
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_search_clause(
+    query: str, *columns: SQLColumnExpression[str] | SQLColumnExpression[str | None]
+) -> ColumnElement[bool]:
+    pattern = f"%{escape_like(query)}%"
+    return or_(*(column.ilike(pattern, escape="\\") for column in columns))
+
+
+def get_search_rank(
+    query: str, *columns: SQLColumnExpression[str] | SQLColumnExpression[str | None]
+) -> ColumnElement[float]:
+    """
+    Rank of a row for the query: the best word similarity among the columns,
+    from 0 to 1.
+    """
+    return func.greatest(
+        *(func.word_similarity(query, func.coalesce(column, "")) for column in columns)
+    )
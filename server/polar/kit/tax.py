@@ -2,6 +2,7 @@ import hashlib
 import json
 import uuid
 from collections.abc import Sequence
+from datetime import timedelta
 from enum import StrEnum
 from typing import Annotated, Any, Literal, LiteralString, Protocol, TypedDict
 
@@ -17,6 +18,7 @@ from stdnum import get_cc_module
 from polar.exceptions import PolarError
 from polar.integrations.stripe.service import stripe as stripe_service
 from polar.kit.address import Address
+from polar.locker import Locker
 
 
 class TaxIDFormat(StrEnum):
@@ -338,22 +340,28 @@ class InvalidTaxLocation(TaxCalculationError):
         )
 
 
-async def calculate_tax(
-    checkout_id: uuid.UUID,
+def _get_tax_inputs_key(
     currency: str,
     amount: int,
     stripe_product_id: str,
     address: Address,
     tax_ids: list[TaxID],
-) -> tuple[str, int]:
-    # Compute an idempotency key based on the input parameters to work as a sort of cache
+) -> str:
     address_str = address.model_dump_json()
     tax_ids_str = ",".join(f"{tax_id[0]}:{tax_id[1]}" for tax_id in tax_ids)
-    idempotency_key_str = f"{checkout_id}:{currency}:{amount}:{stripe_product_id}:{address_str}:{tax_ids_str}"
-    idempotency_key = hashlib.sha256(idempotency_key_str.encode()).hexdigest()
+    return f"{currency}:{amount}:{stripe_product_id}:{address_str}:{tax_ids_str}"
 
+
+async def _create_tax_calculation(
+    currency: str,
+    amount: int,
+    stripe_product_id: str,
+    address: Address,
+    tax_ids: list[TaxID],
+    idempotency_key: str,
+) -> stripe_lib.tax.Calculation:
     try:
-        calculation = await stripe_service.create_tax_calculation(
+        return await stripe_service.create_tax_calculation(
             currency=currency,
             line_items=[
                 {
@@ -382,9 +390,77 @@ async def calculate_tax(
         if e.error is None or e.error.code != "customer_tax_location_invalid":
             raise
         raise InvalidTaxLocation(e) from e
-    else:
-        assert calculation.id is not None
-        return calculation.id, calculation.tax_amount_exclusive
+
+
+async def calculate_tax(
+    checkout_id: uuid.UUID,
+    currency: str,
+    amount: int,
+    stripe_product_id: str,
+    address: Address,
+    tax_ids: list[TaxID],
+) -> tuple[str, int]:
+    # Compute an idempotency key based on the input parameters to work as a sort of cache
+    inputs_key = _get_tax_inputs_key(
+        currency, amount, stripe_product_id, address, tax_ids
+    )
+    idempotency_key_str = f"{checkout_id}:{inputs_key}"
+    idempotency_key = hashlib.sha256(idempotency_key_str.encode()).hexdigest()
+
+    calculation = await _create_tax_calculation(
+        currency, amount, stripe_product_id, address, tax_ids, idempotency_key
+    )
+    assert calculation.id is not None
+    return calculation.id, calculation.tax_amount_exclusive
+
+
+TAX_QUOTE_TTL = timedelta(minutes=10)
+
+
+async def calculate_tax_quote(
+    locker: Locker,
+    currency: str,
+    amount: int,
+    stripe_product_id: str,
+    address: Address,
+    tax_ids: list[TaxID],
+) -> int:
+    """
+    Return the tax amount for the given inputs, without tying it to a checkout.
+
+    Quotes are shared across checkouts through a short-lived Redis cache.
+    Concurrent requests for the same inputs wait on a lock so only one of them
+    calls Stripe; the others read the result it cached.
+
+    The resulting amount is only an estimate: use `calculate_tax` to get
+    a tax calculation that can be turned into a tax transaction.
+    """
+    inputs_key = _get_tax_inputs_key(
+        currency, amount, stripe_product_id, address, tax_ids
+    )
+    quote_hash = hashlib.sha256(inputs_key.encode()).hexdigest()
+    cache_key = f"polar:tax_quote:{quote_hash}"
+
+    cached_tax_amount = await locker.redis.get(cache_key)
+    if cached_tax_amount is not None:
+        return int(cached_tax_amount)
+
+    async with locker.lock(
+        f"tax_quote:{quote_hash}", timeout=10.0, blocking_timeout=10.0
+    ):
+        # A concurrent request might have computed the quote while we waited
+        cached_tax_amount = await locker.redis.get(cache_key)
+        if cached_tax_amount is not None:
+            return int(cached_tax_amount)
+
+        calculation = await _create_tax_calculation(
+            currency, amount, stripe_product_id, address, tax_ids, quote_hash
+        )
+        tax_amount = calculation.tax_amount_exclusive
+        await locker.redis.set(
+            cache_key, tax_amount, ex=int(TAX_QUOTE_TTL.total_seconds())
+        )
+        return tax_amount
 
 
 class TaxabilityReason(StrEnum):
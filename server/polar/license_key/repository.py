@@ -1,7 +1,8 @@
 from uuid import UUID
 
-from sqlalchemy import Select, select
+from sqlalchemy import Select, func, select, update
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from polar.auth.models import AuthSubject, User, is_organization, is_user
 from polar.kit.repository import (
@@ -57,6 +58,45 @@ class LicenseKeyRepository(
         )
         return await self.get_one_or_none(statement)
 
+    async def increment_activations_count(self, license_key: LicenseKey) -> bool:
+        """
+        Atomically reserve an activation slot on the license key.
+
+        The conditional `UPDATE` takes a row lock, so concurrent activations
+        of the same key are serialized by Postgres and the limit can't be
+        exceeded, regardless of the number of existing activations.
+
+        Returns `False` if the activation limit is already reached.
+        """
+        statement = (
+            update(LicenseKey)
+            .where(
+                LicenseKey.id == license_key.id,
+                LicenseKey.limit_activations.is_not(None),
+                LicenseKey.activations_count < LicenseKey.limit_activations,
+            )
+            .values(activations_count=LicenseKey.activations_count + 1)
+            .returning(LicenseKey.activations_count)
+        )
+        result = await self.session.execute(statement)
+        activations_count = result.scalar_one_or_none()
+        if activations_count is None:
+            return False
+        set_committed_value(license_key, "activations_count", activations_count)
+        return True
+
+    async def decrement_activations_count(self, license_key: LicenseKey) -> None:
+        statement = (
+            update(LicenseKey)
+            .where(LicenseKey.id == license_key.id)
+            .values(
+                activations_count=func.greatest(LicenseKey.activations_count - 1, 0)
+            )
+            .returning(LicenseKey.activations_count)
+        )
+        result = await self.session.execute(statement)
+        set_committed_value(license_key, "activations_count", result.scalar_one())
+
     def get_eager_options(self) -> Options:
         return (
             joinedload(LicenseKey.customer),
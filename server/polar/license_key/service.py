@@ -3,7 +3,7 @@ from typing import cast
 from uuid import UUID
 
 import structlog
-from sqlalchemy import Select, func, select
+from sqlalchemy import Select, select
 from sqlalchemy.orm import joinedload
 
 from polar.auth.models import AuthSubject
@@ -113,13 +113,22 @@ class LicenseKeyService:
         return lk
 
     async def get_activation_or_raise(
-        self, session: AsyncSession, *, license_key: LicenseKey, activation_id: UUID
+        self,
+        session: AsyncSession,
+        *,
+        license_key: LicenseKey,
+        activation_id: UUID,
+        for_update: bool = False,
     ) -> LicenseKeyActivation:
         query = select(LicenseKeyActivation).where(
             LicenseKeyActivation.id == activation_id,
             LicenseKeyActivation.license_key_id == license_key.id,
             LicenseKeyActivation.deleted_at.is_(None),
         )
+        if for_update:
+            # Concurrent deactivations of the same activation would otherwise
+            # both decrement `LicenseKey.activations_count`
+            query = query.with_for_update()
         result = await session.execute(query)
         record = result.scalar_one_or_none()
         if not record:
@@ -203,21 +212,6 @@ class LicenseKeyService:
         bound_logger.info("license_key.validate")
         return (license_key, activation)
 
-    async def get_activation_count(
-        self,
-        session: AsyncSession,
-        license_key: LicenseKey,
-    ) -> int:
-        query = select(func.count(LicenseKeyActivation.id)).where(
-            LicenseKeyActivation.license_key_id == license_key.id,
-            LicenseKeyActivation.deleted_at.is_(None),
-        )
-        res = await session.execute(query)
-        count = res.scalar()
-        if count:
-            return count
-        return 0
-
     async def activate(
         self,
         session: AsyncSession,
@@ -227,11 +221,8 @@ class LicenseKeyService:
         if not license_key.limit_activations:
             raise NotPermitted("License key does not require activation")
 
-        current_activation_count = await self.get_activation_count(
-            session,
-            license_key=license_key,
-        )
-        if current_activation_count >= license_key.limit_activations:
+        repository = LicenseKeyRepository.from_session(session)
+        if not await repository.increment_activations_count(license_key):
             log.info(
                 "license_key.activate.limit_reached",
                 license_key_id=license_key.id,
@@ -270,10 +261,13 @@ class LicenseKeyService:
             session,
             license_key=license_key,
             activation_id=deactivate.activation_id,
+            for_update=True,
         )
         activation.mark_deleted()
         session.add(activation)
         await session.flush()
+        repository = LicenseKeyRepository.from_session(session)
+        await repository.decrement_activations_count(license_key)
         assert activation.deleted_at is not None
         log.info(
             "license_key.deactivate",
@@ -1,11 +1,11 @@
 import contextlib
+import time
+import uuid
 from collections.abc import AsyncGenerator
 
 import logfire
 import structlog
 from fastapi import Depends
-from redis.asyncio.lock import Lock
-from redis.exceptions import LockNotOwnedError
 
 from polar.exceptions import PolarError
 from polar.logging import Logger
@@ -31,6 +31,127 @@ class TimeoutLockError(LockerError):
     pass
 
 
+# Release the lock if we still own it,
+# and wake up one of the waiters by pushing to the notification list.
+_RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("DEL", KEYS[1])
+redis.call("LPUSH", KEYS[2], "1")
+redis.call("LTRIM", KEYS[2], 0, 0)
+redis.call("PEXPIRE", KEYS[2], ARGV[2])
+return 1
+"""
+
+NOTIFICATION_TTL = 1.0
+"""
+Lifetime in seconds of a release notification nobody waited for.
+
+A stale notification only causes a waiter to try to acquire the lock once more.
+"""
+
+_wait_duration = logfire.metric_histogram(
+    "locker.wait.duration",
+    unit="s",
+    description="Time spent waiting to acquire a distributed lock.",
+)
+_hold_duration = logfire.metric_histogram(
+    "locker.hold.duration",
+    unit="s",
+    description="Time a distributed lock was held.",
+)
+_contentions = logfire.metric_counter(
+    "locker.contentions",
+    description="Distributed lock acquisitions that had to wait for another holder.",
+)
+_timeouts = logfire.metric_counter(
+    "locker.timeouts",
+    description="Distributed locks that couldn't be acquired in time.",
+)
+_expirations = logfire.metric_counter(
+    "locker.expirations",
+    description="Distributed locks that expired before being released.",
+)
+
+
+def _get_metric_name(name: str) -> str:
+    """
+    Name of the lock for metrics, without the IDs of the locked resources,
+    e.g. `checkout` for `checkout:{id}`.
+    """
+    return name.split(":", 1)[0]
+
+
+class DistributedLock:
+    """
+    Distributed lock on the Redis server.
+
+    Instead of polling, waiters block on a Redis list the holder pushes to
+    when releasing the lock, so they're woken up as soon as it's free.
+    Waiters still check the lock when its lifetime runs out,
+    in case the holder died without releasing it.
+    """
+
+    def __init__(self, redis: Redis, key: str, *, timeout: float) -> None:
+        self.redis = redis
+        self.key = key
+        self.notification_key = f"{key}:notify"
+        self.timeout = timeout
+        self.token = uuid.uuid4().hex
+
+    async def acquire(self, *, blocking_timeout: float) -> bool:
+        """
+        Acquire the lock, waiting at most `blocking_timeout` seconds for it.
+
+        Returns:
+            Whether the lock was acquired.
+        """
+        deadline = time.monotonic() + blocking_timeout
+        while True:
+            if await self._try_acquire():
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            # Wait for a release notification,
+            # but not longer than the lock lifetime, in case the holder died.
+            ttl = await self.redis.pttl(self.key)
+            if ttl == -2:  # The lock expired in the meantime
+                continue
+            wait = min(remaining, ttl / 1000) if ttl > 0 else remaining
+            # BLPOP waits indefinitely with a 0 timeout
+            await self.redis.blpop([self.notification_key], timeout=max(wait, 0.01))
+
+    async def release(self) -> bool:
+        """
+        Release the lock.
+
+        Returns:
+            Whether we still owned the lock, i.e. it didn't expire before.
+        """
+        released = await self.redis.eval(
+            _RELEASE_SCRIPT,
+            2,
+            self.key,
+            self.notification_key,
+            self.token,
+            int(NOTIFICATION_TTL * 1000),
+        )
+        return bool(released)
+
+    async def locked(self) -> bool:
+        return bool(await self.redis.exists(self.key))
+
+    async def _try_acquire(self) -> bool:
+        acquired = await self.redis.set(
+            self.key, self.token, nx=True, px=int(self.timeout * 1000)
+        )
+        return bool(acquired)
+
+
 class Locker:
     """
     Helper class to acquire distributed locks.
@@ -46,9 +167,7 @@ class Locker:
         *,
         timeout: float,
         blocking_timeout: float,
-        sleep: float = 0.1,
-        thread_local: bool = True,
-    ) -> AsyncGenerator[Lock, None]:
+    ) -> AsyncGenerator[DistributedLock, None]:
         """
         Acquire a distributed lock on the Redis server.
 
@@ -57,8 +176,6 @@ class Locker:
             timeout: The lifetime of the lock in seconds.
             blocking_timeout: The maximum amount of time in seconds to spend trying
             to acquire the lock.
-            sleep: Amount of time in seconds to sleep between each iteration.
-            Defaults to 0.1 seconds.
 
         Raises:
             ExpiredLockError: The lock reached its `timeout` lifetime before
@@ -66,15 +183,8 @@ class Locker:
             TimeoutLockError: The lock could not be acquired within `blocking_timeout`
             limit.
         """
-        lock = Lock(
-            self.redis,
-            self._get_key(name),
-            timeout=timeout,
-            sleep=sleep,
-            blocking=True,
-            blocking_timeout=blocking_timeout,
-            thread_local=thread_local,
-        )
+        lock = DistributedLock(self.redis, self._get_key(name), timeout=timeout)
+        metric_attributes = {"lock": _get_metric_name(name)}
 
         with logfire.span(
             "Acquire distributed lock {name}",
@@ -83,9 +193,18 @@ class Locker:
             blocking_timeout=blocking_timeout,
         ):
             log.debug("try to acquire lock", name=name)
-            acquired = await lock.acquire()
+            start = time.perf_counter()
+            acquired = await lock.acquire(blocking_timeout=0)
+            if not acquired:
+                _contentions.add(1, metric_attributes)
+                acquired = await lock.acquire(blocking_timeout=blocking_timeout)
+            _wait_duration.record(
+                time.perf_counter() - start,
+                {**metric_attributes, "acquired": acquired},
+            )
 
             if not acquired:
+                _timeouts.add(1, metric_attributes)
                 log.error(
                     "could not acquire lock before set limit",
                     name=name,
@@ -95,24 +214,72 @@ class Locker:
             else:
                 log.debug("acquired lock", name=name)
 
+        async with self._hold(lock, name, metric_attributes):
+            yield lock
+
+    @contextlib.asynccontextmanager
+    async def try_lock(
+        self, name: str, *, timeout: float
+    ) -> AsyncGenerator[bool, None]:
+        """
+        Acquire a distributed lock on the Redis server, without waiting for it.
+
+        Unlike `lock`, a busy lock is an expected outcome and not an error:
+        the caller checks the yielded value to know whether it holds the lock.
+
+        Args:
+            name: Name of the lock. Automatically prefixed by `polarlock:`.
+            timeout: The lifetime of the lock in seconds.
+
+        Raises:
+            ExpiredLockError: The lock reached its `timeout` lifetime before
+            we released it.
+        """
+        lock = DistributedLock(self.redis, self._get_key(name), timeout=timeout)
+        metric_attributes = {"lock": _get_metric_name(name)}
+
+        acquired = await lock.acquire(blocking_timeout=0)
+        if not acquired:
+            _contentions.add(1, metric_attributes)
+            log.debug("lock is busy", name=name)
+            yield False
+            return
+
+        log.debug("acquired lock", name=name)
+        async with self._hold(lock, name, metric_attributes):
+            yield True
+
+    @contextlib.asynccontextmanager
+    async def _hold(
+        self, lock: DistributedLock, name: str, metric_attributes: dict[str, str]
+    ) -> AsyncGenerator[None, None]:
+        """
+        Hold an acquired lock until the block exits, then release it.
+
+        Raises:
+            ExpiredLockError: The lock reached its `timeout` lifetime before
+            we released it.
+        """
         with logfire.span(
-            "Distributed lock {name} acquired",
-            name=name,
-            timeout=timeout,
-            blocking_timeout=blocking_timeout,
+            "Distributed lock {name} acquired", name=name, timeout=lock.timeout
         ):
+            acquired_at = time.perf_counter()
             try:
-                yield lock
+                yield
             finally:
-                try:
-                    await lock.release()
-                except LockNotOwnedError as e:
+                released = await lock.release()
+                _hold_duration.record(
+                    time.perf_counter() - acquired_at,
+                    {**metric_attributes, "expired": not released},
+                )
+                if not released:
+                    _expirations.add(1, metric_attributes)
                     log.error(
                         "could not release lock as it already expired",
                         name=name,
-                        timeout=timeout,
+                        timeout=lock.timeout,
                     )
-                    raise ExpiredLockError() from e
+                    raise ExpiredLockError()
                 log.debug("released lock", name=name)
 
     async def is_locked(self, name: str) -> bool:
@@ -125,7 +292,7 @@ class Locker:
         Returns:
             bool: True if the lock is currently held, False otherwise.
         """
-        lock = Lock(self.redis, self._get_key(name))
+        lock = DistributedLock(self.redis, self._get_key(name), timeout=0)
         return await lock.locked()
 
     def _get_key(self, name: str) -> str:
@@ -6,7 +6,7 @@ from sqlalchemy import delete
 from sqlalchemy.orm import joinedload
 
 from polar.config import settings
-from polar.email.react import render_email_template
+from polar.email.react import email_renderer_pool
 from polar.email.sender import enqueue_email
 from polar.exceptions import PolarError
 from polar.kit.crypto import generate_token_hash_pair, get_token_hash
@@ -75,7 +75,7 @@ class MagicLinkService(ResourceService[MagicLink, MagicLinkCreate, MagicLinkUpda
 
         url_params = {"token": token, **extra_url_params}
         subject = "Sign in to Polar"
-        body = render_email_template(
+        body = await email_renderer_pool.render(
             "magic_link",
             {
                 "token_lifetime_minutes": token_lifetime_minutes,
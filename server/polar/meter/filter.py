@@ -44,6 +44,16 @@ class FilterClause(BaseModel):
                 return false()
             return self._get_comparison_clause(attr, self.value)
 
+        # Equality is checked with containments: they don't have to inspect
+        # the type of the property, and they can use the index on the metadata
+        if self.operator == FilterOperator.eq:
+            return or_(
+                *(
+                    model.user_metadata.contains({self.property: value})
+                    for value in self._get_equal_values()
+                )
+            )
+
         attr = model.user_metadata[self.property]
 
         # The operator is LIKE OR NOT LIKE, treat everything as a string
@@ -95,6 +105,18 @@ class FilterClause(BaseModel):
             return attr.notlike(f"%{value}%")
         raise ValueError(f"Unsupported operator: {self.operator}")
 
+    def _get_equal_values(self) -> list[str | int | bool]:
+        """
+        Get the metadata values equal to the clause value, following the rules
+        of the comparison by type.
+        """
+        values: list[str | int | bool] = [self._get_str_value()]
+        if isinstance(self.value, bool):
+            values.extend((self.value, self._get_number_value()))
+        elif isinstance(self.value, int):
+            values.append(self.value)
+        return values
+
     def _get_str_value(self) -> str:
         if isinstance(self.value, bool):
             return "t" if self.value else "f"
@@ -0,0 +1,297 @@
+"""
+In-process evaluation of meter filters on events.
+
+It follows the semantics of the SQL clauses of `Filter` and `Aggregation`,
+so events can be tagged with their meters at ingestion, without querying them.
+
+A few comparisons can't be reproduced exactly in Python, like ordering strings
+with punctuation or mixed case, which depends on the database collation:
+the predicate then returns `None`, and the caller should fall back to SQL
+for the event.
+"""
+
+import datetime
+import re
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+from polar.models import Meter
+
+from .aggregation import Aggregation, CountAggregation
+from .filter import Filter, FilterClause, FilterConjunction, FilterOperator
+
+EventData = Mapping[str, Any]
+"""
+The event to match, with the `name`, `source`, `timestamp`
+and `user_metadata` keys.
+"""
+
+Predicate = Callable[[EventData], bool | None]
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+_MISSING = object()
+
+
+def _get_epoch(timestamp: datetime.datetime) -> int:
+    """
+    Same as `CAST(EXTRACT(epoch FROM timestamp) AS BIGINT)`,
+    which rounds half away from zero.
+    """
+    microseconds = (timestamp - _EPOCH) // datetime.timedelta(microseconds=1)
+    seconds, remainder = divmod(abs(microseconds), 1_000_000)
+    if remainder >= 500_000:
+        seconds += 1
+    return seconds if microseconds >= 0 else -seconds
+
+
+def _get_json_text(value: Any) -> str:
+    """
+    Same as the `->>` operator on a JSONB scalar.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return format(Decimal(repr(value)), "f")
+    return str(value)
+
+
+def _compile_like(value: str) -> re.Pattern[str]:
+    """
+    Compile `LIKE '%value%'` into a regular expression.
+
+    The value itself may contain wildcards, escaped with `\\`.
+    """
+    pattern: list[str] = []
+    escaped = False
+    for char in value:
+        if escaped:
+            pattern.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "%":
+            pattern.append(".*")
+        elif char == "_":
+            pattern.append(".")
+        else:
+            pattern.append(re.escape(char))
+    return re.compile(f".*{''.join(pattern)}.*", re.DOTALL)
+
+
+def _compare(operator: FilterOperator, left: Any, right: Any) -> bool:
+    if operator == FilterOperator.eq:
+        return bool(left == right)
+    elif operator == FilterOperator.ne:
+        return bool(left != right)
+    elif operator == FilterOperator.gt:
+        return bool(left > right)
+    elif operator == FilterOperator.gte:
+        return bool(left >= right)
+    elif operator == FilterOperator.lt:
+        return bool(left < right)
+    elif operator == FilterOperator.lte:
+        return bool(left <= right)
+    raise ValueError(f"Unsupported operator: {operator}")
+
+
+_ORDERING_OPERATORS = {
+    FilterOperator.gt,
+    FilterOperator.gte,
+    FilterOperator.lt,
+    FilterOperator.lte,
+}
+
+_COLLATION_SAFE = re.compile(r"[0-9a-z]*")
+"""
+Strings ordered the same by any collation and by code points:
+digits sort before letters, and there's no case or punctuation to weigh.
+"""
+
+
+def _compile_string_comparison(
+    operator: FilterOperator, value: str
+) -> Callable[[str], bool | None]:
+    if operator in (FilterOperator.like, FilterOperator.not_like):
+        regex = _compile_like(value)
+        negate = operator == FilterOperator.not_like
+        return lambda string: (regex.fullmatch(string) is None) == negate
+    if operator in _ORDERING_OPERATORS:
+        # Strings are ordered by the database collation:
+        # leave it to SQL, unless it can't differ from Python
+        if _COLLATION_SAFE.fullmatch(value) is None:
+            return lambda string: None
+        return lambda string: (
+            _compare(operator, string, value)
+            if _COLLATION_SAFE.fullmatch(string) is not None
+            else None
+        )
+    return lambda string: _compare(operator, string, value)
+
+
+def _compile_clause(clause: FilterClause) -> Predicate:
+    operator = clause.operator
+    value = clause.value
+
+    if clause.property in ("timestamp", "name", "source"):
+        if clause.property == "timestamp":
+            if not isinstance(value, int):
+                return lambda event: False
+            return lambda event: _compare(
+                operator, _get_epoch(event["timestamp"]), value
+            )
+        if not isinstance(value, str):
+            return lambda event: False
+        property = clause.property
+        string_comparison = _compile_string_comparison(operator, value)
+        return lambda event: string_comparison(event[property])
+
+    key = clause.property
+    str_value = clause._get_str_value()
+    string_comparison = _compile_string_comparison(operator, str_value)
+
+    # LIKE and NOT LIKE compare the text of any JSON scalar
+    if operator in (FilterOperator.like, FilterOperator.not_like):
+
+        def _like_predicate(event: EventData) -> bool | None:
+            property_value = event["user_metadata"].get(key, _MISSING)
+            if property_value is _MISSING or property_value is None:
+                return False
+            # JSON text of arrays and objects: leave it to SQL
+            if isinstance(property_value, dict | list):
+                return None
+            return string_comparison(_get_json_text(property_value))
+
+        return _like_predicate
+
+    def _typed_predicate(event: EventData) -> bool | None:
+        property_value = event["user_metadata"].get(key, _MISSING)
+        if isinstance(property_value, str):
+            return string_comparison(property_value)
+        if isinstance(property_value, bool):
+            if not isinstance(value, bool):
+                return False
+            return _compare(operator, property_value, value)
+        if isinstance(property_value, int | float):
+            if not isinstance(value, int):
+                return False
+            # Non-integer numbers fail the cast to integer in SQL
+            if isinstance(property_value, float) and not property_value.is_integer():
+                return False
+            return _compare(operator, property_value, clause._get_number_value())
+        # Missing, null, arrays and objects don't match
+        return False
+
+    return _typed_predicate
+
+
+def _compile_filter(filter: Filter) -> Predicate:
+    predicates = [
+        _compile_clause(clause)
+        if isinstance(clause, FilterClause)
+        else _compile_filter(clause)
+        for clause in filter.clauses
+    ]
+
+    if filter.conjunction == FilterConjunction.and_:
+
+        def _and(event: EventData) -> bool | None:
+            result: bool | None = True
+            for predicate in predicates:
+                match = predicate(event)
+                if match is False:
+                    return False
+                if match is None:
+                    result = None
+            return result
+
+        return _and
+
+    def _or(event: EventData) -> bool | None:
+        if not predicates:
+            return True
+        result: bool | None = False
+        for predicate in predicates:
+            match = predicate(event)
+            if match is True:
+                return True
+            if match is None:
+                result = None
+        return result
+
+    return _or
+
+
+def _compile_aggregation(aggregation: Aggregation) -> Predicate:
+    if isinstance(aggregation, CountAggregation):
+        return lambda event: True
+
+    property = aggregation.property
+    if property in ("name", "source"):
+        return lambda event: False
+    if property == "timestamp":
+        return lambda event: True
+
+    def _is_number(event: EventData) -> bool:
+        property_value = event["user_metadata"].get(property)
+        return isinstance(property_value, int | float) and not isinstance(
+            property_value, bool
+        )
+
+    return _is_number
+
+
+def compile_meter(meter: Meter) -> Predicate:
+    """
+    Compile the filter and the aggregation of the meter into a predicate
+    telling if an event belongs to the meter, like `get_meter_definition_clause`.
+    """
+    filter_predicate = _compile_filter(meter.filter)
+    aggregation_predicate = _compile_aggregation(meter.aggregation)
+
+    def _predicate(event: EventData) -> bool | None:
+        if not aggregation_predicate(event):
+            return False
+        return filter_predicate(event)
+
+    return _predicate
+
+
+class MeterMatcher:
+    """
+    Cache of the compiled meters, invalidated when they're updated.
+    """
+
+    def __init__(self, maxsize: int = 10_000) -> None:
+        self.maxsize = maxsize
+        self._cache: OrderedDict[UUID, tuple[datetime.datetime | None, Predicate]] = (
+            OrderedDict()
+        )
+
+    def get_predicate(self, meter: Meter) -> Predicate:
+        try:
+            modified_at, predicate = self._cache[meter.id]
+        except KeyError:
+            pass
+        else:
+            if modified_at == meter.modified_at:
+                self._cache.move_to_end(meter.id)
+                return predicate
+
+        predicate = compile_meter(meter)
+        self._cache[meter.id] = (meter.modified_at, predicate)
+        self._cache.move_to_end(meter.id)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return predicate
+
+    def invalidate(self, meter_id: UUID) -> None:
+        self._cache.pop(meter_id, None)
+
+    def match(self, meter: Meter, event: EventData) -> bool | None:
+        return self.get_predicate(meter)(event)
+
+
+meter_matcher = MeterMatcher()
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from uuid import UUID
 
 from sqlalchemy import Select, select
@@ -16,6 +17,27 @@ class MeterRepository(RepositoryBase[Meter], RepositoryIDMixin[Meter, UUID]):
         statement = self.get_readable_statement(auth_subject).where(Meter.id == id)
         return await self.get_one_or_none(statement)
 
+    async def get_all_by_organizations(
+        self, organization_ids: Sequence[UUID], *, key_share_lock: bool = False
+    ) -> Sequence[Meter]:
+        statement = self.get_base_statement().where(
+            Meter.organization_id.in_(organization_ids)
+        )
+        if key_share_lock:
+            statement = statement.with_for_update(read=True, key_share=True)
+        return await self.get_all(statement)
+
+    async def lock(self, meter: Meter, *, no_key: bool = False) -> None:
+        """
+        Lock the meter row, `FOR UPDATE` or `FOR NO KEY UPDATE`.
+        """
+        statement = (
+            select(Meter.id)
+            .where(Meter.id == meter.id)
+            .with_for_update(key_share=no_key)
+        )
+        await self.session.execute(statement)
+
     def get_readable_statement(
         self, auth_subject: AuthSubject[User | Organization]
     ) -> Select[tuple[Meter]]:
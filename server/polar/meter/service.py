@@ -19,24 +19,32 @@ from sqlalchemy.orm import joinedload
 
 from polar.auth.models import AuthSubject, Organization, User
 from polar.billing_entry.repository import BillingEntryRepository
-from polar.event.repository import EventRepository
+from polar.event.repository import EventMeterRepository, EventRepository
 from polar.exceptions import PolarRequestValidationError, ValidationError
 from polar.kit.metadata import MetadataQuery, apply_metadata_clause, get_metadata_clause
 from polar.kit.pagination import PaginationParams
+from polar.kit.search import get_search_clause
 from polar.kit.sorting import Sorting
 from polar.kit.time_queries import TimeInterval, get_timestamp_series_cte
+from polar.kit.utils import utc_now
 from polar.models import BillingEntry, Event, Meter, SubscriptionProductPrice
+from polar.models.meter import MeterMatchMaterialization
 from polar.models.subscription import Subscription
 from polar.organization.resolver import get_payload_organization
 from polar.postgres import AsyncSession
 from polar.subscription.repository import SubscriptionProductPriceRepository
 from polar.worker import enqueue_job
 
+from .matcher import meter_matcher
 from .repository import MeterRepository
 from .schemas import MeterCreate, MeterQuantities, MeterQuantity, MeterUpdate
 from .sorting import MeterSortProperty
 
 
+MATCH_BACKFILL_BATCH_SIZE = 5_000
+"""Number of events scanned by a job of the match backfill."""
+
+
 class MeterService:
     async def list(
         self,
@@ -58,7 +66,7 @@ class MeterService:
             statement = statement.where(Meter.organization_id.in_(organization_id))
 
         if query is not None:
-            statement = statement.where(Meter.name.ilike(f"%{query}%"))
+            statement = statement.where(get_search_clause(query, Meter.name))
 
         if metadata is not None:
             statement = apply_metadata_clause(Meter, statement, metadata)
@@ -161,8 +169,87 @@ class MeterService:
         if meter_update.aggregation is not None:
             update_dict["aggregation"] = meter_update.aggregation
 
+        # The materialized match was computed with the previous definition
+        if meter.match_materialization is not None and (
+            "filter" in update_dict or "aggregation" in update_dict
+        ):
+            await self.materialize_match(session, meter)
+            meter_matcher.invalidate(meter.id)
+
         return await repository.update(meter, update_dict=update_dict)
 
+    async def materialize_match(self, session: AsyncSession, meter: Meter) -> None:
+        """
+        Materialize the events matching the meter in `event_meters`,
+        so its queries don't evaluate its filter on each event.
+
+        It's opt-in, for the meters whose filter is expensive to evaluate:
+        see `scripts/meter_match_materialization.py`.
+
+        Events ingested from now on are tagged at ingestion;
+        past events are tagged in the background, by `backfill_match`.
+        """
+        repository = MeterRepository.from_session(session)
+        # Ingestions lock the meters they tag events for: wait for the ones
+        # which haven't seen the materialization, and make the next ones wait for it.
+        # Also waits for a backfill batch in progress, so it doesn't tag stale matches.
+        await repository.lock(meter)
+
+        event_meter_repository = EventMeterRepository.from_session(session)
+        await event_meter_repository.delete_by_meter(meter.id)
+
+        materialized_at = utc_now()
+        meter.match_materialization = MeterMatchMaterialization.backfilling
+        meter.match_materialized_at = materialized_at
+        session.add(meter)
+
+        enqueue_job("meter.backfill_match", meter.id, materialized_at.isoformat())
+
+    async def backfill_match(
+        self,
+        session: AsyncSession,
+        meter: Meter,
+        materialized_at: datetime,
+        after: tuple[datetime, uuid.UUID] | None = None,
+    ) -> None:
+        """
+        Tag a batch of the past events matching the meter, then enqueue
+        the next batch from its last event, or mark the match as ready.
+
+        Each batch is committed on its own, so the meter isn't locked
+        for the whole backfill.
+        """
+        # Stop if the match has been materialized again since:
+        # the backfill of the new materialization takes over.
+        if (
+            meter.match_materialization != MeterMatchMaterialization.backfilling
+            or meter.match_materialized_at != materialized_at
+        ):
+            return
+
+        repository = MeterRepository.from_session(session)
+        # Don't block ingestions, but block a concurrent re-materialization
+        await repository.lock(meter, no_key=True)
+
+        # Events ingested after the materialization are tagged at ingestion
+        event_meter_repository = EventMeterRepository.from_session(session)
+        last = await event_meter_repository.tag_ingested_batch(
+            meter, until=materialized_at, after=after, limit=MATCH_BACKFILL_BATCH_SIZE
+        )
+        if last is not None:
+            last_ingested_at, last_id = last
+            enqueue_job(
+                "meter.backfill_match",
+                meter.id,
+                materialized_at.isoformat(),
+                last_ingested_at.isoformat(),
+                last_id,
+            )
+            return
+
+        meter.match_materialization = MeterMatchMaterialization.ready
+        session.add(meter)
+
     async def events(
         self,
         session: AsyncSession,
@@ -212,6 +299,12 @@ class MeterService:
         if metadata is not None:
             event_clauses.append(get_metadata_clause(Event, metadata))
         event_clauses.append(event_repository.get_meter_clause(meter))
+        # Only scan the partitions of the events in the window
+        event_clauses.append(
+            event_repository.get_ingested_since_clause(
+                interval.sql_date_trunc(start_timestamp)
+            )
+        )
 
         statement = (
             select(
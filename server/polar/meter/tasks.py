@@ -1,4 +1,5 @@
 import uuid
+from datetime import datetime
 
 from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.orm import joinedload
@@ -41,3 +42,37 @@ async def meter_billing_entries(meter_id: uuid.UUID) -> None:
             raise MeterDoesNotExist(meter_id)
 
         await meter_service.create_billing_entries(session, meter)
+
+
+@actor(actor_name="meter.materialize_match", priority=TaskPriority.LOW)
+async def meter_materialize_match(meter_id: uuid.UUID) -> None:
+    async with AsyncSessionMaker() as session:
+        repository = MeterRepository.from_session(session)
+        meter = await repository.get_by_id(meter_id)
+        if meter is None:
+            raise MeterDoesNotExist(meter_id)
+
+        await meter_service.materialize_match(session, meter)
+
+
+@actor(actor_name="meter.backfill_match", priority=TaskPriority.LOW)
+async def meter_backfill_match(
+    meter_id: uuid.UUID,
+    materialized_at: str,
+    after_ingested_at: str | None = None,
+    after_id: uuid.UUID | None = None,
+) -> None:
+    async with AsyncSessionMaker() as session:
+        repository = MeterRepository.from_session(session)
+        meter = await repository.get_by_id(meter_id)
+        if meter is None:
+            raise MeterDoesNotExist(meter_id)
+
+        after = (
+            (datetime.fromisoformat(after_ingested_at), uuid.UUID(str(after_id)))
+            if after_ingested_at is not None and after_id is not None
+            else None
+        )
+        await meter_service.backfill_match(
+            session, meter, datetime.fromisoformat(materialized_at), after
+        )
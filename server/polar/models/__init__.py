@@ -14,12 +14,15 @@ from .customer import Customer
 from .customer_meter import CustomerMeter
 from .customer_session import CustomerSession
 from .customer_session_code import CustomerSessionCode
+from .customer_state_snapshot import CustomerStateSnapshot
 from .discount import Discount
 from .discount_product import DiscountProduct
 from .discount_redemption import DiscountRedemption
 from .downloadable import Downloadable
 from .email_verification import EmailVerification
 from .event import Event
+from .event_meter import EventMeter
+from .event_name import EventName
 from .external_event import ExternalEvent
 from .file import File
 from .held_balance import HeldBalance
@@ -63,6 +66,7 @@ from .subscription import Subscription
 from .subscription_meter import SubscriptionMeter
 from .subscription_product_price import SubscriptionProductPrice
 from .transaction import Transaction
+from .transaction_balance_snapshot import TransactionBalanceSnapshot
 from .user import OAuthAccount, User
 from .user_notification import UserNotification
 from .user_organization import UserOrganization
@@ -87,6 +91,7 @@ __all__ = [
     "CustomerMeter",
     "CustomerSession",
     "CustomerSessionCode",
+    "CustomerStateSnapshot",
     "CustomField",
     "Discount",
     "DiscountProduct",
@@ -94,6 +99,8 @@ __all__ = [
     "Downloadable",
     "EmailVerification",
     "Event",
+    "EventMeter",
+    "EventName",
     "ExternalEvent",
     "File",
     "HeldBalance",
@@ -136,6 +143,7 @@ __all__ = [
     "SubscriptionMeter",
     "SubscriptionProductPrice",
     "Transaction",
+    "TransactionBalanceSnapshot",
     "User",
     "UserNotification",
     "UserOrganization",
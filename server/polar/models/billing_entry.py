@@ -46,9 +46,10 @@ class BillingEntry(RecordModel):
     subscription_id: Mapped[UUID | None] = mapped_column(
         Uuid, ForeignKey("subscriptions.id", ondelete="cascade"), nullable=True
     )
-    event_id: Mapped[UUID] = mapped_column(
-        Uuid, ForeignKey("events.id", ondelete="cascade"), nullable=False
-    )
+    # Not a foreign key: `events` is partitioned, so its primary key includes
+    # `ingested_at`, and `id` alone can't be referenced.
+    # A trigger on `events` deletes the entries of deleted events instead.
+    event_id: Mapped[UUID] = mapped_column(Uuid, nullable=False, index=True)
     order_item_id: Mapped[UUID | None] = mapped_column(
         Uuid, ForeignKey("order_items.id", ondelete="cascade"), nullable=True
     )
@@ -67,7 +68,12 @@ class BillingEntry(RecordModel):
 
     @declared_attr
     def event(cls) -> Mapped["Event"]:
-        return relationship("Event", lazy="raise_on_sql")
+        return relationship(
+            "Event",
+            primaryjoin="BillingEntry.event_id == Event.id",
+            foreign_keys="BillingEntry.event_id",
+            lazy="raise_on_sql",
+        )
 
     @declared_attr
     def order_item(cls) -> Mapped["OrderItem | None"]:
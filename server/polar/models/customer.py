@@ -14,13 +14,15 @@ from sqlalchemy import (
     UniqueConstraint,
     Uuid,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, declared_attr, mapped_column, relationship
 
 from polar.kit.address import Address, AddressType
 from polar.kit.db.models import RecordModel
-from polar.kit.metadata import MetadataMixin
+from polar.kit.metadata import MetadataMixin, get_metadata_index
+from polar.kit.search import get_trigram_index
 from polar.kit.tax import TaxID, TaxIDType
 
 if TYPE_CHECKING:
@@ -86,6 +88,14 @@ class Customer(MetadataMixin, RecordModel):
             postgresql_nulls_not_distinct=True,
         ),
         UniqueConstraint("organization_id", "external_id"),
+        get_metadata_index("customers"),
+        get_trigram_index("customers", "email"),
+        get_trigram_index("customers", "name"),
+        Index(
+            "ix_customers_email_domain",
+            "organization_id",
+            text("lower(split_part(email, '@', 2)) text_pattern_ops"),
+        ),
     )
 
     external_id: Mapped[str | None] = mapped_column(String, nullable=True, default=None)
@@ -26,8 +26,9 @@ class CustomerMeter(RecordModel):
     meter_id: Mapped[UUID] = mapped_column(
         Uuid, ForeignKey("meters.id", ondelete="cascade"), index=True
     )
+    # Not a foreign key, since `events` is partitioned
     last_balanced_event_id: Mapped[UUID | None] = mapped_column(
-        Uuid, ForeignKey("events.id"), nullable=True, index=True, default=None
+        Uuid, nullable=True, index=True, default=None
     )
     consumed_units: Mapped[Decimal] = mapped_column(
         Numeric, nullable=False, default=0, index=True
@@ -49,7 +50,12 @@ class CustomerMeter(RecordModel):
 
     @declared_attr
     def last_balanced_event(cls) -> Mapped["Event | None"]:
-        return relationship("Event", lazy="raise_on_sql")
+        return relationship(
+            "Event",
+            primaryjoin="CustomerMeter.last_balanced_event_id == Event.id",
+            foreign_keys="CustomerMeter.last_balanced_event_id",
+            lazy="raise_on_sql",
+        )
 
     organization: AssociationProxy["Organization"] = association_proxy(
         "customer", "organization"
@@ -0,0 +1,37 @@
+from datetime import datetime
+from enum import StrEnum
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import TIMESTAMP, BigInteger, ForeignKey, Uuid
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from polar.kit.db.models import Model
+
+
+class CustomerStateSection(StrEnum):
+    active_subscriptions = "active_subscriptions"
+    granted_benefits = "granted_benefits"
+    active_meters = "active_meters"
+
+
+class CustomerStateSnapshot(Model):
+    """
+    Projection of a customer state, as exposed by the API and webhooks.
+
+    It's updated section by section when subscriptions, benefit grants or meters
+    of the customer change. `version` is bumped each time the state changes.
+    `updated_at` is the time of the last refresh of all the sections.
+    """
+
+    __tablename__ = "customer_state_snapshots"
+
+    customer_id: Mapped[UUID] = mapped_column(
+        Uuid, ForeignKey("customers.id", ondelete="cascade"), primary_key=True
+    )
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    state: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING, Any, cast
 from uuid import UUID
 
 from sqlalchemy import (
+    DDL,
     TIMESTAMP,
     BigInteger,
     ColumnElement,
@@ -11,6 +12,7 @@ from sqlalchemy import (
     String,
     Uuid,
     and_,
+    event,
     exists,
     extract,
     or_,
@@ -30,7 +32,7 @@ from sqlalchemy.orm import (
 from sqlalchemy.sql.elements import BinaryExpression
 
 from polar.kit.db.models import Model
-from polar.kit.metadata import MetadataMixin
+from polar.kit.metadata import MetadataMixin, get_metadata_index
 from polar.kit.utils import generate_uuid, utc_now
 
 from .customer import Customer
@@ -97,11 +99,26 @@ class CustomerComparator(Relationship.Comparator[Customer]):
 
 
 class Event(Model, MetadataMixin):
+    """
+    An event, in a table partitioned by month of `ingested_at`.
+
+    Queries should bound `ingested_at` whenever they can,
+    so Postgres only scans the relevant partitions.
+    """
+
     __tablename__ = "events"
+    __table_args__ = (
+        get_metadata_index("events"),
+        {"postgresql_partition_by": "RANGE (ingested_at)"},
+    )
 
     id: Mapped[UUID] = mapped_column(Uuid, primary_key=True, default=generate_uuid)
     ingested_at: Mapped[datetime.datetime] = mapped_column(
-        TIMESTAMP(timezone=True), nullable=False, default=utc_now, index=True
+        TIMESTAMP(timezone=True),
+        primary_key=True,
+        nullable=False,
+        default=utc_now,
+        index=True,
     )
     timestamp: Mapped[datetime.datetime] = mapped_column(
         TIMESTAMP(timezone=True), nullable=False, default=utc_now, index=True
@@ -168,3 +185,41 @@ class Event(Model, MetadataMixin):
         "name": (str, name),
         "source": (str, source),
     }
+
+
+# Partitions are managed by migrations and maintenance jobs;
+# when the schema is created from the models, e.g. in tests,
+# catch all the events in a default partition.
+event.listen(
+    Event.__table__,
+    "after_create",
+    DDL("CREATE TABLE events_default PARTITION OF events DEFAULT"),
+)
+
+# `billing_entry.event_id` can't reference `events`, see `BillingEntry.event_id`:
+# delete the billing entries of deleted events like `ON DELETE CASCADE` would.
+event.listen(
+    Event.__table__,
+    "after_create",
+    DDL(
+        """
+        CREATE FUNCTION events_delete_billing_entries() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM billing_entry WHERE event_id = OLD.id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ),
+)
+event.listen(
+    Event.__table__,
+    "after_create",
+    DDL(
+        """
+        CREATE TRIGGER events_delete_billing_entries
+        AFTER DELETE ON events
+        FOR EACH ROW EXECUTE FUNCTION events_delete_billing_entries()
+        """
+    ),
+)
@@ -0,0 +1,28 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import TIMESTAMP, ForeignKey, Uuid
+from sqlalchemy.orm import Mapped, mapped_column
+
+from polar.kit.db.models import Model
+
+
+class EventMeter(Model):
+    """
+    Association between an event and a meter it matches.
+
+    It's only maintained for the meters with a materialized match,
+    so their queries don't evaluate the meter filter on each event.
+    """
+
+    __tablename__ = "event_meters"
+
+    meter_id: Mapped[UUID] = mapped_column(
+        Uuid, ForeignKey("meters.id", ondelete="cascade"), primary_key=True
+    )
+    # Copied from the event, so the events of a meter can be bounded in time
+    ingested_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), primary_key=True
+    )
+    # Not a foreign key, since `events` is partitioned
+    event_id: Mapped[UUID] = mapped_column(Uuid, primary_key=True)
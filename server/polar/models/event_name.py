@@ -0,0 +1,42 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import TIMESTAMP, BigInteger, ForeignKey, Index, String, Uuid
+from sqlalchemy.orm import Mapped, mapped_column
+
+from polar.kit.db.models import Model
+from polar.kit.search import get_trigram_index
+
+from .event import EventSource
+
+
+class EventName(Model):
+    """
+    Catalog of the event names of an organization, with their statistics.
+
+    It's maintained when events are ingested,
+    so listing the names doesn't aggregate the events.
+    """
+
+    __tablename__ = "event_names"
+    __table_args__ = (
+        Index(
+            "ix_event_names_organization_id_last_seen", "organization_id", "last_seen"
+        ),
+        get_trigram_index("event_names", "name"),
+    )
+
+    organization_id: Mapped[UUID] = mapped_column(
+        Uuid,
+        ForeignKey("organizations.id", ondelete="cascade"),
+        primary_key=True,
+    )
+    name: Mapped[str] = mapped_column(String(128), primary_key=True)
+    source: Mapped[EventSource] = mapped_column(String, primary_key=True)
+    occurrences: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    first_seen: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+    last_seen: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
@@ -7,8 +7,11 @@ from sqlalchemy import (
     TIMESTAMP,
     Boolean,
     ColumnElement,
+    Index,
+    Integer,
     String,
     UniqueConstraint,
+    text,
     type_coerce,
 )
 from sqlalchemy.dialects.postgresql import JSONB
@@ -25,7 +28,15 @@ class ExternalEventSource(StrEnum):
 
 class ExternalEvent(RecordModel):
     __tablename__ = "external_events"
-    __table_args__ = (UniqueConstraint("source", "external_id"),)
+    __table_args__ = (
+        UniqueConstraint("source", "external_id"),
+        Index(
+            "ix_external_events_source_lane_pending",
+            "source",
+            "lane",
+            postgresql_where=text("handled_at IS NULL AND lane IS NOT NULL"),
+        ),
+    )
 
     source: Mapped[ExternalEventSource] = mapped_column(
         StrEnumType(ExternalEventSource), nullable=False, index=True
@@ -36,6 +47,11 @@ class ExternalEvent(RecordModel):
     task_name: Mapped[str] = mapped_column(String, nullable=False, index=True)
     external_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
     data: Mapped[dict[str, Any]] = mapped_column("data", JSONB, nullable=False)
+    lane: Mapped[int | None] = mapped_column(Integer, nullable=True, default=None)
+    """
+    Processing lane of the event, when processed in order with the other events
+    of the same lane rather than as an independent job.
+    """
 
     @hybrid_property
     def is_handled(self) -> bool:
@@ -70,6 +70,14 @@ class LicenseKey(RecordModel):
 
     limit_activations: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
+    activations_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    """
+    Denormalized number of active activations.
+
+    Maintained atomically by `LicenseKeyRepository` so activation limits
+    can be enforced without counting `LicenseKeyActivation` rows.
+    """
+
     @declared_attr
     def all_activations(cls) -> Mapped[list["LicenseKeyActivation"]]:
         return relationship(
@@ -1,11 +1,14 @@
+from datetime import datetime
+from enum import StrEnum
 from typing import TYPE_CHECKING
 from uuid import UUID
 
-from sqlalchemy import ForeignKey, String, Uuid
+from sqlalchemy import TIMESTAMP, ForeignKey, String, Uuid
 from sqlalchemy.orm import Mapped, declared_attr, mapped_column, relationship
 
 from polar.kit.db.models.base import RecordModel
 from polar.kit.metadata import MetadataMixin
+from polar.kit.search import get_trigram_index
 from polar.meter.aggregation import Aggregation, AggregationType
 from polar.meter.filter import Filter, FilterType
 
@@ -14,19 +17,49 @@ if TYPE_CHECKING:
     from .organization import Organization
 
 
+class MeterMatchMaterialization(StrEnum):
+    backfilling = "backfilling"
+    """Events are tagged at ingestion; past events are being tagged."""
+    ready = "ready"
+    """All the matching events are tagged."""
+
+
 class Meter(RecordModel, MetadataMixin):
     __tablename__ = "meters"
+    __table_args__ = (get_trigram_index("meters", "name"),)
 
     name: Mapped[str] = mapped_column(String, nullable=False)
     filter: Mapped[Filter] = mapped_column(FilterType, nullable=False)
     aggregation: Mapped[Aggregation] = mapped_column(AggregationType, nullable=False)
+    match_materialization: Mapped[MeterMatchMaterialization | None] = mapped_column(
+        String, nullable=True, default=None
+    )
+    """
+    State of the materialized match of the meter, if enabled.
+
+    When ready, the events matching the meter are read from `event_meters`,
+    instead of evaluating the meter filter on each event.
+    """
+    match_materialized_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True, default=None
+    )
+    """
+    When the match was last materialized: events ingested before are tagged
+    by the backfill, the next ones at ingestion.
+    """
+    # Not a foreign key, since `events` is partitioned
     last_billed_event_id: Mapped[UUID | None] = mapped_column(
-        Uuid, ForeignKey("events.id"), nullable=True, index=True, default=None
+        Uuid, nullable=True, index=True, default=None
     )
 
     @declared_attr
     def last_billed_event(cls) -> Mapped["Event | None"]:
-        return relationship("Event", lazy="raise_on_sql")
+        return relationship(
+            "Event",
+            primaryjoin="Meter.last_billed_event_id == Event.id",
+            foreign_keys="Meter.last_billed_event_id",
+            lazy="raise_on_sql",
+        )
 
     organization_id: Mapped[UUID] = mapped_column(
         Uuid,
@@ -38,3 +71,7 @@ class Meter(RecordModel, MetadataMixin):
     @declared_attr
     def organization(cls) -> Mapped["Organization"]:
         return relationship("Organization", lazy="raise")
+
+    @property
+    def is_match_materialized(self) -> bool:
+        return self.match_materialization == MeterMatchMaterialization.ready
@@ -21,7 +21,7 @@ from polar.custom_field.data import CustomFieldDataMixin
 from polar.exceptions import PolarError
 from polar.kit.address import Address, AddressType
 from polar.kit.db.models import RecordModel
-from polar.kit.metadata import MetadataMixin
+from polar.kit.metadata import MetadataMixin, get_metadata_index
 from polar.kit.tax import TaxabilityReason, TaxID, TaxIDType, TaxRate
 from polar.models.order_item import OrderItem
 
@@ -74,6 +74,7 @@ class Order(CustomFieldDataMixin, MetadataMixin, RecordModel):
         Index(
             "ix_total_amount", text("(subtotal_amount - discount_amount + tax_amount)")
         ),
+        get_metadata_index("orders"),
     )
 
     status: Mapped[OrderStatus] = mapped_column(
@@ -7,12 +7,14 @@ from sqlalchemy import (
     Boolean,
     ColumnElement,
     ForeignKey,
+    Index,
     String,
     Text,
     Uuid,
     case,
     or_,
     select,
+    text,
 )
 from sqlalchemy.dialects.postgresql import CITEXT
 from sqlalchemy.ext.associationproxy import AssociationProxy, association_proxy
@@ -45,6 +47,14 @@ class ProductBillingType(StrEnum):
 
 class Product(MetadataMixin, RecordModel):
     __tablename__ = "products"
+    __table_args__ = (
+        # `name` is a CITEXT, which trigram operators don't support: index its text
+        Index(
+            "ix_products_name_trigram",
+            text("(name::text) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+    )
 
     name: Mapped[str] = mapped_column(CITEXT(), nullable=False)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
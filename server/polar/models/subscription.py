@@ -24,7 +24,7 @@ from sqlalchemy.orm.attributes import OP_BULK_REPLACE, Event
 from polar.custom_field.data import CustomFieldDataMixin
 from polar.enums import SubscriptionRecurringInterval
 from polar.kit.db.models import RecordModel
-from polar.kit.metadata import MetadataMixin
+from polar.kit.metadata import MetadataMixin, get_metadata_index
 from polar.product.guard import is_metered_price
 
 from .product_price import HasPriceCurrency
@@ -100,6 +100,7 @@ class CustomerCancellationReason(StrEnum):
 
 class Subscription(CustomFieldDataMixin, MetadataMixin, RecordModel):
     __tablename__ = "subscriptions"
+    __table_args__ = (get_metadata_index("subscriptions"),)
 
     amount: Mapped[int] = mapped_column(Integer, nullable=False)
     currency: Mapped[str] = mapped_column(String(3), nullable=False)
@@ -0,0 +1,40 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import (
+    TIMESTAMP,
+    BigInteger,
+    ForeignKey,
+    String,
+    UniqueConstraint,
+    Uuid,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from polar.kit.db.models import RecordModel
+
+from .transaction import TransactionType
+
+
+class TransactionBalanceSnapshot(RecordModel):
+    """
+    Checkpoint of the balance of an account for a type of transaction.
+
+    It sums the transactions of the account created before `snapshot_at`,
+    so the current balance is the snapshot plus the transactions created after it.
+    """
+
+    __tablename__ = "transaction_balance_snapshots"
+    __table_args__ = (UniqueConstraint("account_id", "type"),)
+
+    account_id: Mapped[UUID] = mapped_column(
+        Uuid, ForeignKey("accounts.id", ondelete="cascade"), nullable=False
+    )
+    type: Mapped[TransactionType] = mapped_column(String, nullable=False)
+    snapshot_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+    amount: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    """Sum of the transactions amounts, in cents, in the Polar currency."""
+    account_amount: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    """Sum of the transactions amounts, in cents, in the account currency."""
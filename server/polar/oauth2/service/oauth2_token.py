@@ -8,7 +8,7 @@ from sqlalchemy.orm import joinedload
 
 from polar.config import settings
 from polar.email.renderer import get_email_renderer
-from polar.email.sender import enqueue_email
+from polar.email.sender import enqueue_bulk_email
 from polar.enums import TokenType
 from polar.exceptions import PolarError
 from polar.kit.crypto import get_token_hash
@@ -111,10 +111,9 @@ class OAuth2TokenService(ResourceServiceReader[OAuth2Token]):
                 },
             )
 
-            for recipient in recipients:
-                enqueue_email(
-                    to_email_addr=recipient, subject=subject, html_content=body
-                )
+            enqueue_bulk_email(
+                to_email_addrs=recipients, subject=subject, html_content=body
+            )
 
         log.info(
             "Revoke leaked access token and refresh token",
@@ -42,6 +42,7 @@ from polar.kit.tax import (
 )
 from polar.logging import Logger
 from polar.models import (
+    BillingEntry,
     Checkout,
     Customer,
     Discount,
@@ -617,6 +618,7 @@ class OrderService:
                 )
             )
 
+        pending_items: Sequence[tuple[OrderItem, Sequence[BillingEntry]]] = []
         if invoice.status == "draft":
             # Add pending billing entries
             stripe_customer_id = customer.stripe_customer_id
@@ -627,7 +629,7 @@ class OrderService:
                 stripe_invoice_id=invoice.id,
                 stripe_customer_id=stripe_customer_id,
             )
-            items.extend(pending_items)
+            items.extend(order_item for order_item, _ in pending_items)
             # Reload the invoice to get totals with added pending items
             if len(pending_items) > 0:
                 invoice = await stripe_service.get_invoice(invoice.id)
@@ -725,6 +727,10 @@ class OrderService:
             flush=True,
         )
 
+        # Link the billing entries to their order items, now they're saved
+        if pending_items:
+            await billing_entry_service.set_order_items(session, pending_items)
+
         # Reset the associated meters, if any
         for subscription_meter in subscription.meters:
             rollover_units = await customer_meter_service.get_rollover_units(
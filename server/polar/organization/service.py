@@ -8,6 +8,7 @@ from sqlalchemy.exc import IntegrityError
 
 from polar.account.service import account as account_service
 from polar.auth.models import AuthSubject
+from polar.checkout.read_model import invalidate_organization_checkouts
 from polar.exceptions import PolarError, PolarRequestValidationError
 from polar.integrations.loops.service import loops as loops_service
 from polar.kit.pagination import PaginationParams
@@ -255,6 +256,7 @@ class OrganizationService:
         session: AsyncSession,
         organization: Organization,
     ) -> None:
+        invalidate_organization_checkouts(session, organization.id)
         await webhook_service.send(
             session, organization, WebhookEventType.organization_updated, organization
         )
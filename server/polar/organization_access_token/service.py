@@ -10,7 +10,7 @@ from sqlalchemy import UnaryExpression, asc, desc
 from polar.auth.models import AuthSubject
 from polar.config import settings
 from polar.email.renderer import get_email_renderer
-from polar.email.sender import enqueue_email
+from polar.email.sender import enqueue_bulk_email
 from polar.enums import TokenType
 from polar.integrations.loops.service import loops as loops_service
 from polar.kit.crypto import generate_token_hash_pair, get_token_hash
@@ -186,12 +186,14 @@ class OrganizationAccessTokenService:
         organization_members = await user_organization_service.list_by_org(
             session, organization_access_token.organization_id
         )
-        for organization_member in organization_members:
-            enqueue_email(
-                to_email_addr=organization_member.user.email,
-                subject=subject,
-                html_content=body,
-            )
+        enqueue_bulk_email(
+            to_email_addrs=[
+                organization_member.user.email
+                for organization_member in organization_members
+            ],
+            subject=subject,
+            html_content=body,
+        )
 
         log.info(
             "Revoke leaked organization access token",
@@ -1,4 +1,4 @@
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable
 from typing import Literal, TypeAlias
 
 from fastapi import Depends, Request
@@ -17,6 +17,7 @@ from polar.kit.db.postgres import (
 from polar.kit.db.postgres import (
     create_sync_engine as _create_sync_engine,
 )
+from polar.redis import Redis
 
 ProcessName: TypeAlias = Literal["app", "worker", "script", "backoffice"]
 
@@ -41,6 +42,42 @@ def create_sync_engine(process_name: ProcessName) -> Engine:
     )
 
 
+AfterCommitCallback: TypeAlias = Callable[[Redis], Awaitable[None]]
+
+_AFTER_COMMIT_CALLBACKS_KEY = "after_commit_callbacks"
+
+
+def after_commit(session: AsyncSession, callback: AfterCommitCallback) -> None:
+    """
+    Run the callback once the transaction of the session is committed,
+    before the response is sent or the task returns.
+
+    Useful to update state living outside of the database, like Redis caches,
+    without exposing uncommitted changes. Callbacks are dropped on rollback.
+    """
+    session.info.setdefault(_AFTER_COMMIT_CALLBACKS_KEY, []).append(callback)
+
+
+async def commit_session(session: AsyncSession, redis: Redis) -> None:
+    """
+    Commit the session and run its after commit callbacks.
+    """
+    await session.commit()
+    callbacks: list[AfterCommitCallback] = session.info.pop(
+        _AFTER_COMMIT_CALLBACKS_KEY, []
+    )
+    for callback in callbacks:
+        await callback(redis)
+
+
+async def rollback_session(session: AsyncSession) -> None:
+    """
+    Rollback the session and drop its after commit callbacks.
+    """
+    session.info.pop(_AFTER_COMMIT_CALLBACKS_KEY, None)
+    await session.rollback()
+
+
 async def get_db_sessionmaker(
     request: Request,
 ) -> AsyncGenerator[AsyncSessionMaker, None]:
@@ -74,16 +111,19 @@ async def get_db_session(
                 request.state.session = session
                 yield session
             except:
-                await session.rollback()
+                await rollback_session(session)
                 raise
             else:
-                await session.commit()
+                await commit_session(session, request.state.redis)
 
 
 __all__ = [
     "AsyncEngine",
     "AsyncSession",
     "sql",
+    "after_commit",
+    "commit_session",
+    "rollback_session",
     "create_async_engine",
     "create_sync_engine",
     "get_db_session",
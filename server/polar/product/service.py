@@ -4,11 +4,12 @@ from collections.abc import Sequence
 from typing import Any, List, Literal, TypeVar  # noqa: UP035
 
 import stripe
-from sqlalchemy import UnaryExpression, asc, case, desc, func, select
+from sqlalchemy import Text, UnaryExpression, asc, case, cast, desc, func, select
 from sqlalchemy.orm import contains_eager, selectinload
 
 from polar.auth.models import AuthSubject, is_user
 from polar.benefit.service import benefit as benefit_service
+from polar.checkout.read_model import invalidate_organization_checkouts
 from polar.checkout_link.repository import CheckoutLinkRepository
 from polar.custom_field.service import custom_field as custom_field_service
 from polar.enums import SubscriptionRecurringInterval
@@ -23,6 +24,7 @@ from polar.integrations.stripe.service import stripe as stripe_service
 from polar.kit.db.postgres import AsyncSession
 from polar.kit.metadata import MetadataQuery, apply_metadata_clause
 from polar.kit.pagination import PaginationParams, paginate
+from polar.kit.search import get_search_clause
 from polar.kit.sorting import Sorting
 from polar.meter.repository import MeterRepository
 from polar.models import (
@@ -107,7 +109,9 @@ class ProductService:
             statement = statement.where(Product.organization_id.in_(organization_id))
 
         if query is not None:
-            statement = statement.where(Product.name.ilike(f"%{query}%"))
+            # Match the trigram index, built on the text of the CITEXT column
+            name_column = cast(Product.name, Text)
+            statement = statement.where(get_search_clause(query, name_column))
 
         if is_archived is not None:
             statement = statement.where(Product.is_archived.is_(is_archived))
@@ -702,6 +706,8 @@ class ProductService:
     async def _after_product_updated(
         self, session: AsyncSession, product: Product
     ) -> None:
+        # Checkouts embed the product, its prices and benefits
+        invalidate_organization_checkouts(session, product.organization_id)
         await self._send_webhook(session, product, WebhookEventType.product_updated)
 
     async def _send_webhook(
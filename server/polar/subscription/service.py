@@ -52,6 +52,7 @@ from polar.models import (
     SubscriptionProductPrice,
     User,
 )
+from polar.models.customer_state_snapshot import CustomerStateSection
 from polar.models.subscription import CustomerCancellationReason, SubscriptionStatus
 from polar.models.webhook_endpoint import WebhookEventType
 from polar.notifications.notification import (
@@ -468,6 +469,7 @@ class SubscriptionService:
             "customer.webhook",
             WebhookEventType.customer_state_changed,
             subscription.customer_id,
+            sections=[CustomerStateSection.active_subscriptions],
         )
 
     async def update(
@@ -1017,6 +1019,7 @@ class SubscriptionService:
             "customer.webhook",
             WebhookEventType.customer_state_changed,
             subscription.customer_id,
+            sections=[CustomerStateSection.active_subscriptions],
         )
 
     async def _on_subscription_updated(
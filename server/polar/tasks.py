@@ -9,6 +9,7 @@ from polar.email import tasks as email
 from polar.email_update import tasks as email_update
 from polar.event import tasks as event
 from polar.eventstream import tasks as eventstream
+from polar.external_event import tasks as external_event
 from polar.integrations.loops import tasks as loops
 from polar.integrations.stripe import tasks as stripe
 from polar.magic_link import tasks as magic_link
@@ -36,6 +37,7 @@ __all__ = [
     "email_update",
     "event",
     "eventstream",
+    "external_event",
     "loops",
     "meter",
     "stripe",
@@ -1,7 +1,9 @@
 from collections.abc import Sequence
+from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import Select
+from sqlalchemy import Select, and_, false, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import selectinload
 
 from polar.kit.repository import (
@@ -9,7 +11,8 @@ from polar.kit.repository import (
     RepositorySoftDeletionIDMixin,
     RepositorySoftDeletionMixin,
 )
-from polar.models import Order, Transaction
+from polar.kit.utils import generate_uuid, utc_now
+from polar.models import Order, Transaction, TransactionBalanceSnapshot
 from polar.models.transaction import TransactionType
 
 
@@ -99,3 +102,157 @@ class PayoutTransactionRepository(TransactionRepository):
             .get_base_statement(include_deleted=include_deleted)
             .where(Transaction.type == TransactionType.payout)
         )
+
+
+TransactionSums = dict[TransactionType, tuple[int, int]]
+"""`(amount, account_amount)` sums of transactions, by transaction type."""
+
+
+class TransactionBalanceSnapshotRepository(
+    RepositorySoftDeletionIDMixin[TransactionBalanceSnapshot, UUID],
+    RepositorySoftDeletionMixin[TransactionBalanceSnapshot],
+    RepositoryBase[TransactionBalanceSnapshot],
+):
+    model = TransactionBalanceSnapshot
+
+    async def get_all_by_account(
+        self, account_id: UUID, *, for_update: bool = False
+    ) -> Sequence[TransactionBalanceSnapshot]:
+        statement = self.get_base_statement().where(
+            TransactionBalanceSnapshot.account_id == account_id
+        )
+        if for_update:
+            statement = statement.with_for_update()
+        return await self.get_all(statement)
+
+    async def get_transactions_sums_after(
+        self,
+        account_id: UUID,
+        snapshots: Sequence[TransactionBalanceSnapshot],
+        *,
+        before: datetime | None = None,
+    ) -> TransactionSums:
+        """
+        Sum the transactions of the account not included in the snapshots yet.
+        """
+        snapshotted_types = [snapshot.type for snapshot in snapshots]
+        statement = self._get_transactions_sums_statement(account_id).where(
+            or_(
+                Transaction.type.not_in(snapshotted_types),
+                *(
+                    and_(
+                        Transaction.type == snapshot.type,
+                        Transaction.created_at >= snapshot.snapshot_at,
+                    )
+                    for snapshot in snapshots
+                ),
+            )
+        )
+        # Every type is snapshotted: bound the scan on the account's transactions
+        if set(snapshotted_types) == set(TransactionType):
+            statement = statement.where(
+                Transaction.created_at
+                >= min(snapshot.snapshot_at for snapshot in snapshots)
+            )
+        if before is not None:
+            statement = statement.where(Transaction.created_at < before)
+        return await self._get_transactions_sums(statement)
+
+    async def get_transactions_sums_before(
+        self, account_id: UUID, snapshots: Sequence[TransactionBalanceSnapshot]
+    ) -> TransactionSums:
+        """
+        Sum the transactions of the account the snapshots should include.
+        """
+        statement = self._get_transactions_sums_statement(account_id).where(
+            or_(
+                false(),
+                *(
+                    and_(
+                        Transaction.type == snapshot.type,
+                        Transaction.created_at < snapshot.snapshot_at,
+                    )
+                    for snapshot in snapshots
+                ),
+            )
+        )
+        return await self._get_transactions_sums(statement)
+
+    async def advance(
+        self,
+        snapshot: TransactionBalanceSnapshot,
+        *,
+        snapshot_at: datetime,
+        amount: int,
+        account_amount: int,
+    ) -> bool:
+        """
+        Add the amounts to the snapshot and move it to `snapshot_at`.
+
+        Returns:
+            `False` if the snapshot was concurrently moved, in which case
+            nothing is updated.
+        """
+        statement = (
+            update(TransactionBalanceSnapshot)
+            .where(
+                TransactionBalanceSnapshot.id == snapshot.id,
+                TransactionBalanceSnapshot.snapshot_at == snapshot.snapshot_at,
+            )
+            .values(
+                snapshot_at=snapshot_at,
+                amount=TransactionBalanceSnapshot.amount + amount,
+                account_amount=TransactionBalanceSnapshot.account_amount
+                + account_amount,
+                modified_at=utc_now(),
+            )
+            .returning(TransactionBalanceSnapshot.id)
+        )
+        result = await self.session.execute(statement)
+        return result.scalar_one_or_none() is not None
+
+    async def create_if_not_exists(
+        self,
+        *,
+        account_id: UUID,
+        type: TransactionType,
+        snapshot_at: datetime,
+        amount: int,
+        account_amount: int,
+    ) -> None:
+        statement = (
+            insert(TransactionBalanceSnapshot)
+            .values(
+                id=generate_uuid(),
+                created_at=utc_now(),
+                account_id=account_id,
+                type=type,
+                snapshot_at=snapshot_at,
+                amount=amount,
+                account_amount=account_amount,
+            )
+            .on_conflict_do_nothing(index_elements=["account_id", "type"])
+        )
+        await self.session.execute(statement)
+
+    def _get_transactions_sums_statement(
+        self, account_id: UUID
+    ) -> Select[tuple[TransactionType, int, int]]:
+        return (
+            select(
+                Transaction.type,
+                func.coalesce(func.sum(Transaction.amount), 0),
+                func.coalesce(func.sum(Transaction.account_amount), 0),
+            )
+            .where(Transaction.account_id == account_id)
+            .group_by(Transaction.type)
+        )
+
+    async def _get_transactions_sums(
+        self, statement: Select[tuple[TransactionType, int, int]]
+    ) -> TransactionSums:
+        result = await self.session.execute(statement)
+        return {
+            TransactionType(type): (int(amount), int(account_amount))
+            for type, amount, account_amount in result.tuples().all()
+        }
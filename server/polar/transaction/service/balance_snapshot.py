@@ -0,0 +1,154 @@
+import uuid
+from datetime import datetime, timedelta
+
+import structlog
+
+from polar.account.repository import AccountRepository
+from polar.kit.utils import utc_now
+from polar.logging import Logger
+from polar.models import Account
+from polar.models.transaction import TransactionType
+from polar.postgres import AsyncSession
+from polar.worker import enqueue_job
+
+from ..repository import (
+    TransactionBalanceSnapshotRepository,
+    TransactionSums,
+)
+
+log: Logger = structlog.get_logger()
+
+SNAPSHOT_DELAY = timedelta(days=1)
+"""
+Only snapshot transactions older than this delay.
+
+Some transactions are created a while before they're committed, or see their
+amounts adjusted afterwards, e.g. payouts while transfers are made.
+"""
+
+
+class TransactionBalanceSnapshotService:
+    async def get_sums(
+        self, session: AsyncSession, account_id: uuid.UUID
+    ) -> TransactionSums:
+        """
+        Sum the transactions of the account, by type,
+        from the snapshots plus the transactions created after them.
+        """
+        repository = TransactionBalanceSnapshotRepository.from_session(session)
+        snapshots = await repository.get_all_by_account(account_id)
+        sums = await repository.get_transactions_sums_after(account_id, snapshots)
+        for snapshot in snapshots:
+            amount, account_amount = sums.get(snapshot.type, (0, 0))
+            sums[snapshot.type] = (
+                snapshot.amount + amount,
+                snapshot.account_amount + account_amount,
+            )
+        return sums
+
+    async def enqueue_snapshots(self, session: AsyncSession) -> None:
+        await self._enqueue_for_accounts(session, "transaction.snapshot_balance")
+
+    async def enqueue_checks(self, session: AsyncSession) -> None:
+        await self._enqueue_for_accounts(session, "transaction.check_balance_snapshot")
+
+    async def snapshot(
+        self,
+        session: AsyncSession,
+        account_id: uuid.UUID,
+        *,
+        snapshot_at: datetime | None = None,
+    ) -> None:
+        """
+        Move the snapshots of the account forward,
+        adding the transactions created since the previous ones.
+        """
+        if snapshot_at is None:
+            snapshot_at = utc_now() - SNAPSHOT_DELAY
+
+        repository = TransactionBalanceSnapshotRepository.from_session(session)
+        snapshots = {
+            snapshot.type: snapshot
+            for snapshot in await repository.get_all_by_account(account_id)
+        }
+        sums = await repository.get_transactions_sums_after(
+            account_id, list(snapshots.values()), before=snapshot_at
+        )
+
+        # Snapshot every type, even without transactions,
+        # so balance queries can bound their scan by the snapshots date
+        for type in TransactionType:
+            amount, account_amount = sums.get(type, (0, 0))
+            snapshot = snapshots.get(type)
+            if snapshot is None:
+                await repository.create_if_not_exists(
+                    account_id=account_id,
+                    type=type,
+                    snapshot_at=snapshot_at,
+                    amount=amount,
+                    account_amount=account_amount,
+                )
+            elif snapshot.snapshot_at < snapshot_at:
+                advanced = await repository.advance(
+                    snapshot,
+                    snapshot_at=snapshot_at,
+                    amount=amount,
+                    account_amount=account_amount,
+                )
+                if not advanced:
+                    log.info(
+                        "transaction.balance_snapshot.concurrent_update",
+                        account_id=account_id,
+                        type=type,
+                    )
+
+    async def check(self, session: AsyncSession, account_id: uuid.UUID) -> bool:
+        """
+        Verify the snapshots of the account match the sums of its transactions.
+
+        Mismatching snapshots are logged and reset to the actual sums.
+
+        Returns:
+            Whether all the snapshots were consistent.
+        """
+        repository = TransactionBalanceSnapshotRepository.from_session(session)
+        # Lock the snapshots, so they're not moved while we check and fix them
+        snapshots = await repository.get_all_by_account(account_id, for_update=True)
+        sums = await repository.get_transactions_sums_before(account_id, snapshots)
+
+        consistent = True
+        for snapshot in snapshots:
+            amount, account_amount = sums.get(snapshot.type, (0, 0))
+            if (snapshot.amount, snapshot.account_amount) == (amount, account_amount):
+                continue
+
+            consistent = False
+            log.error(
+                "transaction.balance_snapshot.mismatch",
+                account_id=account_id,
+                type=snapshot.type,
+                snapshot_at=snapshot.snapshot_at,
+                snapshot_amount=snapshot.amount,
+                snapshot_account_amount=snapshot.account_amount,
+                amount=amount,
+                account_amount=account_amount,
+            )
+            await repository.update(
+                snapshot,
+                update_dict={"amount": amount, "account_amount": account_amount},
+            )
+
+        return consistent
+
+    async def _enqueue_for_accounts(
+        self, session: AsyncSession, actor_name: str
+    ) -> None:
+        account_repository = AccountRepository.from_session(session)
+        statement = account_repository.get_base_statement().order_by(
+            Account.created_at.asc()
+        )
+        async for account in account_repository.stream(statement):
+            enqueue_job(actor_name, account.id)
+
+
+transaction_balance_snapshot = TransactionBalanceSnapshotService()
@@ -1,9 +1,13 @@
-from collections.abc import Iterable
+import asyncio
+import itertools
+import time
+from collections.abc import Iterable, Sequence
 from typing import cast
 
 import stripe as stripe_lib
 import structlog
 
+from polar.config import settings
 from polar.enums import AccountType
 from polar.integrations.stripe.service import stripe as stripe_service
 from polar.integrations.stripe.utils import get_expandable_id
@@ -171,76 +175,179 @@ class PayoutTransactionService(BaseTransactionService):
             transaction.account_amount = 0
 
         # Make individual transfers with the payment transaction as source
+        executor = PayoutTransferExecutor(session, account, payout, transaction)
+        transaction.account_amount -= await executor.execute(transfers)
+
+        return transaction
+
+
+class PayoutTransferExecutor:
+    """
+    Make the Stripe transfers of a payout.
+
+    Transfers are made concurrently, within a client-side rate limit.
+    Their IDs are committed after each chunk of transfers, so a crashed run
+    can be resumed: balance transactions already transferred are skipped.
+    Transfers are created with an idempotency key derived from the balance
+    transaction ID only, so retrying one we made but didn't commit yet returns
+    the existing transfer instead of making a new one, even from another payout.
+    The payout is attached to the transfer metadata afterwards.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        account: Account,
+        payout: Payout,
+        transaction: Transaction,
+        *,
+        concurrency: int = settings.ACCOUNT_PAYOUT_TRANSFERS_CONCURRENCY,
+        rate_limit: float = settings.ACCOUNT_PAYOUT_TRANSFERS_RATE_LIMIT,
+    ) -> None:
         assert account.stripe_id is not None
-        for source_transaction, amount, balance_transaction in transfers:
-            if balance_transaction.transfer_id is None:
-                stripe_transfer = await stripe_service.transfer(
-                    account.stripe_id,
-                    amount,
-                    source_transaction=source_transaction,
-                    metadata={
-                        "payout_id": str(payout.id),
-                        "payout_transaction_id": str(transaction.id),
-                    },
-                )
-                balance_transaction.transfer_id = stripe_transfer.id
+        self.session = session
+        self.account = account
+        self.stripe_id = account.stripe_id
+        self.payout = payout
+        self.transaction = transaction
+        self.concurrency = concurrency
+        self._interval = 1.0 / rate_limit
+        self._next_at = 0.0
+
+    async def execute(self, transfers: Sequence[tuple[str, int, Transaction]]) -> int:
+        """
+        Make the transfers.
 
-                # Immediately commit the transfer_id: it's now effective in Stripe,
-                # we don't want to lose it
-                session.add(balance_transaction)
-                await session.commit()
-            # Case where the transfer has already been made
-            # Legacy behavior from the time when we automatically
-            # transferred each balance
-            else:
-                stripe_transfer = await stripe_service.get_transfer(
-                    balance_transaction.transfer_id
-                )
-                await stripe_service.update_transfer(
-                    stripe_transfer.id,
-                    metadata={
-                        "payout_id": str(payout.id),
-                        "payout_transaction_id": str(transaction.id),
-                    },
-                )
+        Returns:
+            The transferred amount converted in the account currency,
+            if it's different from the transaction currency. Otherwise, 0.
+        """
+        start = time.monotonic()
+        account_amount = 0
+        done = 0
+        for chunk in itertools.batched(transfers, self.concurrency):
+            results = await asyncio.gather(
+                *(self._transfer(*transfer) for transfer in chunk),
+                return_exceptions=True,
+            )
 
-            # Different source and destination currencies: get the converted amount
-            if transaction.currency != transaction.account_currency:
-                assert stripe_transfer.destination_payment is not None
-                stripe_destination_charge = await stripe_service.get_charge(
-                    get_expandable_id(stripe_transfer.destination_payment),
-                    stripe_account=account.stripe_id,
-                    expand=["balance_transaction"],
+            # Checkpoint the transfers which succeeded before raising any error
+            errors: list[BaseException] = []
+            for (_, _, balance_transaction), result in zip(chunk, results):
+                if isinstance(result, BaseException):
+                    errors.append(result)
+                    continue
+                stripe_transfer, converted_amount = result
+                balance_transaction.transfer_id = stripe_transfer.id
+                self.session.add(balance_transaction)
+                account_amount += converted_amount
+                done += 1
+            await self.session.commit()
+
+            if errors:
+                log.error(
+                    "payout.transfers.failed",
+                    payout_id=str(self.payout.id),
+                    account_id=str(self.account.id),
+                    done=done,
+                    failed=len(errors),
+                    total=len(transfers),
                 )
+                raise errors[0]
 
-                # Case where the charge don't lead to a balance transaction,
-                # e.g. when the converted amount is 0
-                if stripe_destination_charge.balance_transaction is None:
-                    balance_transaction_amount = 0
-                else:
-                    stripe_destination_balance_transaction = cast(
-                        stripe_lib.BalanceTransaction,
-                        stripe_destination_charge.balance_transaction,
-                    )
-                    balance_transaction_amount = (
-                        stripe_destination_balance_transaction.amount
-                    )
-
-                transaction.account_amount -= balance_transaction_amount
-
-                log.info(
-                    (
-                        "Source and destination currency don't match. "
-                        "A conversion has been done by Stripe."
-                    ),
-                    source_currency=transaction.currency,
-                    destination_currency=transaction.account_currency,
-                    source_amount=amount,
-                    destination_amount=balance_transaction_amount,
-                    account_id=str(account.id),
-                )
+            log.info(
+                "payout.transfers.progress",
+                payout_id=str(self.payout.id),
+                done=done,
+                total=len(transfers),
+            )
 
-        return transaction
+        duration = time.monotonic() - start
+        log.info(
+            "payout.transfers.done",
+            payout_id=str(self.payout.id),
+            account_id=str(self.account.id),
+            count=done,
+            duration=duration,
+            throughput=done / duration if duration > 0 else None,
+        )
+        return account_amount
+
+    async def _transfer(
+        self, source_transaction: str, amount: int, balance_transaction: Transaction
+    ) -> tuple[stripe_lib.Transfer, int]:
+        await self._wait_rate_limit()
+        if balance_transaction.transfer_id is None:
+            # The request must be the same on each retry for the idempotency key
+            # to apply, so it can't include the payout, which may be a new one
+            stripe_transfer = await stripe_service.transfer(
+                self.stripe_id,
+                amount,
+                source_transaction=source_transaction,
+                metadata={"balance_transaction_id": str(balance_transaction.id)},
+                idempotency_key=f"payout_transfer_{balance_transaction.id}",
+            )
+        # Case where the transfer has already been made
+        # Legacy behavior from the time when we automatically
+        # transferred each balance
+        else:
+            stripe_transfer = await stripe_service.get_transfer(
+                balance_transaction.transfer_id
+            )
+
+        payout_metadata = {
+            "payout_id": str(self.payout.id),
+            "payout_transaction_id": str(self.transaction.id),
+        }
+        # Skip the call when a previous attempt already tagged the transfer
+        transfer_metadata = stripe_transfer.metadata or {}
+        if any(transfer_metadata.get(k) != v for k, v in payout_metadata.items()):
+            await stripe_service.update_transfer(
+                stripe_transfer.id, metadata=payout_metadata
+            )
+
+        # Different source and destination currencies: get the converted amount
+        if self.transaction.currency == self.transaction.account_currency:
+            return stripe_transfer, 0
+
+        assert stripe_transfer.destination_payment is not None
+        stripe_destination_charge = await stripe_service.get_charge(
+            get_expandable_id(stripe_transfer.destination_payment),
+            stripe_account=self.stripe_id,
+            expand=["balance_transaction"],
+        )
+
+        # Case where the charge don't lead to a balance transaction,
+        # e.g. when the converted amount is 0
+        if stripe_destination_charge.balance_transaction is None:
+            balance_transaction_amount = 0
+        else:
+            stripe_destination_balance_transaction = cast(
+                stripe_lib.BalanceTransaction,
+                stripe_destination_charge.balance_transaction,
+            )
+            balance_transaction_amount = stripe_destination_balance_transaction.amount
+
+        log.info(
+            (
+                "Source and destination currency don't match. "
+                "A conversion has been done by Stripe."
+            ),
+            source_currency=self.transaction.currency,
+            destination_currency=self.transaction.account_currency,
+            source_amount=amount,
+            destination_amount=balance_transaction_amount,
+            account_id=str(self.account.id),
+        )
+        return stripe_transfer, balance_transaction_amount
+
+    async def _wait_rate_limit(self) -> None:
+        # Reserve the next slot before sleeping, so concurrent transfers are spaced
+        now = time.monotonic()
+        start_at = max(now, self._next_at)
+        self._next_at = start_at + self._interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
 
 
 payout_transaction = PayoutTransactionService(Transaction)
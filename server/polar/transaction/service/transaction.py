@@ -1,10 +1,9 @@
 import uuid
 from collections.abc import Sequence
 from enum import StrEnum
-from typing import Any, cast
+from typing import Any
 
 from sqlalchemy import Select, UnaryExpression, asc, desc, func, or_, select
-from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import aliased, joinedload, subqueryload
 
 from polar.exceptions import ResourceNotFound
@@ -26,6 +25,9 @@ from ..schemas import (
     TransactionsBalance,
     TransactionsSummary,
 )
+from .balance_snapshot import (
+    transaction_balance_snapshot as transaction_balance_snapshot_service,
+)
 from .base import BaseTransactionService
 
 
@@ -144,47 +146,15 @@ class TransactionService(BaseTransactionService):
     async def get_summary(
         self, session: AsyncSession, account: Account
     ) -> TransactionsSummary:
-        statement = select(
-            cast(type[int], func.coalesce(func.sum(Transaction.amount), 0)),
-            cast(type[int], func.coalesce(func.sum(Transaction.account_amount), 0)),
-            cast(
-                type[int],
-                func.coalesce(
-                    func.sum(Transaction.amount).filter(
-                        Transaction.type == TransactionType.payout
-                    ),
-                    0,
-                ),
-            ),
-            cast(
-                type[int],
-                func.coalesce(
-                    func.sum(Transaction.account_amount).filter(
-                        Transaction.type == TransactionType.payout
-                    ),
-                    0,
-                ),
-            ),
-        ).where(Transaction.account_id == account.id)
-
-        result = await session.execute(statement)
+        sums = await transaction_balance_snapshot_service.get_sums(session, account.id)
 
         currency = "usd"  # FIXME: Main Polar currency
         account_currency = account.currency
         assert account_currency is not None
 
-        try:
-            (
-                amount,
-                account_amount,
-                payout_amount,
-                account_payout_amount,
-            ) = result.one()._tuple()
-        except NoResultFound:
-            amount = 0
-            account_amount = 0
-            payout_amount = 0
-            account_payout_amount = 0
+        amount = sum(amount for amount, _ in sums.values())
+        account_amount = sum(account_amount for _, account_amount in sums.values())
+        payout_amount, account_payout_amount = sums.get(TransactionType.payout, (0, 0))
 
         return TransactionsSummary(
             balance=TransactionsBalance(
@@ -208,15 +178,20 @@ class TransactionService(BaseTransactionService):
         *,
         type: TransactionType | None = None,
     ) -> int:
-        statement = select(func.coalesce(func.sum(Transaction.amount), 0)).where(
-            Transaction.account_id == account_id
-        )
+        # Transactions concerning Polar directly are not snapshotted
+        if account_id is None:
+            statement = select(func.coalesce(func.sum(Transaction.amount), 0)).where(
+                Transaction.account_id.is_(None)
+            )
+            if type is not None:
+                statement = statement.where(Transaction.type == type)
+            result = await session.execute(statement)
+            return int(result.scalar_one())
 
+        sums = await transaction_balance_snapshot_service.get_sums(session, account_id)
         if type is not None:
-            statement = statement.where(Transaction.type == type)
-
-        result = await session.execute(statement)
-        return int(result.scalar_one())
+            return sums.get(type, (0, 0))[0]
+        return sum(amount for amount, _ in sums.values())
 
     def _get_readable_transactions_statement(self, user: User) -> Select[Any]:
         PaymentUserOrganization = aliased(UserOrganization)
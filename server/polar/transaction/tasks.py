@@ -1,6 +1,11 @@
+import uuid
+
 from polar.exceptions import PolarTaskError
 from polar.worker import AsyncSessionMaker, CronTrigger, TaskPriority, actor
 
+from .service.balance_snapshot import (
+    transaction_balance_snapshot as transaction_balance_snapshot_service,
+)
 from .service.processor_fee import (
     processor_fee_transaction as processor_fee_transaction_service,
 )
@@ -17,3 +22,35 @@ class TransactionTaskError(PolarTaskError): ...
 async def sync_stripe_fees() -> None:
     async with AsyncSessionMaker() as session:
         await processor_fee_transaction_service.sync_stripe_fees(session)
+
+
+@actor(
+    actor_name="transaction.enqueue_balance_snapshots",
+    cron_trigger=CronTrigger(hour=1, minute=0),
+    priority=TaskPriority.LOW,
+)
+async def enqueue_balance_snapshots() -> None:
+    async with AsyncSessionMaker() as session:
+        await transaction_balance_snapshot_service.enqueue_snapshots(session)
+
+
+@actor(actor_name="transaction.snapshot_balance", priority=TaskPriority.LOW)
+async def snapshot_balance(account_id: uuid.UUID) -> None:
+    async with AsyncSessionMaker() as session:
+        await transaction_balance_snapshot_service.snapshot(session, account_id)
+
+
+@actor(
+    actor_name="transaction.enqueue_balance_snapshot_checks",
+    cron_trigger=CronTrigger(day_of_week="sun", hour=3, minute=0),
+    priority=TaskPriority.LOW,
+)
+async def enqueue_balance_snapshot_checks() -> None:
+    async with AsyncSessionMaker() as session:
+        await transaction_balance_snapshot_service.enqueue_checks(session)
+
+
+@actor(actor_name="transaction.check_balance_snapshot", priority=TaskPriority.LOW)
+async def check_balance_snapshot(account_id: uuid.UUID) -> None:
+    async with AsyncSessionMaker() as session:
+        await transaction_balance_snapshot_service.check(session, account_id)
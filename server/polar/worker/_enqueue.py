@@ -6,6 +6,7 @@ from typing import Any, TypeAlias
 
 import dramatiq
 import structlog
+from dramatiq.common import current_millis, dq_name
 
 from polar.logging import Logger
 from polar.redis import Redis
@@ -31,50 +32,82 @@ _job_queue_manager: contextvars.ContextVar["JobQueueManager | None"] = (
 
 
 class JobQueueManager:
-    __slots__ = ("_enqueued_jobs", "_ingested_events")
+    __slots__ = ("_enqueued_jobs", "_ingested_events", "_stored_values")
 
     def __init__(self) -> None:
         self._enqueued_jobs: list[
-            tuple[str, tuple[JSONSerializable, ...], dict[str, JSONSerializable]]
+            tuple[
+                str,
+                tuple[JSONSerializable, ...],
+                dict[str, JSONSerializable],
+                int | None,
+            ]
         ] = []
         self._ingested_events: list[uuid.UUID] = []
+        self._stored_values: dict[str, tuple[str, int]] = {}
 
     def enqueue_job(
-        self, actor: str, *args: JSONSerializable, **kwargs: JSONSerializable
+        self,
+        actor: str,
+        *args: JSONSerializable,
+        _delay_ms: int | None = None,
+        **kwargs: JSONSerializable,
     ) -> None:
-        self._enqueued_jobs.append((actor, args, kwargs))
+        self._enqueued_jobs.append((actor, args, kwargs, _delay_ms))
         log.debug("polar.worker.job_enqueued", actor=actor)
 
     def enqueue_events(self, *event_ids: uuid.UUID) -> None:
         self._ingested_events.extend(event_ids)
 
+    def store(self, key: str, value: str, *, ttl: int) -> None:
+        """
+        Store a value in Redis with the jobs, so they can reference it by key
+        instead of carrying it, e.g. a payload shared by many jobs.
+
+        It's written before the jobs are pushed.
+        """
+        self._stored_values[key] = (value, ttl)
+
     async def flush(self, broker: dramatiq.Broker, redis: Redis) -> None:
         if len(self._ingested_events) > 0:
             self.enqueue_job("event.ingested", self._ingested_events)
 
-        for actor_name, args, kwargs in self._enqueued_jobs:
-            fn: dramatiq.Actor[Any, Any] = broker.get_actor(actor_name)
-            redis_message_id = str(uuid.uuid4())
-            message = fn.message_with_options(
-                args=args, kwargs=kwargs, redis_message_id=redis_message_id
-            )
-            await redis.hset(
-                f"dramatiq:{message.queue_name}.msgs",
-                redis_message_id,
-                message.encode(),
-            )
-            await redis.rpush(f"dramatiq:{message.queue_name}", redis_message_id)
-            log.debug(
-                "polar.worker.job_flushed",
-                actor=fn.actor_name,
-                message=message.encode(),
-            )
+        # Pipeline the writes, so flushing many jobs at once takes a single round-trip
+        async with redis.pipeline(transaction=False) as pipe:
+            for key, (value, ttl) in self._stored_values.items():
+                pipe.set(key, value, ex=ttl)
+            for actor_name, args, kwargs, delay_ms in self._enqueued_jobs:
+                fn: dramatiq.Actor[Any, Any] = broker.get_actor(actor_name)
+                redis_message_id = str(uuid.uuid4())
+                message = fn.message_with_options(
+                    args=args, kwargs=kwargs, redis_message_id=redis_message_id
+                )
+                # Same as the broker does: put it on the delay queue,
+                # from which workers move it when it's due.
+                if delay_ms is not None:
+                    message = message.copy(
+                        queue_name=dq_name(message.queue_name),
+                        options={"eta": current_millis() + delay_ms},
+                    )
+                pipe.hset(
+                    f"dramatiq:{message.queue_name}.msgs",
+                    redis_message_id,
+                    message.encode(),
+                )
+                pipe.rpush(f"dramatiq:{message.queue_name}", redis_message_id)
+                log.debug(
+                    "polar.worker.job_flushed",
+                    actor=fn.actor_name,
+                    message=message.encode(),
+                )
+            await pipe.execute()
 
         self.reset()
 
     def reset(self) -> None:
         self._enqueued_jobs = []
         self._ingested_events = []
+        self._stored_values = {}
 
     @classmethod
     @contextlib.asynccontextmanager
@@ -99,11 +132,21 @@ class JobQueueManager:
 
 
 def enqueue_job(
-    actor: str, *args: JSONSerializable, **kwargs: JSONSerializable
+    actor: str,
+    *args: JSONSerializable,
+    _delay_ms: int | None = None,
+    **kwargs: JSONSerializable,
 ) -> None:
-    """Enqueue a job by actor name."""
+    """
+    Enqueue a job by actor name.
+
+    Args:
+        actor: Name of the actor.
+        _delay_ms: Optional delay in milliseconds before the job is processed.
+            Prefixed, so it doesn't clash with the keyword arguments of the actor.
+    """
     job_queue_manager = JobQueueManager.get()
-    job_queue_manager.enqueue_job(actor, *args, **kwargs)
+    job_queue_manager.enqueue_job(actor, *args, _delay_ms=_delay_ms, **kwargs)
 
 
 def enqueue_events(*event_ids: uuid.UUID) -> None:
@@ -2,6 +2,10 @@ import dramatiq
 import structlog
 from dramatiq.asyncio import get_event_loop_thread
 
+from polar.integrations.stripe.service import (
+    stripe_http_client,
+    stripe_object_cache,
+)
 from polar.logging import Logger
 from polar.redis import Redis, create_redis
 
@@ -14,6 +18,8 @@ _redis: Redis | None = None
 async def _close_redis() -> None:
     global _redis
     if _redis is not None:
+        stripe_http_client.set_redis(None)
+        stripe_object_cache.set_redis(None)
         await _redis.close(True)
         log.info("Closed Redis client")
         _redis = None
@@ -36,6 +42,8 @@ class RedisMiddleware(dramatiq.Middleware):
     ) -> None:
         global _redis
         _redis = create_redis("worker")
+        stripe_http_client.set_redis(_redis)
+        stripe_object_cache.set_redis(_redis)
         log.info("Created Redis client")
 
     def after_worker_shutdown(
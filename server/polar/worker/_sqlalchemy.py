@@ -9,7 +9,15 @@ from polar.kit.db.postgres import AsyncSessionMaker as AsyncSessionMakerType
 from polar.kit.db.postgres import create_async_sessionmaker
 from polar.logfire import instrument_sqlalchemy
 from polar.logging import Logger
-from polar.postgres import AsyncEngine, AsyncSession, create_async_engine
+from polar.postgres import (
+    AsyncEngine,
+    AsyncSession,
+    commit_session,
+    create_async_engine,
+    rollback_session,
+)
+
+from ._redis import RedisMiddleware
 
 log: Logger = structlog.get_logger()
 
@@ -63,7 +71,7 @@ async def AsyncSessionMaker() -> AsyncIterator[AsyncSession]:
         try:
             yield session
         except:
-            await session.rollback()
+            await rollback_session(session)
             raise
         else:
-            await session.commit()
+            await commit_session(session, RedisMiddleware.get())
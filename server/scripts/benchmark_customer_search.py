@@ -0,0 +1,201 @@
+import asyncio
+import logging.config
+import time
+from functools import wraps
+from typing import Any
+
+import structlog
+import typer
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.dialects import postgresql
+
+from polar.customer.repository import CustomerRepository
+from polar.kit.db.postgres import create_async_sessionmaker
+from polar.models import Customer, Organization
+from polar.postgres import AsyncSession, create_async_engine
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+BENCHMARK_DOMAIN_SUFFIX = "bench.polar.invalid"
+FIRST_NAMES = ("alice", "bob", "carol", "dave", "eve", "frank", "grace", "heidi")
+LAST_NAMES = ("smith", "jones", "taylor", "brown", "wilson", "evans", "thomas")
+
+
+async def _get_organization_id(session: AsyncSession, slug: str) -> Any:
+    result = await session.execute(
+        select(Organization.id).where(Organization.slug == slug)
+    )
+    organization_id = result.scalar_one_or_none()
+    if organization_id is None:
+        typer.echo(f"❌ Organization {slug} not found")
+        raise typer.Exit(1)
+    return organization_id
+
+
+@cli.command()
+@typer_async
+async def generate(
+    organization_slug: str = typer.Option(...),
+    count: int = typer.Option(1_000_000, min=1),
+    domains: int = typer.Option(10_000, min=1, help="Number of email domains."),
+) -> None:
+    """
+    Generate customers with random names and emails in the organization.
+    """
+    engine = create_async_engine("script")
+    sessionmaker = create_async_sessionmaker(engine)
+    async with sessionmaker() as session:
+        organization_id = await _get_organization_id(session, organization_slug)
+        started_at = time.monotonic()
+        await session.execute(
+            text(
+                """
+                INSERT INTO customers (
+                    id, created_at, organization_id, email, email_verified, name,
+                    user_metadata, oauth_accounts
+                )
+                SELECT
+                    gen_random_uuid(),
+                    now() - (n || ' seconds')::interval,
+                    :organization_id,
+                    (:first_names)[1 + n % cardinality(:first_names)] || '.'
+                        || (:last_names)[1 + (n / 7) % cardinality(:last_names)]
+                        || n || '@domain' || (n % :domains) || '.' || :suffix,
+                    false,
+                    initcap((:first_names)[1 + n % cardinality(:first_names)]) || ' '
+                        || initcap(
+                            (:last_names)[1 + (n / 7) % cardinality(:last_names)]
+                        ),
+                    '{}'::jsonb,
+                    '{}'::jsonb
+                FROM generate_series(1, :count) AS n
+                """
+            ).bindparams(
+                bindparam("first_names", type_=postgresql.ARRAY(postgresql.TEXT)),
+                bindparam("last_names", type_=postgresql.ARRAY(postgresql.TEXT)),
+            ),
+            {
+                "organization_id": organization_id,
+                "first_names": list(FIRST_NAMES),
+                "last_names": list(LAST_NAMES),
+                "domains": domains,
+                "suffix": BENCHMARK_DOMAIN_SUFFIX,
+                "count": count,
+            },
+        )
+        await session.execute(text("ANALYZE customers"))
+        await session.commit()
+    typer.echo(f"✅ {count} customers in {time.monotonic() - started_at:.1f}s")
+    await engine.dispose()
+
+
+async def _explain_analyze(session: AsyncSession, statement: Any) -> float:
+    compiled = statement.compile(dialect=postgresql.dialect(paramstyle="named"))
+    explain = text(f"EXPLAIN (ANALYZE, FORMAT JSON) {compiled}").bindparams(
+        *(
+            bindparam(name, value, type_=compiled.binds[name].type)
+            for name, value in compiled.params.items()
+        )
+    )
+    result = await session.execute(explain)
+    plan = result.scalar_one()[0]
+    return plan["Planning Time"] + plan["Execution Time"]
+
+
+@cli.command()
+@typer_async
+async def run(
+    organization_slug: str = typer.Option(...),
+    queries: list[str] = typer.Option(
+        ["a", "ali", "alice.smith", "smith123", "@domain12", "@domain1234.bench"]
+    ),
+    runs: int = typer.Option(5, min=1),
+) -> None:
+    """
+    Time the list filter and the ranked search for each query.
+    """
+    engine = create_async_engine("script")
+    sessionmaker = create_async_sessionmaker(engine)
+    async with sessionmaker() as session:
+        organization_id = await _get_organization_id(session, organization_slug)
+        repository = CustomerRepository.from_session(session)
+        base_statement = repository.get_base_statement().where(
+            Customer.organization_id == organization_id
+        )
+
+        for query in queries:
+            list_statement = (
+                base_statement.where(repository.get_search_clause(query))
+                .order_by(Customer.created_at.desc())
+                .limit(10)
+            )
+            search_statement = repository.get_search_statement(
+                base_statement, query, limit=10
+            )
+            for label, statement in (
+                ("list", list_statement),
+                ("search", search_statement),
+            ):
+                timings = sorted(
+                    [await _explain_analyze(session, statement) for _ in range(runs)]
+                )
+                typer.echo(
+                    f"{query!r:>24} {label:>6}: "
+                    f"median {timings[len(timings) // 2]:.1f}ms, "
+                    f"max {timings[-1]:.1f}ms"
+                )
+
+    await engine.dispose()
+
+
+@cli.command()
+@typer_async
+async def cleanup(organization_slug: str = typer.Option(...)) -> None:
+    """
+    Delete the generated customers.
+    """
+    engine = create_async_engine("script")
+    sessionmaker = create_async_sessionmaker(engine)
+    async with sessionmaker() as session:
+        organization_id = await _get_organization_id(session, organization_slug)
+        result = await session.execute(
+            text(
+                "DELETE FROM customers "
+                "WHERE organization_id = :organization_id AND email LIKE :pattern"
+            ),
+            {
+                "organization_id": organization_id,
+                "pattern": f"%.{BENCHMARK_DOMAIN_SUFFIX}",
+            },
+        )
+        deleted = result.rowcount  # type: ignore[attr-defined]
+        await session.commit()
+    typer.echo(f"🗑️ {deleted} customers deleted")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    cli()
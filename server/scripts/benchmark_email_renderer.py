@@ -0,0 +1,98 @@
+import asyncio
+import logging.config
+import time
+from functools import wraps
+from typing import Any
+
+import structlog
+import typer
+
+from polar.config import settings
+from polar.email.react import RendererPool, render_email_template
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+def _get_props(index: int) -> dict[str, Any]:
+    return {
+        "token_lifetime_minutes": 30,
+        "url": f"https://polar.sh/login/magic-link/authenticate?token={index}",
+        "current_year": 2025,
+    }
+
+
+@cli.command()
+@typer_async
+async def run(
+    template: str = typer.Option("magic_link"),
+    renders: int = typer.Option(200, min=1),
+    concurrency: int = typer.Option(20, min=1),
+    pool_size: int = typer.Option(settings.EMAIL_RENDERER_POOL_SIZE, min=1),
+    spawn_renders: int = typer.Option(
+        20, min=0, help="Renders with a process per render; 0 to skip."
+    ),
+) -> None:
+    """
+    Compare the renders per second of a process per render
+    with the long-lived processes pool.
+    """
+    if spawn_renders:
+        started_at = time.perf_counter()
+        for index in range(spawn_renders):
+            render_email_template(template, _get_props(index))
+        elapsed = time.perf_counter() - started_at
+        typer.echo(
+            f"Process per render: {spawn_renders} renders in {elapsed:.2f}s, "
+            f"{spawn_renders / elapsed:.1f} renders/s"
+        )
+
+    pool = RendererPool(
+        settings.EMAIL_RENDERER_BINARY_PATH,
+        size=pool_size,
+        timeout=settings.EMAIL_RENDERER_TIMEOUT_SECONDS,
+        max_renders=settings.EMAIL_RENDERER_MAX_RENDERS,
+    )
+    # Don't count the processes startup
+    await pool.render(template, _get_props(0))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _render(index: int) -> None:
+        async with semaphore:
+            await pool.render(template, _get_props(index))
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(_render(index) for index in range(renders)))
+    elapsed = time.perf_counter() - started_at
+    typer.echo(
+        f"Pool of {pool_size} processes: {renders} renders in {elapsed:.2f}s, "
+        f"{renders / elapsed:.1f} renders/s"
+    )
+
+    await pool.close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,126 @@
+import random
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import typer
+
+from polar.meter.aggregation import (
+    AggregationFunction,
+    CountAggregation,
+    PropertyAggregation,
+)
+from polar.meter.filter import Filter, FilterClause, FilterConjunction, FilterOperator
+from polar.meter.matcher import MeterMatcher
+from polar.models import Meter
+from polar.models.event import EventSource
+
+cli = typer.Typer()
+
+
+MODELS = ("gpt-4", "gpt-4o", "claude", "llama", "mistral")
+NAMES = ("completion", "embedding", "upload", "search")
+
+
+def _get_meters(count: int) -> list[Meter]:
+    meters: list[Meter] = []
+    for index in range(count):
+        model = MODELS[index % len(MODELS)]
+        meters.append(
+            Meter(
+                name=f"Meter {index}",
+                filter=Filter(
+                    conjunction=FilterConjunction.and_,
+                    clauses=[
+                        FilterClause(
+                            property="name",
+                            operator=FilterOperator.eq,
+                            value=NAMES[index % len(NAMES)],
+                        ),
+                        Filter(
+                            conjunction=FilterConjunction.or_,
+                            clauses=[
+                                FilterClause(
+                                    property="model",
+                                    operator=FilterOperator.eq,
+                                    value=model,
+                                ),
+                                FilterClause(
+                                    property="model",
+                                    operator=FilterOperator.like,
+                                    value=model[:3],
+                                ),
+                            ],
+                        ),
+                        FilterClause(
+                            property="tokens", operator=FilterOperator.gt, value=10
+                        ),
+                    ],
+                ),
+                aggregation=PropertyAggregation(
+                    func=AggregationFunction.sum, property="tokens"
+                )
+                if index % 2
+                else CountAggregation(),
+            )
+        )
+    return meters
+
+
+def _get_events(count: int) -> list[dict[str, Any]]:
+    now = datetime.now(UTC)
+    return [
+        {
+            "name": random.choice(NAMES),
+            "source": EventSource.user,
+            "timestamp": now - timedelta(seconds=index),
+            "user_metadata": {
+                "model": random.choice(MODELS),
+                "tokens": random.randint(0, 1000),
+                "cached": random.random() < 0.5,
+            },
+        }
+        for index in range(count)
+    ]
+
+
+@cli.command()
+def run(
+    events: int = typer.Option(100_000, min=1),
+    meters: int = typer.Option(10, min=1, help="Meters per organization."),
+    seed: int = typer.Option(0),
+) -> None:
+    """
+    Measure the throughput of the in-process meter matching at ingestion.
+    """
+    random.seed(seed)
+    matcher = MeterMatcher()
+    meter_list = _get_meters(meters)
+    event_list = _get_events(events)
+
+    started_at = time.perf_counter()
+    predicates = [matcher.get_predicate(meter) for meter in meter_list]
+    compiled_in = time.perf_counter() - started_at
+
+    matches = undecided = 0
+    started_at = time.perf_counter()
+    for event in event_list:
+        for predicate in predicates:
+            match = predicate(event)
+            if match is None:
+                undecided += 1
+            elif match:
+                matches += 1
+    elapsed = time.perf_counter() - started_at
+
+    typer.echo(f"Compiled {meters} meters in {compiled_in * 1000:.2f}ms")
+    typer.echo(
+        f"Matched {events} events against {meters} meters in {elapsed:.2f}s: "
+        f"{events / elapsed:,.0f} events/s, "
+        f"{events * meters / elapsed:,.0f} evaluations/s"
+    )
+    typer.echo(f"{matches} matches, {undecided} left to SQL")
+
+
+if __name__ == "__main__":
+    cli()
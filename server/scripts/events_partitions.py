@@ -0,0 +1,104 @@
+import asyncio
+import logging.config
+from collections.abc import Sequence
+from datetime import UTC, datetime
+from functools import wraps
+from typing import Any
+
+import structlog
+import typer
+
+from polar.event.partitions import PARTITIONS_AHEAD, EventPartition
+from polar.event.partitions import event_partition as event_partition_service
+from polar.kit.db.postgres import create_async_sessionmaker
+from polar.postgres import create_async_engine
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+@cli.command()
+@typer_async
+async def list_partitions() -> None:
+    """
+    List the monthly partitions of the events table.
+    """
+    engine = create_async_engine("script")
+    sessionmaker = create_async_sessionmaker(engine)
+    async with sessionmaker() as session:
+        for partition in await event_partition_service.list(session):
+            typer.echo(
+                f"{partition.name}: {partition.start.date()} → {partition.end.date()}"
+            )
+    await engine.dispose()
+
+
+@cli.command()
+@typer_async
+async def create(
+    months: int = typer.Option(PARTITIONS_AHEAD, min=0, help="Months ahead."),
+) -> None:
+    """
+    Create the partitions of the current and next months.
+    """
+    engine = create_async_engine("script")
+    sessionmaker = create_async_sessionmaker(engine)
+    async with sessionmaker() as session:
+        created = await event_partition_service.create_ahead(session, months=months)
+        await session.commit()
+    for partition in created:
+        typer.echo(f"✅ Created {partition.name}")
+    await engine.dispose()
+
+
+@cli.command()
+@typer_async
+async def detach(
+    before: datetime = typer.Option(..., help="Detach partitions ending before."),
+    dry_run: bool = typer.Option(False, help="Only list the partitions to detach."),
+) -> None:
+    """
+    Detach the old partitions, keeping their tables to archive them.
+    """
+    before = before.replace(tzinfo=UTC) if before.tzinfo is None else before
+    engine = create_async_engine("script")
+    sessionmaker = create_async_sessionmaker(engine)
+    async with sessionmaker() as session:
+        partitions: Sequence[EventPartition]
+        if dry_run:
+            partitions = [
+                partition
+                for partition in await event_partition_service.list(session)
+                if partition.end <= before
+            ]
+        else:
+            partitions = await event_partition_service.detach_before(session, before)
+            await session.commit()
+    for partition in partitions:
+        typer.echo(f"{'🔍' if dry_run else '✂️'} {partition.name}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,77 @@
+import asyncio
+import logging.config
+import uuid
+from functools import wraps
+from typing import Any
+
+import dramatiq
+import structlog
+import typer
+
+from polar import tasks  # noqa: F401
+from polar.kit.db.postgres import create_async_sessionmaker
+from polar.meter.repository import MeterRepository
+from polar.postgres import create_async_engine
+from polar.redis import create_redis
+from polar.worker import JobQueueManager
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+@cli.command()
+@typer_async
+async def enable(meter_ids: list[uuid.UUID]) -> None:
+    """
+    Materialize the match of the given meters, tagging their past events
+    in the background.
+    """
+    engine = create_async_engine("script")
+    sessionmaker = create_async_sessionmaker(engine)
+    redis = create_redis("script")
+    broker = dramatiq.get_broker()
+
+    async with sessionmaker() as session:
+        repository = MeterRepository.from_session(session)
+        async with JobQueueManager.open(broker, redis) as job_queue_manager:
+            for meter_id in meter_ids:
+                meter = await repository.get_by_id(meter_id)
+                if meter is None:
+                    typer.echo(f"❌ Meter {meter_id} not found")
+                    continue
+                if meter.match_materialization is not None:
+                    typer.echo(
+                        f"⏭️ Meter {meter_id} already materialized "
+                        f"({meter.match_materialization})"
+                    )
+                    continue
+                job_queue_manager.enqueue_job("meter.materialize_match", meter.id)
+                typer.echo(f"🔄 Meter {meter_id} materialization enqueued")
+
+    await redis.close(True)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    cli()
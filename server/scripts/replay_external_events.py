@@ -0,0 +1,106 @@
+import asyncio
+import logging.config
+import time
+from datetime import datetime
+from functools import wraps
+from typing import Any
+
+import dramatiq
+import structlog
+import typer
+
+from polar import tasks  # noqa: F401
+from polar.external_event.service import external_event as external_event_service
+from polar.kit.db.postgres import create_async_sessionmaker
+from polar.models.external_event import ExternalEventSource
+from polar.postgres import create_async_engine
+from polar.redis import create_redis
+from polar.worker import JobQueueManager
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+@cli.command()
+@typer_async
+async def replay_external_events(
+    source: ExternalEventSource = typer.Option(ExternalEventSource.stripe),
+    task_name: str | None = typer.Option(None, help="Only replay this task."),
+    start: datetime | None = typer.Option(None, help="Events created from this date."),
+    end: datetime | None = typer.Option(None, help="Events created before this date."),
+    batch_size: int = typer.Option(500, min=1),
+    rate: float = typer.Option(100.0, min=0.1, help="Maximum events per second."),
+    dry_run: bool = typer.Option(False, help="Only count the events to replay."),
+) -> None:
+    """
+    Enqueue again the unhandled external events, oldest first.
+    """
+    engine = create_async_engine("script")
+    sessionmaker = create_async_sessionmaker(engine)
+    redis = create_redis("script")
+    broker = dramatiq.get_broker()
+
+    count = 0
+    started_at = time.monotonic()
+    async with sessionmaker() as session:
+        async with JobQueueManager.open(broker, redis) as job_queue_manager:
+            async for events in external_event_service.stream_unhandled(
+                session,
+                source,
+                task_name=task_name,
+                start=start,
+                end=end,
+                batch_size=batch_size,
+            ):
+                batch_started_at = time.monotonic()
+                if not dry_run:
+                    await external_event_service.resend_many(events)
+                    await job_queue_manager.flush(broker, redis)
+                count += len(events)
+
+                elapsed = max(time.monotonic() - started_at, 0.001)
+                typer.echo(
+                    f"{'🔍' if dry_run else '🔄'} {count} events, "
+                    f"up to {events[-1].created_at.isoformat()} "
+                    f"({count / elapsed:.0f} events/s)"
+                )
+
+                # Cap the rate, so workers aren't flooded
+                if not dry_run:
+                    min_duration = len(events) / rate
+                    batch_duration = time.monotonic() - batch_started_at
+                    if batch_duration < min_duration:
+                        await asyncio.sleep(min_duration - batch_duration)
+
+    typer.echo(
+        f"✅ {count} events {'to replay' if dry_run else 'replayed'} "
+        f"in {time.monotonic() - started_at:.1f}s"
+    )
+
+    await redis.close(True)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    cli()
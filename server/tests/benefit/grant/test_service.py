@@ -1,5 +1,5 @@
 from typing import Any, Literal, cast
-from unittest.mock import MagicMock, call
+from unittest.mock import ANY, MagicMock, call
 
 import pytest
 from pytest_mock import MockerFixture
@@ -7,6 +7,7 @@ from pytest_mock import MockerFixture
 from polar.benefit.grant.repository import BenefitGrantRepository
 from polar.benefit.grant.service import benefit_grant as benefit_grant_service
 from polar.benefit.strategies import BenefitActionRequiredError, BenefitServiceProtocol
+from polar.config import settings
 from polar.models import Benefit, BenefitGrant, Customer, Product, Subscription
 from polar.postgres import AsyncSession
 from polar.redis import Redis
@@ -357,16 +358,13 @@ class TestEnqueueBenefitsGrants:
             session, task, customer, product, subscription=subscription
         )
 
-        enqueue_job_mock.assert_has_calls(
-            [
-                call(
-                    f"benefit.{task}",
-                    customer_id=customer.id,
-                    benefit_id=benefit.id,
-                    subscription_id=subscription.id,
-                )
-                for benefit in benefits
-            ]
+        enqueue_job_mock.assert_called_once_with(
+            "benefit.customer_batch",
+            task=task,
+            batch_id=ANY,
+            customer_id=customer.id,
+            benefit_ids=[benefit.id for benefit in benefits],
+            subscription_id=subscription.id,
         )
 
     async def test_outdated_grants(
@@ -396,9 +394,11 @@ class TestEnqueueBenefitsGrants:
         )
 
         enqueue_job_mock.assert_any_call(
-            "benefit.revoke",
+            "benefit.customer_batch",
+            task="revoke",
+            batch_id=ANY,
             customer_id=customer.id,
-            benefit_id=benefits[0].id,
+            benefit_ids=[benefits[0].id],
             subscription_id=subscription.id,
         )
 
@@ -458,10 +458,55 @@ class TestEnqueueBenefitGrantUpdates:
         )
 
         enqueue_job_mock.assert_called_once_with(
-            "benefit.update",
-            benefit_grant_id=granted_grant.id,
+            "benefit.grant_batch",
+            task="update",
+            batch_id=ANY,
+            benefit_id=benefit_organization.id,
+            benefit_grant_ids=[granted_grant.id],
         )
 
+    async def test_required_update_batched(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        redis: Redis,
+        save_fixture: SaveFixture,
+        customer: Customer,
+        product: Product,
+        benefit_organization: Benefit,
+        benefit_strategy_mock: MagicMock,
+    ) -> None:
+        mocker.patch.object(settings, "BENEFIT_GRANT_BATCH_SIZE", 2)
+        grants: list[BenefitGrant] = []
+        for _ in range(5):
+            subscription = await create_subscription(
+                save_fixture, product=product, customer=customer
+            )
+            grants.append(
+                await create_benefit_grant(
+                    save_fixture,
+                    customer,
+                    benefit_organization,
+                    granted=True,
+                    subscription=subscription,
+                )
+            )
+
+        enqueue_job_mock = mocker.patch("polar.benefit.grant.service.enqueue_job")
+        benefit_strategy_mock.requires_update.return_value = True
+
+        await benefit_grant_service.enqueue_benefit_grant_updates(
+            session, redis, benefit_organization, {}
+        )
+
+        assert enqueue_job_mock.call_count == 3
+        batched_ids = [
+            id
+            for call_args in enqueue_job_mock.call_args_list
+            for id in call_args.kwargs["benefit_grant_ids"]
+        ]
+        assert sorted(batched_ids) == sorted(grant.id for grant in grants)
+
     async def test_required_update_revoked(
         self,
         mocker: MockerFixture,
@@ -756,7 +801,11 @@ class TestEnqueueBenefitGrantDeletions:
         )
 
         enqueue_job_mock.assert_called_once_with(
-            "benefit.delete_grant", benefit_grant_id=granted_grant.id
+            "benefit.grant_batch",
+            task="delete",
+            batch_id=ANY,
+            benefit_id=benefit_organization.id,
+            benefit_grant_ids=[granted_grant.id],
         )
 
 
@@ -792,9 +841,22 @@ class TestEnqueueCustomerGrantDeletions:
 
         enqueue_job_mock.assert_has_calls(
             [
-                call("benefit.delete_grant", benefit_grant_id=grant1.id),
-                call("benefit.delete_grant", benefit_grant_id=grant2.id),
-            ]
+                call(
+                    "benefit.grant_batch",
+                    task="delete",
+                    batch_id=ANY,
+                    benefit_id=benefit_organization.id,
+                    benefit_grant_ids=[grant1.id],
+                ),
+                call(
+                    "benefit.grant_batch",
+                    task="delete",
+                    batch_id=ANY,
+                    benefit_id=benefit_organization_second.id,
+                    benefit_grant_ids=[grant2.id],
+                ),
+            ],
+            any_order=True,
         )
 
 
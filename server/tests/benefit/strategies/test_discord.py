@@ -0,0 +1,52 @@
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.benefit.strategies import BenefitRetriableError
+from polar.benefit.strategies.discord.service import BenefitDiscordService
+from polar.integrations.discord.client import DiscordRateLimitError
+from polar.models import Benefit, Customer
+from polar.postgres import AsyncSession
+from polar.redis import Redis
+
+
+def _rate_limit_error(retry_after: float, is_global: bool) -> DiscordRateLimitError:
+    return DiscordRateLimitError(
+        httpx.Response(
+            429,
+            json={"retry_after": retry_after, "global": is_global},
+            request=httpx.Request("DELETE", "https://discord.com/api/v10/guilds"),
+        )
+    )
+
+
+@pytest.mark.asyncio
+class TestRevoke:
+    @pytest.mark.parametrize("is_global", [True, False])
+    async def test_rate_limited(
+        self,
+        is_global: bool,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        redis: Redis,
+        benefit_organization: Benefit,
+        customer: Customer,
+    ) -> None:
+        mocker.patch(
+            "polar.benefit.strategies.discord.service"
+            ".discord_bot_service.remove_member_role",
+            side_effect=_rate_limit_error(2.5, is_global),
+        )
+        service = BenefitDiscordService(session, redis)
+
+        with pytest.raises(BenefitRetriableError) as e:
+            await service.revoke(
+                benefit_organization,
+                customer,
+                {"guild_id": "GUILD_ID", "role_id": "ROLE_ID", "account_id": "USER"},
+            )
+
+        assert e.value.defer_seconds == 3
+        # Only a global rate limit blocks the other processes
+        wait = await service._get_rate_limiter().try_acquire()
+        assert (wait > 0) is is_global
@@ -0,0 +1,82 @@
+from collections.abc import AsyncIterator
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from polar.benefit.strategies.github_repository.service import (
+    BenefitGitHubRepositoryService,
+)
+from polar.postgres import AsyncSession
+from polar.redis import Redis
+
+
+def _invitation(user_id: int) -> MagicMock:
+    return MagicMock(invitee=MagicMock(id=user_id))
+
+
+class FakeGitHub:
+    def __init__(self, invitations: list[MagicMock]) -> None:
+        self.invitations = invitations
+        self.list_calls = 0
+        self.rest = MagicMock()
+
+    async def paginate(self, *args: Any, **kwargs: Any) -> AsyncIterator[MagicMock]:
+        self.list_calls += 1
+        for invitation in self.invitations:
+            yield invitation
+
+
+@pytest.fixture
+def service(session: AsyncSession, redis: Redis) -> BenefitGitHubRepositoryService:
+    return BenefitGitHubRepositoryService(session, redis)
+
+
+async def _get_invitation(
+    service: BenefitGitHubRepositoryService, client: Any, user_id: int
+) -> Any:
+    return await service._get_invitation(
+        client,
+        repository_owner="polarsource",
+        repository_name="polar",
+        user_id=user_id,
+    )
+
+
+@pytest.mark.asyncio
+class TestGetInvitation:
+    async def test_without_batch(self, service: BenefitGitHubRepositoryService) -> None:
+        invitations = [_invitation(1), _invitation(2)]
+        client = FakeGitHub(invitations)
+
+        assert await _get_invitation(service, client, 1) is invitations[0]
+        assert await _get_invitation(service, client, 3) is None
+        assert client.list_calls == 2
+
+    async def test_batch(self, service: BenefitGitHubRepositoryService) -> None:
+        invitations = [_invitation(1), _invitation(2)]
+        client = FakeGitHub(invitations)
+
+        async with service.batch():
+            assert await _get_invitation(service, client, 1) is invitations[0]
+            assert await _get_invitation(service, client, 2) is invitations[1]
+            assert await _get_invitation(service, client, 3) is None
+
+        assert client.list_calls == 1
+
+    async def test_batch_index_updates(
+        self, service: BenefitGitHubRepositoryService
+    ) -> None:
+        client = FakeGitHub([_invitation(1)])
+
+        async with service.batch():
+            assert await _get_invitation(service, client, 2) is None
+
+            invitation = _invitation(2)
+            service._index_invitation("polarsource", "polar", invitation)
+            assert await _get_invitation(service, client, 2) is invitation
+
+            service._unindex_invitation("polarsource", "polar", 1)
+            assert await _get_invitation(service, client, 1) is None
+
+        assert client.list_calls == 1
@@ -4,6 +4,7 @@ import pytest
 from dramatiq import Retry
 from pytest_mock import MockerFixture
 
+from polar.benefit.grant.batch import BenefitGrantBatchProgress
 from polar.benefit.grant.service import BenefitGrantService
 from polar.benefit.strategies import BenefitRetriableError
 from polar.benefit.tasks import (  # type: ignore[attr-defined]
@@ -11,15 +12,20 @@ from polar.benefit.tasks import (  # type: ignore[attr-defined]
     BenefitGrantDoesNotExist,
     CustomerDoesNotExist,
     benefit_delete,
+    benefit_customer_batch,
     benefit_delete_grant,
     benefit_grant,
+    benefit_grant_batch,
     benefit_grant_service,
     benefit_revoke,
     benefit_update,
 )
-from polar.models import Benefit, BenefitGrant, Customer, Subscription
+from polar.kit.utils import generate_uuid
+from polar.models import Benefit, BenefitGrant, Customer, Product, Subscription
 from polar.postgres import AsyncSession
+from polar.redis import Redis
 from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_benefit_grant, create_subscription
 
 
 @pytest.mark.asyncio
@@ -353,3 +359,135 @@ class TestBenefitDeleteGrant:
 
         with pytest.raises(Retry):
             await benefit_delete_grant(grant.id)
+
+
+@pytest.mark.asyncio
+class TestBenefitGrantBatch:
+    async def test_not_existing_benefit(self, session: AsyncSession) -> None:
+        # then
+        session.expunge_all()
+
+        with pytest.raises(BenefitDoesNotExist):
+            await benefit_grant_batch("update", generate_uuid(), uuid.uuid4(), [])
+
+    async def test_resume_after_retry(
+        self,
+        session: AsyncSession,
+        redis: Redis,
+        save_fixture: SaveFixture,
+        mocker: MockerFixture,
+        product: Product,
+        customer: Customer,
+        benefit_organization: Benefit,
+    ) -> None:
+        grants: list[BenefitGrant] = []
+        for _ in range(3):
+            subscription = await create_subscription(
+                save_fixture, product=product, customer=customer
+            )
+            grants.append(
+                await create_benefit_grant(
+                    save_fixture,
+                    customer,
+                    benefit_organization,
+                    granted=True,
+                    subscription=subscription,
+                )
+            )
+
+        process_mock = mocker.patch.object(
+            benefit_grant_service,
+            "process_benefit_grant_batch_item",
+            spec=BenefitGrantService.process_benefit_grant_batch_item,
+        )
+        process_mock.side_effect = [None, BenefitRetriableError(10), None, None]
+
+        batch_id = generate_uuid()
+        grant_ids = [grant.id for grant in grants]
+
+        # then
+        session.expunge_all()
+
+        with pytest.raises(Retry):
+            await benefit_grant_batch(
+                "update", batch_id, benefit_organization.id, grant_ids
+            )
+
+        progress = BenefitGrantBatchProgress(redis, batch_id)
+        assert await progress.get() == (1, 3)
+
+        await benefit_grant_batch(
+            "update", batch_id, benefit_organization.id, grant_ids
+        )
+
+        assert process_mock.call_count == 4
+        resumed_grant_ids = [
+            call_args.args[4].id for call_args in process_mock.call_args_list[2:]
+        ]
+        assert resumed_grant_ids == grant_ids[1:]
+        assert await progress.get() == (3, 3)
+
+
+@pytest.mark.asyncio
+class TestBenefitCustomerBatch:
+    async def test_not_existing_customer(self, session: AsyncSession) -> None:
+        # then
+        session.expunge_all()
+
+        with pytest.raises(CustomerDoesNotExist):
+            await benefit_customer_batch("grant", generate_uuid(), uuid.uuid4(), [])
+
+    async def test_resume_after_retry(
+        self,
+        session: AsyncSession,
+        redis: Redis,
+        mocker: MockerFixture,
+        customer: Customer,
+        subscription: Subscription,
+        benefit_organization: Benefit,
+        benefit_organization_second: Benefit,
+        benefit_organization_third: Benefit,
+    ) -> None:
+        grant_mock = mocker.patch.object(
+            benefit_grant_service,
+            "grant_benefit",
+            spec=BenefitGrantService.grant_benefit,
+        )
+        grant_mock.side_effect = [None, BenefitRetriableError(10), None, None]
+
+        batch_id = generate_uuid()
+        benefit_ids = [
+            benefit_organization.id,
+            benefit_organization_second.id,
+            benefit_organization_third.id,
+        ]
+
+        # then
+        session.expunge_all()
+
+        with pytest.raises(Retry):
+            await benefit_customer_batch(
+                "grant",
+                batch_id,
+                customer.id,
+                benefit_ids,
+                subscription_id=subscription.id,
+            )
+
+        progress = BenefitGrantBatchProgress(redis, batch_id)
+        assert await progress.get() == (1, 3)
+
+        await benefit_customer_batch(
+            "grant",
+            batch_id,
+            customer.id,
+            benefit_ids,
+            subscription_id=subscription.id,
+        )
+
+        assert grant_mock.call_count == 4
+        resumed_benefit_ids = [
+            call_args.args[3].id for call_args in grant_mock.call_args_list[2:]
+        ]
+        assert resumed_benefit_ids == benefit_ids[1:]
+        assert await progress.get() == (3, 3)
@@ -1,20 +1,29 @@
+import asyncio
+import os
+import time
 from decimal import Decimal
 from types import SimpleNamespace
+from typing import Any
 from unittest.mock import ANY, MagicMock, call
 
 import pytest
 import pytest_asyncio
+import structlog
 from pytest_mock.plugin import MockerFixture
+from sqlalchemy import func, select
 
+from polar.billing_entry.service import INVOICE_ITEMS_CONCURRENCY
 from polar.billing_entry.service import billing_entry as billing_entry_service
 from polar.enums import SubscriptionRecurringInterval
 from polar.event.system import SystemEvent
 from polar.integrations.stripe.service import StripeService
+from polar.kit.utils import utc_now
 from polar.meter.aggregation import AggregationFunction, PropertyAggregation
 from polar.meter.filter import Filter, FilterConjunction
 from polar.models import (
     BillingEntry,
     Customer,
+    Event,
     Meter,
     Order,
     OrderItem,
@@ -237,12 +246,13 @@ class TestCreateOrderItemsFromPending:
 
         assert len(order_items) == 1
 
-        order_item = order_items[0]
+        order_item, order_item_entries = order_items[0]
         assert meter.name in order_item.label
         assert order_item.amount == 50_00
 
-        for entry in entries[1:]:
-            assert entry.order_item == order_item
+        assert {entry.id for entry in order_item_entries} == {
+            entry.id for entry in entries[1:]
+        }
 
         stripe_service_mock.create_invoice_item.assert_awaited_once_with(
             customer="STRIPE_CUSTOMER_ID",
@@ -251,6 +261,7 @@ class TestCreateOrderItemsFromPending:
             currency=price.price_currency,
             description=order_item.label,
             metadata=ANY,
+            idempotency_key=ANY,
         )
 
     async def test_several_prices(
@@ -321,21 +332,27 @@ class TestCreateOrderItemsFromPending:
 
         assert len(order_items) == 2
 
-        order_item_old_price = next(
-            item for item in order_items if item.product_price == old_price
+        order_item_old_price, order_item_old_price_entries = next(
+            (item, item_entries)
+            for item, item_entries in order_items
+            if item.product_price == old_price
         )
         assert meter.name in order_item_old_price.label
         assert order_item_old_price.amount == 75_00
-        for entry in entries[:2]:
-            assert entry.order_item == order_item_old_price
-
-        order_item_current_price = next(
-            item for item in order_items if item.product_price == current_price
+        assert {entry.id for entry in order_item_old_price_entries} == {
+            entry.id for entry in entries[:2]
+        }
+
+        order_item_current_price, order_item_current_price_entries = next(
+            (item, item_entries)
+            for item, item_entries in order_items
+            if item.product_price == current_price
         )
         assert meter.name in order_item_current_price.label
         assert order_item_current_price.amount == 70_00
-        for entry in entries[2:]:
-            assert entry.order_item == order_item_current_price
+        assert {entry.id for entry in order_item_current_price_entries} == {
+            entry.id for entry in entries[2:]
+        }
 
         stripe_service_mock.create_invoice_item.assert_has_calls(
             [
@@ -346,6 +363,7 @@ class TestCreateOrderItemsFromPending:
                     currency=old_price.price_currency,
                     description=order_item_old_price.label,
                     metadata=ANY,
+                    idempotency_key=ANY,
                 ),
                 call(
                     customer="STRIPE_CUSTOMER_ID",
@@ -354,6 +372,7 @@ class TestCreateOrderItemsFromPending:
                     currency=current_price.price_currency,
                     description=order_item_current_price.label,
                     metadata=ANY,
+                    idempotency_key=ANY,
                 ),
             ],
             any_order=True,
@@ -423,12 +442,13 @@ class TestCreateOrderItemsFromPending:
 
         assert len(order_items) == 1
 
-        order_item = order_items[0]
+        order_item, order_item_entries = order_items[0]
         assert meter.name in order_item.label
         assert order_item.amount == 40_00
 
-        for entry in entries[1:]:
-            assert entry.order_item == order_item
+        assert {entry.id for entry in order_item_entries} == {
+            entry.id for entry in entries[1:]
+        }
 
         stripe_service_mock.create_invoice_item.assert_awaited_once_with(
             customer="STRIPE_CUSTOMER_ID",
@@ -437,4 +457,225 @@ class TestCreateOrderItemsFromPending:
             currency=price.price_currency,
             description=order_item.label,
             metadata=ANY,
+            idempotency_key=ANY,
+        )
+
+    async def test_concurrent_invoice_items(
+        self,
+        mocker: MockerFixture,
+        save_fixture: SaveFixture,
+        stripe_service_mock: MagicMock,
+        session: AsyncSession,
+        customer: Customer,
+        meter: Meter,
+        product_metered_unit: Product,
+        metered_subscription: Subscription,
+    ) -> None:
+        mocker.patch("polar.billing_entry.service.INVOICE_ITEMS_CONCURRENCY", 2)
+        in_flight = 0
+        max_in_flight = 0
+
+        async def _create_invoice_item(**kwargs: Any) -> SimpleNamespace:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return SimpleNamespace(id="STRIPE_INVOICE_ITEM_ID")
+
+        stripe_service_mock.create_invoice_item.side_effect = _create_invoice_item
+
+        prices: list[ProductPrice] = [product_metered_unit.prices[0]]
+        for _ in range(3):
+            prices.append(
+                await create_product_price_metered_unit(
+                    save_fixture, product=product_metered_unit, meter=meter
+                )
+            )
+        for price in prices:
+            for tokens in (10, 20):
+                await create_event_billing_entry(
+                    save_fixture,
+                    customer=customer,
+                    product=product_metered_unit,
+                    price=price,
+                    subscription=metered_subscription,
+                    tokens=tokens,
+                )
+
+        order_items = await billing_entry_service.create_order_items_from_pending(
+            session,
+            metered_subscription,
+            stripe_invoice_id="STRIPE_INVOICE_ID",
+            stripe_customer_id="STRIPE_CUSTOMER_ID",
+        )
+
+        assert len(order_items) == len(prices)
+        # Invoice items created in parallel, within the concurrency limit
+        assert max_in_flight == 2
+
+        # One idempotency key per group of entries, stable across retries
+        idempotency_keys = [
+            c.kwargs["idempotency_key"]
+            for c in stripe_service_mock.create_invoice_item.call_args_list
+        ]
+        assert len(set(idempotency_keys)) == len(prices)
+
+        stripe_service_mock.create_invoice_item.reset_mock()
+        retried_order_items = (
+            await billing_entry_service.create_order_items_from_pending(
+                session,
+                metered_subscription,
+                stripe_invoice_id="STRIPE_INVOICE_ID",
+                stripe_customer_id="STRIPE_CUSTOMER_ID",
+            )
+        )
+        assert {
+            c.kwargs["idempotency_key"]
+            for c in stripe_service_mock.create_invoice_item.call_args_list
+        } == set(idempotency_keys)
+        assert {order_item.id for order_item, _ in retried_order_items} == {
+            order_item.id for order_item, _ in order_items
+        }
+
+
+@pytest.mark.asyncio
+class TestSetOrderItems:
+    async def test_basic(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+        product_metered_unit: Product,
+        metered_subscription: Subscription,
+        order: Order,
+    ) -> None:
+        price = product_metered_unit.prices[0]
+        entries = [
+            await create_event_billing_entry(
+                save_fixture,
+                customer=customer,
+                product=product_metered_unit,
+                price=price,
+                subscription=metered_subscription,
+                tokens=tokens,
+            )
+            for tokens in (10, 20)
+        ]
+
+        order_items = await billing_entry_service.create_order_items_from_pending(
+            session,
+            metered_subscription,
+            stripe_invoice_id="STRIPE_INVOICE_ID",
+            stripe_customer_id="STRIPE_CUSTOMER_ID",
+        )
+        order.items.extend(order_item for order_item, _ in order_items)
+        await save_fixture(order)
+
+        await billing_entry_service.set_order_items(session, order_items)
+
+        order_item, _ = order_items[0]
+        for entry in entries:
+            assert entry.order_item == order_item
+
+        result = await session.execute(
+            select(BillingEntry.order_item_id).where(
+                BillingEntry.id.in_([entry.id for entry in entries])
+            )
+        )
+        assert set(result.scalars().all()) == {order_item.id}
+
+
+@pytest.mark.skipif(
+    os.environ.get("POLAR_TEST_BENCHMARK") != "1",
+    reason="Benchmark, run it with POLAR_TEST_BENCHMARK=1 and -s to see the timing",
+)
+@pytest.mark.asyncio
+async def test_benchmark_pending_entries(
+    save_fixture: SaveFixture,
+    stripe_service_mock: MagicMock,
+    session: AsyncSession,
+    customer: Customer,
+    meter: Meter,
+    product_metered_unit: Product,
+    metered_subscription: Subscription,
+    order: Order,
+) -> None:
+    """
+    Billing cycle of a subscription with 10,000 pending entries
+    spread over 10 metered prices.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def _create_invoice_item(**kwargs: Any) -> SimpleNamespace:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)  # Stripe API latency
+        in_flight -= 1
+        return SimpleNamespace(id="STRIPE_INVOICE_ITEM_ID")
+
+    stripe_service_mock.create_invoice_item.side_effect = _create_invoice_item
+
+    prices: list[ProductPrice] = [product_metered_unit.prices[0]]
+    for _ in range(9):
+        prices.append(
+            await create_product_price_metered_unit(
+                save_fixture, product=product_metered_unit, meter=meter
+            )
+        )
+
+    entries: list[BillingEntry] = []
+    for i in range(10_000):
+        event = Event(
+            timestamp=utc_now(),
+            source=EventSource.user,
+            name="test",
+            customer_id=customer.id,
+            organization=customer.organization,
+            user_metadata={"tokens": 1},
+        )
+        entries.append(
+            BillingEntry(
+                start_timestamp=event.timestamp,
+                end_timestamp=event.timestamp,
+                direction=BillingEntryDirection.debit,
+                customer=customer,
+                product_price=prices[i % len(prices)],
+                subscription=metered_subscription,
+                event=event,
+            )
+        )
+    session.add_all(entries)
+    await session.flush()
+
+    started_at = time.perf_counter()
+    order_items = await billing_entry_service.create_order_items_from_pending(
+        session,
+        metered_subscription,
+        stripe_invoice_id="STRIPE_INVOICE_ID",
+        stripe_customer_id="STRIPE_CUSTOMER_ID",
+    )
+
+    order.items.extend(order_item for order_item, _ in order_items)
+    await save_fixture(order)
+
+    await billing_entry_service.set_order_items(session, order_items)
+    structlog.get_logger().info(
+        "Pending entries billed",
+        entries=len(entries),
+        elapsed=f"{time.perf_counter() - started_at:.2f}s",
+    )
+
+    assert len(order_items) == len(prices)
+    # Invoice items created in parallel, within the concurrency limit
+    assert 1 < max_in_flight <= INVOICE_ITEMS_CONCURRENCY
+
+    result = await session.execute(
+        select(func.count(BillingEntry.id)).where(
+            BillingEntry.subscription_id == metered_subscription.id,
+            BillingEntry.order_item_id.is_(None),
         )
+    )
+    assert result.scalar_one() == 0
@@ -10,16 +10,18 @@ from pytest_mock import MockerFixture
 
 from polar.auth.models import AuthSubject
 from polar.auth.scope import Scope
+from polar.checkout.read_model import CheckoutPublicReadModel
 from polar.checkout.repository import CheckoutRepository
-from polar.checkout.schemas import CheckoutProductCreate
+from polar.checkout.schemas import CheckoutProductCreate, CheckoutPublic
 from polar.checkout.service import checkout as checkout_service
 from polar.enums import SubscriptionRecurringInterval
 from polar.integrations.stripe.service import StripeService
-from polar.kit.tax import calculate_tax
+from polar.kit.tax import calculate_tax, calculate_tax_quote
 from polar.kit.utils import utc_now
 from polar.models import Checkout, Product, User, UserOrganization
 from polar.models.checkout import CheckoutStatus
 from polar.postgres import AsyncSession
+from polar.redis import Redis
 from tests.fixtures.auth import AuthSubjectFixture
 from tests.fixtures.database import SaveFixture
 from tests.fixtures.random_objects import (
@@ -54,6 +56,14 @@ def calculate_tax_mock(mocker: MockerFixture) -> AsyncMock:
     return mock
 
 
+@pytest.fixture(autouse=True)
+def calculate_tax_quote_mock(mocker: MockerFixture) -> AsyncMock:
+    mock = AsyncMock(spec=calculate_tax_quote)
+    mocker.patch("polar.checkout.service.calculate_tax_quote", new=mock)
+    mock.return_value = 0
+    return mock
+
+
 @pytest_asyncio.fixture
 async def checkout_open(
     save_fixture: SaveFixture, product_one_time: Product
@@ -418,6 +428,33 @@ class TestClientGet:
         assert json["id"] == str(checkout_open.id)
         assert "metadata" not in json
 
+    async def test_read_model(
+        self,
+        api_prefix: str,
+        client: AsyncClient,
+        redis: Redis,
+        checkout_open: Checkout,
+    ) -> None:
+        checkout_public = CheckoutPublic.model_validate(checkout_open).model_dump(
+            mode="json", by_alias=True
+        )
+        await CheckoutPublicReadModel(redis).set(
+            checkout_open.client_secret,
+            {**checkout_public, "customer_email": "customer@example.com"},
+            version=utc_now().timestamp(),
+            organization_id=checkout_open.product.organization_id,
+        )
+
+        response = await client.get(
+            f"{api_prefix}/client/{checkout_open.client_secret}"
+        )
+
+        assert response.status_code == 200
+
+        json = response.json()
+        assert json["id"] == str(checkout_open.id)
+        assert json["customer_email"] == "customer@example.com"
+
 
 @pytest.mark.asyncio
 class TestClientCreateCheckout:
@@ -0,0 +1,133 @@
+import json
+import uuid
+from datetime import timedelta
+from typing import Any
+
+import pytest
+
+from polar.checkout.read_model import CheckoutPublicReadModel
+from polar.kit.utils import utc_now
+from polar.redis import Redis
+
+ORGANIZATION_ID = uuid.uuid4()
+
+
+def _get_checkout_public(**kwargs: Any) -> dict[str, Any]:
+    return {
+        "id": "CHECKOUT_ID",
+        "status": "open",
+        "customer_email": None,
+        "expires_at": (utc_now() + timedelta(hours=1)).isoformat(),
+        **kwargs,
+    }
+
+
+@pytest.mark.asyncio
+class TestCheckoutPublicReadModel:
+    async def test_not_existing(self, redis: Redis) -> None:
+        read_model = CheckoutPublicReadModel(redis)
+
+        assert await read_model.get("CLIENT_SECRET") is None
+
+    async def test_set(self, redis: Redis) -> None:
+        read_model = CheckoutPublicReadModel(redis)
+        checkout_public = _get_checkout_public()
+
+        delta = await read_model.set(
+            "CLIENT_SECRET",
+            checkout_public,
+            version=1.0,
+            organization_id=ORGANIZATION_ID,
+        )
+        assert delta == checkout_public
+
+        data = await read_model.get("CLIENT_SECRET")
+        assert data is not None
+        assert json.loads(data) == checkout_public
+
+    async def test_delta(self, redis: Redis) -> None:
+        read_model = CheckoutPublicReadModel(redis)
+        checkout_public = _get_checkout_public()
+        await read_model.set(
+            "CLIENT_SECRET",
+            checkout_public,
+            version=1.0,
+            organization_id=ORGANIZATION_ID,
+        )
+
+        delta = await read_model.set(
+            "CLIENT_SECRET",
+            {**checkout_public, "customer_email": "customer@example.com"},
+            version=2.0,
+            organization_id=ORGANIZATION_ID,
+        )
+
+        assert delta == {"customer_email": "customer@example.com"}
+
+    async def test_stale_version(self, redis: Redis) -> None:
+        read_model = CheckoutPublicReadModel(redis)
+        checkout_public = _get_checkout_public(status="confirmed")
+        await read_model.set(
+            "CLIENT_SECRET",
+            checkout_public,
+            version=2.0,
+            organization_id=ORGANIZATION_ID,
+        )
+
+        delta = await read_model.set(
+            "CLIENT_SECRET",
+            _get_checkout_public(status="open"),
+            version=1.0,
+            organization_id=ORGANIZATION_ID,
+        )
+
+        assert delta is None
+        data = await read_model.get("CLIENT_SECRET")
+        assert data is not None
+        assert json.loads(data)["status"] == "confirmed"
+
+    async def test_expired(self, redis: Redis) -> None:
+        read_model = CheckoutPublicReadModel(redis)
+        checkout_public = _get_checkout_public(
+            expires_at=(utc_now() - timedelta(minutes=1)).isoformat()
+        )
+
+        delta = await read_model.set(
+            "CLIENT_SECRET",
+            checkout_public,
+            version=1.0,
+            organization_id=ORGANIZATION_ID,
+        )
+
+        assert delta is None
+        assert await read_model.get("CLIENT_SECRET") is None
+
+    async def test_invalidate_organization(self, redis: Redis) -> None:
+        read_model = CheckoutPublicReadModel(redis)
+        checkout_public = _get_checkout_public()
+        await read_model.set(
+            "CLIENT_SECRET",
+            checkout_public,
+            version=1.0,
+            organization_id=ORGANIZATION_ID,
+        )
+        await read_model.set(
+            "OTHER_CLIENT_SECRET",
+            checkout_public,
+            version=1.0,
+            organization_id=uuid.uuid4(),
+        )
+
+        await read_model.invalidate_organization(ORGANIZATION_ID)
+
+        assert await read_model.get("CLIENT_SECRET") is None
+        assert await read_model.get("OTHER_CLIENT_SECRET") is not None
+
+        # Rebuilt after the invalidation
+        await read_model.set(
+            "CLIENT_SECRET",
+            checkout_public,
+            version=2.0,
+            organization_id=ORGANIZATION_ID,
+        )
+        assert await read_model.get("CLIENT_SECRET") is not None
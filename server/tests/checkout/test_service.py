@@ -1,3 +1,4 @@
+import json
 import uuid
 from types import SimpleNamespace
 from typing import Any
@@ -11,6 +12,8 @@ from pytest_mock import MockerFixture
 from sqlalchemy.orm import joinedload
 
 from polar.auth.models import Anonymous, AuthSubject
+from polar.checkout.eventstream import CheckoutEvent
+from polar.checkout.read_model import CheckoutPublicReadModel
 from polar.checkout.schemas import (
     CheckoutConfirmStripe,
     CheckoutCreatePublic,
@@ -39,7 +42,12 @@ from polar.exceptions import PolarRequestValidationError
 from polar.integrations.stripe.schemas import ProductType
 from polar.integrations.stripe.service import StripeService
 from polar.kit.address import Address
-from polar.kit.tax import IncompleteTaxLocation, TaxIDFormat, calculate_tax
+from polar.kit.tax import (
+    IncompleteTaxLocation,
+    TaxIDFormat,
+    calculate_tax,
+    calculate_tax_quote,
+)
 from polar.locker import Locker
 from polar.models import (
     Checkout,
@@ -63,8 +71,9 @@ from polar.models.product_price import (
 )
 from polar.models.subscription import SubscriptionStatus
 from polar.order.service import OrderService
-from polar.postgres import AsyncSession
+from polar.postgres import AsyncSession, commit_session, rollback_session
 from polar.product.guard import is_fixed_price, is_metered_price
+from polar.redis import Redis
 from polar.subscription.service import SubscriptionService
 from tests.fixtures.auth import AuthSubjectFixture
 from tests.fixtures.database import SaveFixture
@@ -110,6 +119,14 @@ def calculate_tax_mock(mocker: MockerFixture) -> AsyncMock:
     return mock
 
 
+@pytest.fixture(autouse=True)
+def calculate_tax_quote_mock(mocker: MockerFixture) -> AsyncMock:
+    mock = AsyncMock(spec=calculate_tax_quote)
+    mocker.patch("polar.checkout.service.calculate_tax_quote", new=mock)
+    mock.return_value = 0
+    return mock
+
+
 @pytest_asyncio.fixture
 async def checkout_one_time_fixed(
     save_fixture: SaveFixture, product_one_time: Product
@@ -1506,6 +1523,14 @@ class TestCheckoutLinkCreate:
         }
 
 
+def _get_updated_events(publish_mock: MagicMock) -> list[tuple[str, Any]]:
+    return [
+        (call_args.args[0], call_args.args[2])
+        for call_args in publish_mock.call_args_list
+        if call_args.args[1] == CheckoutEvent.updated
+    ]
+
+
 @pytest.mark.asyncio
 class TestUpdate:
     async def test_not_existing_product(
@@ -1964,10 +1989,10 @@ class TestUpdate:
         self,
         session: AsyncSession,
         locker: Locker,
-        calculate_tax_mock: AsyncMock,
+        calculate_tax_quote_mock: AsyncMock,
         checkout_one_time_fixed: Checkout,
     ) -> None:
-        calculate_tax_mock.side_effect = IncompleteTaxLocation(
+        calculate_tax_quote_mock.side_effect = IncompleteTaxLocation(
             stripe_lib.InvalidRequestError("ERROR", "ERROR")
         )
 
@@ -1990,9 +2015,10 @@ class TestUpdate:
         session: AsyncSession,
         locker: Locker,
         calculate_tax_mock: AsyncMock,
+        calculate_tax_quote_mock: AsyncMock,
         checkout_one_time_fixed: Checkout,
     ) -> None:
-        calculate_tax_mock.return_value = "TAX_PROCESSOR_ID", 100
+        calculate_tax_quote_mock.return_value = 100
 
         checkout = await checkout_service.update(
             session,
@@ -2004,9 +2030,39 @@ class TestUpdate:
         )
 
         assert checkout.tax_amount == 100
-        assert checkout.tax_processor_id == "TAX_PROCESSOR_ID"
+        assert checkout.tax_processor_id is None
         assert checkout.customer_billing_address is not None
         assert checkout.customer_billing_address.country == "FR"
+        calculate_tax_mock.assert_not_called()
+
+    async def test_skip_tax_unchanged_inputs(
+        self,
+        session: AsyncSession,
+        locker: Locker,
+        calculate_tax_quote_mock: AsyncMock,
+        checkout_one_time_fixed: Checkout,
+    ) -> None:
+        calculate_tax_quote_mock.return_value = 100
+
+        checkout = await checkout_service.update(
+            session,
+            locker,
+            checkout_one_time_fixed,
+            CheckoutUpdate(
+                customer_billing_address=Address.model_validate({"country": "FR"}),
+            ),
+        )
+        assert checkout.tax_amount == 100
+        calculate_tax_quote_mock.assert_called_once()
+
+        checkout = await checkout_service.update(
+            session,
+            locker,
+            checkout,
+            CheckoutUpdate(customer_name="John Doe"),
+        )
+        assert checkout.tax_amount == 100
+        calculate_tax_quote_mock.assert_called_once()
 
     async def test_ignore_email_update_if_customer_set(
         self,
@@ -2046,6 +2102,62 @@ class TestUpdate:
 
         assert checkout.user_metadata == {"key": "value"}
 
+    async def test_public_read_model(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        redis: Redis,
+        locker: Locker,
+        checkout_one_time_free: Checkout,
+    ) -> None:
+        publish_mock = mocker.patch("polar.checkout.service.publish_checkout_event")
+        read_model = CheckoutPublicReadModel(redis)
+
+        checkout = await checkout_service.update(
+            session,
+            locker,
+            checkout_one_time_free,
+            CheckoutUpdate(customer_email="customer@example.com"),
+        )
+
+        # Not exposed before the transaction is committed
+        assert await read_model.get(checkout.client_secret) is None
+        assert _get_updated_events(publish_mock) == []
+
+        await commit_session(session, redis)
+
+        data = await read_model.get(checkout.client_secret)
+        assert data is not None
+        assert json.loads(data)["customer_email"] == "customer@example.com"
+
+        [(client_secret, payload)] = _get_updated_events(publish_mock)
+        assert client_secret == checkout.client_secret
+        assert payload["status"] == CheckoutStatus.open
+        assert payload["delta"]["customer_email"] == "customer@example.com"
+
+    async def test_public_read_model_rollback(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        redis: Redis,
+        locker: Locker,
+        checkout_one_time_free: Checkout,
+    ) -> None:
+        publish_mock = mocker.patch("polar.checkout.service.publish_checkout_event")
+
+        checkout = await checkout_service.update(
+            session,
+            locker,
+            checkout_one_time_free,
+            CheckoutUpdate(customer_email="customer@example.com"),
+        )
+        client_secret = checkout.client_secret
+        await rollback_session(session)
+        await commit_session(session, redis)
+
+        assert await CheckoutPublicReadModel(redis).get(client_secret) is None
+        assert _get_updated_events(publish_mock) == []
+
     async def test_valid_metadata_reset(
         self,
         session: AsyncSession,
@@ -72,6 +72,38 @@ class TestListCustomers:
         assert json["pagination"]["total_count"] == 2
 
 
+@pytest.mark.asyncio
+class TestSearchCustomers:
+    async def test_anonymous(self, client: AsyncClient) -> None:
+        response = await client.get("/v1/customers/search", params={"query": "a"})
+
+        assert response.status_code == 401
+
+    @pytest.mark.auth
+    async def test_valid(
+        self,
+        save_fixture: SaveFixture,
+        client: AsyncClient,
+        organization: Organization,
+        user_organization: UserOrganization,
+    ) -> None:
+        customer = await create_customer(
+            save_fixture, organization=organization, email="jane@acme.com"
+        )
+        await create_customer(
+            save_fixture, organization=organization, email="john@example.com"
+        )
+
+        response = await client.get(
+            "/v1/customers/search", params={"query": "@acme", "limit": 5}
+        )
+
+        assert response.status_code == 200
+
+        json = response.json()
+        assert [item["id"] for item in json] == [str(customer.id)]
+
+
 @pytest.mark.asyncio
 class TestGetExternal:
     async def test_anonymous(
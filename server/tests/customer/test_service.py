@@ -2,20 +2,39 @@ from typing import Any
 
 import pytest
 from pytest_mock import MockerFixture
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError
 
 from polar.auth.models import AuthSubject, is_user
+from polar.config import settings
+from polar.customer.repository import (
+    CustomerRepository,
+    CustomerStateSnapshotRepository,
+)
 from polar.customer.schemas.customer import CustomerCreate, CustomerUpdate
 from polar.customer.service import customer as customer_service
 from polar.exceptions import PolarRequestValidationError
 from polar.kit.pagination import PaginationParams
-from polar.models import Customer, Organization, User, UserOrganization
+from polar.kit.utils import utc_now
+from polar.models import (
+    Benefit,
+    Customer,
+    Organization,
+    Product,
+    User,
+    UserOrganization,
+)
+from polar.models.customer_state_snapshot import CustomerStateSection
 from polar.models.webhook_endpoint import CustomerWebhookEventType, WebhookEventType
 from polar.postgres import AsyncSession
-from polar.redis import Redis
 from tests.fixtures.auth import AuthSubjectFixture
 from tests.fixtures.database import SaveFixture
-from tests.fixtures.random_objects import create_customer
+from tests.fixtures.random_objects import (
+    create_active_subscription,
+    create_benefit_grant,
+    create_customer,
+)
 
 
 @pytest.mark.asyncio
@@ -73,6 +92,145 @@ class TestList:
         assert customer1 in customers
         assert customer2 in customers
 
+    @pytest.mark.auth(AuthSubjectFixture(subject="organization"))
+    async def test_query(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        auth_subject: AuthSubject[Organization],
+        organization: Organization,
+    ) -> None:
+        customer1 = await create_customer(
+            save_fixture,
+            organization=organization,
+            email="jane@acme.com",
+            name="Jane 100%",
+        )
+        customer2 = await create_customer(
+            save_fixture,
+            organization=organization,
+            email="john@acmecorp.com",
+            name="John",
+        )
+        await create_customer(
+            save_fixture,
+            organization=organization,
+            email="acme@example.com",
+            name="Acme 1000",
+        )
+
+        customers, total = await customer_service.list(
+            session, auth_subject, query="@acme", pagination=PaginationParams(1, 10)
+        )
+        assert total == 2
+        assert set(customers) == {customer1, customer2}
+
+        # Wildcards are matched literally
+        customers, total = await customer_service.list(
+            session, auth_subject, query="100%", pagination=PaginationParams(1, 10)
+        )
+        assert total == 1
+        assert customers == [customer1]
+
+
+@pytest.mark.asyncio
+class TestSearch:
+    @pytest.mark.auth
+    async def test_not_accessible_organization(
+        self, session: AsyncSession, auth_subject: AuthSubject[User], customer: Customer
+    ) -> None:
+        customers = await customer_service.search(session, auth_subject, "customer")
+        assert len(customers) == 0
+
+    @pytest.mark.auth(
+        AuthSubjectFixture(subject="user"), AuthSubjectFixture(subject="organization")
+    )
+    async def test_ranking(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        auth_subject: AuthSubject[User | Organization],
+        organization: Organization,
+        user_organization: UserOrganization,
+    ) -> None:
+        customer1 = await create_customer(
+            save_fixture,
+            organization=organization,
+            email="alexandra@example.com",
+            name="Alexandra Stone",
+        )
+        customer2 = await create_customer(
+            save_fixture,
+            organization=organization,
+            email="alex@example.com",
+            name="Alex Smith",
+        )
+        await create_customer(
+            save_fixture,
+            organization=organization,
+            email="bob@example.com",
+            name="Bob",
+        )
+
+        customers = await customer_service.search(session, auth_subject, "alex")
+
+        assert customers == [customer2, customer1]
+
+        customers = await customer_service.search(
+            session, auth_subject, "alex", limit=1
+        )
+
+        assert customers == [customer2]
+
+    async def test_indexes(self, session: AsyncSession) -> None:
+        result = await session.execute(
+            text(
+                "SELECT indexname, indexdef FROM pg_indexes "
+                "WHERE tablename = 'customers'"
+            )
+        )
+        indexes: dict[str, str] = dict(result.tuples().all())
+
+        # Trigram indexes serve the `ILIKE '%query%'` filters
+        for column in ("email", "name"):
+            assert (
+                f"USING gin ({column} gin_trgm_ops)"
+                in indexes[f"ix_customers_{column}_trigram"]
+            )
+
+        # The domain filter uses the expression of the index
+        assert (
+            "(organization_id, lower(split_part((email)::text, '@'::text, 2)) "
+            "text_pattern_ops)" in indexes["ix_customers_email_domain"]
+        )
+        repository = CustomerRepository.from_session(session)
+        clause = repository.get_search_clause("@acme").compile(
+            dialect=postgresql.dialect()
+        )
+        assert "lower(split_part(customers.email, '@', 2)) LIKE" in str(clause)
+
+    async def test_index_usage(self, session: AsyncSession) -> None:
+        # Tables are empty in tests: force the planner to consider the index
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+
+        repository = CustomerRepository.from_session(session)
+        for query, index in (
+            ("alex", "ix_customers_email_trigram"),
+            ("@acme", "ix_customers_email_domain"),
+        ):
+            # Without the base statement, so the `deleted_at` index isn't an option
+            statement = select(Customer.id).where(repository.get_search_clause(query))
+            # Render the parameters inline, so the `ILIKE ... ESCAPE` clause
+            # isn't parsed again by `text`
+            connection = await session.connection()
+            compiled = statement.compile(
+                dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+            )
+            result = await connection.exec_driver_sql(f"EXPLAIN {compiled}")
+            plan = "\n".join(result.scalars().all())
+
+            assert index in plan
+
 
 @pytest.mark.asyncio
 class TestCreate:
@@ -338,12 +496,11 @@ class TestWebhook:
         event_type: CustomerWebhookEventType,
         mocker: MockerFixture,
         session: AsyncSession,
-        redis: Redis,
         customer: Customer,
     ) -> None:
         send_mock = mocker.patch("polar.webhook.service.webhook.send")
 
-        await customer_service.webhook(session, redis, event_type, customer)
+        await customer_service.webhook(session, event_type, customer)
 
         assert send_mock.call_count == 2
 
@@ -351,13 +508,151 @@ class TestWebhook:
         self,
         mocker: MockerFixture,
         session: AsyncSession,
-        redis: Redis,
         customer: Customer,
     ) -> None:
         send_mock = mocker.patch("polar.webhook.service.webhook.send")
 
         await customer_service.webhook(
-            session, redis, WebhookEventType.customer_state_changed, customer
+            session, WebhookEventType.customer_state_changed, customer
         )
 
         assert send_mock.call_count == 1
+        state = send_mock.call_args[0][3]
+        assert state.version == 1
+
+
+@pytest.mark.asyncio
+class TestGetState:
+    async def test_build_snapshot(
+        self,
+        mocker: MockerFixture,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+        product: Product,
+        benefit_organization: Benefit,
+    ) -> None:
+        enqueue_job_mock = mocker.patch("polar.customer.service.enqueue_job")
+        subscription = await create_active_subscription(
+            save_fixture, product=product, customer=customer
+        )
+        grant = await create_benefit_grant(
+            save_fixture, customer, benefit_organization, granted=True
+        )
+
+        state = await customer_service.get_state(session, customer)
+
+        assert state.version == 1
+        assert [s.id for s in state.active_subscriptions] == [subscription.id]
+        assert [g.id for g in state.granted_benefits] == [grant.id]
+
+        # Persisted by the worker
+        repository = CustomerStateSnapshotRepository.from_session(session)
+        assert await repository.get_by_customer(customer.id) is None
+        enqueue_job_mock.assert_called_once_with(
+            "customer.refresh_state", customer_id=customer.id
+        )
+
+    async def test_existing_snapshot(
+        self,
+        mocker: MockerFixture,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+        benefit_organization: Benefit,
+    ) -> None:
+        enqueue_job_mock = mocker.patch("polar.customer.service.enqueue_job")
+        await customer_service.refresh_state(session, customer)
+        # Not projected yet
+        await create_benefit_grant(
+            save_fixture, customer, benefit_organization, granted=True
+        )
+
+        state = await customer_service.get_state(session, customer)
+
+        assert state.version == 1
+        assert state.granted_benefits == []
+        enqueue_job_mock.assert_not_called()
+
+    async def test_expired_snapshot(
+        self,
+        mocker: MockerFixture,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+        benefit_organization: Benefit,
+    ) -> None:
+        enqueue_job_mock = mocker.patch("polar.customer.service.enqueue_job")
+        await customer_service.refresh_state(session, customer)
+        repository = CustomerStateSnapshotRepository.from_session(session)
+        snapshot = await repository.get_by_customer(customer.id)
+        assert snapshot is not None
+        snapshot.updated_at = utc_now() - settings.CUSTOMER_STATE_SNAPSHOT_TTL
+        await save_fixture(snapshot)
+        # Missed by the section hooks
+        grant = await create_benefit_grant(
+            save_fixture, customer, benefit_organization, granted=True
+        )
+
+        state = await customer_service.get_state(session, customer)
+
+        assert state.version == 2
+        assert [g.id for g in state.granted_benefits] == [grant.id]
+        snapshot = await repository.get_by_customer(customer.id)
+        assert snapshot is not None
+        assert snapshot.version == 1
+        enqueue_job_mock.assert_called_once_with(
+            "customer.refresh_state", customer_id=customer.id
+        )
+
+
+@pytest.mark.asyncio
+class TestRefreshState:
+    async def test_unchanged(self, session: AsyncSession, customer: Customer) -> None:
+        state = await customer_service.refresh_state(session, customer)
+        assert state.version == 1
+        repository = CustomerStateSnapshotRepository.from_session(session)
+        snapshot = await repository.get_by_customer(customer.id)
+        assert snapshot is not None
+        updated_at = snapshot.updated_at
+
+        state = await customer_service.refresh_state(session, customer)
+        assert state.version == 1
+        # Still marked as fresh
+        assert snapshot.updated_at > updated_at
+
+    async def test_sections(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+        benefit_organization: Benefit,
+    ) -> None:
+        await customer_service.refresh_state(session, customer)
+        grant = await create_benefit_grant(
+            save_fixture, customer, benefit_organization, granted=True
+        )
+
+        state = await customer_service.refresh_state(
+            session, customer, [CustomerStateSection.active_meters]
+        )
+        assert state.version == 1
+        assert state.granted_benefits == []
+
+        state = await customer_service.refresh_state(
+            session, customer, [CustomerStateSection.granted_benefits]
+        )
+        assert state.version == 2
+        assert [g.id for g in state.granted_benefits] == [grant.id]
+
+    async def test_customer_fields(
+        self, save_fixture: SaveFixture, session: AsyncSession, customer: Customer
+    ) -> None:
+        await customer_service.refresh_state(session, customer)
+        customer.name = "Updated Name"
+        await save_fixture(customer)
+
+        state = await customer_service.refresh_state(session, customer, [])
+
+        assert state.version == 2
+        assert state.name == "Updated Name"
@@ -0,0 +1,119 @@
+import asyncio
+import uuid
+from collections.abc import Sequence
+from datetime import timedelta
+
+import pytest
+
+from polar.discount.reservation import DiscountRedemptionReservations
+from polar.redis import Redis
+
+
+class FakeRedemptions:
+    """Redemptions committed in database."""
+
+    def __init__(self) -> None:
+        self.committed: set[uuid.UUID] = set()
+
+    async def count(self, exclude: Sequence[uuid.UUID]) -> int:
+        return len(self.committed - set(exclude))
+
+
+@pytest.mark.asyncio
+class TestReserve:
+    async def test_granted(self, redis: Redis) -> None:
+        reservations = DiscountRedemptionReservations(redis)
+        redemptions = FakeRedemptions()
+        discount_id = uuid.uuid4()
+
+        async with reservations.reserve(
+            discount_id,
+            uuid.uuid4(),
+            max_redemptions=1,
+            count_redemptions=redemptions.count,
+        ) as granted:
+            assert granted is True
+
+    async def test_committed_counted_once(self, redis: Redis) -> None:
+        reservations = DiscountRedemptionReservations(redis)
+        redemptions = FakeRedemptions()
+        discount_id = uuid.uuid4()
+
+        redemption_id = uuid.uuid4()
+        async with reservations.reserve(
+            discount_id,
+            redemption_id,
+            max_redemptions=2,
+            count_redemptions=redemptions.count,
+        ) as granted:
+            assert granted is True
+        redemptions.committed.add(redemption_id)
+
+        async with reservations.reserve(
+            discount_id,
+            uuid.uuid4(),
+            max_redemptions=2,
+            count_redemptions=redemptions.count,
+        ) as granted:
+            assert granted is True
+
+    async def test_limit_reached(self, redis: Redis) -> None:
+        reservations = DiscountRedemptionReservations(redis)
+        redemptions = FakeRedemptions()
+        redemptions.committed.add(uuid.uuid4())
+
+        async with reservations.reserve(
+            uuid.uuid4(),
+            uuid.uuid4(),
+            max_redemptions=1,
+            count_redemptions=redemptions.count,
+        ) as granted:
+            assert granted is False
+
+    async def test_released_on_error(self, redis: Redis) -> None:
+        reservations = DiscountRedemptionReservations(redis)
+        redemptions = FakeRedemptions()
+        discount_id = uuid.uuid4()
+
+        with pytest.raises(ValueError):
+            async with reservations.reserve(
+                discount_id,
+                uuid.uuid4(),
+                max_redemptions=1,
+                count_redemptions=redemptions.count,
+            ):
+                raise ValueError()
+
+        async with reservations.reserve(
+            discount_id,
+            uuid.uuid4(),
+            max_redemptions=1,
+            count_redemptions=redemptions.count,
+        ) as granted:
+            assert granted is True
+
+    async def test_expired(self, redis: Redis) -> None:
+        reservations = DiscountRedemptionReservations(
+            redis, ttl=timedelta(milliseconds=100)
+        )
+        redemptions = FakeRedemptions()
+        discount_id = uuid.uuid4()
+
+        # Reservation of a checkout which crashed before committing
+        async with reservations.reserve(
+            discount_id,
+            uuid.uuid4(),
+            max_redemptions=1,
+            count_redemptions=redemptions.count,
+        ) as granted:
+            assert granted is True
+
+        await asyncio.sleep(0.2)
+
+        async with reservations.reserve(
+            discount_id,
+            uuid.uuid4(),
+            max_redemptions=1,
+            count_redemptions=redemptions.count,
+        ) as granted:
+            assert granted is True
@@ -6,10 +6,12 @@ from unittest.mock import MagicMock
 
 import pytest
 from pytest_mock import MockerFixture
+from sqlalchemy import delete
 
 from polar.auth.models import AuthSubject, User
 from polar.checkout.schemas import CheckoutUpdatePublic
 from polar.checkout.service import checkout as checkout_service
+from polar.config import settings
 from polar.discount.schemas import (
     DiscountFixedOnceForeverDurationCreate,
     DiscountUpdate,
@@ -18,6 +20,7 @@ from polar.discount.service import DiscountNotRedeemableError
 from polar.discount.service import discount as discount_service
 from polar.exceptions import PolarRequestValidationError
 from polar.integrations.stripe.service import StripeService
+from polar.kit.db.postgres import create_async_engine, create_async_sessionmaker
 from polar.kit.utils import utc_now
 from polar.locker import Locker
 from polar.models import (
@@ -30,8 +33,16 @@ from polar.models import (
 )
 from polar.models.discount import DiscountDuration, DiscountType
 from polar.postgres import AsyncSession
-from tests.fixtures.database import SaveFixture
-from tests.fixtures.random_objects import create_checkout, create_discount
+from tests.fixtures.database import (
+    SaveFixture,
+    get_database_url,
+    save_fixture_factory,
+)
+from tests.fixtures.random_objects import (
+    create_checkout,
+    create_discount,
+    create_organization,
+)
 
 
 async def create_discount_redemption(
@@ -492,6 +503,86 @@ class TestRedeemDiscount:
         with pytest.raises(DiscountNotRedeemableError):
             second_redemption.result()
 
+    async def test_load_concurrent_checkouts(
+        self, worker_id: str, locker: Locker
+    ) -> None:
+        """
+        Checkouts confirming concurrently with the same code, each in its own
+        committed transaction: exactly `max_redemptions` of them redeem it,
+        without being serialized on the discount.
+        """
+        checkouts_count = 200
+        max_redemptions = 20
+
+        engine = create_async_engine(
+            dsn=get_database_url(worker_id),
+            application_name=f"test_{worker_id}_load",
+            pool_size=20,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+        )
+        sessionmaker = create_async_sessionmaker(engine)
+
+        async with sessionmaker() as session:
+            organization = await create_organization(save_fixture_factory(session))
+            discount = await create_discount(
+                save_fixture_factory(session),
+                type=DiscountType.percentage,
+                basis_points=1000,
+                duration=DiscountDuration.once,
+                organization=organization,
+                max_redemptions=max_redemptions,
+            )
+            await session.commit()
+        organization_id, discount_id = organization.id, discount.id
+
+        in_flight = 0
+        max_in_flight = 0
+
+        async def _confirm_checkout() -> bool:
+            nonlocal in_flight, max_in_flight
+            async with sessionmaker() as session:
+                checkout_discount = await session.get(Discount, discount_id)
+                assert checkout_discount is not None
+                try:
+                    async with discount_service.redeem_discount(
+                        session, locker, checkout_discount
+                    ):
+                        # Payment
+                        in_flight += 1
+                        max_in_flight = max(max_in_flight, in_flight)
+                        await asyncio.sleep(0.05)
+                        in_flight -= 1
+                except DiscountNotRedeemableError:
+                    return False
+                await session.commit()
+                return True
+
+        try:
+            results = await asyncio.gather(
+                *(_confirm_checkout() for _ in range(checkouts_count))
+            )
+
+            assert sum(results) == max_redemptions
+            assert max_in_flight > 1
+            async with sessionmaker() as session:
+                redeemed_discount = await session.get(Discount, discount_id)
+                assert redeemed_discount is not None
+                assert redeemed_discount.redemptions_count == max_redemptions
+        finally:
+            async with engine.begin() as connection:
+                await connection.execute(
+                    delete(DiscountRedemption).where(
+                        DiscountRedemption.discount_id == discount_id
+                    )
+                )
+                await connection.execute(
+                    delete(Discount).where(Discount.id == discount_id)
+                )
+                await connection.execute(
+                    delete(Organization).where(Organization.id == organization_id)
+                )
+            await engine.dispose()
+
 
 @pytest.mark.asyncio
 class TestCodeCaseInsensitivity:
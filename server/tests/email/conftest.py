@@ -0,0 +1,72 @@
+import json
+import uuid
+from collections.abc import AsyncIterator
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from polar.email.sender import ResendEmailSender
+
+
+class FakeResendServer:
+    """
+    Minimal stand-in for the Resend API, accepting every email.
+
+    Responses can be forced by pushing status codes to `statuses`,
+    e.g. to simulate rate limiting.
+    """
+
+    def __init__(self) -> None:
+        self.statuses: list[int] = []
+        self.requests: list[httpx.Request] = []
+
+    @property
+    def emails(self) -> list[dict[str, object]]:
+        emails: list[dict[str, object]] = []
+        for request in self.requests:
+            payload = json.loads(request.content)
+            emails.extend(payload if isinstance(payload, list) else [payload])
+        return emails
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        status_code = self.statuses.pop(0) if self.statuses else 200
+        if status_code == 429:
+            return httpx.Response(
+                429,
+                headers={"Retry-After": "0"},
+                json={"name": "rate_limit_exceeded"},
+            )
+        if status_code != 200:
+            return httpx.Response(status_code, json={"name": "application_error"})
+
+        self.requests.append(request)
+        payload = json.loads(request.content)
+        if request.url.path == "/emails/batch":
+            return httpx.Response(
+                200, json={"data": [{"id": str(uuid.uuid4())} for _ in payload]}
+            )
+        return httpx.Response(200, json={"id": str(uuid.uuid4())})
+
+
+@pytest.fixture
+def fake_resend_server() -> FakeResendServer:
+    return FakeResendServer()
+
+
+@pytest_asyncio.fixture
+async def resend_email_sender(
+    fake_resend_server: FakeResendServer,
+) -> AsyncIterator[ResendEmailSender]:
+    sender = ResendEmailSender(
+        rate_limit=100.0,
+        rate_limit_capacity=100,
+        rate_limit_timeout=1.0,
+        max_rate_limited_retries=2,
+    )
+    sender.client = httpx.AsyncClient(
+        base_url="https://api.resend.com",
+        transport=httpx.MockTransport(fake_resend_server.handler),
+    )
+    yield sender
+    await sender.client.aclose()
@@ -0,0 +1,77 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+
+from polar.config import settings
+from polar.email.react import ReactEmailError, RendererPool, render_email_template
+
+
+def _get_props(url: str) -> dict[str, object]:
+    return {"token_lifetime_minutes": 30, "url": url, "current_year": 2025}
+
+
+@pytest_asyncio.fixture
+async def pool() -> AsyncIterator[RendererPool]:
+    pool = RendererPool(
+        settings.EMAIL_RENDERER_BINARY_PATH, size=2, timeout=10.0, max_renders=1000
+    )
+    yield pool
+    await pool.close()
+
+
+@pytest.mark.asyncio
+class TestRendererPool:
+    async def test_concurrent_renders(self, pool: RendererPool) -> None:
+        urls = [f"https://example.com/magic/{i}" for i in range(20)]
+
+        bodies = await asyncio.gather(
+            *(pool.render("magic_link", _get_props(url)) for url in urls)
+        )
+
+        for url, body in zip(urls, bodies):
+            assert url in body
+        assert len(pool._processes) == 2
+
+    async def test_same_output_as_single_render(self, pool: RendererPool) -> None:
+        props = _get_props("https://example.com/magic")
+
+        body = await pool.render("magic_link", props)
+
+        assert body.strip() == render_email_template("magic_link", props).strip()
+
+    async def test_unknown_template(self, pool: RendererPool) -> None:
+        with pytest.raises(ReactEmailError):
+            await pool.render("unknown", {})
+
+        # The process is still usable
+        body = await pool.render("magic_link", _get_props("https://example.com"))
+        assert "https://example.com" in body
+
+    async def test_restart_exited_process(self, pool: RendererPool) -> None:
+        await pool.render("magic_link", _get_props("https://example.com"))
+        pids = {process.process.pid for process in pool._processes}
+
+        for process in pool._processes:
+            process.kill()
+            await process.process.wait()
+
+        body = await pool.render("magic_link", _get_props("https://example.com"))
+
+        assert "https://example.com" in body
+        assert pids.isdisjoint(process.process.pid for process in pool._processes)
+
+    async def test_recycle_after_max_renders(self) -> None:
+        pool = RendererPool(
+            settings.EMAIL_RENDERER_BINARY_PATH, size=1, timeout=10.0, max_renders=1
+        )
+        try:
+            await pool.render("magic_link", _get_props("https://example.com"))
+            pid = pool._processes[0].process.pid
+
+            await pool.render("magic_link", _get_props("https://example.com"))
+
+            assert pool._processes[0].process.pid != pid
+        finally:
+            await pool.close()
@@ -1,4 +1,4 @@
-from polar.email.renderer import EmailRenderer
+from polar.email.renderer import EmailRenderer, get_email_renderer
 
 email_renderer = EmailRenderer()
 
@@ -14,3 +14,57 @@ def test_render_from_string() -> None:
     assert rendered_subject == "Hello, John!"
     assert rendered_body.startswith("<!DOCTYPE html")
     assert "<p>Hi, John! Welcome to Polar!</p>" in rendered_body
+
+
+def test_render_from_string_cached() -> None:
+    renderer = EmailRenderer()
+
+    first = renderer.render_from_string(
+        "Hello, {{ name }}!", "<p>{{ name }}</p>", context={"name": "John"}
+    )
+    second = renderer.render_from_string(
+        "Hello, {{ name }}!", "<p>{{ name }}</p>", context={"name": "Jane"}
+    )
+
+    assert first[0] == "Hello, John!"
+    assert second[0] == "Hello, Jane!"
+    assert "<p>Jane</p>" in second[1]
+    assert renderer._from_string.cache_info().hits == 2
+
+
+def test_render_many_from_template() -> None:
+    renderer = EmailRenderer({"oauth2": "polar.oauth2"})
+    contexts = [
+        {
+            "client_name": "Client",
+            "notifier": "GitHub",
+            "url": f"https://example.com/{name}",
+            "current_year": 2025,
+        }
+        for name in ("john", "jane")
+    ]
+
+    emails = renderer.render_many_from_template(
+        "Hello {{ client_name }}", "oauth2/leaked_token.html", contexts
+    )
+
+    assert [subject for subject, _ in emails] == ["Hello Client", "Hello Client"]
+    assert "https://example.com/john" in emails[0][1]
+    assert "https://example.com/jane" in emails[1][1]
+    assert (
+        emails[0][1]
+        == renderer.render_from_template(
+            "Hello {{ client_name }}", "oauth2/leaked_token.html", contexts[0]
+        )[1]
+    )
+
+
+def test_get_email_renderer() -> None:
+    renderer = get_email_renderer({"oauth2": "polar.oauth2", "order": "polar.order"})
+
+    assert (
+        get_email_renderer({"order": "polar.order", "oauth2": "polar.oauth2"})
+        is renderer
+    )
+    assert get_email_renderer({"oauth2": "polar.oauth2"}) is not renderer
+    assert get_email_renderer() is get_email_renderer({})
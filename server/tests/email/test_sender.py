@@ -0,0 +1,234 @@
+import json
+import uuid
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.email.sender import (
+    EMAIL_BATCH_SIZE,
+    ResendEmailSender,
+    SendEmailError,
+    enqueue_bulk_email,
+    enqueue_email,
+    get_email_content,
+    get_email_content_key,
+)
+from polar.email.tasks import email_send_batch
+from polar.redis import Redis
+from polar.worker import JobQueueManager
+
+from .conftest import FakeResendServer
+
+
+def test_enqueue_email_stores_content_once() -> None:
+    for to_email_addr in ("john@example.com", "jane@example.com"):
+        enqueue_email(
+            to_email_addr=to_email_addr, subject="Hello", html_content="<p>Hi</p>"
+        )
+
+    job_queue_manager = JobQueueManager.get()
+    content_key = get_email_content_key("Hello", "<p>Hi</p>")
+    assert list(job_queue_manager._stored_values) == [content_key]
+    value, _ = job_queue_manager._stored_values[content_key]
+    assert json.loads(value) == {"subject": "Hello", "html_content": "<p>Hi</p>"}
+
+    jobs = job_queue_manager._enqueued_jobs
+    assert [actor for actor, *_ in jobs] == ["email.send", "email.send"]
+    for _, _, kwargs, _ in jobs:
+        assert kwargs["content_key"] == content_key
+        assert "html_content" not in kwargs
+
+
+def test_enqueue_bulk_email() -> None:
+    to_email_addrs = [f"user{i}@example.com" for i in range(EMAIL_BATCH_SIZE + 1)]
+
+    enqueue_bulk_email(
+        to_email_addrs=to_email_addrs, subject="Hello", html_content="<p>Hi</p>"
+    )
+
+    job_queue_manager = JobQueueManager.get()
+    assert len(job_queue_manager._stored_values) == 1
+    jobs = job_queue_manager._enqueued_jobs
+    assert [actor for actor, *_ in jobs] == ["email.send_batch", "email.send_batch"]
+    assert [kwargs["to_email_addrs"] for _, _, kwargs, _ in jobs] == [
+        to_email_addrs[:EMAIL_BATCH_SIZE],
+        to_email_addrs[EMAIL_BATCH_SIZE:],
+    ]
+    assert [kwargs["batch_offset"] for _, _, kwargs, _ in jobs] == [
+        0,
+        EMAIL_BATCH_SIZE,
+    ]
+    # The jobs share the batch ID, another enqueue gets another one
+    assert len({kwargs["batch_id"] for _, _, kwargs, _ in jobs}) == 1
+    enqueue_bulk_email(
+        to_email_addrs=to_email_addrs, subject="Hello", html_content="<p>Hi</p>"
+    )
+    assert jobs[2][2]["batch_id"] != jobs[0][2]["batch_id"]
+
+
+@pytest.mark.asyncio
+class TestResendEmailSender:
+    async def test_send(
+        self,
+        resend_email_sender: ResendEmailSender,
+        fake_resend_server: FakeResendServer,
+    ) -> None:
+        await resend_email_sender.send(
+            to_email_addr="john@example.com", subject="Hello", html_content="<p>Hi</p>"
+        )
+
+        assert [request.url.path for request in fake_resend_server.requests] == [
+            "/emails"
+        ]
+        assert fake_resend_server.emails[0]["to"] == ["john@example.com"]
+
+    async def test_send_batch(
+        self,
+        resend_email_sender: ResendEmailSender,
+        fake_resend_server: FakeResendServer,
+    ) -> None:
+        to_email_addrs = [f"user{i}@example.com" for i in range(EMAIL_BATCH_SIZE + 1)]
+
+        await resend_email_sender.send_batch(
+            to_email_addrs=to_email_addrs,
+            subject="Hello",
+            html_content="<p>Hi</p>",
+            batch_id=uuid.uuid4(),
+        )
+
+        assert [request.url.path for request in fake_resend_server.requests] == [
+            "/emails/batch",
+            "/emails/batch",
+        ]
+        assert [email["to"] for email in fake_resend_server.emails] == [
+            [to_email_addr] for to_email_addr in to_email_addrs
+        ]
+
+    async def test_send_batch_idempotency_key(
+        self,
+        resend_email_sender: ResendEmailSender,
+        fake_resend_server: FakeResendServer,
+    ) -> None:
+        to_email_addrs = [f"user{i}@example.com" for i in range(EMAIL_BATCH_SIZE + 1)]
+
+        batch_id = uuid.uuid4()
+        for _ in range(2):
+            await resend_email_sender.send_batch(
+                to_email_addrs=to_email_addrs,
+                subject="Hello",
+                html_content="<p>Hi</p>",
+                batch_id=batch_id,
+            )
+        # Same email, enqueued again
+        await resend_email_sender.send_batch(
+            to_email_addrs=to_email_addrs,
+            subject="Hello",
+            html_content="<p>Hi</p>",
+            batch_id=uuid.uuid4(),
+        )
+        # Second job of the batch, retried
+        await resend_email_sender.send_batch(
+            to_email_addrs=to_email_addrs[EMAIL_BATCH_SIZE:],
+            subject="Hello",
+            html_content="<p>Hi</p>",
+            batch_id=batch_id,
+            batch_offset=EMAIL_BATCH_SIZE,
+        )
+
+        keys = [
+            request.headers["Idempotency-Key"]
+            for request in fake_resend_server.requests
+        ]
+        assert len(keys) == 7
+        # Each chunk has its own key, stable when the batch is sent again
+        assert keys[0] != keys[1]
+        assert keys[2:4] == keys[:2]
+        # Another batch has other keys
+        assert set(keys[4:6]).isdisjoint(keys[:2])
+        assert keys[6] == keys[1]
+
+    async def test_rate_limited(
+        self,
+        resend_email_sender: ResendEmailSender,
+        fake_resend_server: FakeResendServer,
+    ) -> None:
+        fake_resend_server.statuses = [429, 429]
+
+        await resend_email_sender.send(
+            to_email_addr="john@example.com", subject="Hello", html_content="<p>Hi</p>"
+        )
+
+        assert len(fake_resend_server.emails) == 1
+
+    async def test_rate_limited_exhausted(
+        self,
+        resend_email_sender: ResendEmailSender,
+        fake_resend_server: FakeResendServer,
+    ) -> None:
+        fake_resend_server.statuses = [429, 429, 429]
+
+        with pytest.raises(SendEmailError):
+            await resend_email_sender.send(
+                to_email_addr="john@example.com",
+                subject="Hello",
+                html_content="<p>Hi</p>",
+            )
+
+        assert fake_resend_server.emails == []
+
+
+@pytest.mark.asyncio
+class TestEmailSendBatch:
+    async def test_basic(
+        self,
+        mocker: MockerFixture,
+        redis: Redis,
+        resend_email_sender: ResendEmailSender,
+        fake_resend_server: FakeResendServer,
+    ) -> None:
+        mocker.patch("polar.email.tasks.email_sender", new=resend_email_sender)
+        content_key = get_email_content_key("Hello", "<p>Hi</p>")
+        await redis.set(
+            content_key,
+            json.dumps({"subject": "Hello", "html_content": "<p>Hi</p>"}),
+        )
+        assert await get_email_content(redis, content_key) == ("Hello", "<p>Hi</p>")
+
+        await email_send_batch(
+            to_email_addrs=["john@example.com", "jane@example.com"],
+            content_key=content_key,
+            batch_id=uuid.uuid4(),
+            batch_offset=0,
+            from_name="Polar",
+            from_email_addr="noreply@example.com",
+            email_headers={},
+            reply_to_name=None,
+            reply_to_email_addr=None,
+        )
+
+        assert [email["subject"] for email in fake_resend_server.emails] == [
+            "Hello",
+            "Hello",
+        ]
+
+    async def test_expired_content(
+        self,
+        mocker: MockerFixture,
+        resend_email_sender: ResendEmailSender,
+        fake_resend_server: FakeResendServer,
+    ) -> None:
+        mocker.patch("polar.email.tasks.email_sender", new=resend_email_sender)
+
+        await email_send_batch(
+            to_email_addrs=["john@example.com"],
+            content_key=get_email_content_key("Hello", "<p>Hi</p>"),
+            batch_id=uuid.uuid4(),
+            batch_offset=0,
+            from_name="Polar",
+            from_email_addr="noreply@example.com",
+            email_headers={},
+            reply_to_name=None,
+            reply_to_email_addr=None,
+        )
+
+        assert fake_resend_server.requests == []
@@ -0,0 +1,109 @@
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import delete, select
+
+from polar.event.partitions import event_partition as event_partition_service
+from polar.event.partitions import get_partition
+from polar.event.repository import EventRepository
+from polar.models import BillingEntry, Customer, Event, Organization, Product
+from polar.models.billing_entry import BillingEntryDirection
+from polar.postgres import AsyncSession
+from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_event
+
+
+def test_get_partition() -> None:
+    partition = get_partition(datetime(2025, 12, 17, 10, 30, tzinfo=UTC))
+
+    assert partition.name == "events_y2025m12"
+    assert partition.start == datetime(2025, 12, 1, tzinfo=UTC)
+    assert partition.end == datetime(2026, 1, 1, tzinfo=UTC)
+
+
+@pytest.mark.asyncio
+class TestCreateAhead:
+    async def test_basic(self, session: AsyncSession) -> None:
+        now = datetime(2020, 11, 17, tzinfo=UTC)
+
+        created = await event_partition_service.create_ahead(session, months=2, now=now)
+        assert [partition.name for partition in created] == [
+            "events_y2020m11",
+            "events_y2020m12",
+            "events_y2021m01",
+        ]
+
+        created = await event_partition_service.create_ahead(session, months=3, now=now)
+        assert [partition.name for partition in created] == ["events_y2021m02"]
+
+        partitions = await event_partition_service.list(session)
+        assert [partition.name for partition in partitions] == [
+            "events_y2020m11",
+            "events_y2020m12",
+            "events_y2021m01",
+            "events_y2021m02",
+        ]
+
+
+@pytest.mark.asyncio
+class TestDetachBefore:
+    async def test_basic(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+    ) -> None:
+        await event_partition_service.create_ahead(
+            session, months=2, now=datetime(2020, 11, 17, tzinfo=UTC)
+        )
+        event = await create_event(
+            save_fixture,
+            organization=organization,
+            ingested_at=datetime(2020, 11, 20, tzinfo=UTC),
+        )
+
+        detached = await event_partition_service.detach_before(
+            session, datetime(2021, 1, 1, tzinfo=UTC)
+        )
+
+        assert [partition.name for partition in detached] == [
+            "events_y2020m11",
+            "events_y2020m12",
+        ]
+        partitions = await event_partition_service.list(session)
+        assert [partition.name for partition in partitions] == ["events_y2021m01"]
+
+        # Events of detached partitions are not reachable from `events` anymore
+        session.expunge_all()
+        repository = EventRepository.from_session(session)
+        assert await repository.get_by_id(event.id) is None
+
+
+@pytest.mark.asyncio
+class TestDeleteEvent:
+    async def test_billing_entries_deleted(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+        product: Product,
+    ) -> None:
+        event = await create_event(
+            save_fixture, organization=customer.organization, customer=customer
+        )
+        billing_entry = BillingEntry(
+            start_timestamp=event.timestamp,
+            end_timestamp=event.timestamp,
+            direction=BillingEntryDirection.debit,
+            customer=customer,
+            product_price=product.prices[0],
+            event=event,
+        )
+        await save_fixture(billing_entry)
+
+        await session.execute(delete(Event).where(Event.id == event.id))
+
+        result = await session.execute(
+            select(BillingEntry.id).where(BillingEntry.id == billing_entry.id)
+        )
+        assert result.scalar_one_or_none() is None
@@ -7,7 +7,7 @@ from pydantic import ValidationError
 from pytest_mock import MockerFixture
 
 from polar.auth.models import AuthSubject, is_user
-from polar.event.repository import EventRepository
+from polar.event.repository import EventNameRepository, EventRepository
 from polar.event.schemas import (
     EventCreateCustomer,
     EventCreateExternalCustomer,
@@ -19,7 +19,7 @@ from polar.exceptions import PolarRequestValidationError
 from polar.kit.pagination import PaginationParams
 from polar.kit.utils import utc_now
 from polar.meter.filter import Filter, FilterClause, FilterConjunction, FilterOperator
-from polar.models import Customer, Organization, User, UserOrganization
+from polar.models import Customer, Event, Organization, User, UserOrganization
 from polar.models.event import EventSource
 from polar.postgres import AsyncSession
 from tests.fixtures.auth import AuthSubjectFixture
@@ -260,15 +260,24 @@ class TestListNames:
         organization: Organization,
         user_organization: UserOrganization,
     ) -> None:
+        events: list[Event] = []
         for i in range(5):
-            await create_event(save_fixture, organization=organization, name="event_1")
+            events.append(
+                await create_event(
+                    save_fixture, organization=organization, name="event_1"
+                )
+            )
         for i in range(3):
-            await create_event(
-                save_fixture,
-                organization=organization,
-                name="event_2",
-                source=EventSource.system,
+            events.append(
+                await create_event(
+                    save_fixture,
+                    organization=organization,
+                    name="event_2",
+                    source=EventSource.system,
+                )
             )
+        event_name_repository = EventNameRepository.from_session(session)
+        await event_name_repository.upsert_from_events([event.id for event in events])
 
         event_names, count = await event_service.list_names(
             session,
@@ -290,6 +299,42 @@ class TestListNames:
 
         assert count == 2
 
+    @pytest.mark.auth(AuthSubjectFixture(subject="organization"))
+    async def test_customer_filter(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        auth_subject: AuthSubject[Organization],
+        organization: Organization,
+        customer: Customer,
+        customer_second: Customer,
+    ) -> None:
+        for _ in range(2):
+            await create_event(
+                save_fixture,
+                organization=organization,
+                customer=customer,
+                name="event_1",
+            )
+        await create_event(
+            save_fixture,
+            organization=organization,
+            customer=customer_second,
+            name="event_2",
+        )
+
+        # Not in the catalog: aggregated from the events
+        event_names, count = await event_service.list_names(
+            session,
+            auth_subject,
+            customer_id=[customer.id],
+            pagination=PaginationParams(1, 10),
+        )
+
+        assert count == 1
+        assert event_names[0].name == "event_1"
+        assert event_names[0].occurrences == 2
+
 
 @pytest.mark.asyncio
 class TestIngest:
@@ -449,7 +494,8 @@ class TestIngest:
         for event in events:
             assert event.source == EventSource.user
 
-        enqueue_events_mock.assert_called_once_with(*(event.id for event in events))
+        enqueue_events_mock.assert_called_once()
+        assert set(enqueue_events_mock.call_args.args) == {event.id for event in events}
 
     @pytest.mark.parametrize("count", [0, 1, 500])
     @pytest.mark.auth(AuthSubjectFixture(subject="organization"))
@@ -479,7 +525,94 @@ class TestIngest:
         for event in events:
             assert event.source == EventSource.user
 
-        enqueue_events_mock.assert_called_once_with(*(event.id for event in events))
+        enqueue_events_mock.assert_called_once()
+        assert set(enqueue_events_mock.call_args.args) == {event.id for event in events}
+
+
+@pytest.mark.asyncio
+class TestEventNamesCatalog:
+    async def test_create_event(
+        self,
+        enqueue_events_mock: AsyncMock,
+        session: AsyncSession,
+        organization: Organization,
+    ) -> None:
+        first_timestamp = utc_now() - timedelta(days=1)
+        last_timestamp = utc_now()
+        for timestamp in (last_timestamp, first_timestamp):
+            await event_service.create_event(
+                session,
+                Event(
+                    name="event_1",
+                    source=EventSource.system,
+                    organization=organization,
+                    timestamp=timestamp,
+                ),
+            )
+
+        event_name_repository = EventNameRepository.from_session(session)
+        [event_name] = await event_name_repository.get_all_by_organization(
+            organization.id
+        )
+        await session.refresh(event_name)
+        assert event_name.name == "event_1"
+        assert event_name.source == EventSource.system
+        assert event_name.occurrences == 2
+        assert event_name.first_seen == first_timestamp
+        assert event_name.last_seen == last_timestamp
+
+    async def test_reconcile(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+    ) -> None:
+        # Keep the ID around, the organization is expired below
+        organization_id = organization.id
+        settled_at = utc_now() - timedelta(days=1)
+        events = [
+            # Settled, before the high-water mark
+            await create_event(
+                save_fixture,
+                organization=organization,
+                name="event_1",
+                timestamp=settled_at,
+                ingested_at=settled_at,
+            ),
+            await create_event(save_fixture, organization=organization, name="event_1"),
+            await create_event(save_fixture, organization=organization, name="event_2"),
+        ]
+        event_name_repository = EventNameRepository.from_session(session)
+        await event_name_repository.upsert_from_events([events[0].id, events[2].id])
+        # Events ingested without updating the catalog
+        await create_event(save_fixture, organization=organization, name="event_3")
+        # Name in the catalog without events
+        await event_name_repository.set_statistics(
+            organization_id,
+            [("event_4", EventSource.user, 1, utc_now(), utc_now())],
+        )
+
+        assert not await event_service.reconcile_names(session, organization_id)
+
+        session.expire_all()
+        event_names = {
+            event_name.name: event_name.occurrences
+            for event_name in await event_name_repository.get_all_by_organization(
+                organization_id
+            )
+        }
+        assert event_names == {"event_1": 2, "event_2": 1, "event_3": 1}
+
+        assert await event_service.reconcile_names(session, organization_id)
+
+        # Counted in the catalog as they're ingested
+        await event_service.create_event(
+            session,
+            Event(
+                name="event_1", source=EventSource.user, organization_id=organization_id
+            ),
+        )
+        assert await event_service.reconcile_names(session, organization_id)
 
 
 @pytest.mark.asyncio
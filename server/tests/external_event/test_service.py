@@ -1,9 +1,12 @@
+from datetime import timedelta
 from unittest.mock import AsyncMock
 
 import pytest
 from pytest_mock import MockerFixture
 
+from polar.config import settings
 from polar.external_event.service import external_event as external_event_service
+from polar.kit.utils import utc_now
 from polar.models import ExternalEvent
 from polar.models.external_event import ExternalEventSource
 from polar.postgres import AsyncSession
@@ -30,6 +33,54 @@ class TestEnqueue:
 
         enqueue_job_mock.assert_called_once_with("task_name", event.id)
 
+    async def test_lane(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        enqueue_job_mock: AsyncMock,
+    ) -> None:
+        mocker.patch.object(settings, "EXTERNAL_EVENT_LANES", 8)
+
+        first_event = await external_event_service.enqueue(
+            session,
+            ExternalEventSource.stripe,
+            "task_name",
+            "FIRST_EXTERNAL_EVENT_ID",
+            {},
+            partition_key="cus_1Abc",
+        )
+        second_event = await external_event_service.enqueue(
+            session,
+            ExternalEventSource.stripe,
+            "task_name",
+            "SECOND_EXTERNAL_EVENT_ID",
+            {},
+            partition_key="cus_1Abc",
+        )
+
+        assert first_event.lane is not None
+        assert 0 <= first_event.lane < 8
+        assert second_event.lane == first_event.lane
+
+        enqueue_job_mock.assert_called_with(
+            "external_event.process_lane", ExternalEventSource.stripe, first_event.lane
+        )
+
+    async def test_lanes_disabled(
+        self, session: AsyncSession, enqueue_job_mock: AsyncMock
+    ) -> None:
+        event = await external_event_service.enqueue(
+            session,
+            ExternalEventSource.stripe,
+            "task_name",
+            "EXTERNAL_EVENT_ID",
+            {},
+            partition_key="cus_1Abc",
+        )
+
+        assert event.lane is None
+        enqueue_job_mock.assert_called_once_with("task_name", event.id)
+
     async def test_already_existing(
         self,
         save_fixture: SaveFixture,
@@ -51,3 +102,130 @@ class TestEnqueue:
         assert event == existing_event
 
         enqueue_job_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+class TestGetLanePending:
+    async def test_ordered_by_source_creation(
+        self, save_fixture: SaveFixture, session: AsyncSession
+    ) -> None:
+        events = [
+            ExternalEvent(
+                source=ExternalEventSource.stripe,
+                task_name="task_name",
+                external_id=external_id,
+                data={"created": created},
+                lane=1,
+            )
+            for external_id, created in [("LATER", 200), ("EARLIER", 100)]
+        ]
+        for event in events:
+            await save_fixture(event)
+        await save_fixture(
+            ExternalEvent(
+                source=ExternalEventSource.stripe,
+                task_name="task_name",
+                external_id="OTHER_LANE",
+                data={"created": 50},
+                lane=2,
+            )
+        )
+        await save_fixture(
+            ExternalEvent(
+                source=ExternalEventSource.stripe,
+                task_name="task_name",
+                external_id="HANDLED",
+                data={"created": 50},
+                lane=1,
+                handled_at=utc_now(),
+            )
+        )
+
+        pending = await external_event_service.get_lane_pending(
+            session, ExternalEventSource.stripe, 1, limit=10
+        )
+
+        assert [event.external_id for event in pending] == ["EARLIER", "LATER"]
+
+
+@pytest.mark.asyncio
+class TestStreamUnhandled:
+    async def test_keyset_paging(
+        self, save_fixture: SaveFixture, session: AsyncSession
+    ) -> None:
+        now = utc_now()
+        for i in range(5):
+            await save_fixture(
+                ExternalEvent(
+                    source=ExternalEventSource.stripe,
+                    task_name="task_name",
+                    external_id=f"EVENT_{i}",
+                    data={},
+                    created_at=now - timedelta(minutes=10 - i),
+                )
+            )
+        await save_fixture(
+            ExternalEvent(
+                source=ExternalEventSource.stripe,
+                task_name="other_task_name",
+                external_id="OTHER_TASK",
+                data={},
+                created_at=now - timedelta(minutes=8),
+            )
+        )
+        await save_fixture(
+            ExternalEvent(
+                source=ExternalEventSource.stripe,
+                task_name="task_name",
+                external_id="HANDLED",
+                data={},
+                created_at=now - timedelta(minutes=8),
+                handled_at=now,
+            )
+        )
+
+        batches = [
+            [event.external_id for event in events]
+            async for events in external_event_service.stream_unhandled(
+                session,
+                ExternalEventSource.stripe,
+                task_name="task_name",
+                start=now - timedelta(minutes=9),
+                batch_size=2,
+            )
+        ]
+
+        assert batches == [["EVENT_1", "EVENT_2"], ["EVENT_3", "EVENT_4"]]
+
+
+@pytest.mark.asyncio
+class TestResendMany:
+    async def test_lanes_enqueued_once(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        enqueue_job_mock: AsyncMock,
+    ) -> None:
+        events = [
+            ExternalEvent(
+                source=ExternalEventSource.stripe,
+                task_name="task_name",
+                external_id=f"EVENT_{i}",
+                data={},
+                lane=lane,
+            )
+            for i, lane in enumerate([None, 1, 1, 2])
+        ]
+        for event in events:
+            await save_fixture(event)
+
+        await external_event_service.resend_many(events)
+
+        assert enqueue_job_mock.call_count == 3
+        enqueue_job_mock.assert_any_call("task_name", events[0].id)
+        enqueue_job_mock.assert_any_call(
+            "external_event.process_lane", ExternalEventSource.stripe, 1
+        )
+        enqueue_job_mock.assert_any_call(
+            "external_event.process_lane", ExternalEventSource.stripe, 2
+        )
@@ -0,0 +1,256 @@
+import asyncio
+import uuid
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.external_event.service import external_event as external_event_service
+from polar.external_event.tasks import LANE_MAX_ATTEMPTS, process_lane
+from polar.integrations.stripe import tasks as stripe_tasks  # noqa: F401
+from polar.locker import Locker
+from polar.models import ExternalEvent
+from polar.models.external_event import ExternalEventSource
+from polar.postgres import AsyncSession
+from polar.redis import Redis
+from polar.worker import JobQueueManager, can_retry, enqueue_job, get_retries
+from tests.fixtures.database import SaveFixture
+
+SOURCE = ExternalEventSource.stripe
+LANE = 1
+TASK_NAME = "stripe.webhook.payment_intent.succeeded"
+
+
+class Handler:
+    """Handle the events like a Stripe handler, failing on the given ones."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.calls: list[uuid.UUID] = []
+        self.retries: list[tuple[int, bool]] = []
+        self.failing: set[uuid.UUID] = set()
+
+    async def __call__(self, event_id: uuid.UUID) -> None:
+        self.calls.append(event_id)
+        self.retries.append((get_retries(), can_retry()))
+        async with external_event_service.handle(self.session, SOURCE, event_id):
+            enqueue_job("handled", event_id)
+            if event_id in self.failing:
+                raise ValueError("Handler failed")
+
+
+@pytest.fixture
+def handler(mocker: MockerFixture, session: AsyncSession) -> Handler:
+    handler = Handler(session)
+    mocker.patch("polar.external_event.tasks._get_handler", return_value=handler)
+    return handler
+
+
+@pytest.fixture
+def flushed_jobs(mocker: MockerFixture) -> list[list[tuple[str, Any]]]:
+    """Jobs enqueued at each flush of the job queue manager."""
+    flushes: list[list[tuple[str, Any]]] = []
+
+    async def _flush(self: JobQueueManager, *args: Any) -> None:
+        flushes.append([(name, args) for name, args, _, _ in self._enqueued_jobs])
+        self.reset()
+
+    mocker.patch.object(JobQueueManager, "flush", new=_flush)
+    return flushes
+
+
+@pytest.fixture
+def enqueue_lane_mock(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("polar.external_event.tasks.enqueue_job")
+
+
+@pytest.fixture
+def enqueue_handling_mock(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("polar.external_event.service.enqueue_job")
+
+
+async def _create_lane_events(
+    save_fixture: SaveFixture, *created: int
+) -> list[ExternalEvent]:
+    events: list[ExternalEvent] = []
+    for i, created_at in enumerate(created):
+        event = ExternalEvent(
+            source=SOURCE,
+            task_name=TASK_NAME,
+            external_id=f"EVENT_{i}",
+            data={"created": created_at},
+            lane=LANE,
+        )
+        await save_fixture(event)
+        events.append(event)
+    return events
+
+
+async def _get_event(session: AsyncSession, event: ExternalEvent) -> ExternalEvent:
+    # The task closes the session, detaching the fixtures
+    reloaded = await session.get(ExternalEvent, event.id, populate_existing=True)
+    assert reloaded is not None
+    return reloaded
+
+
+@pytest.mark.asyncio
+class TestProcessLane:
+    async def test_order(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        handler: Handler,
+        flushed_jobs: list[list[tuple[str, Any]]],
+        enqueue_lane_mock: MagicMock,
+    ) -> None:
+        later, earliest, earlier = await _create_lane_events(
+            save_fixture, 300, 100, 200
+        )
+
+        await process_lane(SOURCE, LANE)
+
+        assert handler.calls == [earliest.id, earlier.id, later.id]
+        for event in (earliest, earlier, later):
+            assert (await _get_event(session, event)).is_handled
+
+        # The jobs of each handler are flushed right after it
+        assert flushed_jobs[:3] == [
+            [("handled", (earliest.id,))],
+            [("handled", (earlier.id,))],
+            [("handled", (later.id,))],
+        ]
+        enqueue_lane_mock.assert_not_called()
+
+    async def test_resume_after_failure(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        redis: Redis,
+        handler: Handler,
+        flushed_jobs: list[list[tuple[str, Any]]],
+        enqueue_lane_mock: MagicMock,
+    ) -> None:
+        first, second, third = await _create_lane_events(save_fixture, 100, 200, 300)
+        handler.failing.add(second.id)
+
+        with pytest.raises(ValueError):
+            await process_lane(SOURCE, LANE)
+
+        assert handler.calls == [first.id, second.id]
+        assert (await _get_event(session, first)).is_handled
+        assert not (await _get_event(session, second)).is_handled
+        assert not (await _get_event(session, third)).is_handled
+        # The jobs of the failed handler are dropped
+        assert [("handled", (first.id,))] in flushed_jobs
+        assert all(("handled", (second.id,)) not in flush for flush in flushed_jobs)
+        # The lane isn't locked anymore
+        assert not await Locker(redis).is_locked(f"external_event_lane:{SOURCE}:{LANE}")
+
+        handler.calls = []
+        handler.failing.clear()
+        await process_lane(SOURCE, LANE)
+
+        assert handler.calls == [second.id, third.id]
+        assert (await _get_event(session, second)).is_handled
+        assert (await _get_event(session, third)).is_handled
+
+    async def test_left_after_max_attempts(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        handler: Handler,
+        flushed_jobs: list[list[tuple[str, Any]]],
+        enqueue_lane_mock: MagicMock,
+        enqueue_handling_mock: MagicMock,
+    ) -> None:
+        poisoned, next_event = await _create_lane_events(save_fixture, 100, 200)
+        handler.failing.add(poisoned.id)
+
+        for _ in range(LANE_MAX_ATTEMPTS - 1):
+            with pytest.raises(ValueError):
+                await process_lane(SOURCE, LANE)
+        assert not (await _get_event(session, next_event)).is_handled
+
+        await process_lane(SOURCE, LANE)
+
+        poisoned = await _get_event(session, poisoned)
+        assert poisoned.lane is None
+        assert not poisoned.is_handled
+        enqueue_handling_mock.assert_called_once_with(TASK_NAME, poisoned.id)
+        # The handler sees the lane attempts as its retries
+        assert handler.retries[:LANE_MAX_ATTEMPTS] == [
+            (attempt, attempt < LANE_MAX_ATTEMPTS - 1)
+            for attempt in range(LANE_MAX_ATTEMPTS)
+        ]
+        assert (await _get_event(session, next_event)).is_handled
+
+    async def test_time_limit(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        mocker: MockerFixture,
+        flushed_jobs: list[list[tuple[str, Any]]],
+        enqueue_lane_mock: MagicMock,
+    ) -> None:
+        mocker.patch("polar.external_event.tasks.LANE_EVENT_TIME_LIMIT", 10)
+        slow, next_event = await _create_lane_events(save_fixture, 100, 200)
+
+        class SlowHandler(Handler):
+            async def __call__(self, event_id: uuid.UUID) -> None:
+                await super().__call__(event_id)
+                if event_id == slow.id:
+                    await asyncio.sleep(1)
+
+        handler = SlowHandler(session)
+        mocker.patch("polar.external_event.tasks._get_handler", return_value=handler)
+
+        with pytest.raises(TimeoutError):
+            await process_lane(SOURCE, LANE)
+
+        assert handler.calls == [slow.id]
+        assert not (await _get_event(session, next_event)).is_handled
+
+    async def test_busy(
+        self,
+        save_fixture: SaveFixture,
+        redis: Redis,
+        handler: Handler,
+        enqueue_lane_mock: MagicMock,
+    ) -> None:
+        await _create_lane_events(save_fixture, 100)
+
+        locker = Locker(redis)
+        async with locker.lock(
+            f"external_event_lane:{SOURCE}:{LANE}", timeout=10, blocking_timeout=1
+        ):
+            await process_lane(SOURCE, LANE)
+
+        assert handler.calls == []
+        assert await redis.exists(f"external_event_lane:{SOURCE}:{LANE}:pending")
+
+    async def test_reenqueued_when_flagged_while_running(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        mocker: MockerFixture,
+        flushed_jobs: list[list[tuple[str, Any]]],
+        enqueue_lane_mock: MagicMock,
+    ) -> None:
+        (event,) = await _create_lane_events(save_fixture, 100)
+
+        class ConcurrentHandler(Handler):
+            async def __call__(self, event_id: uuid.UUID) -> None:
+                await super().__call__(event_id)
+                # Another job for the lane comes in while we're running
+                await process_lane(SOURCE, LANE)
+
+        handler = ConcurrentHandler(session)
+        mocker.patch("polar.external_event.tasks._get_handler", return_value=handler)
+
+        await process_lane(SOURCE, LANE)
+
+        assert handler.calls == [event.id]
+        enqueue_lane_mock.assert_called_once_with(
+            "external_event.process_lane", SOURCE, LANE
+        )
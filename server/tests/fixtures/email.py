@@ -2,14 +2,16 @@ import asyncio
 import os
 import tempfile
 import webbrowser
-from collections.abc import Callable, Coroutine
+from collections.abc import AsyncIterator, Callable, Coroutine
 from pathlib import Path
 from types import TracebackType
 from typing import TYPE_CHECKING, Any
 
+import pytest_asyncio
 import structlog
 from watchfiles import awatch
 
+from polar.email.react import email_renderer_pool
 from polar.email.sender import (
     DEFAULT_FROM_EMAIL_ADDRESS,
     DEFAULT_FROM_NAME,
@@ -21,6 +23,13 @@ if TYPE_CHECKING:
     from tempfile import _TemporaryFileWrapper as TemporaryFileWrapper
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def close_email_renderer_pool() -> AsyncIterator[None]:
+    yield
+    # Its processes are bound to the event loop of the test
+    await email_renderer_pool.close()
+
+
 class WatcherEmailRenderer:
     def __init__(self) -> None:
         self._temporary_file: TemporaryFileWrapper[str] | None = None
@@ -1548,12 +1548,14 @@ async def create_event(
     source: EventSource = EventSource.user,
     name: str = "test",
     timestamp: datetime | None = None,
+    ingested_at: datetime | None = None,
     customer: Customer | None = None,
     external_customer_id: str | None = None,
     metadata: dict[str, str | int | bool | float] | None = None,
 ) -> Event:
     event = Event(
         timestamp=timestamp or utc_now(),
+        ingested_at=ingested_at or utc_now(),
         source=source,
         name=name,
         customer_id=customer.id if customer else None,
@@ -0,0 +1,60 @@
+import httpx
+import pytest
+
+from polar.integrations.discord.client import (
+    BASE_URL,
+    DiscordClient,
+    DiscordRateLimitError,
+)
+
+
+def _get_client(response: httpx.Response) -> DiscordClient:
+    client = DiscordClient("Bot", "TOKEN")
+    client.client = httpx.AsyncClient(
+        base_url=BASE_URL, transport=httpx.MockTransport(lambda _: response)
+    )
+    return client
+
+
+@pytest.mark.asyncio
+class TestRateLimit:
+    async def test_body(self) -> None:
+        client = _get_client(
+            httpx.Response(
+                429,
+                json={
+                    "message": "You are being rate limited.",
+                    "retry_after": 1.5,
+                    "global": True,
+                },
+            )
+        )
+
+        with pytest.raises(DiscordRateLimitError) as e:
+            await client.remove_member_role("GUILD_ID", "USER_ID", "ROLE_ID")
+
+        assert e.value.retry_after == 1.5
+        assert e.value.is_global is True
+
+    async def test_headers(self) -> None:
+        client = _get_client(
+            httpx.Response(
+                429,
+                headers={"Retry-After": "3", "X-RateLimit-Scope": "user"},
+                text="Too Many Requests",
+            )
+        )
+
+        with pytest.raises(DiscordRateLimitError) as e:
+            await client.remove_member_role("GUILD_ID", "USER_ID", "ROLE_ID")
+
+        assert e.value.retry_after == 3.0
+        assert e.value.is_global is False
+
+    async def test_other_error(self) -> None:
+        client = _get_client(httpx.Response(404, json={"message": "Unknown Member"}))
+
+        with pytest.raises(httpx.HTTPStatusError) as e:
+            await client.remove_member_role("GUILD_ID", "USER_ID", "ROLE_ID")
+
+        assert not isinstance(e.value, DiscordRateLimitError)
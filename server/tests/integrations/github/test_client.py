@@ -0,0 +1,45 @@
+from collections.abc import Iterator
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.integrations.github import client as github_client
+from polar.integrations.github.client import get_app_installation_client
+
+
+@pytest.fixture(autouse=True)
+def clear_app_installation_clients() -> Iterator[None]:
+    github_client._app_installation_clients.clear()
+    yield
+    github_client._app_installation_clients.clear()
+
+
+class TestGetAppInstallationClient:
+    def test_reused(self) -> None:
+        client = get_app_installation_client(1)
+
+        assert get_app_installation_client(1) is client
+        assert get_app_installation_client(2) is not client
+
+    def test_bounded_size(self, mocker: MockerFixture) -> None:
+        mocker.patch.object(github_client, "APP_INSTALLATION_CLIENTS_MAX_SIZE", 2)
+
+        first = get_app_installation_client(1)
+        second = get_app_installation_client(2)
+        # Touch the first one, so the second is the least recently used
+        get_app_installation_client(1)
+        get_app_installation_client(3)
+
+        assert len(github_client._app_installation_clients) == 2
+        assert get_app_installation_client(1) is first
+        assert get_app_installation_client(2) is not second
+
+    def test_expired(self, mocker: MockerFixture) -> None:
+        monotonic_mock = mocker.patch(
+            "polar.integrations.github.client.time.monotonic", return_value=1000.0
+        )
+        client = get_app_installation_client(1)
+
+        monotonic_mock.return_value += github_client.APP_INSTALLATION_CLIENTS_TTL
+
+        assert get_app_installation_client(1) is not client
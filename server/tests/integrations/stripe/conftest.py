@@ -0,0 +1,61 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from polar.integrations.stripe.http_client import StripeHTTPClient
+
+
+class FakeStripeServer:
+    """
+    Minimal stand-in for the Stripe API, answering every request with an object
+    named after the requested path, after a configurable latency.
+
+    Responses can be forced by pushing status codes to `statuses`,
+    e.g. to simulate rate limiting.
+    """
+
+    def __init__(self, latency: float = 0.01) -> None:
+        self.latency = latency
+        self.statuses: list[int] = []
+        self.requests: list[httpx.Request] = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        await asyncio.sleep(self.latency)
+
+        status_code = self.statuses.pop(0) if self.statuses else 200
+        if status_code == 429:
+            return httpx.Response(
+                429,
+                headers={"Retry-After": "0"},
+                json={"error": {"type": "invalid_request_error", "code": "rate_limit"}},
+            )
+
+        id = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(status_code, content=json.dumps({"id": id}))
+
+
+@pytest.fixture
+def fake_stripe_server() -> FakeStripeServer:
+    return FakeStripeServer()
+
+
+@pytest_asyncio.fixture
+async def stripe_http_client(
+    fake_stripe_server: FakeStripeServer,
+) -> AsyncIterator[StripeHTTPClient]:
+    client = StripeHTTPClient(
+        rate_limit=100.0,
+        rate_limit_capacity=100,
+        rate_limit_timeout=1.0,
+        max_rate_limited_retries=2,
+    )
+    client._client_async = httpx.AsyncClient(
+        transport=httpx.MockTransport(fake_stripe_server.handler)
+    )
+    yield client
+    await client._client_async.aclose()
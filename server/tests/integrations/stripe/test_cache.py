@@ -0,0 +1,128 @@
+from datetime import timedelta
+from typing import Any
+from unittest.mock import AsyncMock
+
+import pytest
+import stripe as stripe_lib
+
+from polar.integrations.stripe.cache import StripeObjectCache
+from polar.redis import Redis
+
+
+def _build_charge(**kwargs: Any) -> stripe_lib.Charge:
+    return stripe_lib.Charge.construct_from(
+        {
+            "id": "ch_1Abc",
+            "object": "charge",
+            "status": "succeeded",
+            "balance_transaction": "txn_1Abc",
+            **kwargs,
+        },
+        key=None,
+    )
+
+
+def _is_final(charge: stripe_lib.Charge) -> bool:
+    return charge.status == "succeeded"
+
+
+@pytest.fixture
+def stripe_object_cache(redis: Redis) -> StripeObjectCache:
+    cache = StripeObjectCache(local_size=2, ttl=timedelta(minutes=1))
+    cache.set_redis(redis)
+    return cache
+
+
+@pytest.mark.asyncio
+class TestGetOrRetrieve:
+    async def test_final(self, stripe_object_cache: StripeObjectCache) -> None:
+        retrieve = AsyncMock(return_value=_build_charge())
+
+        for _ in range(3):
+            charge = await stripe_object_cache.get_or_retrieve(
+                stripe_lib.Charge, "ch_1Abc", retrieve, is_final=_is_final
+            )
+            assert isinstance(charge, stripe_lib.Charge)
+            assert charge.id == "ch_1Abc"
+            assert charge.balance_transaction == "txn_1Abc"
+
+        retrieve.assert_awaited_once()
+
+    async def test_not_final(self, stripe_object_cache: StripeObjectCache) -> None:
+        retrieve = AsyncMock(return_value=_build_charge(status="pending"))
+
+        for _ in range(2):
+            await stripe_object_cache.get_or_retrieve(
+                stripe_lib.Charge, "ch_1Abc", retrieve, is_final=_is_final
+            )
+
+        assert retrieve.await_count == 2
+
+    async def test_shared_through_redis(
+        self, redis: Redis, stripe_object_cache: StripeObjectCache
+    ) -> None:
+        await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Charge,
+            "ch_1Abc",
+            AsyncMock(return_value=_build_charge()),
+            is_final=_is_final,
+        )
+
+        other_cache = StripeObjectCache(local_size=2, ttl=timedelta(minutes=1))
+        other_cache.set_redis(redis)
+        retrieve = AsyncMock()
+        charge = await other_cache.get_or_retrieve(
+            stripe_lib.Charge, "ch_1Abc", retrieve, is_final=_is_final
+        )
+
+        assert charge.id == "ch_1Abc"
+        retrieve.assert_not_awaited()
+
+    async def test_keyed_by_expand(
+        self, stripe_object_cache: StripeObjectCache
+    ) -> None:
+        retrieve = AsyncMock(return_value=_build_charge())
+
+        await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Charge, "ch_1Abc", retrieve, is_final=_is_final
+        )
+        await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Charge,
+            "ch_1Abc",
+            retrieve,
+            is_final=_is_final,
+            expand=["balance_transaction"],
+        )
+
+        assert retrieve.await_count == 2
+
+    async def test_local_eviction(self) -> None:
+        cache = StripeObjectCache(local_size=2, ttl=timedelta(minutes=1))
+
+        for id in ("ch_1", "ch_2", "ch_3"):
+            await cache.get_or_retrieve(
+                stripe_lib.Charge,
+                id,
+                AsyncMock(return_value=_build_charge(id=id)),
+                is_final=_is_final,
+            )
+
+        retrieve = AsyncMock(return_value=_build_charge(id="ch_1"))
+        await cache.get_or_retrieve(
+            stripe_lib.Charge, "ch_1", retrieve, is_final=_is_final
+        )
+        retrieve.assert_awaited_once()
+
+    async def test_returned_objects_not_shared(
+        self, stripe_object_cache: StripeObjectCache
+    ) -> None:
+        retrieve = AsyncMock(return_value=_build_charge())
+        charge = await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Charge, "ch_1Abc", retrieve, is_final=_is_final
+        )
+        charge.status = "failed"
+
+        charge = await stripe_object_cache.get_or_retrieve(
+            stripe_lib.Charge, "ch_1Abc", retrieve, is_final=_is_final
+        )
+        assert charge.status == "succeeded"
@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+import pytest
+import structlog
+
+from polar.integrations.stripe.http_client import StripeHTTPClient, get_operation
+from polar.redis import Redis
+
+from .conftest import FakeStripeServer
+
+HEADERS = {"Authorization": "Bearer sk_test_KEY"}
+
+
+@pytest.mark.parametrize(
+    "method,url,expected",
+    [
+        ("get", "https://api.stripe.com/v1/charges/ch_3Nabc", "GET /v1/charges/{id}"),
+        (
+            "post",
+            "https://api.stripe.com/v1/payment_intents/pi_1Abc/confirm",
+            "POST /v1/payment_intents/{id}/confirm",
+        ),
+        (
+            "get",
+            "https://api.stripe.com/v1/invoices/in_1Abc?expand[0]=charge",
+            "GET /v1/invoices/{id}",
+        ),
+        (
+            "post",
+            "https://api.stripe.com/v1/tax/calculations",
+            "POST /v1/tax/calculations",
+        ),
+    ],
+)
+def test_get_operation(method: str, url: str, expected: str) -> None:
+    assert get_operation(method, url) == expected
+
+
+@pytest.mark.asyncio
+class TestRequestAsync:
+    async def test_coalesce_get(
+        self,
+        stripe_http_client: StripeHTTPClient,
+        fake_stripe_server: FakeStripeServer,
+    ) -> None:
+        url = "https://api.stripe.com/v1/charges/ch_1Abc"
+        responses = await asyncio.gather(
+            *(stripe_http_client.request_async("get", url, HEADERS) for _ in range(5))
+        )
+
+        assert len(fake_stripe_server.requests) == 1
+        assert all(response[1] == 200 for response in responses)
+        assert len({response[0] for response in responses}) == 1
+
+        # Coalescing only applies to requests in flight
+        await stripe_http_client.request_async("get", url, HEADERS)
+        assert len(fake_stripe_server.requests) == 2
+
+    async def test_not_coalesce_different_account(
+        self,
+        stripe_http_client: StripeHTTPClient,
+        fake_stripe_server: FakeStripeServer,
+    ) -> None:
+        url = "https://api.stripe.com/v1/charges/ch_1Abc"
+        await asyncio.gather(
+            stripe_http_client.request_async("get", url, HEADERS),
+            stripe_http_client.request_async(
+                "get", url, {**HEADERS, "Stripe-Account": "acct_1Abc"}
+            ),
+        )
+
+        assert len(fake_stripe_server.requests) == 2
+
+    async def test_not_coalesce_post(
+        self,
+        stripe_http_client: StripeHTTPClient,
+        fake_stripe_server: FakeStripeServer,
+    ) -> None:
+        url = "https://api.stripe.com/v1/transfers"
+        await asyncio.gather(
+            *(
+                stripe_http_client.request_async("post", url, HEADERS, "amount=100")
+                for _ in range(3)
+            )
+        )
+
+        assert len(fake_stripe_server.requests) == 3
+
+    async def test_rate_limited_retry(
+        self,
+        stripe_http_client: StripeHTTPClient,
+        fake_stripe_server: FakeStripeServer,
+    ) -> None:
+        fake_stripe_server.statuses = [429, 429]
+
+        _, status_code, _ = await stripe_http_client.request_async(
+            "get", "https://api.stripe.com/v1/invoices/in_1Abc", HEADERS
+        )
+
+        assert status_code == 200
+        assert len(fake_stripe_server.requests) == 3
+
+    async def test_rate_limited_exhausted(
+        self,
+        stripe_http_client: StripeHTTPClient,
+        fake_stripe_server: FakeStripeServer,
+    ) -> None:
+        fake_stripe_server.statuses = [429, 429, 429, 429]
+
+        _, status_code, _ = await stripe_http_client.request_async(
+            "get", "https://api.stripe.com/v1/invoices/in_1Abc", HEADERS
+        )
+
+        assert status_code == 429
+        assert len(fake_stripe_server.requests) == 3
+
+    async def test_shared_rate_limit(
+        self,
+        redis: Redis,
+        stripe_http_client: StripeHTTPClient,
+        fake_stripe_server: FakeStripeServer,
+    ) -> None:
+        stripe_http_client.rate_limit = 10.0
+        stripe_http_client.rate_limit_capacity = 2
+        stripe_http_client.set_redis(redis)
+
+        start = time.perf_counter()
+        for i in range(4):
+            await stripe_http_client.request_async(
+                "post", "https://api.stripe.com/v1/transfers", HEADERS, f"amount={i}"
+            )
+
+        # The two requests over capacity waited for the bucket to refill
+        assert time.perf_counter() - start >= 0.15
+        assert len(fake_stripe_server.requests) == 4
+
+
+@pytest.mark.asyncio
+async def test_benchmark_coalescing(
+    stripe_http_client: StripeHTTPClient, fake_stripe_server: FakeStripeServer
+) -> None:
+    """
+    Simulate a burst of reads on a few hot objects, as when many actors
+    look up the same invoices and charges.
+    """
+    fake_stripe_server.latency = 0.05
+    urls = [f"https://api.stripe.com/v1/invoices/in_{i}Abc" for i in range(10)]
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            stripe_http_client.request_async("get", urls[i % len(urls)], HEADERS)
+            for i in range(500)
+        )
+    )
+    duration = time.perf_counter() - start
+
+    structlog.get_logger().info(
+        "stripe.benchmark.coalescing",
+        requests=500,
+        upstream_requests=len(fake_stripe_server.requests),
+        duration=duration,
+    )
+    assert len(fake_stripe_server.requests) == len(urls)
@@ -1,7 +1,15 @@
+from typing import Any
+
 import pytest
 from pydantic import ValidationError
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.dialects import postgresql
 
-from polar.kit.metadata import MetadataInputMixin
+from polar.kit.metadata import MetadataInputMixin, MetadataMixin, get_metadata_clause
+from polar.models import Customer, Event, Order, Organization, Subscription
+from polar.postgres import AsyncSession
+from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_customer
 
 
 class MetadataSchema(MetadataInputMixin): ...
@@ -25,3 +33,139 @@ def test_serialization() -> None:
 
     dump = schema.model_dump(by_alias=True)
     assert dump["user_metadata"] == schema.metadata
+
+
+@pytest.mark.asyncio
+class TestGetMetadataClause:
+    async def test_values(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+    ) -> None:
+        metadatas: list[dict[str, Any]] = [
+            {"key": "1"},
+            {"key": 1},
+            {"key": "true"},
+            {"key": True},
+            {"key": "other"},
+            {"key": 2, "other": "1"},
+            {},
+        ]
+        customers = [
+            await create_customer(
+                save_fixture,
+                organization=organization,
+                email=f"customer{i}@example.com",
+                user_metadata=metadata,
+            )
+            for i, metadata in enumerate(metadatas)
+        ]
+
+        statement = select(Customer.id).where(
+            Customer.organization_id == organization.id,
+            get_metadata_clause(Customer, {"key": ["1", "true"]}),
+        )
+        result = await session.execute(statement)
+
+        assert set(result.scalars().all()) == {
+            customer.id for customer in customers[:4]
+        }
+
+    async def test_number_spellings(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+    ) -> None:
+        metadatas: list[dict[str, Any]] = [
+            {"key": 1},
+            {"key": 1.0},
+            {"key": "1"},
+            {"key": "1.0"},
+        ]
+        customers = [
+            await create_customer(
+                save_fixture,
+                organization=organization,
+                email=f"customer{i}@example.com",
+                user_metadata=metadata,
+            )
+            for i, metadata in enumerate(metadatas)
+        ]
+
+        statement = select(Customer.id).where(
+            Customer.organization_id == organization.id,
+            get_metadata_clause(Customer, {"key": ["1.0"]}),
+        )
+        result = await session.execute(statement)
+
+        # Numbers are compared by value, strings as they are
+        assert set(result.scalars().all()) == {
+            customers[0].id,
+            customers[1].id,
+            customers[3].id,
+        }
+
+    @pytest.mark.parametrize(
+        ("model", "tablename"),
+        [
+            (Customer, "customers"),
+            (Order, "orders"),
+            (Subscription, "subscriptions"),
+            (Event, "events"),
+        ],
+    )
+    async def test_index(
+        self, session: AsyncSession, model: type[MetadataMixin], tablename: str
+    ) -> None:
+        result = await session.execute(
+            text(
+                "SELECT indexdef FROM pg_indexes "
+                "WHERE tablename = :tablename AND indexname = :indexname"
+            ),
+            {"tablename": tablename, "indexname": f"ix_{tablename}_user_metadata"},
+        )
+        indexdef = result.scalar_one()
+
+        assert "USING gin (user_metadata jsonb_path_ops)" in indexdef
+
+        # `jsonb_path_ops` only serves containment queries
+        clause = select(model).where(get_metadata_clause(model, {"key": ["value"]}))
+        compiled = str(clause.compile(dialect=postgresql.dialect()))
+        assert f"{tablename}.user_metadata @>" in compiled
+
+    @pytest.mark.parametrize(
+        ("model", "tablename"),
+        [
+            (Customer, "customers"),
+            (Order, "orders"),
+            (Subscription, "subscriptions"),
+            (Event, "events"),
+        ],
+    )
+    async def test_index_usage(
+        self, session: AsyncSession, model: type[MetadataMixin], tablename: str
+    ) -> None:
+        # Tables are empty in tests: force the planner to consider the index
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+
+        statement = select(model).where(
+            get_metadata_clause(model, {"key": ["value", "1"], "other": ["value"]})
+        )
+        compiled = statement.compile(dialect=postgresql.dialect(paramstyle="named"))
+        # Escape the casts, so `text` doesn't mistake them for parameters
+        sql = str(compiled).replace("::", "\\:\\:")
+        explain = text(f"EXPLAIN {sql}").bindparams(
+            *(
+                bindparam(name, value, type_=compiled.binds[name].type)
+                for name, value in compiled.params.items()
+            )
+        )
+        result = await session.execute(explain)
+        plan = "\n".join(result.scalars().all())
+
+        assert "Bitmap Index Scan" in plan
+        assert "user_metadata" in plan
+        # Relationships loaded with the model may still be scanned
+        assert f"Seq Scan on {tablename}" not in plan
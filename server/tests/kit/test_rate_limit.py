@@ -0,0 +1,38 @@
+import pytest
+
+from polar.kit.rate_limit import RateLimiter, RateLimitTimeout
+from polar.redis import Redis
+
+
+@pytest.mark.asyncio
+class TestRateLimiter:
+    async def test_burst_within_capacity(self, redis: Redis) -> None:
+        rate_limiter = RateLimiter(redis, "test", rate=1.0, capacity=3)
+
+        for _ in range(3):
+            assert await rate_limiter.try_acquire() == 0
+
+        wait = await rate_limiter.try_acquire()
+        assert 0 < wait <= 1.0
+
+    async def test_shared_bucket(self, redis: Redis) -> None:
+        rate_limiter_a = RateLimiter(redis, "test", rate=1.0, capacity=1)
+        rate_limiter_b = RateLimiter(redis, "test", rate=1.0, capacity=1)
+
+        assert await rate_limiter_a.try_acquire() == 0
+        assert await rate_limiter_b.try_acquire() > 0
+
+    async def test_block(self, redis: Redis) -> None:
+        rate_limiter = RateLimiter(redis, "test", rate=100.0, capacity=100)
+
+        await rate_limiter.block(30)
+
+        wait = await rate_limiter.try_acquire()
+        assert 29 < wait <= 30
+
+    async def test_acquire_timeout(self, redis: Redis) -> None:
+        rate_limiter = RateLimiter(redis, "test", rate=0.1, capacity=1)
+
+        await rate_limiter.acquire()
+        with pytest.raises(RateLimitTimeout):
+            await rate_limiter.acquire(timeout=1.0)
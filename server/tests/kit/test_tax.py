@@ -0,0 +1,65 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.integrations.stripe.service import StripeService
+from polar.kit.address import Address
+from polar.kit.tax import calculate_tax_quote
+from polar.locker import Locker
+
+
+@pytest.fixture
+def stripe_service_mock(mocker: MockerFixture) -> MagicMock:
+    mock = MagicMock(spec=StripeService)
+    mocker.patch("polar.kit.tax.stripe_service", new=mock)
+    return mock
+
+
+async def _create_tax_calculation(**kwargs: object) -> MagicMock:
+    await asyncio.sleep(0.1)
+    return MagicMock(id="TAX_CALCULATION_ID", tax_amount_exclusive=200)
+
+
+@pytest.mark.asyncio
+class TestCalculateTaxQuote:
+    async def test_shared_cache(
+        self, locker: Locker, stripe_service_mock: MagicMock
+    ) -> None:
+        stripe_service_mock.create_tax_calculation = AsyncMock(
+            side_effect=_create_tax_calculation
+        )
+        address = Address.model_validate({"country": "FR"})
+
+        tax_amount = await calculate_tax_quote(
+            locker, "usd", 1000, "prod_1", address, []
+        )
+        assert tax_amount == 200
+
+        tax_amount = await calculate_tax_quote(
+            locker, "usd", 1000, "prod_1", address, []
+        )
+        assert tax_amount == 200
+        stripe_service_mock.create_tax_calculation.assert_called_once()
+
+        await calculate_tax_quote(locker, "usd", 2000, "prod_1", address, [])
+        assert stripe_service_mock.create_tax_calculation.call_count == 2
+
+    async def test_single_flight(
+        self, locker: Locker, stripe_service_mock: MagicMock
+    ) -> None:
+        stripe_service_mock.create_tax_calculation = AsyncMock(
+            side_effect=_create_tax_calculation
+        )
+        address = Address.model_validate({"country": "FR"})
+
+        tax_amounts = await asyncio.gather(
+            *(
+                calculate_tax_quote(locker, "usd", 1000, "prod_1", address, [])
+                for _ in range(5)
+            )
+        )
+
+        assert tax_amounts == [200] * 5
+        stripe_service_mock.create_tax_calculation.assert_called_once()
@@ -0,0 +1,201 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+
+from polar.config import settings
+from polar.exceptions import NotPermitted, PolarError
+from polar.kit.db.postgres import AsyncSession, create_async_engine
+from polar.license_key.repository import LicenseKeyRepository
+from polar.license_key.schemas import LicenseKeyActivate, LicenseKeyDeactivate
+from polar.license_key.service import license_key as license_key_service
+from polar.models import Benefit, Customer, LicenseKey, Organization
+from polar.models.benefit import BenefitType
+from tests.fixtures.database import SaveFixture, get_database_url, save_fixture_factory
+from tests.fixtures.random_objects import (
+    create_benefit,
+    create_customer,
+    create_organization,
+)
+
+CONCURRENT_ACTIVATIONS = 20
+LIMIT_ACTIVATIONS = 5
+
+
+async def create_license_key(
+    save_fixture: SaveFixture,
+    *,
+    organization: Organization,
+    customer: Customer,
+    benefit: Benefit,
+    limit_activations: int | None = LIMIT_ACTIVATIONS,
+) -> LicenseKey:
+    license_key = LicenseKey(
+        organization=organization,
+        customer=customer,
+        benefit=benefit,
+        key=str(benefit.id).upper(),
+        limit_activations=limit_activations,
+    )
+    await save_fixture(license_key)
+    return license_key
+
+
+def _activate_schema(license_key: LicenseKey, label: str) -> LicenseKeyActivate:
+    return LicenseKeyActivate(
+        key=license_key.key,
+        organization_id=license_key.organization_id,
+        label=label,
+        conditions={},
+        meta={},
+    )
+
+
+@pytest.mark.asyncio
+class TestActivate:
+    async def test_limit_reached(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        customer: Customer,
+    ) -> None:
+        benefit = await create_benefit(
+            save_fixture, type=BenefitType.license_keys, organization=organization
+        )
+        license_key = await create_license_key(
+            save_fixture,
+            organization=organization,
+            customer=customer,
+            benefit=benefit,
+            limit_activations=2,
+        )
+
+        for i in range(2):
+            await license_key_service.activate(
+                session, license_key, _activate_schema(license_key, f"Device {i}")
+            )
+        assert license_key.activations_count == 2
+
+        with pytest.raises(NotPermitted):
+            await license_key_service.activate(
+                session, license_key, _activate_schema(license_key, "Device 3")
+            )
+        assert license_key.activations_count == 2
+
+    async def test_deactivate_frees_slot(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        customer: Customer,
+    ) -> None:
+        benefit = await create_benefit(
+            save_fixture, type=BenefitType.license_keys, organization=organization
+        )
+        license_key = await create_license_key(
+            save_fixture,
+            organization=organization,
+            customer=customer,
+            benefit=benefit,
+            limit_activations=1,
+        )
+
+        activation = await license_key_service.activate(
+            session, license_key, _activate_schema(license_key, "Device")
+        )
+        assert license_key.activations_count == 1
+
+        await license_key_service.deactivate(
+            session,
+            license_key,
+            LicenseKeyDeactivate(
+                key=license_key.key,
+                organization_id=license_key.organization_id,
+                activation_id=activation.id,
+            ),
+        )
+        assert license_key.activations_count == 0
+
+        await license_key_service.activate(
+            session, license_key, _activate_schema(license_key, "Other device")
+        )
+        assert license_key.activations_count == 1
+
+
+@pytest_asyncio.fixture
+async def committed_license_key(worker_id: str) -> AsyncIterator[LicenseKey]:
+    """
+    License key committed outside of the test transaction,
+    so it's visible from several concurrent connections.
+    """
+    engine = create_async_engine(
+        dsn=get_database_url(worker_id),
+        application_name=f"test_{worker_id}",
+        pool_size=settings.DATABASE_POOL_SIZE,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+    )
+    async with AsyncSession(bind=engine, expire_on_commit=False) as session:
+        save_fixture = save_fixture_factory(session)
+        organization = await create_organization(save_fixture)
+        customer = await create_customer(save_fixture, organization=organization)
+        benefit = await create_benefit(
+            save_fixture, type=BenefitType.license_keys, organization=organization
+        )
+        license_key = await create_license_key(
+            save_fixture, organization=organization, customer=customer, benefit=benefit
+        )
+        await session.commit()
+
+        yield license_key
+
+        await session.execute(
+            delete(Organization).where(Organization.id == organization.id)
+        )
+        await session.commit()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_activate_concurrently(
+    worker_id: str, committed_license_key: LicenseKey
+) -> None:
+    engine = create_async_engine(
+        dsn=get_database_url(worker_id),
+        application_name=f"test_{worker_id}",
+        pool_size=CONCURRENT_ACTIVATIONS,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+    )
+
+    async def _activate(i: int) -> bool:
+        async with AsyncSession(bind=engine, expire_on_commit=False) as session:
+            repository = LicenseKeyRepository.from_session(session)
+            license_key = await repository.get_by_id(committed_license_key.id)
+            assert license_key is not None
+            try:
+                await license_key_service.activate(
+                    session, license_key, _activate_schema(license_key, f"Device {i}")
+                )
+            except PolarError:
+                await session.rollback()
+                return False
+            await session.commit()
+            return True
+
+    results = await asyncio.gather(
+        *(_activate(i) for i in range(CONCURRENT_ACTIVATIONS))
+    )
+
+    async with AsyncSession(bind=engine) as session:
+        repository = LicenseKeyRepository.from_session(session)
+        license_key = await repository.get_by_id(
+            committed_license_key.id, options=repository.get_eager_options()
+        )
+        assert license_key is not None
+        assert sum(results) == LIMIT_ACTIVATIONS
+        assert license_key.activations_count == LIMIT_ACTIVATIONS
+        assert len(license_key.activations) == LIMIT_ACTIVATIONS
+
+    await engine.dispose()
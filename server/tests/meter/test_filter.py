@@ -155,3 +155,53 @@ class TestFilter:
         matching_events = await repository.get_all(statement)
 
         assert len(matching_events) == 2
+
+    @pytest.mark.parametrize(
+        "value,expected",
+        [
+            ("5", [0]),
+            (5, [0, 1]),
+            (True, [2, 3, 4]),
+        ],
+    )
+    async def test_equal_clause(
+        self,
+        value: str | int | bool,
+        expected: list[int],
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+    ) -> None:
+        metadatas: list[dict[str, str | int | bool | float]] = [
+            {"value": "5"},
+            {"value": 5},
+            {"value": "t"},
+            {"value": True},
+            {"value": 1},
+            {"value": "other_value"},
+            {"value": False},
+            {"other": 5},
+        ]
+        events = [
+            await create_event(
+                save_fixture,
+                organization=organization,
+                external_customer_id="customer_1",
+                metadata=metadata,
+            )
+            for metadata in metadatas
+        ]
+        filter = Filter(
+            conjunction=FilterConjunction.and_,
+            clauses=[
+                FilterClause(property="value", operator=FilterOperator.eq, value=value)
+            ],
+        )
+
+        repository = EventRepository.from_session(session)
+        statement = repository.get_base_statement().where(filter.get_sql_clause(Event))
+        matching_events = await repository.get_all(statement)
+
+        assert {event.id for event in matching_events} == {
+            events[i].id for i in expected
+        }
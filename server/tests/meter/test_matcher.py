@@ -0,0 +1,316 @@
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+from sqlalchemy import select
+
+from polar.event.repository import EventRepository
+from polar.meter.aggregation import (
+    Aggregation,
+    AggregationFunction,
+    CountAggregation,
+    PropertyAggregation,
+)
+from polar.meter.filter import Filter, FilterClause, FilterConjunction, FilterOperator
+from polar.meter.matcher import MeterMatcher, _compile_like, _get_epoch, compile_meter
+from polar.models import Event, Meter, Organization
+from polar.models.event import EventSource
+from polar.postgres import AsyncSession
+from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_event
+
+
+def _get_meter(
+    *clauses: FilterClause | Filter,
+    conjunction: FilterConjunction = FilterConjunction.and_,
+    aggregation: Aggregation | None = None,
+) -> Meter:
+    return Meter(
+        name="Meter",
+        filter=Filter(conjunction=conjunction, clauses=list(clauses)),
+        aggregation=aggregation or CountAggregation(),
+    )
+
+
+def _get_event_data(**kwargs: Any) -> dict[str, Any]:
+    return {
+        "name": "test",
+        "source": EventSource.user,
+        "timestamp": datetime(2025, 1, 1, tzinfo=UTC),
+        "user_metadata": {},
+        **kwargs,
+    }
+
+
+@pytest.mark.parametrize(
+    "timestamp,expected",
+    [
+        (datetime(1970, 1, 1, 0, 0, 10, 499_999, tzinfo=UTC), 10),
+        (datetime(1970, 1, 1, 0, 0, 10, 500_000, tzinfo=UTC), 11),
+        (datetime(1969, 12, 31, 23, 59, 49, 500_000, tzinfo=UTC), -11),
+        (datetime(1969, 12, 31, 23, 59, 49, 600_000, tzinfo=UTC), -10),
+    ],
+)
+def test_get_epoch(timestamp: datetime, expected: int) -> None:
+    assert _get_epoch(timestamp) == expected
+
+
+@pytest.mark.parametrize(
+    "value,string,expected",
+    [
+        ("gpt", "openai/gpt-4", True),
+        ("gpt", "claude", False),
+        ("g%4", "openai/gpt-4", True),
+        ("g_t", "openai/gpt-4", True),
+        ("g_t", "openai/gt-4", False),
+        ("100\\%", "100%", True),
+        ("100\\%", "1000", False),
+        ("a.b", "axb", False),
+        ("line", "first\nline", True),
+    ],
+)
+def test_compile_like(value: str, string: str, expected: bool) -> None:
+    assert (_compile_like(value).fullmatch(string) is not None) == expected
+
+
+@pytest.mark.parametrize(
+    "value,name,expected",
+    [
+        ("10", "100", True),
+        ("10", "09", False),
+        ("a", "b", True),
+        ("a1", "a", False),
+        ("A", "b", None),
+        ("a", "B", None),
+        ("a", "a-b", None),
+    ],
+)
+def test_ordering_string(value: str, name: str, expected: bool | None) -> None:
+    predicate = compile_meter(
+        _get_meter(
+            FilterClause(property="name", operator=FilterOperator.gt, value=value)
+        )
+    )
+
+    assert predicate(_get_event_data(name=name)) is expected
+
+
+def test_three_valued_logic() -> None:
+    undecided = FilterClause(property="name", operator=FilterOperator.gt, value="A")
+    matching = FilterClause(property="name", operator=FilterOperator.eq, value="test")
+    not_matching = FilterClause(property="name", operator=FilterOperator.eq, value="x")
+    event = _get_event_data()
+
+    assert compile_meter(_get_meter(undecided, not_matching))(event) is False
+    assert compile_meter(_get_meter(undecided, matching))(event) is None
+    assert (
+        compile_meter(
+            _get_meter(undecided, matching, conjunction=FilterConjunction.or_)
+        )(event)
+        is True
+    )
+    assert (
+        compile_meter(
+            _get_meter(undecided, not_matching, conjunction=FilterConjunction.or_)
+        )(event)
+        is None
+    )
+
+
+def test_float_metadata() -> None:
+    event = _get_event_data(user_metadata={"tokens": 20.0})
+    non_integer_event = _get_event_data(user_metadata={"tokens": 20.5})
+
+    for operator in (FilterOperator.eq, FilterOperator.gte):
+        predicate = compile_meter(
+            _get_meter(FilterClause(property="tokens", operator=operator, value=20))
+        )
+        assert predicate(event) is True
+        assert predicate(non_integer_event) is False
+
+    predicate = compile_meter(
+        _get_meter(
+            FilterClause(property="tokens", operator=FilterOperator.like, value="20.")
+        )
+    )
+    assert predicate(event) is True
+    assert predicate(non_integer_event) is True
+
+
+class TestMeterMatcher:
+    def test_cache(self) -> None:
+        matcher = MeterMatcher(maxsize=1)
+        meter = _get_meter(
+            FilterClause(property="name", operator=FilterOperator.eq, value="test")
+        )
+        meter.modified_at = None
+
+        predicate = matcher.get_predicate(meter)
+        assert matcher.get_predicate(meter) is predicate
+        assert matcher.match(meter, _get_event_data()) is True
+
+        # Updated meter
+        meter.filter = Filter(
+            conjunction=FilterConjunction.and_,
+            clauses=[
+                FilterClause(property="name", operator=FilterOperator.eq, value="x")
+            ],
+        )
+        meter.modified_at = datetime(2025, 1, 1, tzinfo=UTC)
+        assert matcher.get_predicate(meter) is not predicate
+        assert matcher.match(meter, _get_event_data()) is False
+
+    def test_invalidate(self) -> None:
+        matcher = MeterMatcher()
+        meter = _get_meter()
+        meter.modified_at = None
+
+        predicate = matcher.get_predicate(meter)
+        matcher.invalidate(meter.id)
+
+        assert matcher.get_predicate(meter) is not predicate
+
+
+EVENTS: list[dict[str, Any]] = [
+    {"name": "completion", "metadata": {}},
+    {"name": "completion", "metadata": {"model": "gpt-4", "tokens": 100}},
+    {"name": "completion", "metadata": {"model": "gpt-4o", "tokens": 15}},
+    {"name": "completion", "metadata": {"model": "claude", "tokens": 20}},
+    {"name": "embedding", "metadata": {"model": "ada", "tokens": -3}},
+    {"name": "embedding", "metadata": {"tokens": "100", "cached": True}},
+    {"name": "upload", "metadata": {"cached": False, "size": 0}},
+    {"name": "upload", "metadata": {"cached": "t", "size": 1}},
+    {"name": "upload", "metadata": {"model": "100%", "size": 2}},
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "meter",
+    [
+        _get_meter(),
+        _get_meter(
+            FilterClause(property="name", operator=FilterOperator.eq, value="upload")
+        ),
+        _get_meter(
+            FilterClause(property="name", operator=FilterOperator.ne, value="upload"),
+            FilterClause(property="name", operator=FilterOperator.like, value="bed"),
+            conjunction=FilterConjunction.or_,
+        ),
+        _get_meter(
+            FilterClause(property="source", operator=FilterOperator.eq, value="user")
+        ),
+        _get_meter(FilterClause(property="name", operator=FilterOperator.eq, value=1)),
+        _get_meter(
+            FilterClause(
+                property="timestamp",
+                operator=FilterOperator.gte,
+                value=int(datetime(2025, 1, 1, tzinfo=UTC).timestamp()),
+            )
+        ),
+        _get_meter(
+            FilterClause(property="model", operator=FilterOperator.eq, value="gpt-4")
+        ),
+        _get_meter(
+            FilterClause(property="model", operator=FilterOperator.like, value="gpt")
+        ),
+        _get_meter(
+            FilterClause(
+                property="model", operator=FilterOperator.not_like, value="gpt"
+            )
+        ),
+        _get_meter(
+            FilterClause(property="model", operator=FilterOperator.like, value="0\\%")
+        ),
+        _get_meter(
+            FilterClause(property="tokens", operator=FilterOperator.eq, value=100)
+        ),
+        _get_meter(
+            FilterClause(property="tokens", operator=FilterOperator.ne, value=100)
+        ),
+        _get_meter(
+            FilterClause(property="tokens", operator=FilterOperator.gt, value=10)
+        ),
+        _get_meter(
+            FilterClause(property="tokens", operator=FilterOperator.like, value="1")
+        ),
+        _get_meter(
+            FilterClause(property="cached", operator=FilterOperator.eq, value=True)
+        ),
+        _get_meter(
+            FilterClause(property="cached", operator=FilterOperator.ne, value=True)
+        ),
+        _get_meter(
+            FilterClause(property="size", operator=FilterOperator.eq, value=True)
+        ),
+        _get_meter(FilterClause(property="size", operator=FilterOperator.lte, value=0)),
+        _get_meter(
+            Filter(
+                conjunction=FilterConjunction.or_,
+                clauses=[
+                    FilterClause(
+                        property="model", operator=FilterOperator.eq, value="ada"
+                    ),
+                    FilterClause(
+                        property="model", operator=FilterOperator.eq, value="claude"
+                    ),
+                ],
+            ),
+            FilterClause(property="name", operator=FilterOperator.ne, value="upload"),
+        ),
+        _get_meter(
+            aggregation=PropertyAggregation(
+                func=AggregationFunction.sum, property="tokens"
+            )
+        ),
+        _get_meter(
+            aggregation=PropertyAggregation(
+                func=AggregationFunction.max, property="timestamp"
+            )
+        ),
+        _get_meter(
+            FilterClause(property="model", operator=FilterOperator.ne, value="ada"),
+            aggregation=PropertyAggregation(
+                func=AggregationFunction.sum, property="size"
+            ),
+        ),
+    ],
+)
+async def test_sql_parity(
+    meter: Meter,
+    save_fixture: SaveFixture,
+    session: AsyncSession,
+    organization: Organization,
+) -> None:
+    events = [
+        await create_event(
+            save_fixture,
+            organization=organization,
+            name=event["name"],
+            timestamp=datetime(2025, 1, 1, tzinfo=UTC) + timedelta(hours=index - 4),
+            metadata=event["metadata"],
+        )
+        for index, event in enumerate(EVENTS)
+    ]
+
+    repository = EventRepository.from_session(session)
+    result = await session.execute(
+        select(Event.id).where(
+            Event.organization_id == organization.id,
+            repository.get_meter_definition_clause(meter),
+        )
+    )
+    expected = set(result.scalars().all())
+
+    predicate = compile_meter(meter)
+    for event in events:
+        match = predicate(
+            {
+                "name": event.name,
+                "source": event.source,
+                "timestamp": event.timestamp,
+                "user_metadata": event.user_metadata,
+            }
+        )
+        assert match is not None
+        assert match == (event.id in expected), event.user_metadata
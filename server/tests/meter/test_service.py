@@ -1,14 +1,16 @@
 import uuid
-from datetime import timedelta
+from datetime import datetime, timedelta
 from decimal import Decimal
 from unittest.mock import AsyncMock
 
 import pytest
 import pytest_asyncio
 from pytest_mock import MockerFixture
+from sqlalchemy import select
 
 from polar.auth.models import AuthSubject
 from polar.enums import SubscriptionRecurringInterval
+from polar.event.service import event as event_service
 from polar.event.system import SystemEvent
 from polar.exceptions import PolarRequestValidationError
 from polar.kit.time_queries import TimeInterval
@@ -25,6 +27,7 @@ from polar.meter.service import meter as meter_service
 from polar.models import (
     Customer,
     Event,
+    EventMeter,
     Meter,
     Organization,
     Product,
@@ -32,6 +35,7 @@ from polar.models import (
 )
 from polar.models.billing_entry import BillingEntryDirection
 from polar.models.event import EventSource
+from polar.models.meter import MeterMatchMaterialization
 from polar.postgres import AsyncSession
 from tests.fixtures.auth import AuthSubjectFixture
 from tests.fixtures.database import SaveFixture
@@ -53,6 +57,7 @@ class TestCreate:
     @pytest.mark.auth(AuthSubjectFixture(subject="organization"))
     async def test_last_billed_event_set(
         self,
+        enqueue_job_mock: AsyncMock,
         save_fixture: SaveFixture,
         session: AsyncSession,
         auth_subject: AuthSubject[Organization],
@@ -96,6 +101,9 @@ class TestCreate:
         )
 
         assert meter.last_billed_event == events[1]
+        # The match materialization is opt-in
+        assert meter.match_materialization is None
+        enqueue_job_mock.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -707,6 +715,184 @@ async def metered_subscription(
     )
 
 
+@pytest.mark.asyncio
+class TestMaterializeMatch:
+    async def test_basic(
+        self,
+        mocker: MockerFixture,
+        enqueue_job_mock: AsyncMock,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+    ) -> None:
+        timestamp = utc_now()
+        meter = await create_meter(
+            save_fixture,
+            filter=Filter(
+                conjunction=FilterConjunction.and_,
+                clauses=[
+                    FilterClause(
+                        property="model", operator=FilterOperator.eq, value="lite"
+                    )
+                ],
+            ),
+            aggregation=PropertyAggregation(
+                func=AggregationFunction.sum, property="tokens"
+            ),
+            organization=customer.organization,
+        )
+        past_event = await create_event(
+            save_fixture,
+            timestamp=timestamp - timedelta(days=40),
+            ingested_at=timestamp - timedelta(days=40),
+            organization=customer.organization,
+            customer=customer,
+            metadata={"tokens": 20, "model": "lite"},
+        )
+        await create_event(
+            save_fixture,
+            timestamp=timestamp,
+            organization=customer.organization,
+            customer=customer,
+            metadata={"tokens": 100, "model": "pro"},
+        )
+
+        await meter_service.materialize_match(session, meter)
+
+        assert meter.match_materialization == MeterMatchMaterialization.backfilling
+        assert meter.match_materialized_at is not None
+        materialized_at = meter.match_materialized_at
+        enqueue_job_mock.assert_called_once_with(
+            "meter.backfill_match", meter.id, materialized_at.isoformat()
+        )
+
+        # Tagged at ingestion while backfilling
+        new_event = await event_service.create_event(
+            session,
+            Event(
+                timestamp=timestamp,
+                source=EventSource.user,
+                name="test",
+                customer_id=customer.id,
+                organization=customer.organization,
+                user_metadata={"tokens": 10, "model": "lite"},
+            ),
+        )
+
+        # One event per batch
+        mocker.patch("polar.meter.service.MATCH_BACKFILL_BATCH_SIZE", 1)
+        enqueue_job_mock.reset_mock()
+        after: tuple[datetime, uuid.UUID] | None = None
+        batches = 0
+        while True:
+            await meter_service.backfill_match(session, meter, materialized_at, after)
+            if not enqueue_job_mock.called:
+                break
+            # The next batch is enqueued from the last event
+            assert not meter.is_match_materialized
+            actor, meter_id, materialized_at_arg, after_ingested_at, after_id = (
+                enqueue_job_mock.call_args.args
+            )
+            assert (actor, meter_id) == ("meter.backfill_match", meter.id)
+            assert materialized_at_arg == materialized_at.isoformat()
+            after = (datetime.fromisoformat(after_ingested_at), after_id)
+            enqueue_job_mock.reset_mock()
+            batches += 1
+
+        # The two events ingested before the materialization, then an empty batch
+        assert batches == 2
+        assert meter.is_match_materialized
+        result = await session.execute(
+            select(EventMeter.event_id).where(EventMeter.meter_id == meter.id)
+        )
+        assert set(result.scalars().all()) == {past_event.id, new_event.id}
+
+        quantities = await meter_service.get_quantities(
+            session,
+            meter,
+            customer_id=[customer.id],
+            start_timestamp=timestamp - timedelta(days=40),
+            end_timestamp=timestamp,
+            interval=TimeInterval.year,
+        )
+        assert quantities.total == 30
+
+    async def test_update_definition(
+        self,
+        enqueue_job_mock: AsyncMock,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+    ) -> None:
+        meter = await create_meter(
+            save_fixture,
+            organization=customer.organization,
+        )
+        meter.match_materialization = MeterMatchMaterialization.ready
+        await save_fixture(meter)
+        event = await create_event(
+            save_fixture,
+            organization=customer.organization,
+            customer=customer,
+            metadata={"tokens": 10, "model": "lite"},
+        )
+        await save_fixture(
+            EventMeter(
+                meter_id=meter.id, event_id=event.id, ingested_at=event.ingested_at
+            )
+        )
+
+        await meter_service.update(
+            session,
+            meter,
+            MeterUpdate(
+                aggregation=PropertyAggregation(
+                    func=AggregationFunction.max, property="tokens"
+                )
+            ),
+        )
+
+        assert meter.match_materialization == MeterMatchMaterialization.backfilling
+        assert meter.match_materialized_at is not None
+        enqueue_job_mock.assert_called_once_with(
+            "meter.backfill_match", meter.id, meter.match_materialized_at.isoformat()
+        )
+        result = await session.execute(
+            select(EventMeter.event_id).where(EventMeter.meter_id == meter.id)
+        )
+        assert result.scalars().all() == []
+
+    async def test_backfill_superseded(
+        self,
+        enqueue_job_mock: AsyncMock,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        customer: Customer,
+    ) -> None:
+        meter = await create_meter(save_fixture, organization=customer.organization)
+        await create_event(
+            save_fixture,
+            ingested_at=utc_now() - timedelta(days=1),
+            organization=customer.organization,
+            customer=customer,
+        )
+        await meter_service.materialize_match(session, meter)
+        previous_materialized_at = meter.match_materialized_at
+        assert previous_materialized_at is not None
+        await meter_service.materialize_match(session, meter)
+        enqueue_job_mock.reset_mock()
+
+        # The backfill of the previous materialization stops
+        await meter_service.backfill_match(session, meter, previous_materialized_at)
+
+        enqueue_job_mock.assert_not_called()
+        assert meter.match_materialization == MeterMatchMaterialization.backfilling
+        result = await session.execute(
+            select(EventMeter.event_id).where(EventMeter.meter_id == meter.id)
+        )
+        assert result.scalars().all() == []
+
+
 @pytest.mark.asyncio
 class TestCreateBillingEntries:
     async def test_no_subscription(
@@ -13,9 +13,9 @@ from ..conftest import create_oauth2_token
 
 
 @pytest.fixture(autouse=True)
-def enqueue_email_mock(mocker: MockerFixture) -> MagicMock:
+def enqueue_bulk_email_mock(mocker: MockerFixture) -> MagicMock:
     return mocker.patch(
-        "polar.oauth2.service.oauth2_token.enqueue_email", autospec=True
+        "polar.oauth2.service.oauth2_token.enqueue_bulk_email", autospec=True
     )
 
 
@@ -35,14 +35,14 @@ class TestRevokeLeaked:
         token: str,
         token_type: TokenType,
         session: AsyncSession,
-        enqueue_email_mock: MagicMock,
+        enqueue_bulk_email_mock: MagicMock,
     ) -> None:
         result = await oauth2_token_service.revoke_leaked(
             session, token, token_type, notifier="github", url="https://github.com"
         )
         assert result is False
 
-        enqueue_email_mock.assert_not_called()
+        enqueue_bulk_email_mock.assert_not_called()
 
     @pytest.mark.parametrize(
         "token, token_type",
@@ -59,7 +59,7 @@ class TestRevokeLeaked:
         session: AsyncSession,
         oauth2_client: OAuth2Client,
         user: User,
-        enqueue_email_mock: MagicMock,
+        enqueue_bulk_email_mock: MagicMock,
     ) -> None:
         oauth2_token = await create_oauth2_token(
             save_fixture,
@@ -78,7 +78,10 @@ class TestRevokeLeaked:
         assert oauth2_token.access_token_revoked_at is not None
         assert oauth2_token.refresh_token_revoked_at is not None
 
-        enqueue_email_mock.assert_called_once()
+        enqueue_bulk_email_mock.assert_called_once()
+        assert enqueue_bulk_email_mock.call_args.kwargs["to_email_addrs"] == [
+            user.email
+        ]
 
     @pytest.mark.parametrize(
         "token, token_type",
@@ -96,7 +99,7 @@ class TestRevokeLeaked:
         oauth2_client: OAuth2Client,
         organization: Organization,
         user_organization: UserOrganization,
-        enqueue_email_mock: MagicMock,
+        enqueue_bulk_email_mock: MagicMock,
     ) -> None:
         oauth2_token = await create_oauth2_token(
             save_fixture,
@@ -115,7 +118,7 @@ class TestRevokeLeaked:
         assert oauth2_token.access_token_revoked_at is not None
         assert oauth2_token.refresh_token_revoked_at is not None
 
-        enqueue_email_mock.assert_called_once()
+        enqueue_bulk_email_mock.assert_called_once()
 
     async def test_already_revoked(
         self,
@@ -123,7 +126,7 @@ class TestRevokeLeaked:
         session: AsyncSession,
         oauth2_client: OAuth2Client,
         user: User,
-        enqueue_email_mock: MagicMock,
+        enqueue_bulk_email_mock: MagicMock,
     ) -> None:
         await create_oauth2_token(
             save_fixture,
@@ -141,4 +144,4 @@ class TestRevokeLeaked:
         )
         assert result is True
 
-        enqueue_email_mock.assert_not_called()
+        enqueue_bulk_email_mock.assert_not_called()
@@ -17,16 +17,16 @@ from tests.fixtures.database import SaveFixture
 
 
 @pytest.fixture(autouse=True)
-def enqueue_email_mock(mocker: MockerFixture) -> MagicMock:
+def enqueue_bulk_email_mock(mocker: MockerFixture) -> MagicMock:
     return mocker.patch(
-        "polar.organization_access_token.service.enqueue_email", autospec=True
+        "polar.organization_access_token.service.enqueue_bulk_email", autospec=True
     )
 
 
 @pytest.mark.asyncio
 class TestRevokeLeaked:
     async def test_false_positive(
-        self, session: AsyncSession, enqueue_email_mock: MagicMock
+        self, session: AsyncSession, enqueue_bulk_email_mock: MagicMock
     ) -> None:
         result = await organization_access_token_service.revoke_leaked(
             session,
@@ -37,7 +37,7 @@ class TestRevokeLeaked:
         )
         assert result is False
 
-        enqueue_email_mock.assert_not_called()
+        enqueue_bulk_email_mock.assert_not_called()
 
     async def test_true_positive(
         self,
@@ -45,7 +45,7 @@ class TestRevokeLeaked:
         session: AsyncSession,
         organization: Organization,
         user_organization: UserOrganization,
-        enqueue_email_mock: MagicMock,
+        enqueue_bulk_email_mock: MagicMock,
     ) -> None:
         token_hash = get_token_hash("polar_pat_123", secret=settings.SECRET)
         organization_access_token = OrganizationAccessToken(
@@ -72,4 +72,7 @@ class TestRevokeLeaked:
         assert updated_organization_access_token is not None
         assert updated_organization_access_token.deleted_at is not None
 
-        enqueue_email_mock.assert_called_once()
+        enqueue_bulk_email_mock.assert_called_once()
+        assert enqueue_bulk_email_mock.call_args.kwargs["to_email_addrs"] == [
+            user_organization.user.email
+        ]
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+from polar.locker import ExpiredLockError, Locker, TimeoutLockError
+from polar.redis import Redis
+
+
+@pytest.mark.asyncio
+class TestLock:
+    async def test_acquire_release(self, locker: Locker) -> None:
+        async with locker.lock("test", timeout=1, blocking_timeout=1):
+            assert await locker.is_locked("test")
+
+        assert not await locker.is_locked("test")
+
+    async def test_timeout(self, locker: Locker) -> None:
+        async with locker.lock("test", timeout=5, blocking_timeout=1):
+            with pytest.raises(TimeoutLockError):
+                async with locker.lock("test", timeout=5, blocking_timeout=0.2):
+                    pass
+
+    async def test_expired(self, locker: Locker) -> None:
+        with pytest.raises(ExpiredLockError):
+            async with locker.lock("test", timeout=0.1, blocking_timeout=1):
+                await asyncio.sleep(0.2)
+
+    async def test_waiter_notified(self, locker: Locker) -> None:
+        holding = asyncio.Event()
+        released_at: float | None = None
+
+        async def _hold() -> None:
+            nonlocal released_at
+            async with locker.lock("test", timeout=10, blocking_timeout=1):
+                holding.set()
+                await asyncio.sleep(0.2)
+                released_at = time.perf_counter()
+
+        holder = asyncio.create_task(_hold())
+        await holding.wait()
+
+        async with locker.lock("test", timeout=10, blocking_timeout=5):
+            acquired_at = time.perf_counter()
+
+        await holder
+        assert released_at is not None
+        # Woken up by the release, not after the lock lifetime
+        assert acquired_at - released_at < 1
+
+    async def test_holder_died(self, redis: Redis, locker: Locker) -> None:
+        # Lock held by a process which died without releasing it
+        await redis.set("polarlock:test", "DEAD_TOKEN", px=200)
+
+        start = time.perf_counter()
+        async with locker.lock("test", timeout=1, blocking_timeout=2):
+            pass
+
+        assert time.perf_counter() - start < 1
+
+    async def test_serialized(self, locker: Locker) -> None:
+        counter = 0
+        max_concurrent = 0
+
+        async def _increment() -> None:
+            nonlocal counter, max_concurrent
+            async with locker.lock("test", timeout=5, blocking_timeout=5):
+                counter += 1
+                max_concurrent = max(max_concurrent, counter)
+                await asyncio.sleep(0.01)
+                counter -= 1
+
+        await asyncio.gather(*(_increment() for _ in range(10)))
+
+        assert max_concurrent == 1
+
+
+@pytest.mark.asyncio
+class TestTryLock:
+    async def test_acquire_release(self, locker: Locker) -> None:
+        async with locker.try_lock("test", timeout=1) as acquired:
+            assert acquired
+            assert await locker.is_locked("test")
+
+        assert not await locker.is_locked("test")
+
+    async def test_busy(self, locker: Locker) -> None:
+        async with locker.lock("test", timeout=5, blocking_timeout=1):
+            async with locker.try_lock("test", timeout=5) as acquired:
+                assert not acquired
+            # Didn't release the lock it doesn't hold
+            assert await locker.is_locked("test")
+
+    async def test_expired(self, locker: Locker) -> None:
+        with pytest.raises(ExpiredLockError):
+            async with locker.try_lock("test", timeout=0.1) as acquired:
+                assert acquired
+                await asyncio.sleep(0.2)
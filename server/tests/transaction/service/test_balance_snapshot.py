@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+import pytest
+
+from polar.kit.utils import utc_now
+from polar.models import Account
+from polar.models.transaction import TransactionType
+from polar.postgres import AsyncSession
+from polar.transaction.repository import TransactionBalanceSnapshotRepository
+from polar.transaction.service.balance_snapshot import (
+    transaction_balance_snapshot as transaction_balance_snapshot_service,
+)
+from polar.transaction.service.transaction import transaction as transaction_service
+from tests.fixtures.database import SaveFixture
+from tests.transaction.conftest import create_transaction
+
+
+async def _create_transactions(
+    save_fixture: SaveFixture, account: Account, *, days_ago: int
+) -> None:
+    created_at = utc_now() - timedelta(days=days_ago)
+    await create_transaction(
+        save_fixture, account=account, amount=1000, created_at=created_at
+    )
+    await create_transaction(
+        save_fixture, account=account, amount=-200, created_at=created_at
+    )
+    await create_transaction(
+        save_fixture,
+        account=account,
+        type=TransactionType.payout,
+        amount=-500,
+        created_at=created_at,
+    )
+
+
+@pytest.mark.asyncio
+class TestSnapshot:
+    async def test_snapshot_plus_delta(
+        self, session: AsyncSession, save_fixture: SaveFixture, account: Account
+    ) -> None:
+        await _create_transactions(save_fixture, account, days_ago=3)
+
+        await transaction_balance_snapshot_service.snapshot(session, account.id)
+
+        repository = TransactionBalanceSnapshotRepository.from_session(session)
+        snapshots = {
+            snapshot.type: snapshot
+            for snapshot in await repository.get_all_by_account(account.id)
+        }
+        assert set(snapshots) == set(TransactionType)
+        assert snapshots[TransactionType.balance].amount == 800
+        assert snapshots[TransactionType.payout].amount == -500
+        assert snapshots[TransactionType.payment].amount == 0
+
+        await _create_transactions(save_fixture, account, days_ago=0)
+
+        assert (
+            await transaction_service.get_transactions_sum(session, account.id) == 600
+        )
+        assert (
+            await transaction_service.get_transactions_sum(
+                session, account.id, type=TransactionType.balance
+            )
+            == 1600
+        )
+
+        summary = await transaction_service.get_summary(session, account)
+        assert summary.balance.amount == 600
+        assert summary.payout.amount == -1000
+
+    async def test_advance(
+        self, session: AsyncSession, save_fixture: SaveFixture, account: Account
+    ) -> None:
+        await _create_transactions(save_fixture, account, days_ago=5)
+        await transaction_balance_snapshot_service.snapshot(
+            session, account.id, snapshot_at=utc_now() - timedelta(days=4)
+        )
+        await _create_transactions(save_fixture, account, days_ago=3)
+
+        await transaction_balance_snapshot_service.snapshot(session, account.id)
+        session.expunge_all()
+
+        repository = TransactionBalanceSnapshotRepository.from_session(session)
+        snapshots = {
+            snapshot.type: snapshot
+            for snapshot in await repository.get_all_by_account(account.id)
+        }
+        assert snapshots[TransactionType.balance].amount == 1600
+        assert snapshots[TransactionType.payout].amount == -1000
+        assert (
+            await transaction_service.get_transactions_sum(session, account.id) == 600
+        )
+
+
+@pytest.mark.asyncio
+class TestCheck:
+    async def test_consistent(
+        self, session: AsyncSession, save_fixture: SaveFixture, account: Account
+    ) -> None:
+        await _create_transactions(save_fixture, account, days_ago=3)
+        await transaction_balance_snapshot_service.snapshot(session, account.id)
+
+        assert await transaction_balance_snapshot_service.check(session, account.id)
+
+    async def test_mismatch(
+        self, session: AsyncSession, save_fixture: SaveFixture, account: Account
+    ) -> None:
+        await _create_transactions(save_fixture, account, days_ago=3)
+        await transaction_balance_snapshot_service.snapshot(session, account.id)
+        session.expunge_all()
+
+        repository = TransactionBalanceSnapshotRepository.from_session(session)
+        for snapshot in await repository.get_all_by_account(account.id):
+            if snapshot.type == TransactionType.balance:
+                await repository.update(snapshot, update_dict={"amount": 0}, flush=True)
+
+        assert not await transaction_balance_snapshot_service.check(session, account.id)
+        assert await transaction_balance_snapshot_service.check(session, account.id)
+        assert (
+            await transaction_service.get_transactions_sum(session, account.id) == 300
+        )
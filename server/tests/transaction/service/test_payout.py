@@ -1,8 +1,11 @@
+import uuid
 from functools import partial
 from types import SimpleNamespace
+from typing import Any
 from unittest.mock import MagicMock
 
 import pytest
+import stripe as stripe_lib
 from pytest_mock import MockerFixture
 
 from polar.enums import AccountType
@@ -11,6 +14,9 @@ from polar.locker import Locker
 from polar.models import Account, Organization, Payout, Transaction, User
 from polar.models.transaction import Processor, TransactionType
 from polar.postgres import AsyncSession
+from polar.transaction.service.payout import (
+    PayoutTransferExecutor,
+)
 from polar.transaction.service.payout import (
     payout_transaction as payout_transaction_service,
 )
@@ -84,7 +90,9 @@ class TestCreate:
         )
 
         stripe_service_mock.transfer.return_value = SimpleNamespace(
-            id="STRIPE_TRANSFER_ID", balance_transaction="STRIPE_BALANCE_TRANSACTION_ID"
+            id="STRIPE_TRANSFER_ID",
+            balance_transaction="STRIPE_BALANCE_TRANSACTION_ID",
+            metadata={},
         )
 
         payout, fees = await create_payout(save_fixture, session, account=account)
@@ -119,6 +127,11 @@ class TestCreate:
                 payment_transaction_1.charge_id,
                 payment_transaction_2.charge_id,
             ]
+            assert "balance_transaction_id" in call[1]["metadata"]
+
+        update_transfer_mock: MagicMock = stripe_service_mock.update_transfer
+        assert update_transfer_mock.call_count == transfer_mock.call_count
+        for call in update_transfer_mock.call_args_list:
             assert call[1]["metadata"]["payout_transaction_id"] == str(transaction.id)
 
         stripe_service_mock.create_payout.assert_not_called()
@@ -150,6 +163,7 @@ class TestCreate:
             id="STRIPE_TRANSFER_ID",
             balance_transaction="STRIPE_BALANCE_TRANSACTION_ID",
             destination_payment="STRIPE_DESTINATION_CHARGE_ID",
+            metadata={},
         )
         stripe_service_mock.get_charge.return_value = SimpleNamespace(
             id="STRIPE_DESTINATION_CHARGE_ID",
@@ -232,7 +246,9 @@ class TestCreate:
         )
 
         stripe_service_mock.transfer.return_value = SimpleNamespace(
-            id="STRIPE_TRANSFER_ID", balance_transaction="STRIPE_BALANCE_TRANSACTION_ID"
+            id="STRIPE_TRANSFER_ID",
+            balance_transaction="STRIPE_BALANCE_TRANSACTION_ID",
+            metadata={},
         )
 
         payout, fees = await create_payout(save_fixture, session, account=account)
@@ -274,6 +290,11 @@ class TestCreate:
                 payment_transaction_1.charge_id,
                 payment_transaction_2.charge_id,
             ]
+            assert "balance_transaction_id" in call[1]["metadata"]
+
+        update_transfer_mock: MagicMock = stripe_service_mock.update_transfer
+        assert update_transfer_mock.call_count == transfer_mock.call_count
+        for call in update_transfer_mock.call_args_list:
             assert call[1]["metadata"]["payout_transaction_id"] == str(transaction.id)
 
         stripe_service_mock.create_payout.assert_not_called()
@@ -339,7 +360,9 @@ class TestCreate:
         )
 
         stripe_service_mock.transfer.return_value = SimpleNamespace(
-            id="STRIPE_TRANSFER_ID", balance_transaction="STRIPE_BALANCE_TRANSACTION_ID"
+            id="STRIPE_TRANSFER_ID",
+            balance_transaction="STRIPE_BALANCE_TRANSACTION_ID",
+            metadata={},
         )
 
         payout, fees = await create_payout(save_fixture, session, account=account)
@@ -376,10 +399,97 @@ class TestCreate:
                 payment_transaction_3.charge_id,
             ]
             # assert call[1]["transfer_group"] == str(payout.id)
+            assert "balance_transaction_id" in call[1]["metadata"]
+
+        update_transfer_mock: MagicMock = stripe_service_mock.update_transfer
+        assert update_transfer_mock.call_count == transfer_mock.call_count
+        for call in update_transfer_mock.call_args_list:
             assert call[1]["metadata"]["payout_transaction_id"] == str(transaction.id)
 
         stripe_service_mock.create_payout.assert_not_called()
 
+    async def test_stripe_idempotency_keys(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+        user: User,
+        stripe_service_mock: MagicMock,
+    ) -> None:
+        account = await create_account(save_fixture, organization, user)
+        balance_transactions = []
+        for _ in range(3):
+            payment_transaction = await create_payment_transaction(save_fixture)
+            balance_transactions.append(
+                await create_balance_transaction(
+                    save_fixture,
+                    account=account,
+                    payment_transaction=payment_transaction,
+                )
+            )
+
+        stripe_service_mock.transfer.return_value = SimpleNamespace(
+            id="STRIPE_TRANSFER_ID",
+            balance_transaction="STRIPE_BALANCE_TRANSACTION_ID",
+            metadata={},
+        )
+
+        payout, fees = await create_payout(save_fixture, session, account=account)
+        await payout_transaction_service.create(session, payout, fees)
+
+        idempotency_keys = {
+            call[1]["idempotency_key"]
+            for call in stripe_service_mock.transfer.call_args_list
+        }
+        assert len(idempotency_keys) == stripe_service_mock.transfer.call_count
+        assert {
+            f"payout_transfer_{balance_transaction.id}"
+            for balance_transaction in balance_transactions
+        } == idempotency_keys
+
+    async def test_stripe_partial_failure(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+        user: User,
+        stripe_service_mock: MagicMock,
+    ) -> None:
+        account = await create_account(save_fixture, organization, user)
+
+        payment_transaction_1 = await create_payment_transaction(
+            save_fixture, charge_id="STRIPE_CHARGE_ID_1"
+        )
+        balance_transaction_1 = await create_balance_transaction(
+            save_fixture, account=account, payment_transaction=payment_transaction_1
+        )
+        payment_transaction_2 = await create_payment_transaction(
+            save_fixture, charge_id="STRIPE_CHARGE_ID_2"
+        )
+        balance_transaction_2 = await create_balance_transaction(
+            save_fixture, account=account, payment_transaction=payment_transaction_2
+        )
+
+        async def transfer(
+            destination_stripe_id: str, amount: int, **kwargs: Any
+        ) -> SimpleNamespace:
+            if kwargs["source_transaction"] == payment_transaction_2.charge_id:
+                raise stripe_lib.APIConnectionError("Connection error")
+            return SimpleNamespace(id="STRIPE_TRANSFER_ID", metadata={})
+
+        stripe_service_mock.transfer.side_effect = transfer
+
+        payout, fees = await create_payout(save_fixture, session, account=account)
+
+        with pytest.raises(stripe_lib.APIConnectionError):
+            await payout_transaction_service.create(session, payout, fees)
+
+        # The successful transfer is checkpointed, so a new run won't make it again
+        await session.refresh(balance_transaction_1)
+        await session.refresh(balance_transaction_2)
+        assert balance_transaction_1.transfer_id == "STRIPE_TRANSFER_ID"
+        assert balance_transaction_2.transfer_id is None
+
     async def test_open_collective(
         self,
         save_fixture: SaveFixture,
@@ -415,3 +525,81 @@ class TestCreate:
 
         assert len(transaction.incurred_transactions) == 0
         assert len(transaction.account_incurred_transactions) == 0
+
+
+@pytest.mark.asyncio
+class TestPayoutTransferExecutor:
+    @pytest.mark.parametrize(
+        "metadata",
+        [
+            pytest.param({}, id="untagged"),
+            pytest.param({"payout_id": "OTHER_PAYOUT_ID"}, id="other payout"),
+        ],
+    )
+    async def test_existing_transfer_update(
+        self,
+        metadata: dict[str, str],
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+        user: User,
+        stripe_service_mock: MagicMock,
+    ) -> None:
+        account = await create_account(save_fixture, organization, user)
+        payout = await _create_payout(save_fixture, account=account)
+        transaction = Transaction(
+            id=uuid.uuid4(),
+            type=TransactionType.payout,
+            currency="usd",
+            account_currency="usd",
+        )
+        balance_transaction = Transaction(
+            id=uuid.uuid4(), transfer_id="STRIPE_TRANSFER_ID"
+        )
+        stripe_service_mock.get_transfer.return_value = SimpleNamespace(
+            id="STRIPE_TRANSFER_ID", metadata=metadata
+        )
+
+        executor = PayoutTransferExecutor(session, account, payout, transaction)
+        await executor._transfer("STRIPE_CHARGE_ID", 1000, balance_transaction)
+
+        stripe_service_mock.update_transfer.assert_called_once_with(
+            "STRIPE_TRANSFER_ID",
+            metadata={
+                "payout_id": str(payout.id),
+                "payout_transaction_id": str(transaction.id),
+            },
+        )
+
+    async def test_existing_transfer_already_tagged(
+        self,
+        save_fixture: SaveFixture,
+        session: AsyncSession,
+        organization: Organization,
+        user: User,
+        stripe_service_mock: MagicMock,
+    ) -> None:
+        account = await create_account(save_fixture, organization, user)
+        payout = await _create_payout(save_fixture, account=account)
+        transaction = Transaction(
+            id=uuid.uuid4(),
+            type=TransactionType.payout,
+            currency="usd",
+            account_currency="usd",
+        )
+        balance_transaction = Transaction(
+            id=uuid.uuid4(), transfer_id="STRIPE_TRANSFER_ID"
+        )
+        stripe_service_mock.get_transfer.return_value = SimpleNamespace(
+            id="STRIPE_TRANSFER_ID",
+            metadata={
+                "balance_transaction_id": str(balance_transaction.id),
+                "payout_id": str(payout.id),
+                "payout_transaction_id": str(transaction.id),
+            },
+        )
+
+        executor = PayoutTransferExecutor(session, account, payout, transaction)
+        await executor._transfer("STRIPE_CHARGE_ID", 1000, balance_transaction)
+
+        stripe_service_mock.update_transfer.assert_not_called()